@@ -0,0 +1,474 @@
+# type: ignore  # SQLAlchemy Column type annotations have known limitations with type checkers
+"""
+AI work queue (ai_tasks table)
+
+Rows are added at ingest time, one per (entity, task), so finding pending AI
+work is an indexed O(batch) lookup instead of a scan over posts/comments JSON.
+Workers claim tasks with SELECT ... FOR UPDATE SKIP LOCKED and keep the lock
+until they commit their results, so concurrent workers never process the same
+row and a crashed worker simply releases its claim.
+"""
+from sqlalchemy import Float, String, bindparam, case, cast, func, literal, select, update
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Iterable, Optional
+import logging
+from app.models import AITask, Post, Comment
+
+logger = logging.getLogger(__name__)
+
+TASK_SENTIMENT = 'sentiment'
+TASK_COMMENT_SENTIMENT = 'comment_sentiment'  # A post's aggregate over its comments (analyze_post_sentiment), kept apart from the caption's result; not queued
+TASK_TOPICS = 'topics'  # Keyword topics (app/topics.py), results in ai_results['topics']
+TASK_EMBEDDING = 'embedding'  # Semantic search vectors, stored in the embedding index rather than ai_results
+INGEST_TASKS = (TASK_SENTIMENT, TASK_TOPICS, TASK_EMBEDDING)  # Queued for every new post/comment
+MAX_ATTEMPTS = 3  # Tasks that fail this many times are parked as 'failed'
+
+ENTITY_MODELS = {'post': Post, 'comment': Comment}
+QUEUE_COLUMNS = ['entity_type', 'entity_id', 'task', 'status', 'attempts', 'created_at', 'updated_at']
+
+
+def _has_text(entity_type: str):
+    """Only rows with text are worth queueing"""
+    if entity_type == 'post':
+        return [Post.caption.isnot(None), Post.caption != '']
+    return [Comment.comment_text.isnot(None), Comment.comment_text != '']
+
+
+def sentiment_label(model):
+    """SQL expression for the stored sentiment label (NULL when not analyzed yet)"""
+    return cast(model.ai_results, JSONB)[TASK_SENTIMENT]['label'].astext
+
+
+def sentiment_score(model, weights: Optional[list[float]] = None):
+    """
+    SQL expression for a row's sentiment score in -1..1 (NULL when not analyzed yet)
+
+    The expected value of the stored 5-class distribution under the class
+    weights (SENTIMENT_CLASS_WEIGHTS by default). Results stored without a
+    distribution (rule-based, or analyzed before it was kept) count as
+    +score / -score / 0 by label.
+    """
+    from app.config import SENTIMENT_CLASS_WEIGHTS
+
+    sentiment = cast(model.ai_results, JSONB)[TASK_SENTIMENT]
+    probs = sentiment['probs']
+    expected = sum(
+        cast(probs[i].astext, Float) * weight
+        for i, weight in enumerate(weights or SENTIMENT_CLASS_WEIGHTS)
+    )
+    score = cast(sentiment['score'].astext, Float)
+    by_label = case(
+        (sentiment_label(model) == 'positive', score),
+        (sentiment_label(model) == 'negative', -score),
+        (sentiment_label(model).isnot(None), 0.0)
+    )
+    return func.coalesce(expected, by_label)
+
+
+def sentiment_polarity(model):
+    """
+    SQL expression for a row's polarity in -1..1 (NULL when not analyzed yet)
+
+    The positive minus the negative probability mass of the stored 5-class
+    distribution (the 'very_' classes count with their base class), so its mean
+    is the share of positive minus the share of negative items. Results stored
+    without a distribution count as +1 / -1 / 0 by label.
+    """
+    from app.config import SENTIMENT_CLASSES
+
+    probs = cast(model.ai_results, JSONB)[TASK_SENTIMENT]['probs']
+    mass = sum(
+        cast(probs[i].astext, Float) * (1 if name.endswith('positive') else -1)
+        for i, name in enumerate(SENTIMENT_CLASSES)
+        if name != 'neutral'
+    )
+    by_label = case(
+        (sentiment_label(model) == 'positive', 1.0),
+        (sentiment_label(model) == 'negative', -1.0),
+        (sentiment_label(model).isnot(None), 0.0)
+    )
+    return func.coalesce(mass, by_label)
+
+
+def score_value(sentiment: Optional[dict]) -> float:
+    """Python twin of sentiment_score() for one stored result dict"""
+    from app.config import SENTIMENT_CLASS_WEIGHTS
+
+    if not sentiment:
+        return 0.0
+    if sentiment.get('probs'):
+        return sum(p * w for p, w in zip(sentiment['probs'], SENTIMENT_CLASS_WEIGHTS))
+    sign = {'positive': 1, 'negative': -1}.get(sentiment.get('label'), 0)
+    return sign * (sentiment.get('score') or 0.0)
+
+
+def has_result(model, task: str):
+    """SQL filter: row already carries the task's result in ai_results"""
+    return func.coalesce(cast(model.ai_results, JSONB).has_key(task), False)
+
+
+def has_sentiment(model):
+    """SQL filter: row already carries a sentiment result in ai_results"""
+    return has_result(model, TASK_SENTIMENT)
+
+
+def is_trivial_text(model):
+    """SQL filter: the ingest pre-pass tagged the row as emoji/mention/URL-only or empty (untagged rows count as text)"""
+    return func.coalesce(cast(model.text_features, JSONB)['kind'].astext, 'text') != 'text'
+
+
+def enqueue(db: Session, entity_type: str, filters: list, tasks: Iterable[str] = (TASK_SENTIMENT,)) -> None:
+    """
+    Queue tasks for every entity matching filters (INSERT ... SELECT, duplicates ignored)
+
+    Args:
+        db: Session, caller commits
+        entity_type: 'post' or 'comment'
+        filters: SQLAlchemy filters on the entity model
+        tasks: Task names to queue
+    """
+    model = ENTITY_MODELS[entity_type]
+    now = datetime.utcnow()
+    for task in tasks:
+        rows = select(
+            literal(entity_type), model.id, literal(task), literal('pending'), literal(0), literal(now), literal(now)
+        ).where(*filters, *_has_text(entity_type))
+        stmt = insert(AITask.__table__).from_select(QUEUE_COLUMNS, rows)\
+            .on_conflict_do_nothing(index_elements=['entity_type', 'entity_id', 'task'])
+        db.execute(stmt)
+
+
+def enqueue_posts(db: Session, post_ids: list[str], tasks: Iterable[str] = INGEST_TASKS) -> None:
+    """Queue AI tasks for newly inserted posts (by Instagram post_id)"""
+    if post_ids:
+        enqueue(db, 'post', [Post.post_id.in_(post_ids)], tasks)
+
+
+def enqueue_comments(db: Session, comment_ids: list[str], tasks: Iterable[str] = INGEST_TASKS) -> None:
+    """Queue AI tasks for newly inserted comments (by Instagram comment_id)"""
+    if comment_ids:
+        enqueue(db, 'comment', [Comment.comment_id.in_(comment_ids)], tasks)
+
+
+def claim_tasks(db: Session, entity_type: str, task: str, limit: int) -> list[AITask]:
+    """
+    Claim up to `limit` pending tasks, oldest first
+
+    Rows stay locked (FOR UPDATE SKIP LOCKED) until the caller commits or
+    rolls back, so other workers skip them in the meantime.
+    """
+    tasks = db.query(AITask)\
+        .filter(AITask.task == task, AITask.entity_type == entity_type, AITask.status == 'pending')\
+        .order_by(AITask.id)\
+        .limit(limit)\
+        .with_for_update(skip_locked=True)\
+        .all()
+
+    for t in tasks:
+        t.status = 'running'
+        t.attempts = (t.attempts or 0) + 1
+
+    return tasks
+
+
+def complete_tasks(db: Session, tasks: list[AITask], model_version: Optional[str] = None) -> None:
+    """Mark claimed tasks as done (caller commits)"""
+    now = datetime.utcnow()
+    for t in tasks:
+        t.status = 'done'
+        t.model_version = model_version
+        t.error_message = None
+        t.updated_at = now
+
+
+def fail_tasks(db: Session, task_ids: list[int], error: str) -> None:
+    """
+    Record a failed attempt, tasks go back to pending until MAX_ATTEMPTS
+
+    Meant to run in a fresh transaction after the failed one was rolled back.
+    """
+    if not task_ids:
+        return
+    db.query(AITask).filter(AITask.id.in_(task_ids)).update({
+        'attempts': AITask.attempts + 1,
+        'status': case((AITask.attempts + 1 >= MAX_ATTEMPTS, 'failed'), else_='pending'),
+        'error_message': error[:1000],
+        'updated_at': datetime.utcnow()
+    }, synchronize_session=False)
+
+
+def mark_done(db: Session, entity_type: str, entity_ids: list[int], task: str, model_version: Optional[str] = None) -> None:
+    """
+    Mark a task as done for entities processed outside the queue
+    (e.g. single-item endpoints), creating the rows if they don't exist yet
+    """
+    if not entity_ids:
+        return
+    now = datetime.utcnow()
+    stmt = insert(AITask.__table__).values([
+        {
+            'entity_type': entity_type,
+            'entity_id': entity_id,
+            'task': task,
+            'status': 'done',
+            'attempts': 1,
+            'model_version': model_version,
+            'created_at': now,
+            'updated_at': now
+        }
+        for entity_id in set(entity_ids)
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['entity_type', 'entity_id', 'task'],
+        set_={'status': 'done', 'model_version': model_version, 'error_message': None, 'updated_at': now}
+    )
+    db.execute(stmt)
+
+
+def store_sentiments(db: Session, entity_type: str, rows: list, sentiments: list, features: Optional[list] = None) -> None:
+    """
+    Bulk-write sentiment results into ai_results and bump the post counters (caller commits)
+
+    Args:
+        rows: Objects/rows with .id (and .post_id for comments)
+        sentiments: SentimentResults in the same order as rows
+        features: Optional text_features in the same order, stored alongside
+            (tags rows ingested before the pre-pass existed)
+    """
+    if not rows:
+        return
+    analyzed_at = datetime.utcnow().isoformat()
+    values = {
+        row.id: {**sentiment.to_dict(), 'analyzed_at': analyzed_at}
+        for row, sentiment in zip(rows, sentiments)
+    }
+    extra = None
+    if features is not None:
+        extra = {row.id: {'text_features': row_features} for row, row_features in zip(rows, features)}
+    previous = merge_results(db, entity_type, TASK_SENTIMENT, values, extra)
+
+    if entity_type == 'comment':
+        update_post_counters(db, [
+            (row.post_id, previous.get(row.id), values[row.id])
+            for row in rows
+        ])
+
+
+def merge_results(db: Session, entity_type: str, task: str, values: dict, extra: Optional[dict] = None) -> dict:
+    """
+    Write one task's results into ai_results in SQL, returning the results they replaced (caller commits)
+
+    Only the task's key is replaced (jsonb ||), so a concurrent write of
+    another task to the same rows isn't lost. The rows are locked (FOR UPDATE,
+    in id order) before the previous results are read, so they are the ones
+    this write replaces until the caller commits, which is what rollup deltas
+    need.
+
+    Args:
+        values: Entity id -> result for the task
+        extra: Entity id -> other columns to set alongside, e.g. {'text_features': ...}
+
+    Returns:
+        Entity id -> previous result (missing when there was none)
+    """
+    if not values:
+        return {}
+    table = ENTITY_MODELS[entity_type].__table__
+    ids = sorted(values)
+    previous = dict(db.execute(
+        select(table.c.id, cast(table.c.ai_results, JSONB)[task])
+        .where(table.c.id.in_(ids))
+        .order_by(table.c.id)
+        .with_for_update()
+    ).all())
+
+    merged = func.coalesce(cast(table.c.ai_results, JSONB), func.jsonb_build_object())\
+        .op('||')(func.jsonb_build_object(cast(literal(task), String), bindparam('b_value', type_=JSONB)))
+    extra_columns = sorted({column for columns in (extra or {}).values() for column in columns})
+    stmt = update(table).where(table.c.id == bindparam('b_id')).values(
+        ai_results=cast(merged, table.c.ai_results.type),
+        **{column: bindparam(f'b_{column}') for column in extra_columns}
+    )
+    db.execute(stmt, [
+        {
+            'b_id': entity_id,
+            'b_value': values[entity_id],
+            **{f'b_{column}': (extra or {}).get(entity_id, {}).get(column) for column in extra_columns}
+        }
+        for entity_id in ids
+    ])
+    return {entity_id: result for entity_id, result in previous.items() if result is not None}
+
+
+COUNTED_LABELS = ('positive', 'neutral', 'negative')
+
+
+def update_post_counters(db: Session, changes: list) -> None:
+    """
+    Apply comment sentiment writes to their posts' counters (caller commits)
+
+    Increments are relative (col = col + delta), so concurrent writers don't
+    lose each other's updates.
+
+    Args:
+        changes: (post_id, previous sentiment dict or None, new sentiment dict) per comment
+    """
+    deltas = {}
+    for post_id, previous, current in changes:
+        delta = deltas.setdefault(post_id, {**{label: 0 for label in COUNTED_LABELS}, 'score': 0.0})
+        for sentiment, sign in ((previous, -1), (current, 1)):
+            if sentiment and sentiment.get('label') in COUNTED_LABELS:
+                delta[sentiment['label']] += sign
+                delta['score'] += sign * score_value(sentiment)
+
+    if not deltas:
+        return
+    posts = Post.__table__
+    stmt = update(posts).where(posts.c.id == bindparam('b_id')).values(
+        sentiment_positive=posts.c.sentiment_positive + bindparam('b_positive'),
+        sentiment_neutral=posts.c.sentiment_neutral + bindparam('b_neutral'),
+        sentiment_negative=posts.c.sentiment_negative + bindparam('b_negative'),
+        sentiment_score_sum=posts.c.sentiment_score_sum + bindparam('b_score')
+    )
+    db.execute(stmt, [
+        {
+            'b_id': post_id,
+            'b_positive': delta['positive'],
+            'b_neutral': delta['neutral'],
+            'b_negative': delta['negative'],
+            'b_score': delta['score']
+        }
+        for post_id, delta in deltas.items()
+    ])
+
+
+def rebuild_post_counters(db: Session, post_ids: Optional[list[int]] = None) -> None:
+    """
+    Recompute post counters from the results stored on their comments (caller commits)
+
+    SQL only, no model. Run for posts aggregated before the counters existed,
+    or for all posts after SENTIMENT_CLASS_WEIGHTS changed.
+
+    Args:
+        post_ids: Posts to rebuild (default: all)
+    """
+    posts = Post.__table__
+    label = sentiment_label(Comment)
+    totals = select(
+        Comment.post_id.label('post_id'),
+        *[func.count().filter(label == name).label(name) for name in COUNTED_LABELS],
+        func.coalesce(func.sum(sentiment_score(Comment)), 0.0).label('score_sum')
+    ).where(label.isnot(None))
+    reset = update(posts).values(
+        sentiment_positive=0,
+        sentiment_neutral=0,
+        sentiment_negative=0,
+        sentiment_score_sum=0.0,
+        sentiment_aggregated_at=datetime.utcnow()
+    )
+    if post_ids is not None:
+        totals = totals.where(Comment.post_id.in_(post_ids))
+        reset = reset.where(posts.c.id.in_(post_ids))
+    totals = totals.group_by(Comment.post_id).subquery()
+
+    db.execute(reset)
+    db.execute(
+        update(posts).where(posts.c.id == totals.c.post_id).values(
+            sentiment_positive=totals.c.positive,
+            sentiment_neutral=totals.c.neutral,
+            sentiment_negative=totals.c.negative,
+            sentiment_score_sum=totals.c.score_sum
+        )
+    )
+
+
+def seed_tasks(db: Session) -> int:
+    """
+    Fill the queue from existing posts/comments on first startup
+
+    Runs once per task: only while ai_tasks has no rows for it yet (so a task
+    added later is seeded on the next startup). Rows that already carry the
+    task's result in ai_results are recorded as done. Returns the number of
+    rows inserted.
+    """
+    inserted = 0
+    now = datetime.utcnow()
+    for task in INGEST_TASKS:
+        if db.query(AITask.id).filter(AITask.task == task).first() is not None:
+            continue
+        inserted += _seed_task(db, task, now)
+
+    db.commit()
+    if inserted:
+        logger.info(f"Seeded {inserted} AI tasks from existing posts and comments")
+    return inserted
+
+
+def _seed_task(db: Session, task: str, now: datetime) -> int:
+    inserted = 0
+    for entity_type, model in ENTITY_MODELS.items():
+        already_done = has_result(model, task)
+        rows = select(
+            literal(entity_type),
+            model.id,
+            literal(task),
+            case((already_done, 'done'), else_='pending'),
+            literal(0),
+            literal(now),
+            literal(now)
+        ).where(*_has_text(entity_type))
+        stmt = insert(AITask.__table__).from_select(QUEUE_COLUMNS, rows)\
+            .on_conflict_do_nothing(index_elements=['entity_type', 'entity_id', 'task'])
+        inserted += db.execute(stmt).rowcount
+    return inserted
+
+
+def move_comment_aggregates(db: Session) -> int:
+    """
+    Move post comment aggregates stored under ai_results['sentiment'] to their own key
+
+    analyze_post_sentiment used to write its aggregate (the result with a
+    'breakdown') over the caption's sentiment. Those posts get the aggregate
+    under TASK_COMMENT_SENTIMENT and their caption sentiment queued again, so
+    they are neither counted as their comments' label nor skipped as analyzed.
+    Idempotent; returns the number of posts moved.
+    """
+    table = Post.__table__
+    results = cast(table.c.ai_results, JSONB)
+    moved = results.op('-')(literal(TASK_SENTIMENT, String))\
+        .op('||')(func.jsonb_build_object(cast(literal(TASK_COMMENT_SENTIMENT), String), results[TASK_SENTIMENT]))
+    post_ids = db.execute(
+        update(table)
+        .where(results[TASK_SENTIMENT].has_key('breakdown'))
+        .values(ai_results=cast(moved, table.c.ai_results.type))
+        .returning(table.c.id)
+    ).scalars().all()
+
+    if post_ids:
+        db.query(AITask).filter(
+            AITask.entity_type == 'post',
+            AITask.task == TASK_SENTIMENT,
+            AITask.entity_id.in_(post_ids)
+        ).update({'status': 'pending', 'attempts': 0, 'updated_at': datetime.utcnow()}, synchronize_session=False)
+        enqueue(db, 'post', [Post.id.in_(post_ids)])
+        logger.info(f"Moved {len(post_ids)} post comment aggregates to ai_results['{TASK_COMMENT_SENTIMENT}']")
+    db.commit()
+    return len(post_ids)
+
+
+def task_counts(db: Session, task: str = TASK_SENTIMENT) -> dict:
+    """
+    Task status counts per entity type, e.g.
+    {'post': {'pending': 10, 'done': 90}, 'comment': {...}}
+    """
+    rows = db.query(AITask.entity_type, AITask.status, func.count(AITask.id))\
+        .filter(AITask.task == task)\
+        .group_by(AITask.entity_type, AITask.status)\
+        .all()
+
+    counts = {entity_type: {} for entity_type in ENTITY_MODELS}
+    for entity_type, status, count in rows:
+        counts.setdefault(entity_type, {})[status] = count
+    return counts
@@ -0,0 +1,677 @@
+# type: ignore  # SQLAlchemy Column type annotations have known limitations with type checkers
+"""
+Dashboard analytics widgets
+
+Each widget is a function of a session and its parameters. A GET
+/analytics/<name> endpoint runs one widget. POST /analytics/snapshot runs any
+number of them in one session and one REPEATABLE READ transaction, so a
+dashboard page loads with a single round trip. Snapshot widgets are cached one
+by one, so pages with overlapping widget lists share entries.
+
+The per-post aggregates (engagement overview, post types, posting hours and
+days, content sources) come from one GROUPING SETS query. A snapshot asking
+for several of them scans posts once instead of once per widget.
+
+Counting happens in SQL: sentiment labels are read with JSONB extraction and
+counted with FILTER clauses, and caption lengths are bucketed with
+width_bucket(). Only the aggregated rows reach Python, so memory use does not
+grow with the size of the tables.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+import inspect
+import json
+import re
+from sqlalchemy import desc, func, select, tuple_, union_all
+from sqlalchemy.dialects.postgresql import array
+from sqlalchemy.orm import Session
+from app.models import Post, Comment, TargetUser, TargetHashtag, TargetPlace
+
+DAY_NAMES = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+
+# Caption length buckets: lower bounds of all but the first, and their names
+CAPTION_LENGTH_BOUNDS = [51, 101, 201, 501]
+CAPTION_LENGTH_RANGES = ["0-50", "51-100", "101-200", "201-500", "500+"]
+
+# Widget -> grouping in the shared posts query (None: the grand total)
+POST_AGGREGATES = {
+    'engagement-overview': None,
+    'engagement-by-post-type': Post.post_type,
+    'posting-hours': func.extract('hour', Post.timestamp),
+    'posting-days': func.extract('dow', Post.timestamp),
+    'content-sources': Post.source,
+}
+
+# Snapshot parameters use the endpoints' query parameter names
+PARAM_ALIASES = {'excludeSpam': 'exclude_spam'}
+
+
+def _labels(model, *filters):
+    """Lower-cased sentiment label of every row with a sentiment result"""
+    from app import ai_tasks
+    return select(func.lower(ai_tasks.sentiment_label(model)).label('label'))\
+        .where(ai_tasks.has_sentiment(model), *filters)
+
+
+def _label_counts(db: Session, labels) -> dict:
+    """positive/neutral/negative/total over a label select; any other label counts as neutral"""
+    labels = labels.subquery()
+    row = db.query(
+        func.count().filter(labels.c.label == 'positive').label('positive'),
+        func.count().filter(labels.c.label == 'negative').label('negative'),
+        func.count().label('total')
+    ).select_from(labels).one()
+    return {
+        "positive": row.positive,
+        "neutral": row.total - row.positive - row.negative,
+        "negative": row.negative,
+        "total": row.total
+    }
+
+
+def _label_count_columns(model) -> list:
+    """count(*) FILTER per sentiment label, for grouped queries over model"""
+    from app import ai_tasks
+    label = func.lower(ai_tasks.sentiment_label(model))
+    return [func.count().filter(label == name).label(name) for name in ('positive', 'neutral', 'negative')]
+
+
+def _post_summary(p: Post) -> dict:
+    return {
+        "post_id": p.post_id,
+        "shortcode": p.shortcode,
+        "owner_username": p.owner_username,
+        "caption": (p.caption[:100] + "...") if p.caption and len(p.caption) > 100 else p.caption,
+        "post_type": p.post_type,
+        "likes_count": p.likes_count,
+        "comments_count": p.comments_count,
+        "timestamp": p.timestamp.isoformat() if p.timestamp else None,
+        "display_url": f"https://picsum.photos/seed/{p.post_id}/800/800",
+    }
+
+
+# ============================================================================
+# Per-post aggregates (one scan)
+# ============================================================================
+
+def post_aggregates(db: Session, widgets) -> dict:
+    """
+    Results of the requested POST_AGGREGATES widgets, from one query over posts
+
+    Returns:
+        {widget name: result}
+    """
+    widgets = [name for name in POST_AGGREGATES if name in widgets]
+    if not widgets:
+        return {}
+    dimensions = [(name, POST_AGGREGATES[name]) for name in widgets if POST_AGGREGATES[name] is not None]
+    grouping_sets = [tuple_(expression) for _, expression in dimensions]
+    if 'engagement-overview' in widgets:
+        grouping_sets.append(tuple_())
+
+    rows = db.query(
+        *[expression.label(f"key{i}") for i, (_, expression) in enumerate(dimensions)],
+        *[func.grouping(expression).label(f"grouped{i}") for i, (_, expression) in enumerate(dimensions)],
+        func.count(Post.id).label('count'),
+        func.sum(Post.likes_count).label('total_likes'),
+        func.sum(Post.comments_count).label('total_comments'),
+        func.avg(Post.likes_count).label('avg_likes'),
+        func.avg(Post.comments_count).label('avg_comments'),
+        func.max(Post.likes_count).label('max_likes'),
+        func.max(Post.comments_count).label('max_comments'),
+    ).group_by(func.grouping_sets(*grouping_sets)).all()
+
+    # GROUPING() is 0 for the dimension a row is grouped by; the grand total has none
+    groups = {name: {} for name, _ in dimensions}
+    total = None
+    for row in rows:
+        index = next((i for i in range(len(dimensions)) if getattr(row, f"grouped{i}") == 0), None)
+        if index is None:
+            total = row
+        elif getattr(row, f"key{index}") is not None:
+            groups[dimensions[index][0]][getattr(row, f"key{index}")] = row
+
+    results = {}
+    if 'engagement-overview' in widgets:
+        total_likes = total.total_likes or 0 if total else 0
+        total_comments = total.total_comments or 0 if total else 0
+        total_posts = total.count if total else 0
+        results['engagement-overview'] = {
+            "total_likes": total_likes,
+            "total_comments": total_comments,
+            "total_posts": total_posts,
+            "avg_likes_per_post": round(float(total.avg_likes or 0), 2) if total else 0,
+            "avg_comments_per_post": round(float(total.avg_comments or 0), 2) if total else 0,
+            "max_likes": total.max_likes or 0 if total else 0,
+            "max_comments": total.max_comments or 0 if total else 0,
+            "engagement_rate": round((float(total_likes) + float(total_comments)) / max(total_posts, 1), 2)
+        }
+    if 'engagement-by-post-type' in widgets:
+        results['engagement-by-post-type'] = [
+            {
+                "post_type": post_type,
+                "count": r.count,
+                "total_likes": r.total_likes or 0,
+                "total_comments": r.total_comments or 0,
+                "avg_likes": round(float(r.avg_likes or 0), 2),
+                "avg_comments": round(float(r.avg_comments or 0), 2),
+            }
+            for post_type, r in groups['engagement-by-post-type'].items()
+        ]
+    if 'posting-hours' in widgets:
+        hours = {int(hour): r for hour, r in groups['posting-hours'].items()}
+        results['posting-hours'] = [
+            {
+                "hour": h,
+                "count": hours[h].count if h in hours else 0,
+                "avg_likes": round(float(hours[h].avg_likes or 0), 1) if h in hours else 0
+            }
+            for h in range(24)
+        ]
+    if 'posting-days' in widgets:
+        days = {int(day): r for day, r in groups['posting-days'].items()}
+        results['posting-days'] = [
+            {
+                "day_name": DAY_NAMES[d],
+                "day_number": d,
+                "count": days[d].count if d in days else 0,
+                "avg_likes": round(float(days[d].avg_likes or 0), 1) if d in days else 0,
+                "total_likes": days[d].total_likes or 0 if d in days else 0
+            }
+            for d in range(7)
+        ]
+    if 'content-sources' in widgets:
+        results['content-sources'] = [
+            {
+                "source": source,
+                "count": r.count,
+                "total_likes": r.total_likes or 0,
+                "total_comments": r.total_comments or 0,
+            }
+            for source, r in groups['content-sources'].items()
+        ]
+    return results
+
+
+def engagement_overview(db: Session) -> dict:
+    return post_aggregates(db, ['engagement-overview'])['engagement-overview']
+
+
+def engagement_by_post_type(db: Session) -> list[dict]:
+    return post_aggregates(db, ['engagement-by-post-type'])['engagement-by-post-type']
+
+
+def posting_hours(db: Session) -> list[dict]:
+    return post_aggregates(db, ['posting-hours'])['posting-hours']
+
+
+def posting_days(db: Session) -> list[dict]:
+    return post_aggregates(db, ['posting-days'])['posting-days']
+
+
+def content_sources(db: Session) -> list[dict]:
+    return post_aggregates(db, ['content-sources'])['content-sources']
+
+
+# ============================================================================
+# Other widgets
+# ============================================================================
+
+def sentiment_breakdown(db: Session, exclude_spam: bool = False) -> dict:
+    spam_filter = [Comment.is_spam.isnot(True)] if exclude_spam else []
+    return _label_counts(db, union_all(_labels(Post), _labels(Comment, *spam_filter)))
+
+
+def comment_sentiment_breakdown(db: Session, exclude_spam: bool = False) -> dict:
+    spam_filter = [Comment.is_spam.isnot(True)] if exclude_spam else []
+    return _label_counts(db, _labels(Comment, *spam_filter))
+
+
+def top_hashtags(db: Session, limit: int = 10) -> list[dict]:
+    all_hashtags = []
+    for (caption,) in db.query(Post.caption).filter(Post.caption.isnot(None)):
+        if caption:
+            all_hashtags.extend(re.findall(r'#(\w+)', caption.lower()))
+    return [{"hashtag": tag, "count": count} for tag, count in Counter(all_hashtags).most_common(limit)]
+
+
+def top_topics(db: Session, limit: int = 10, weeks: Optional[int] = None) -> list[dict]:
+    from app import topics
+    since = datetime.utcnow() - timedelta(weeks=weeks - 1) if weeks else None
+    return topics.top_topics(db, limit, since)
+
+
+def top_posts_by_likes(db: Session, limit: int = 10) -> list[dict]:
+    return [_post_summary(p) for p in db.query(Post).order_by(desc(Post.likes_count)).limit(limit)]
+
+
+def top_posts_by_comments(db: Session, limit: int = 10) -> list[dict]:
+    return [_post_summary(p) for p in db.query(Post).order_by(desc(Post.comments_count)).limit(limit)]
+
+
+def posts_over_time(db: Session, group_by: str = "day", days: int = 30) -> list[dict]:
+    cutoff_date = datetime.utcnow() - timedelta(days=days)
+    period = func.date_trunc(group_by if group_by in ('hour', 'week', 'month') else 'day', Post.timestamp)
+
+    results = db.query(
+        period.label('date'),
+        func.count(Post.id).label('count'),
+        func.sum(Post.likes_count).label('likes'),
+        func.sum(Post.comments_count).label('comments')
+    ).filter(
+        Post.timestamp >= cutoff_date,
+        Post.timestamp.isnot(None)
+    ).group_by(period).order_by(period).all()
+
+    return [
+        {
+            "period": r.date.isoformat() if r.date else None,
+            "count": r.count,
+            "likes": r.likes or 0,
+            "comments": r.comments or 0
+        }
+        for r in results
+    ]
+
+
+def top_authors(db: Session, limit: int = 10) -> list[dict]:
+    results = db.query(
+        Post.owner_username,
+        func.count(Post.id).label('post_count'),
+        func.sum(Post.likes_count).label('total_likes'),
+        func.sum(Post.comments_count).label('total_comments'),
+    ).filter(Post.owner_username.isnot(None)).group_by(
+        Post.owner_username
+    ).order_by(desc('post_count')).limit(limit).all()
+
+    return [
+        {
+            "username": r.owner_username,
+            "post_count": r.post_count,
+            "total_likes": r.total_likes or 0,
+            "total_comments": r.total_comments or 0,
+        }
+        for r in results
+    ]
+
+
+def top_authors_by_engagement(db: Session, limit: int = 10) -> list[dict]:
+    results = db.query(
+        Post.owner_username,
+        func.count(Post.id).label('post_count'),
+        func.sum(Post.likes_count).label('total_likes'),
+        func.sum(Post.comments_count).label('total_comments'),
+        (func.sum(Post.likes_count) + func.sum(Post.comments_count)).label('total_engagement'),
+    ).filter(Post.owner_username.isnot(None)).group_by(
+        Post.owner_username
+    ).order_by(desc('total_engagement')).limit(limit).all()
+
+    return [
+        {
+            "username": r.owner_username,
+            "post_count": r.post_count,
+            "total_likes": r.total_likes or 0,
+            "total_comments": r.total_comments or 0,
+            "total_engagement": r.total_engagement or 0,
+        }
+        for r in results
+    ]
+
+
+def author_activity(db: Session, username: str) -> dict:
+    """
+    Raises:
+        ValueError: If the author has no posts
+    """
+    stats = db.query(
+        func.count(Post.id).label('post_count'),
+        func.coalesce(func.sum(Post.likes_count), 0).label('total_likes'),
+        func.coalesce(func.sum(Post.comments_count), 0).label('total_comments'),
+        func.array_agg(Post.post_type.distinct()).filter(Post.post_type.isnot(None)).label('post_types')
+    ).filter(Post.owner_username == username).one()
+    if not stats.post_count:
+        raise ValueError("Author not found")
+
+    recent_posts = db.query(Post.post_id, Post.caption, Post.likes_count, Post.comments_count, Post.timestamp)\
+        .filter(Post.owner_username == username)\
+        .order_by(Post.timestamp.desc().nullslast())\
+        .limit(5)
+
+    return {
+        "username": username,
+        "post_count": stats.post_count,
+        "total_likes": stats.total_likes,
+        "total_comments": stats.total_comments,
+        "avg_likes": round(stats.total_likes / stats.post_count, 2),
+        "avg_comments": round(stats.total_comments / stats.post_count, 2),
+        "post_types": stats.post_types or [],
+        "recent_posts": [
+            {
+                "post_id": p.post_id,
+                "caption": (p.caption[:100] + "...") if p.caption and len(p.caption) > 100 else p.caption,
+                "likes_count": p.likes_count,
+                "comments_count": p.comments_count,
+                "timestamp": p.timestamp.isoformat() if p.timestamp else None,
+            }
+            for p in recent_posts
+        ]
+    }
+
+
+def comment_stats(db: Session, exclude_spam: bool = False) -> dict:
+    spam_filter = [Comment.is_spam.isnot(True)] if exclude_spam else []
+    stats = db.query(
+        func.count(Comment.id).label('total_comments'),
+        func.sum(Comment.likes_count).label('total_likes'),
+        func.avg(Comment.likes_count).label('avg_likes'),
+        func.max(Comment.likes_count).label('max_likes'),
+    ).filter(*spam_filter).first()
+
+    ai_analyzed = db.query(Comment).filter(Comment.ai_results.isnot(None), *spam_filter).count()
+
+    # Near-duplicate clusters: comments sharing one cluster and spam-flagged comments
+    clusters = db.query(
+        func.count(Comment.cluster_id.distinct()).label('clusters'),
+        func.count(Comment.id).filter(Comment.is_spam == True).label('spam'),
+    ).filter(Comment.cluster_id.isnot(None)).first()
+
+    return {
+        "total_comments": stats.total_comments or 0,
+        "total_likes": stats.total_likes or 0,
+        "avg_likes_per_comment": round(float(stats.avg_likes or 0), 2),
+        "max_likes": stats.max_likes or 0,
+        "ai_analyzed": ai_analyzed,
+        "near_duplicate_clusters": clusters.clusters or 0,
+        "spam_comments": clusters.spam or 0,
+    }
+
+
+def top_commenters(db: Session, limit: int = 10, exclude_spam: bool = False) -> list[dict]:
+    results = db.query(
+        Comment.owner_username,
+        func.count(Comment.id).label('comment_count'),
+        func.sum(Comment.likes_count).label('total_likes'),
+    ).filter(
+        Comment.owner_username.isnot(None),
+        *([Comment.is_spam.isnot(True)] if exclude_spam else [])
+    ).group_by(
+        Comment.owner_username
+    ).order_by(desc('comment_count')).limit(limit).all()
+
+    return [
+        {
+            "username": r.owner_username,
+            "comment_count": r.comment_count,
+            "total_likes": r.total_likes or 0,
+        }
+        for r in results
+    ]
+
+
+def caption_length_analysis(db: Session) -> list[dict]:
+    # width_bucket() returns 0 below the first bound, i for [bounds[i-1], bounds[i])
+    bucket = func.width_bucket(func.length(Post.caption), array(CAPTION_LENGTH_BOUNDS))
+    rows = db.query(
+        bucket.label('bucket'),
+        func.count(Post.id).label('count'),
+        func.coalesce(func.sum(Post.likes_count), 0).label('total_likes'),
+        func.coalesce(func.sum(Post.comments_count), 0).label('total_comments'),
+    ).filter(Post.caption.isnot(None)).group_by('bucket').all()
+
+    buckets = {r.bucket: r for r in rows}
+    return [
+        {
+            "range": name,
+            "count": buckets[i].count if i in buckets else 0,
+            "avg_likes": round(buckets[i].total_likes / buckets[i].count, 2) if i in buckets else 0,
+            "avg_comments": round(buckets[i].total_comments / buckets[i].count, 2) if i in buckets else 0,
+        }
+        for i, name in enumerate(CAPTION_LENGTH_RANGES)
+    ]
+
+
+def mentions(db: Session, limit: int = 20) -> list[dict]:
+    all_mentions = []
+    for (caption,) in db.query(Post.caption).filter(Post.caption.isnot(None)):
+        if caption:
+            all_mentions.extend(re.findall(r'@(\w+)', caption))
+    return [{"username": mention, "count": count} for mention, count in Counter(all_mentions).most_common(limit)]
+
+
+def ai_coverage(db: Session) -> dict:
+    from app import ai_tasks
+    from app.models import AITask
+
+    # Sentiment coverage is an aggregate over the AI work queue
+    def analyzed(entity_type: str):
+        return select(func.count(AITask.id)).where(
+            AITask.task == ai_tasks.TASK_SENTIMENT,
+            AITask.entity_type == entity_type,
+            AITask.status == 'done'
+        ).scalar_subquery()
+
+    counts = db.query(
+        select(func.count(Post.id)).scalar_subquery().label('total_posts'),
+        select(func.count(Comment.id)).scalar_subquery().label('total_comments'),
+        analyzed('post').label('posts_with_ai'),
+        analyzed('comment').label('comments_with_ai')
+    ).one()
+    total_posts, total_comments = counts.total_posts, counts.total_comments
+    posts_with_ai, comments_with_ai = counts.posts_with_ai, counts.comments_with_ai
+
+    return {
+        "posts": {
+            "total": total_posts,
+            "analyzed": posts_with_ai,
+            "pending": total_posts - posts_with_ai,
+            "coverage_percent": round((posts_with_ai / total_posts * 100), 1) if total_posts > 0 else 0
+        },
+        "comments": {
+            "total": total_comments,
+            "analyzed": comments_with_ai,
+            "pending": total_comments - comments_with_ai,
+            "coverage_percent": round((comments_with_ai / total_comments * 100), 1) if total_comments > 0 else 0
+        }
+    }
+
+
+def sentiment_by_source(db: Session) -> list[dict]:
+    rows = db.query(Post.source, *_label_count_columns(Post)).filter(
+        Post.ai_results.isnot(None),
+        Post.source.isnot(None)
+    ).group_by(Post.source).order_by(Post.source).all()
+
+    return [
+        {
+            "source": r.source,
+            "positive": r.positive,
+            "neutral": r.neutral,
+            "negative": r.negative,
+            "total": r.positive + r.neutral + r.negative,
+        }
+        for r in rows
+    ]
+
+
+def sentiment_trend(db: Session, days: int = 30) -> list[dict]:
+    cutoff_date = datetime.utcnow() - timedelta(days=days)
+    day = func.date_trunc('day', Post.timestamp)
+    rows = db.query(day.label('day'), *_label_count_columns(Post)).filter(
+        Post.ai_results.isnot(None),
+        Post.timestamp >= cutoff_date,
+        Post.timestamp.isnot(None)
+    ).group_by(day).order_by(day).all()
+
+    return [
+        {
+            "date": r.day.strftime("%Y-%m-%d"),
+            "positive": r.positive,
+            "neutral": r.neutral,
+            "negative": r.negative,
+        }
+        for r in rows
+    ]
+
+
+def targets_overview(db: Session) -> dict:
+    return {
+        "users": {
+            "total": db.query(TargetUser).count(),
+            "active": db.query(TargetUser).filter(TargetUser.is_active == True).count()
+        },
+        "hashtags": {
+            "total": db.query(TargetHashtag).count(),
+            "active": db.query(TargetHashtag).filter(TargetHashtag.is_active == True).count()
+        },
+        "places": {
+            "total": db.query(TargetPlace).count(),
+            "active": db.query(TargetPlace).filter(TargetPlace.is_active == True).count()
+        },
+    }
+
+
+def scraping_activity(db: Session) -> list[dict]:
+    # Group the 100 most recently collected posts by date
+    activity = {}
+    for collected_at, source in db.query(Post.collected_at, Post.source).order_by(desc(Post.collected_at)).limit(100):
+        if collected_at:
+            day = activity.setdefault(collected_at.strftime("%Y-%m-%d"), {"posts": 0, "sources": set()})
+            day["posts"] += 1
+            if source:
+                day["sources"].add(source)
+
+    return [
+        {
+            "date": date,
+            "posts_collected": activity[date]["posts"],
+            "sources": list(activity[date]["sources"]),
+        }
+        for date in sorted(activity, reverse=True)[:14]  # Last 2 weeks
+    ]
+
+
+# ============================================================================
+# Snapshot
+# ============================================================================
+
+# name -> (function, cache domains, {parameter: (min, max)})
+WIDGETS = {
+    'sentiment-breakdown': (sentiment_breakdown, ('content', 'ai'), {}),
+    'top-hashtags': (top_hashtags, ('content',), {'limit': (1, 50)}),
+    'top-topics': (top_topics, ('ai',), {'limit': (1, 50), 'weeks': (1, 520)}),
+    'engagement-overview': (engagement_overview, ('content',), {}),
+    'engagement-by-post-type': (engagement_by_post_type, ('content',), {}),
+    'top-posts-by-likes': (top_posts_by_likes, ('content',), {'limit': (1, 50)}),
+    'top-posts-by-comments': (top_posts_by_comments, ('content',), {'limit': (1, 50)}),
+    'posts-over-time': (posts_over_time, ('content',), {'days': (1, 365)}),
+    'posting-hours': (posting_hours, ('content',), {}),
+    'posting-days': (posting_days, ('content',), {}),
+    'top-authors': (top_authors, ('content',), {'limit': (1, 50)}),
+    'top-authors-by-engagement': (top_authors_by_engagement, ('content',), {'limit': (1, 50)}),
+    'author-activity': (author_activity, ('content',), {}),
+    'comment-stats': (comment_stats, ('content',), {}),
+    'top-commenters': (top_commenters, ('content',), {'limit': (1, 50)}),
+    'comment-sentiment-breakdown': (comment_sentiment_breakdown, ('content', 'ai'), {}),
+    'content-sources': (content_sources, ('content',), {}),
+    'caption-length-analysis': (caption_length_analysis, ('content',), {}),
+    'mentions': (mentions, ('content',), {'limit': (1, 100)}),
+    'ai-coverage': (ai_coverage, ('content', 'ai'), {}),
+    'sentiment-by-source': (sentiment_by_source, ('content', 'ai'), {}),
+    'sentiment-trend': (sentiment_trend, ('content', 'ai'), {'days': (1, 365)}),
+    'targets-overview': (targets_overview, ('targets',), {}),
+    'scraping-activity': (scraping_activity, ('content',), {}),
+}
+
+
+def _normalize(widget: dict) -> tuple:
+    """
+    (response key, name, keyword arguments with defaults filled in) of a snapshot widget
+
+    Raises:
+        ValueError: If the widget or one of its parameters is unknown, missing or out of range
+    """
+    name = widget.get('name')
+    if name not in WIDGETS:
+        raise ValueError(f"Unknown widget '{name}'. Available: {', '.join(WIDGETS)}")
+    function, _, bounds = WIDGETS[name]
+    params = {PARAM_ALIASES.get(key, key): value for key, value in (widget.get('params') or {}).items()}
+    for key, value in params.items():
+        if key in bounds and not (isinstance(value, int) and bounds[key][0] <= value <= bounds[key][1]):
+            raise ValueError(f"{name}: {key} must be an integer from {bounds[key][0]} to {bounds[key][1]}")
+
+    accepted = list(inspect.signature(function).parameters.values())[1:]  # After db
+    unknown = set(params) - {parameter.name for parameter in accepted}
+    if unknown:
+        raise ValueError(
+            f"{name}: unknown parameter {', '.join(sorted(unknown))} "
+            f"(accepted: {', '.join(parameter.name for parameter in accepted) or 'none'})"
+        )
+    missing = [parameter.name for parameter in accepted if parameter.default is inspect.Parameter.empty and parameter.name not in params]
+    if missing:
+        raise ValueError(f"{name}: missing parameter {', '.join(missing)}")
+    params = {
+        parameter.name: params.get(parameter.name, parameter.default)
+        for parameter in accepted
+    }
+    return widget.get('id') or name, name, params
+
+
+def widget_cache_key(name: str, params: dict) -> str:
+    return f"widget:{name}:{json.dumps(params, sort_keys=True, default=str)}"
+
+
+def snapshot(db: Session, widgets: list[dict], cache: Optional[Callable] = None) -> dict:
+    """
+    Compute several widgets in one transaction
+
+    Every widget is cached on its own (name and parameters), so dashboards
+    asking for overlapping widget lists share entries, and a write only
+    recomputes the widgets depending on the bumped domain. Widgets that miss
+    are computed in one REPEATABLE READ transaction, and the per-post
+    aggregates among them share one scan.
+
+    Args:
+        widgets: [{'name': widget, 'params': {...}, 'id': optional response key}]
+        cache: get_or_compute(key, domains, compute) of the analytics cache (default: no caching)
+
+    Returns:
+        {'generated_at', 'widgets': {key: result}, 'errors': {key: message}}.
+        A widget that fails on its input (e.g. an unknown author) goes to errors.
+
+    Raises:
+        ValueError: If a widget or parameter is unknown, missing or out of range
+    """
+    requested = [_normalize(widget) for widget in widgets]
+    cache = cache or (lambda key, domains, compute: compute())
+    aggregate_names = {name for _, name, _ in requested if name in POST_AGGREGATES}
+    shared = None
+    in_transaction = False
+
+    def compute(name: str, params: dict):
+        nonlocal shared, in_transaction
+        if not in_transaction:
+            # Must come first: the isolation level is set when the transaction begins
+            db.connection(execution_options={'isolation_level': 'REPEATABLE READ'})
+            in_transaction = True
+        if name in POST_AGGREGATES:
+            if shared is None:
+                shared = post_aggregates(db, aggregate_names)  # Once for every aggregate widget that misses
+            return shared[name]
+        function, _, _ = WIDGETS[name]
+        return function(db, **params)
+
+    results, errors = {}, {}
+    for key, name, params in requested:
+        try:
+            results[key] = cache(
+                widget_cache_key(name, params), WIDGETS[name][1], lambda name=name, params=params: compute(name, params)
+            )
+        except ValueError as e:
+            errors[key] = str(e)
+
+    return {
+        'generated_at': datetime.utcnow().isoformat() + 'Z',
+        'widgets': results,
+        'errors': errors
+    }
@@ -0,0 +1,309 @@
+# type: ignore  # SQLAlchemy Column type annotations have known limitations with type checkers
+"""
+Continuous sentiment backfill worker
+
+Keeps pulling batches of pending sentiment tasks (comments first, then posts)
+from the ai_tasks queue until the backlog is drained, then idles and checks
+again. Finished tasks are the checkpoint, so a restart picks up exactly where
+the previous run stopped. The worker's own progress and tuned batch size are
+also saved to a JobExecution row.
+
+Batches run through a staged pipeline (orchestrator.stream_sentiment_backfill):
+the next batch is claimed and tokenized and the previous one written while the
+current one is in the model. The batch size adapts after every batch to reach
+BACKFILL_CONFIG's target_items_per_sec while staying under max_cpu_percent.
+
+The worker is controlled through the 'sentiment_backfill' job in /jobs, so
+the control state lives in the DB and any API process can change it.
+Deactivating that job pauses the worker at its next check (every few
+seconds). The job's scheduled run is a watchdog that starts the worker if it
+isn't running. It only fires in the process holding the scheduler lock, so
+there is one worker however many API processes there are. Its state and
+throughput are checkpointed to a single JobExecution row, which is where
+status() reads them, whichever process asks.
+"""
+from datetime import datetime
+from typing import Optional
+import logging
+import os
+import threading
+import time
+from app.config import BACKFILL_CONFIG
+from app.database import SessionLocal
+from app.models import JobExecution, JobSchedule
+from app.services.ai.pipeline import CpuMeter
+from app import ai_tasks
+
+logger = logging.getLogger(__name__)
+
+JOB_ID = 'sentiment_backfill'
+CHECKPOINT_JOB_ID = 'sentiment_backfill_worker'  # JobExecution row holding the worker's progress
+
+
+class SentimentBackfillWorker:
+    """Long-running sentiment backfill with adaptive batch size"""
+
+    def __init__(self, config: dict = BACKFILL_CONFIG):
+        self.config = config
+        self.batch_size = config['initial_batch_size']
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+        self.state = 'stopped'  # stopped, running, paused, idle
+        self.processed = 0
+        self.items_per_sec = 0.0  # Moving average
+        self.cpu_percent = 0.0
+        self.last_error: Optional[str] = None
+        self.started_at: Optional[datetime] = None
+
+        self._cpu = CpuMeter()
+        self._execution_id: Optional[int] = None
+        self._last_checkpoint = 0.0
+        self._enabled = True
+        self._enabled_checked_at = 0.0
+
+    # ------------------------------------------------------------------
+    # Control
+    # ------------------------------------------------------------------
+
+    def start(self) -> bool:
+        """Start the worker thread if it isn't running. Returns True if it was started."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._stop.clear()
+            self.started_at = datetime.utcnow()
+            self._restore_checkpoint()
+            self._thread = threading.Thread(target=self._loop, name="sentiment-backfill", daemon=True)
+            self._thread.start()
+            logger.info(f"Sentiment backfill worker started (batch size {self.batch_size})")
+            return True
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        self.state = 'stopped'
+        self._checkpoint(force=True, status='completed')
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # ------------------------------------------------------------------
+    # Loop
+    # ------------------------------------------------------------------
+
+    def _is_enabled(self) -> bool:
+        """The worker pauses while its job is deactivated in /jobs"""
+        db = SessionLocal()
+        try:
+            job = db.query(JobSchedule.is_active).filter(JobSchedule.job_id == JOB_ID).first()
+            return bool(job.is_active) if job else True
+        finally:
+            db.close()
+
+    def _loop(self):
+        from app.orchestrator import get_orchestrator
+        orchestrator = get_orchestrator()
+
+        while not self._stop.is_set():
+            try:
+                if not self._is_enabled():
+                    if self.state != 'paused':
+                        logger.info("Sentiment backfill paused")
+                        self.state = 'paused'
+                        self._checkpoint(force=True, status='paused')
+                    else:
+                        self._checkpoint(status='paused')  # Keeps the row fresh for status()
+                    self._stop.wait(5)
+                    continue
+
+                self.state = 'running'
+                self._enabled = True
+                self._enabled_checked_at = time.monotonic()
+                wall_start = time.perf_counter()
+                self._cpu.take()
+                total = 0
+
+                # Batches overlap, so each one is measured from the end of the previous one
+                # (the meter counts the pipeline's threads only, not the rest of the process)
+                for done in orchestrator.stream_sentiment_backfill(lambda: self.batch_size, self._keep_going, self._cpu):
+                    total += done
+                    self.processed += done
+                    self.last_error = None
+                    wall = time.perf_counter() - wall_start
+                    wall_start = time.perf_counter()
+                    self._adapt(done, wall, self._cpu.take())
+                    self._checkpoint()
+
+                if self._stop.is_set() or not self._enabled:
+                    continue  # Stopped or paused mid-stream, not drained
+
+                self.state = 'idle'
+                if total:
+                    logger.info(f"Sentiment backfill drained the queue after {total} items")
+                self._checkpoint(force=True)
+                self._stop.wait(self.config['idle_sleep_seconds'])
+
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Sentiment backfill batch failed: {e}")
+                self.batch_size = max(self.config['min_batch_size'], self.batch_size // 2)
+                self._checkpoint(force=True)
+                self._stop.wait(10)
+
+        self.state = 'stopped'
+
+    def _keep_going(self) -> bool:
+        """Checked before each claim; the enabled check is a query, so it runs at most every few seconds"""
+        if self._stop.is_set():
+            return False
+        now = time.monotonic()
+        if now - self._enabled_checked_at >= 5:
+            self._enabled_checked_at = now
+            self._enabled = self._is_enabled()
+        return self._enabled
+
+    def _adapt(self, items: int, wall: float, cpu: float):
+        """
+        Adjust batch size (and throttle) after a batch
+
+        Over the CPU budget: shrink and sleep off the excess.
+        Under the target rate: grow, larger batches amortize per-batch overhead.
+        Well over the target rate: sleep so we don't take more than we need.
+        """
+        rate = items / wall if wall > 0 else 0.0
+        self.items_per_sec = rate if self.items_per_sec == 0 else 0.7 * self.items_per_sec + 0.3 * rate
+        self.cpu_percent = cpu / wall / (os.cpu_count() or 1) * 100 if wall > 0 else 0.0
+
+        target = self.config['target_items_per_sec']
+        max_cpu = self.config['max_cpu_percent']
+        sleep_for = 0.0
+
+        if self.cpu_percent > max_cpu:
+            self.batch_size = int(self.batch_size * 0.75)
+            sleep_for = wall * (self.cpu_percent / max_cpu - 1)
+        elif rate < target:
+            self.batch_size = int(self.batch_size * 1.25) + 1
+        elif rate > target * 1.2:
+            sleep_for = items / target - wall
+
+        self.batch_size = max(self.config['min_batch_size'], min(self.config['max_batch_size'], self.batch_size))
+        if sleep_for > 0:
+            self._stop.wait(min(sleep_for, 60))
+
+    # ------------------------------------------------------------------
+    # Checkpointing
+    # ------------------------------------------------------------------
+
+    def _restore_checkpoint(self):
+        """Resume with the batch size tuned by the previous run, reusing its row"""
+        db = SessionLocal()
+        try:
+            execution = _checkpoint_row(db)
+            if execution and execution.result_summary and execution.result_summary.get('batch_size'):
+                self.batch_size = int(execution.result_summary['batch_size'])
+
+            if execution is None:
+                execution = JobExecution(job_id=CHECKPOINT_JOB_ID)
+                db.add(execution)
+            execution.status = 'running'
+            execution.started_at = self.started_at
+            execution.completed_at = None
+            execution.error_message = None
+            db.commit()
+            self._execution_id = execution.id
+        except Exception as e:
+            logger.error(f"Failed to restore backfill checkpoint: {e}")
+        finally:
+            db.close()
+
+    def _checkpoint(self, force: bool = False, status: Optional[str] = None):
+        now = time.monotonic()
+        if self._execution_id is None or (not force and now - self._last_checkpoint < self.config['checkpoint_seconds']):
+            return
+        self._last_checkpoint = now
+
+        db = SessionLocal()
+        try:
+            execution = db.query(JobExecution).filter(JobExecution.id == self._execution_id).first()
+            if execution:
+                execution.status = status or 'running'
+                execution.error_message = self.last_error
+                execution.result_summary = {
+                    'state': 'stopped' if status == 'completed' else self.state,
+                    'processed': self.processed,
+                    'batch_size': self.batch_size,
+                    'items_per_sec': round(self.items_per_sec, 2),
+                    'cpu_percent': round(self.cpu_percent, 1),
+                    'checkpoint_at': datetime.utcnow().isoformat()
+                }
+                if status == 'completed':
+                    execution.completed_at = datetime.utcnow()
+                db.commit()
+        except Exception as e:
+            logger.error(f"Failed to checkpoint backfill progress: {e}")
+        finally:
+            db.close()
+
+    # ------------------------------------------------------------------
+    # Status
+    # ------------------------------------------------------------------
+
+    def status(self) -> dict:
+        """
+        Backlog size, throughput and ETA
+
+        Read from the checkpoint row, so every API process reports the worker
+        running in the scheduler's process.
+        """
+        db = SessionLocal()
+        try:
+            counts = ai_tasks.task_counts(db, ai_tasks.TASK_SENTIMENT)
+            execution = _checkpoint_row(db)
+        finally:
+            db.close()
+
+        progress = (execution.result_summary or {}) if execution else {}
+        state = 'stopped'
+        if execution and execution.status in ('running', 'paused') and progress.get('checkpoint_at'):
+            age = (datetime.utcnow() - datetime.fromisoformat(progress['checkpoint_at'])).total_seconds()
+            # The worker checkpoints at least every checkpoint_seconds (idle: every idle_sleep_seconds)
+            stale_after = 3 * max(self.config['checkpoint_seconds'], self.config['idle_sleep_seconds'])
+            state = progress.get('state', 'running') if age < stale_after else 'stopped'
+
+        backlog = {entity_type: c.get('pending', 0) + c.get('running', 0) for entity_type, c in counts.items()}
+        total_backlog = sum(backlog.values())
+        items_per_sec = progress.get('items_per_sec', 0.0)
+        eta_seconds = int(total_backlog / items_per_sec) if state == 'running' and items_per_sec > 0 else None
+
+        return {
+            'state': state,
+            'backlog': {**backlog, 'total': total_backlog},
+            'failed': {entity_type: c.get('failed', 0) for entity_type, c in counts.items()},
+            'processed': progress.get('processed', 0),
+            'batch_size': progress.get('batch_size', self.config['initial_batch_size']),
+            'items_per_sec': items_per_sec,
+            'cpu_percent': progress.get('cpu_percent', 0.0),
+            'eta_seconds': eta_seconds,
+            'targets': {
+                'items_per_sec': self.config['target_items_per_sec'],
+                'max_cpu_percent': self.config['max_cpu_percent']
+            },
+            'started_at': execution.started_at.isoformat() + 'Z' if execution and execution.started_at else None,
+            'checkpoint_at': progress['checkpoint_at'] + 'Z' if progress.get('checkpoint_at') else None,
+            'last_error': execution.error_message if execution else None
+        }
+
+
+def _checkpoint_row(db) -> Optional[JobExecution]:
+    """The worker's JobExecution row (the latest one, from before rows were reused)"""
+    return db.query(JobExecution)\
+        .filter(JobExecution.job_id == CHECKPOINT_JOB_ID)\
+        .order_by(JobExecution.started_at.desc())\
+        .first()
+
+
+backfill_worker = SentimentBackfillWorker()
@@ -0,0 +1,270 @@
+"""
+Response cache for the /analytics endpoints
+
+Results are kept in an in-process LRU with a TTL, keyed by endpoint and
+arguments. Each entry records the data versions it was computed from. Write
+paths in ScrapingOrchestrator call bump() after they commit, and an entry whose
+versions moved on is recomputed on its next request. Dashboards that poll
+unchanged data are served from memory, so the DB sees about one query per
+endpoint per write, however many viewers there are.
+
+Versions are the modification times of small marker files under
+ANALYTICS_CACHE_CONFIG["directory"]. Every API worker process and the scheduler
+see each other's bumps, and a lookup costs a stat() per domain. With "shared"
+enabled, results are also written to a SQLite file in the same directory, so a
+result computed by one worker process is served by the others.
+
+Bumps also publish a 'data' event (app/events.py), so dashboards learn about
+new data without polling.
+
+Domains:
+    content  posts and comments (scrapes, near-duplicate flags)
+    ai       sentiment, summaries, topics
+    targets  target users/hashtags/places
+"""
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable, Optional
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from app.config import ANALYTICS_CACHE_CONFIG
+from app.events import data_changed
+
+logger = logging.getLogger(__name__)
+
+DOMAINS = ('content', 'ai', 'targets')
+
+
+class ResponseCache:
+    """
+    Args:
+        directory: Version marker files (and the shared store) live here
+        max_entries: In-process LRU size
+        ttl_seconds: Upper bound on an entry's age, even without bumps
+        min_age_seconds: Entries younger than this are served even after a bump,
+                         so continuous writes (e.g. the sentiment backfill) don't
+                         turn every request into a recompute
+        shared: Also keep results in a SQLite file shared by the processes on this host
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_entries: int = 512,
+        ttl_seconds: float = 300,
+        min_age_seconds: float = 0,
+        shared: bool = False
+    ):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.min_age = min_age_seconds
+
+        self._entries: OrderedDict = OrderedDict()  # key -> (version, stored_at, value)
+        self._lock = threading.Lock()
+        self._inflight = {}  # key -> lock held while one request computes it
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._store: Optional[sqlite3.Connection] = None
+        self._store_lock = threading.Lock()
+        if shared:
+            self._open_store()
+
+    # ------------------------------------------------------------------
+    # Versions
+    # ------------------------------------------------------------------
+
+    def _marker(self, domain: str) -> str:
+        return os.path.join(self.directory, f"version-{domain}")
+
+    def version(self, domains: tuple) -> str:
+        """Current version of the given domains"""
+        parts = []
+        for domain in domains:
+            try:
+                parts.append(f"{domain}:{os.stat(self._marker(domain)).st_mtime_ns}")
+            except FileNotFoundError:
+                parts.append(f"{domain}:0")
+        return '|'.join(parts)
+
+    def bump(self, *domains: str) -> None:
+        """Invalidate results depending on these domains (call after the write committed)"""
+        for domain in domains:
+            path = self._marker(domain)
+            try:
+                with open(path, 'a'):
+                    pass
+                # Explicit, strictly increasing time: the kernel's own file timestamps are
+                # only a few ms precise, so two writes could otherwise share a version
+                version = max(time.time_ns(), os.stat(path).st_mtime_ns + 1)
+                os.utime(path, ns=(version, version))
+            except OSError as e:
+                logger.error(f"Failed to bump analytics cache version {domain}: {e}")
+        data_changed(domains)  # Tells /events clients to refetch
+
+    # ------------------------------------------------------------------
+    # Shared store
+    # ------------------------------------------------------------------
+
+    def _open_store(self):
+        try:
+            store = sqlite3.connect(os.path.join(self.directory, 'responses.sqlite'), timeout=1, check_same_thread=False)
+            store.execute("PRAGMA journal_mode=WAL")
+            store.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, version TEXT, stored_at REAL, value TEXT)"
+            )
+            store.commit()
+            self._store = store
+        except sqlite3.Error as e:
+            logger.error(f"Shared analytics cache unavailable, using the in-process cache only: {e}")
+
+    def _store_get(self, key: str) -> Optional[tuple]:
+        try:
+            with self._store_lock:
+                row = self._store.execute(
+                    "SELECT version, stored_at, value FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared analytics cache read failed: {e}")
+            return None
+        return (row[0], row[1], json.loads(row[2])) if row else None
+
+    def _store_put(self, key: str, version: str, stored_at: float, value) -> None:
+        try:
+            payload = json.dumps(value, default=str)
+            with self._store_lock:
+                self._store.execute(
+                    "INSERT OR REPLACE INTO responses (key, version, stored_at, value) VALUES (?, ?, ?, ?)",
+                    (key, version, stored_at, payload)
+                )
+                self._store.execute("DELETE FROM responses WHERE stored_at < ?", (time.time() - self.ttl,))
+                self._store.commit()
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.warning(f"Shared analytics cache write failed: {e}")
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def _fresh(self, entry: Optional[tuple], version: str, now: float) -> bool:
+        if entry is None:
+            return False
+        entry_version, stored_at, _ = entry
+        age = now - stored_at
+        return age < self.ttl and (entry_version == version or age < self.min_age)
+
+    def _lookup(self, key: str, version: str, now: float) -> Optional[tuple]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if self._fresh(entry, version, now):
+                self._entries.move_to_end(key)
+                return entry
+        if self._store is not None:
+            entry = self._store_get(key)
+            if self._fresh(entry, version, now):
+                self._remember(key, entry)
+                return entry
+        return None
+
+    def _remember(self, key: str, entry: tuple) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: str, domains: tuple, compute: Callable):
+        """
+        Cached result for key, computing it when missing or outdated
+
+        Concurrent requests for the same missing key wait for one computation.
+        """
+        version = self.version(domains)
+        entry = self._lookup(key, version, time.time())
+        if entry is not None:
+            self.hits += 1
+            return entry[2]
+
+        with self._lock:
+            key_lock = self._inflight.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                # Another request may have computed it while this one waited
+                entry = self._lookup(key, version, time.time())
+                if entry is not None:
+                    self.hits += 1
+                    return entry[2]
+
+                self.misses += 1
+                stored_at = time.time()
+                value = compute()
+                self._remember(key, (version, stored_at, value))
+                if self._store is not None:
+                    self._store_put(key, version, stored_at, value)
+                return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self._store is not None:
+            with self._store_lock:
+                self._store.execute("DELETE FROM responses")
+                self._store.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            'shared': self._store is not None,
+            'versions': {domain: self.version((domain,)).split(':', 1)[1] for domain in DOMAINS}
+        }
+
+
+analytics_cache = ResponseCache(
+    ANALYTICS_CACHE_CONFIG["directory"],
+    max_entries=ANALYTICS_CACHE_CONFIG["max_entries"],
+    ttl_seconds=ANALYTICS_CACHE_CONFIG["ttl_seconds"],
+    min_age_seconds=ANALYTICS_CACHE_CONFIG["min_age_seconds"],
+    shared=ANALYTICS_CACHE_CONFIG["shared"]
+)
+
+
+def bump(*domains: str) -> None:
+    """Shortcut for analytics_cache.bump"""
+    analytics_cache.bump(*domains)
+
+
+def get_or_compute(key: str, domains: tuple, compute: Callable):
+    """analytics_cache.get_or_compute, or just compute() with the cache disabled"""
+    if not ANALYTICS_CACHE_CONFIG["enabled"]:
+        return compute()
+    return analytics_cache.get_or_compute(key, domains, compute)
+
+
+def cached(*domains: str):
+    """
+    Cache an endpoint's result until one of the domains is bumped (or the TTL passes)
+
+    Goes below the route decorator. FastAPI passes parameters as keyword
+    arguments, and these make up the key together with the function name.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = f"{func.__name__}:{json.dumps([args, kwargs], sort_keys=True, default=str)}"
+            return get_or_compute(key, domains, lambda: func(*args, **kwargs))
+        return wrapper
+    return decorator
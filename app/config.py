@@ -1,7 +1,7 @@
 import os
 from pathlib import Path
 from dotenv import load_dotenv
-import torch
+from functools import lru_cache
 
 # Load .env from project root
 env_path = Path(__file__).parent.parent / '.env'
@@ -25,7 +25,20 @@ INSTAGRAM_TAGGED_SCRAPER_ACTOR_ID = os.getenv('INSTAGRAM_TAGGED_SCRAPER_ACTOR_ID
 INSTAGRAM_COMMENT_SCRAPER_ACTOR_ID = os.getenv('INSTAGRAM_COMMENT_SCRAPER_ACTOR_ID', '')
 
 # AI Services Configuration
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+# Resolved on first use so that importing the config doesn't pull in torch
+@lru_cache()
+def get_device() -> str:
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+# Inference worker (app/services/ai/worker.py)
+# When set, the API and scheduler send inference to this worker instead of loading the models in-process
+INFERENCE_WORKER_URL = os.getenv('INFERENCE_WORKER_URL', '').rstrip('/')
+INFERENCE_WORKER_TIMEOUT = int(os.getenv('INFERENCE_WORKER_TIMEOUT', '300'))  # Seconds, summarization can be slow on CPU
+
+# Load the models and run a dummy inference in the background at startup,
+# so the first real AI request doesn't pay for the download and load
+AI_WARMUP_ON_STARTUP = os.getenv('AI_WARMUP_ON_STARTUP', 'false').lower() == 'true'
 
 # Model names
 SUMMARIZATION_MODEL = "fatmaserry/AraT5v2-arabic-summarization"
@@ -39,6 +52,16 @@ SUMMARY_CONFIG = {
     "min_length": 20,
     "short_summary_max_length": 50,  # For single comment summaries
     "time_period_max_length": 300,  # For time period/weekly summaries
+    "chunk_token_budget": 900,  # Hierarchical summaries: max input tokens per chunk (model max is 1024)
+    "chunk_max_length": 120,  # Hierarchical summaries: length of intermediate chunk summaries
+    "max_reduce_levels": 4,
+    "cache_max_entries": int(os.getenv('SUMMARY_CACHE_MAX_ENTRIES', '50000')),  # Chunk summaries kept (LRU, app/summary_cache.py)
+    "extractive_max_items": 5,  # Comments/posts kept by the extractive tier
+    "extractive_max_sentences": 2,  # Sentences kept when digesting a single long text
+    "comment_pool_size": 500,  # Most liked comments considered for a post summary
+    "comment_token_budget": 1000,  # Input tokens filled with comments for a post summary (model max is 1024)
+    "preselect_max_items_per_day": 60,  # Same for each day of a time period summary
+    "model_scripts": ["arabic", "mixed"],  # Scripts the (Arabic) model is fed; other text goes to the extractive tier
 }
 
 # Sentiment parameters
@@ -48,9 +71,147 @@ SENTIMENT_CONFIG = {
     "padding": True,
 }
 
+# Model classes, in the order their probabilities are stored (ai_results.sentiment.probs)
+SENTIMENT_CLASSES = ["very_negative", "negative", "neutral", "positive", "very_positive"]
+# Scores are expected values of the stored distribution under these weights (-1..1), computed
+# in SQL (ai_tasks.sentiment_score), so changing them doesn't need a model re-run
+SENTIMENT_CLASS_WEIGHTS = [
+    float(w) for w in os.getenv('SENTIMENT_CLASS_WEIGHTS', '-1,-0.5,0,0.5,1').split(',')
+]
+
+# Micro-batching of concurrent single-item requests (app/services/ai/batching.py)
+MICRO_BATCH_ENABLED = os.getenv('MICRO_BATCH_ENABLED', 'true').lower() == 'true'
+MICRO_BATCH_CONFIG = {
+    "sentiment": {
+        "max_batch_size": 32,
+        "max_wait_ms": 10,  # How long the first request waits for others to join its batch
+        "latency_slo_ms": 500,  # While p95 latency is above this, batches are dispatched without waiting
+    },
+    "summarization": {
+        "max_batch_size": 8,
+        "max_wait_ms": 25,
+        "latency_slo_ms": 15000,
+    },
+}
+
+# Inference batch size / thread autotuning (app/services/ai/autotune.py)
+AUTOTUNE_ON_STARTUP = os.getenv('AUTOTUNE_ON_STARTUP', 'false').lower() == 'true'
+AUTOTUNE_STATE_FILE = os.getenv('AUTOTUNE_STATE_FILE', str(Path(__file__).parent.parent / 'logs' / 'autotune.json'))
+AUTOTUNE_CONFIG = {
+    "sentiment": {
+        "default_batch_size": 32,
+        "batch_sizes": [1, 4, 8, 16, 32, 64, 128],
+        "p95_ceiling_ms": 2000,  # Per forward pass
+        "memory_ceiling_mb": int(os.getenv('AUTOTUNE_MEMORY_CEILING_MB', '4096')),
+        "repeats": 3,  # Batches timed per setting
+    },
+    "summarization": {
+        "default_batch_size": 4,
+        "batch_sizes": [1, 2, 4, 8],
+        "p95_ceiling_ms": 30000,
+        "memory_ceiling_mb": int(os.getenv('AUTOTUNE_MEMORY_CEILING_MB', '4096')),
+        "repeats": 2,
+    },
+    "drift_check_every": 500,  # Texts seen between length-distribution checks
+    "drift_threshold": 0.5,  # Re-tune when p50 or p90 text length moves by more than 50%
+}
+
+# Bulk inference pipelines (app/services/ai/pipeline.py): batches buffered between stages.
+# Every buffered sentiment job batch holds a DB connection (and its task locks), so keep this small
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '1'))
+
+# Continuous sentiment backfill worker (app/backfill.py)
+BACKFILL_CONFIG = {
+    "target_items_per_sec": float(os.getenv('BACKFILL_TARGET_ITEMS_PER_SEC', '20')),
+    "max_cpu_percent": float(os.getenv('BACKFILL_MAX_CPU_PERCENT', '60')),  # Share of all cores the worker may use
+    "initial_batch_size": 64,
+    "min_batch_size": 8,
+    "max_batch_size": 512,
+    "idle_sleep_seconds": 30,  # Wait this long when the backlog is empty
+    "checkpoint_seconds": 30,  # How often progress is persisted
+}
+
+# Historical weekly report rebuilds (app/report_backfill.py). Processes when INFERENCE_WORKER_URL
+# is set (they share the worker's models), threads sharing the in-process models otherwise
+REPORT_BACKFILL_CONFIG = {
+    "workers": int(os.getenv('REPORT_BACKFILL_WORKERS', '4')),
+}
+
+# Near-duplicate comment clusters and spam flags (app/near_duplicates.py)
+NEAR_DUPLICATE_CONFIG = {
+    "num_perm": 64,  # MinHash signature size
+    "bands": 8,  # LSH bands of num_perm / bands rows each
+    "shingle_size": 3,  # Characters per shingle
+    "similarity_threshold": 0.7,  # Estimated Jaccard similarity to join a cluster
+    "spam_min_cluster_size": int(os.getenv('SPAM_MIN_CLUSTER_SIZE', '5')),
+    "spam_min_posts": 2,  # Same text under this many different posts
+    "spam_min_length": 15,  # Normalized characters; short reactions ("شكرا", "nice") repeat without being spam
+    "batch_size": 2000,  # Comments clustered per pass by the scheduled job
+}
+
+# Batch topic extraction (app/services/ai/topic_service.py, rollup in app/topics.py)
+TOPIC_CONFIG = {
+    "max_topics": 3,  # Per caption/comment
+    "min_score": 1.0,  # TF-IDF score within the batch
+    "max_df_ratio": 0.5,  # Terms in more than half of a batch are too generic to be a topic
+    "phrase_boost": 1.5,  # Hashtags and bigrams over single words
+    "batch_size": 500,  # Texts per extraction batch (also the IDF reference set)
+    "report_top_topics": 10,  # Topics returned with a weekly report
+    # Merge near-synonymous topics with sentence embeddings (EMBEDDING_MODEL)
+    "merge_with_embeddings": os.getenv('TOPIC_MERGE_WITH_EMBEDDINGS', 'false').lower() == 'true',
+    "merge_threshold": 0.85,  # Cosine similarity
+}
+
+# Sentence embeddings and the semantic search index (app/services/ai/embedding_service.py, vector_index.py)
+EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+EMBEDDING_INDEX_DIR = os.getenv('EMBEDDING_INDEX_DIR', str(Path(__file__).parent.parent / 'data' / 'embeddings'))
+EMBEDDING_CONFIG = {
+    "dimension": 384,  # Output size of EMBEDDING_MODEL
+    "batch_size": 64,  # Texts per forward pass
+    "max_length": 128,  # Tokens per text; captions are cut there
+    "job_batch_size": 512,  # Items embedded (and written to the index) per job batch
+    "use_hnsw": os.getenv('EMBEDDING_USE_HNSW', 'true').lower() == 'true',  # Needs hnswlib, exact search otherwise
+    "hnsw_m": 16,
+    "hnsw_ef_construction": 200,
+    "hnsw_ef_search": 64,
+    # Writes extend and save the graph only when this many rows are outside it, or when it's this old;
+    # searches scan the rows outside it exactly
+    "hnsw_rebuild_rows": 10000,
+    "hnsw_rebuild_seconds": 3600,
+    "filter_oversample": 10,  # Candidates fetched per requested result when time/source filters apply
+}
+
+# Response cache for /analytics (app/cache.py), invalidated by the orchestrator's write paths
+ANALYTICS_CACHE_CONFIG = {
+    "enabled": os.getenv('ANALYTICS_CACHE_ENABLED', 'true').lower() == 'true',
+    "directory": os.getenv('ANALYTICS_CACHE_DIR', str(Path(__file__).parent.parent / 'data' / 'cache')),
+    "shared": os.getenv('ANALYTICS_CACHE_SHARED', 'false').lower() == 'true',  # SQLite file shared by API worker processes
+    "max_entries": 512,
+    "ttl_seconds": int(os.getenv('ANALYTICS_CACHE_TTL_SECONDS', '300')),
+    "min_age_seconds": 5,  # Results younger than this survive a version bump
+}
+
+# Background runner for the scrape and pipeline endpoints (app/jobs.py)
+JOB_RUNNER_CONFIG = {
+    "workers": int(os.getenv('JOB_WORKERS', '2')),  # Jobs running at once per API process
+    "max_queued": int(os.getenv('JOB_MAX_QUEUED', '20')),  # Submissions beyond this are rejected with 429
+}
+
+# Bulk exports (GET /export/posts, /export/comments, see app/exports.py)
+EXPORT_CONFIG = {
+    "batch_rows": int(os.getenv('EXPORT_BATCH_ROWS', '10000')),  # Rows per server-side cursor fetch (and Parquet row group)
+}
+
+# Server-sent events (GET /events, see app/events.py)
+EVENTS_CONFIG = {
+    "enabled": os.getenv('EVENTS_ENABLED', 'true').lower() == 'true',
+    "data_interval_seconds": float(os.getenv('EVENTS_DATA_INTERVAL', '2')),  # At most one 'data' event per process per interval
+    "heartbeat_seconds": float(os.getenv('EVENTS_HEARTBEAT', '15')),  # Keeps proxies from closing idle streams
+}
+
 # Business logic thresholds
 LONG_COMMENT_THRESHOLD = 100  # Characters
 SUMMARY_TIME_WINDOW_DAYS = 7  # Days to look back for time-based summary
-SENTIMENT_POSITIVE_THRESHOLD = 0.2  # Average score threshold for positive sentiment
-SENTIMENT_NEGATIVE_THRESHOLD = -0.2  # Average score threshold for negative sentiment
-SENTIMENT_TIME_PERIOD_THRESHOLD = 20  # Percentage threshold for time period sentiment (0-100)
+SENTIMENT_POSITIVE_THRESHOLD = 0.2  # Post label: share of positive minus share of negative comments (-1..1) above this
+SENTIMENT_NEGATIVE_THRESHOLD = -0.2  # Post label: share of positive minus share of negative comments below this
+SENTIMENT_TIME_PERIOD_THRESHOLD = 20  # Time period label: percentage points of positive minus negative probability mass (0-100)
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.config import DATABASE_URL
 
@@ -14,7 +14,32 @@ def get_db():
     finally:
         db.close()
 
+# Columns added to existing tables after they were first created
+# (create_all only creates missing tables, it never alters existing ones)
+ADDED_COLUMNS = [
+    ('posts', 'text_features', 'JSON'),
+    ('comments', 'text_features', 'JSON'),
+    ('posts', 'sentiment_positive', 'INTEGER NOT NULL DEFAULT 0'),
+    ('posts', 'sentiment_neutral', 'INTEGER NOT NULL DEFAULT 0'),
+    ('posts', 'sentiment_negative', 'INTEGER NOT NULL DEFAULT 0'),
+    ('posts', 'sentiment_score_sum', 'DOUBLE PRECISION NOT NULL DEFAULT 0'),
+    ('posts', 'sentiment_aggregated_at', 'TIMESTAMP'),
+    ('comments', 'cluster_id', 'INTEGER'),
+    ('comments', 'is_spam', 'BOOLEAN NOT NULL DEFAULT FALSE'),
+]
+
+# Indexes on added columns, same reason
+ADDED_INDEXES = [
+    ('ix_comments_cluster_id', 'comments', 'cluster_id'),
+    ('ix_summary_cache_last_used_at', 'summary_cache', 'last_used_at'),
+]
+
 def init_db():
-    from app.models import Post, Comment, TargetUser, TargetHashtag, TargetPlace, WeeklyReport
+    from app.models import Post, Comment, TargetUser, TargetHashtag, TargetPlace, WeeklyReport, AITask, SummaryCache, CommentLSHBucket, WeeklyTopic
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for table, column, column_type in ADDED_COLUMNS:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {column_type}"))
+        for name, table, column in ADDED_INDEXES:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column})"))
     print("Database tables created")
@@ -0,0 +1,201 @@
+"""
+Server-sent events: job state changes and new-data notifications
+
+GET /events streams these events to the dashboard, so it can refetch what
+changed instead of polling every few seconds:
+
+    job   a scheduled job started or finished, or a submitted job (app/jobs.py)
+          was queued, entered a stage or finished
+    data  a write committed new data in some domains (content, ai, targets:
+          the analytics cache domains, see app/cache.py)
+
+Events are published with Postgres NOTIFY. Each API process runs one thread
+that LISTENs and fans events out to its connected clients. That way a job run
+by the scheduler, or a write made by another process, still reaches every
+client. An idle dashboard keeps one open connection and costs no queries.
+
+Data events are coalesced: a process sends at most one per
+EVENTS_CONFIG["data_interval_seconds"], naming every domain written in that
+time, so a backfill committing batches back to back doesn't flood clients.
+"""
+from typing import Optional
+import asyncio
+import itertools
+import json
+import logging
+import select
+import threading
+import time
+from sqlalchemy import text
+from app.config import EVENTS_CONFIG
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'app_events'
+EVENT_TYPES = ('job', 'data')
+MAX_PAYLOAD_BYTES = 7900  # NOTIFY payloads must be shorter than 8000 bytes
+MAX_TEXT_CHARS = 500  # Error messages and other long strings are cut to this in events
+CORE_FIELDS = ('type', 'at', 'job_id', 'name', 'execution_id', 'status', 'stage', 'domains')
+
+
+def _payload(event_type: str, data: dict) -> str:
+    """
+    JSON payload that fits in a NOTIFY
+
+    Long strings are cut first. If it's still too big (e.g. large stage
+    details), only the fields clients act on are kept; they refetch the rest.
+    """
+    event = {'type': event_type, 'at': time.time(), **{
+        key: value[:MAX_TEXT_CHARS] if isinstance(value, str) else value for key, value in data.items()
+    }}
+    payload = json.dumps(event, default=str)
+    if len(payload.encode('utf-8')) <= MAX_PAYLOAD_BYTES:
+        return payload
+    event = {key: value for key, value in event.items() if key in CORE_FIELDS}
+    return json.dumps({**event, 'truncated': True}, default=str)
+
+
+def publish(event_type: str, **data) -> None:
+    """Send an event to the clients of every process (never raises)"""
+    if not EVENTS_CONFIG["enabled"]:
+        return
+    payload = _payload(event_type, data)
+    try:
+        with engine.begin() as connection:
+            connection.execute(text("SELECT pg_notify(:channel, :payload)"), {'channel': CHANNEL, 'payload': payload})
+    except Exception as e:
+        logger.warning(f"Failed to publish {event_type} event: {e}")
+
+
+def job_changed(job_id: str, status: str, execution_id: Optional[int] = None, **details) -> None:
+    """Publish a job state change (details: e.g. the stage a submitted job entered)"""
+    from app.scheduler import determine_job_name
+    publish('job', job_id=job_id, name=determine_job_name(job_id), execution_id=execution_id, status=status, **details)
+
+
+# ============================================================================
+# Coalesced data events
+# ============================================================================
+
+_pending_domains: set = set()
+_pending_lock = threading.Lock()
+_flush_timer: Optional[threading.Timer] = None
+
+
+def data_changed(domains) -> None:
+    """Announce new data in these domains, batched with other writes of the next few seconds"""
+    global _flush_timer
+    if not EVENTS_CONFIG["enabled"]:
+        return
+    with _pending_lock:
+        _pending_domains.update(domains)
+        if _flush_timer is None:
+            _flush_timer = threading.Timer(EVENTS_CONFIG["data_interval_seconds"], _flush_data)
+            _flush_timer.daemon = True
+            _flush_timer.start()
+
+
+def _flush_data():
+    global _flush_timer
+    with _pending_lock:
+        domains = sorted(_pending_domains)
+        _pending_domains.clear()
+        _flush_timer = None
+    if domains:
+        publish('data', domains=domains)
+
+
+# ============================================================================
+# Fan-out to connected clients
+# ============================================================================
+
+class EventBus:
+    """LISTENs on CHANNEL (one thread per process) and hands events to subscriber queues"""
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers = {}  # queue -> event loop it belongs to
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._ids = itertools.count(1)
+
+    def subscribe(self) -> asyncio.Queue:
+        """Queue receiving every event from now on (call from the client's event loop)"""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers[queue] = asyncio.get_running_loop()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._listen, name="event-listener", daemon=True)
+                self._thread.start()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def _dispatch(self, payload: str):
+        try:
+            event = {'id': next(self._ids), **json.loads(payload)}
+        except ValueError:
+            logger.warning(f"Ignoring malformed event: {payload[:200]}")
+            return
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # The client's event loop closed without unsubscribing; don't let it stop the listener
+                logger.warning("Dropping an event subscriber whose event loop is closed")
+                self.unsubscribe(queue)
+
+    def _listen(self):
+        """Hold a LISTEN connection while there are subscribers, reconnecting after errors"""
+        backoff = 1
+        while self._subscribers:
+            raw = None
+            try:
+                raw = engine.raw_connection()
+                raw.detach()  # Kept out of the pool: it stays in LISTEN mode
+                connection = raw.driver_connection
+                connection.autocommit = True
+                connection.cursor().execute(f"LISTEN {CHANNEL}")
+                backoff = 1
+                logger.info("Event listener connected")
+
+                while self._subscribers:
+                    if select.select([connection], [], [], 5) == ([], [], []):
+                        continue  # Timeout: re-check for subscribers
+                    connection.poll()
+                    while connection.notifies:
+                        self._dispatch(connection.notifies.pop(0).payload)
+            except Exception as e:
+                logger.error(f"Event listener failed, reconnecting in {backoff}s: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+            finally:
+                if raw is not None:
+                    try:
+                        raw.close()
+                    except Exception:
+                        pass
+        logger.info("Event listener stopped (no subscribers)")
+
+
+def _offer(queue: asyncio.Queue, event: dict):
+    """Queue an event for a client; a client too slow to keep up loses its oldest events"""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+event_bus = EventBus()
+
+
+def format_sse(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
@@ -0,0 +1,306 @@
+# type: ignore  # SQLAlchemy Column type annotations have known limitations with type checkers
+"""
+Background jobs for the long scrape and pipeline requests
+
+POST /scrape/hashtags, /scrape/comments, /pipeline/discovery and /pipeline/full
+used to run inside the request for up to 10 minutes. They held an API thread
+and often ran into proxy timeouts. They now submit their work here and return
+an execution id right away.
+
+Jobs run on a small thread pool of their own (JOB_RUNNER_CONFIG["workers"]),
+so the API's threads stay free for reads while pipelines run. Each job is a
+JobExecution row going queued -> running -> completed / failed / cancelled.
+Its result_summary holds the parameters, the stages reached so far and, once
+done, the result. GET /jobs/{execution_id} reads it.
+
+Cancelling sets the row to 'cancelling', so it works whichever API process
+gets the request. The job checks for it at its next stage: a scraper call in
+progress runs to its end, but nothing after it starts.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Optional
+import json
+import logging
+import os
+import socket
+import threading
+from app.config import JOB_RUNNER_CONFIG
+from app.database import SessionLocal
+from app.events import job_changed
+from app.models import JobExecution
+
+logger = logging.getLogger(__name__)
+
+# Job ids of the submitted jobs (scheduled jobs can't be cancelled here)
+JOB_IDS = ('scrape_hashtags', 'scrape_comments', 'discovery_pipeline', 'full_pipeline')
+ACTIVE_STATUSES = ('queued', 'running', 'cancelling')
+
+
+class JobCancelled(Exception):
+    """Raised inside a job at its next stage once it was cancelled"""
+
+
+def _process_token(pid: int) -> Optional[str]:
+    """host:pid:start time of a running process (None if it's gone), unique across pid reuse"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            start_time = f.read().rsplit(')', 1)[1].split()[19]
+    except (OSError, IndexError):
+        return None
+    return f"{socket.gethostname()}:{pid}:{start_time}"
+
+
+PROCESS = _process_token(os.getpid())
+
+
+def process_gone(owner: Optional[str]) -> bool:
+    """True if a PROCESS token names a process of this host that no longer exists"""
+    if PROCESS is None:
+        return False  # No /proc to tell live processes from gone ones
+    owner_host, _, pid = (owner or '').rpartition(':')[0].partition(':')
+    return owner_host == socket.gethostname() and pid.isdigit() and _process_token(int(pid)) != owner
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat() + 'Z'
+
+
+def _transition(db, execution_id: int, from_statuses: tuple, values: dict) -> bool:
+    """Move a job out of one of from_statuses (compare-and-set, caller commits)"""
+    return db.query(JobExecution)\
+        .filter(JobExecution.id == execution_id, JobExecution.status.in_(from_statuses))\
+        .update(values, synchronize_session=False) == 1
+
+
+class JobContext:
+    """Handed to a job function, which reports its stages through it"""
+
+    def __init__(self, execution_id: int, job_id: str):
+        self.execution_id = execution_id
+        self.job_id = job_id
+
+    def stage(self, name: str, **details) -> None:
+        """
+        Record that the job entered a stage, with optional details (e.g. item counts)
+
+        Raises:
+            JobCancelled: If the job was cancelled since its last stage
+        """
+        db = SessionLocal()
+        try:
+            execution = db.query(JobExecution).filter(JobExecution.id == self.execution_id).first()
+            if execution.status == 'cancelling':
+                raise JobCancelled(f"Job {self.execution_id} was cancelled")
+
+            progress = dict(execution.result_summary or {})
+            progress['stage'] = name
+            progress['stages'] = [*progress.get('stages', []), {'name': name, 'started_at': _now(), **details}]
+            execution.result_summary = progress  # Reassigned, JSON columns don't track in-place changes
+            db.commit()
+        finally:
+            db.close()
+        logger.info(f"Job {self.execution_id}: {name} {details or ''}")
+        job_changed(self.job_id, 'running', self.execution_id, stage=name, details=details)
+
+
+class JobRunner:
+    """
+    Args:
+        workers: Jobs running at once
+        max_queued: Jobs waiting or running in this process before submit() refuses more
+    """
+
+    def __init__(self, workers: int = 2, max_queued: int = 20):
+        self.max_queued = max_queued
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._active = 0
+
+    def submit(self, job_id: str, function: Callable, params: dict) -> dict:
+        """
+        Record a job and queue function(context) on the pool
+
+        Args:
+            job_id: One of JOB_IDS
+            function: Called with a JobContext, returns the job's result (JSON-serializable)
+            params: Request parameters, kept with the job
+
+        Raises:
+            RuntimeError: If max_queued jobs are already waiting or running in this process
+        """
+        with self._lock:
+            if self._active >= self.max_queued:
+                raise RuntimeError(f"{self._active} jobs are already queued or running, try again later")
+            self._active += 1
+
+        try:
+            db = SessionLocal()
+            try:
+                execution = JobExecution(
+                    job_id=job_id,
+                    status='queued',
+                    started_at=datetime.utcnow(),
+                    result_summary={
+                        'params': params,
+                        'process': PROCESS,  # Lets mark_interrupted() find jobs of exited processes
+                        'stage': None,
+                        'stages': []
+                    }
+                )
+                db.add(execution)
+                db.commit()
+                execution_id = execution.id
+            finally:
+                db.close()
+            self._executor.submit(self._run, execution_id, job_id, function)
+        except Exception:
+            with self._lock:
+                self._active -= 1
+            raise
+
+        logger.info(f"Job {execution_id} ({job_id}) queued")
+        job_changed(job_id, 'queued', execution_id)
+        return {'execution_id': execution_id, 'job_id': job_id, 'status': 'queued'}
+
+    def _run(self, execution_id: int, job_id: str, function: Callable):
+        try:
+            db = SessionLocal()
+            try:
+                started = _transition(db, execution_id, ('queued',), {'status': 'running', 'started_at': datetime.utcnow()})
+                db.commit()
+            finally:
+                db.close()
+            if not started:
+                return  # Cancelled while queued
+            job_changed(job_id, 'running', execution_id)
+
+            result, error = None, None
+            try:
+                result = json.loads(json.dumps(function(JobContext(execution_id, job_id)), default=str))
+                status = 'completed'
+            except JobCancelled:
+                status = 'cancelled'
+            except Exception as e:
+                logger.error(f"Job {execution_id} ({job_id}) failed: {e}")
+                status, error = 'failed', str(e)
+
+            db = SessionLocal()
+            try:
+                execution = db.query(JobExecution).filter(JobExecution.id == execution_id).first()
+                execution.status = status
+                execution.completed_at = datetime.utcnow()
+                execution.error_message = error
+                execution.result_summary = {**(execution.result_summary or {}), 'stage': None, 'result': result}
+                db.commit()
+            finally:
+                db.close()
+            logger.info(f"Job {execution_id} ({job_id}) {status}")
+            job_changed(job_id, status, execution_id, error_message=error)
+        except Exception as e:
+            logger.error(f"Job {execution_id} ({job_id}): failed to record its state: {e}")
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def shutdown(self):
+        """Stop taking jobs; queued ones are marked interrupted on the next start"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+job_runner = JobRunner(JOB_RUNNER_CONFIG["workers"], JOB_RUNNER_CONFIG["max_queued"])
+
+
+def get_job(execution_id: int) -> dict:
+    """
+    State, stages and result of a job (also works for scheduled job executions)
+
+    Raises:
+        ValueError: If there is no execution with this id
+    """
+    from app.scheduler import determine_job_name
+
+    db = SessionLocal()
+    try:
+        execution = db.query(JobExecution).filter(JobExecution.id == execution_id).first()
+        if not execution:
+            raise ValueError(f"Job {execution_id} not found")
+
+        progress = execution.result_summary or {}
+        return {
+            'execution_id': execution.id,
+            'job_id': execution.job_id,
+            'name': determine_job_name(execution.job_id),
+            'status': execution.status,
+            'stage': progress.get('stage'),
+            'stages': progress.get('stages', []),
+            'params': progress.get('params'),
+            'result': progress.get('result'),
+            'cancellable': execution.job_id in JOB_IDS and execution.status in ('queued', 'running'),
+            'started_at': execution.started_at.isoformat() + 'Z' if execution.started_at else None,
+            'completed_at': execution.completed_at.isoformat() + 'Z' if execution.completed_at else None,
+            'error_message': execution.error_message
+        }
+    finally:
+        db.close()
+
+
+def cancel(execution_id: int) -> dict:
+    """
+    Cancel a queued job, or ask a running one to stop at its next stage
+
+    Raises:
+        ValueError: If there is no cancellable job with this id
+        RuntimeError: If the job already finished
+    """
+    db = SessionLocal()
+    try:
+        execution = db.query(JobExecution)\
+            .filter(JobExecution.id == execution_id, JobExecution.job_id.in_(JOB_IDS))\
+            .first()
+        if not execution:
+            raise ValueError(f"Job {execution_id} not found")
+
+        if not _transition(db, execution_id, ('queued',), {'status': 'cancelled', 'completed_at': datetime.utcnow()}) \
+                and not _transition(db, execution_id, ('running',), {'status': 'cancelling'}):
+            db.rollback()
+            db.refresh(execution)
+            if execution.status != 'cancelling':
+                raise RuntimeError(f"Job {execution_id} already {execution.status}")
+        db.commit()
+    finally:
+        db.close()
+    job = get_job(execution_id)
+    job_changed(job['job_id'], job['status'], execution_id)
+    return job
+
+
+def mark_interrupted() -> int:
+    """
+    Close jobs left open by a process of this host that no longer exists (restart, crash)
+
+    Returns:
+        Number of jobs marked 'interrupted'
+    """
+    if PROCESS is None:
+        return 0  # No /proc to tell live processes from gone ones
+
+    db = SessionLocal()
+    try:
+        interrupted = [
+            execution.id
+            for execution in db.query(JobExecution).filter(
+                JobExecution.job_id.in_(JOB_IDS), JobExecution.status.in_(ACTIVE_STATUSES)
+            )
+            if process_gone((execution.result_summary or {}).get('process'))
+        ]
+
+        if interrupted:
+            db.query(JobExecution)\
+                .filter(JobExecution.id.in_(interrupted), JobExecution.status.in_(ACTIVE_STATUSES))\
+                .update({'status': 'interrupted', 'completed_at': datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+            logger.info(f"Marked {len(interrupted)} jobs of exited processes as interrupted")
+        return len(interrupted)
+    finally:
+        db.close()
@@ -1,16 +1,19 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from contextlib import asynccontextmanager
 from typing import Optional, List
 from pydantic import BaseModel, Field
-from functools import lru_cache
 from app.database import init_db, SessionLocal
 from app.models import Post, Comment, TargetUser, TargetHashtag, TargetPlace
-from app.orchestrator import ScrapingOrchestrator
+from app.orchestrator import get_orchestrator
 from sqlalchemy import desc, func
 from datetime import datetime, timedelta
+import asyncio
 import logging
 from app.scheduler import start_scheduler, stop_scheduler, get_jobs_status
+from app.cache import analytics_cache, cached, get_or_compute as cache_get_or_compute
+from app import analytics
 import re
 
 logging.basicConfig(level=logging.INFO)
@@ -104,26 +107,28 @@ class DiscoverAndSaveRequest(BaseModel):
 class SummarizePostRequest(BaseModel):
     """Request to summarize post comments"""
     prioritize_engagement: bool = Field(True, description="Weight high-engagement comments more")
+    mode: str = Field('abstractive', pattern='^(extractive|abstractive)$', description="extractive = instant digest without the model")
 
     class Config:
         json_schema_extra = {
-            "example": {"prioritize_engagement": True}
+            "example": {"prioritize_engagement": True, "mode": "abstractive"}
         }
 
 
 class SummarizePeriodRequest(BaseModel):
     """Request to summarize time period"""
     days: int = Field(7, ge=1, le=365, description="Number of days to look back")
+    mode: str = Field('abstractive', pattern='^(extractive|abstractive)$', description="extractive = instant digest without the model")
 
     class Config:
         json_schema_extra = {
-            "example": {"days": 7}
+            "example": {"days": 7, "mode": "abstractive"}
         }
 
 
 class BatchSentimentRequest(BaseModel):
     """Request to batch analyze sentiment"""
-    batch_size: int = Field(50, ge=1, le=1000, description="Number of comments to process")
+    batch_size: Optional[int] = Field(None, ge=1, le=1000, description="Number of items to process (default: based on the autotuned batch size)")
 
     class Config:
         json_schema_extra = {
@@ -142,6 +147,45 @@ class WeeklyReportRequest(BaseModel):
         }
 
 
+class WeeklyReportBackfillRequest(BaseModel):
+    """Request to rebuild the weekly reports of a date range"""
+    date_from: datetime = Field(..., description="First day of the range")
+    date_to: datetime = Field(..., description="Last day of the range")
+    force: bool = Field(False, description="Rebuild every week with content, not only stale ones")
+    dry_run: bool = Field(False, description="Only return the plan")
+    workers: Optional[int] = Field(None, ge=1, le=16, description="Weeks built in parallel (default: REPORT_BACKFILL_WORKERS)")
+
+    class Config:
+        json_schema_extra = {
+            "example": {"date_from": "2025-01-01", "date_to": "2025-12-31"}
+        }
+
+
+class AnalyticsWidget(BaseModel):
+    """One widget of a dashboard snapshot"""
+    name: str = Field(..., description="Widget name, as in /analytics/<name>")
+    params: dict = Field(default_factory=dict, description="The endpoint's query parameters, e.g. {\"limit\": 5}")
+    id: Optional[str] = Field(None, description="Key in the response (default: name), to request one widget twice")
+
+
+class AnalyticsSnapshotRequest(BaseModel):
+    """Request to compute several /analytics widgets at once"""
+    widgets: List[AnalyticsWidget] = Field(..., min_length=1, max_length=50)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "widgets": [
+                    {"name": "engagement-overview"},
+                    {"name": "posting-hours"},
+                    {"name": "posting-days"},
+                    {"name": "top-authors", "params": {"limit": 5}},
+                    {"name": "sentiment-breakdown", "params": {"excludeSpam": True}}
+                ]
+            }
+        }
+
+
 class UpdateJobScheduleRequest(BaseModel):
     """Request to update job schedule"""
     name: Optional[str] = None
@@ -163,12 +207,62 @@ class UpdateJobScheduleRequest(BaseModel):
         }
 
 
+def preload_models():
+    """
+    Load the AI models once in the gunicorn master (PRELOAD_MODELS=true, see
+    gunicorn.conf.py) so the forked API workers share them copy-on-write
+    """
+    from app.config import INFERENCE_WORKER_URL
+    if INFERENCE_WORKER_URL:
+        logger.info("Models are served by the inference worker, nothing to preload")
+        return
+    get_orchestrator().load_models()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize database on startup"""
     logger.info("Starting scraping POC...")
     init_db()
     
+    # Fill the AI work queue from existing rows (first startup only), after moving
+    # post comment aggregates off the caption's sentiment key (no-op once done)
+    try:
+        from app import ai_tasks
+        db = SessionLocal()
+        try:
+            if ai_tasks.move_comment_aggregates(db):
+                analytics_cache.bump('ai')
+            ai_tasks.seed_tasks(db)
+        finally:
+            db.close()
+    except Exception as e:
+        logger.error(f"Failed to seed AI tasks: {e}")
+    
+    # Optionally load (and tune) the models in the background; the API is ready without waiting for them
+    from app.config import AI_WARMUP_ON_STARTUP, AUTOTUNE_ON_STARTUP
+    if AI_WARMUP_ON_STARTUP or AUTOTUNE_ON_STARTUP:
+        import threading
+        
+        def prepare_models():
+            orchestrator = get_orchestrator()
+            if AI_WARMUP_ON_STARTUP:
+                orchestrator.warm_up_models()
+            if AUTOTUNE_ON_STARTUP:
+                try:
+                    orchestrator.autotune_models(force=False)  # Only models without a saved profile for this host
+                except Exception as e:
+                    logger.error(f"Startup autotune failed: {e}")
+        
+        threading.Thread(target=prepare_models, name="ai-warmup", daemon=True).start()
+    
+    # Close jobs whose process exited without finishing them
+    try:
+        from app.jobs import mark_interrupted
+        mark_interrupted()
+    except Exception as e:
+        logger.error(f"Failed to check for interrupted jobs: {e}")
+    
     # Start Scheduler
     try:
         start_scheduler()
@@ -178,6 +272,11 @@ async def lifespan(app: FastAPI):
     logger.info("Ready")
     yield
     stop_scheduler()
+    from app.backfill import backfill_worker
+    if backfill_worker.is_running():
+        backfill_worker.stop()
+    from app.jobs import job_runner
+    job_runner.shutdown()
     logger.info("Shutting down...")
 
 
@@ -198,12 +297,6 @@ app.add_middleware(
 )
 
 
-@lru_cache()
-def get_orchestrator() -> ScrapingOrchestrator:
-    """Get singleton orchestrator instance (loads AI models once)"""
-    return ScrapingOrchestrator()
-
-
 @app.get("/")
 def root():
     return {
@@ -213,11 +306,26 @@ def root():
             "scrape_hashtags": "POST /scrape/hashtags",
             "scrape_comments": "POST /scrape/comments",
             "stats": "GET /stats",
-            "jobs": "GET /jobs"
+            "jobs": "GET /jobs",
+            "events": "GET /events"
         }
     }
 
 
+@app.get("/ready")
+def readiness(require_models: bool = False):
+    """
+    Readiness probe with AI model state
+    
+    The API is ready as soon as it answers. With require_models=true it
+    returns 503 until both models are loaded (or warmed up).
+    """
+    status = get_orchestrator().get_model_status()
+    if require_models and not status['ready']:
+        raise HTTPException(status_code=503, detail=status)
+    return {'status': 'ready', **status}
+
+
 @app.get("/jobs")
 def list_jobs():
     """List scheduled jobs"""
@@ -230,6 +338,35 @@ def job_history(limit: int = 50):
     return get_job_history(limit)
 
 
+@app.get("/jobs/sentiment-backfill")
+def sentiment_backfill_status():
+    """Continuous sentiment backfill: state, backlog, items/sec and ETA"""
+    from app.backfill import backfill_worker
+    return backfill_worker.status()
+
+
+@app.post("/jobs/sentiment-backfill/{action}")
+def sentiment_backfill_control(action: str):
+    """
+    Pause or resume the sentiment backfill
+
+    Toggles the 'sentiment_backfill' job in the DB. The worker, which runs in
+    the scheduler's process, checks it every few seconds. A stopped worker is
+    started by the job's watchdog run (every 5 minutes).
+    """
+    from app.scheduler import update_job_schedule
+    from app.backfill import backfill_worker, JOB_ID
+    if action not in ('pause', 'resume'):
+        raise HTTPException(status_code=404, detail=f"Unknown action: {action}")
+    try:
+        update_job_schedule(JOB_ID, {'is_active': action == 'resume'})
+        return backfill_worker.status()
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/jobs/{job_id}/schedule")
 def update_job(job_id: str, request: UpdateJobScheduleRequest):
     """Update schedule for a specific job"""
@@ -242,13 +379,93 @@ def update_job(job_id: str, request: UpdateJobScheduleRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/scrape/hashtags")
+@app.get("/jobs/{execution_id}")
+def get_job(execution_id: int):
+    """State, stages and result of a submitted job (or of any job execution)"""
+    from app import jobs
+    try:
+        return jobs.get_job(execution_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.post("/jobs/{execution_id}/cancel")
+def cancel_job(execution_id: int):
+    """Cancel a queued job, or stop a running one before its next stage"""
+    from app import jobs
+    try:
+        return jobs.cancel(execution_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.get("/events")
+async def stream_events(
+    request: Request,
+    types: Optional[str] = Query(None, description="Comma-separated event types (job, data), all by default")
+):
+    """
+    Server-sent events: job state changes and new-data notifications
+
+    'job' events carry job_id, name, execution_id, status and, for submitted
+    jobs, the stage entered. 'data' events carry the domains that changed
+    (content, ai, targets). A comment line is sent every few seconds while idle.
+    """
+    from app.config import EVENTS_CONFIG
+    from app.events import EVENT_TYPES, event_bus, format_sse
+
+    if not EVENTS_CONFIG["enabled"]:
+        raise HTTPException(status_code=404, detail="Events are disabled")
+    wanted = set(types.split(',')) if types else set(EVENT_TYPES)
+    unknown = wanted - set(EVENT_TYPES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown event types: {', '.join(sorted(unknown))}")
+
+    async def stream():
+        queue = event_bus.subscribe()
+        try:
+            yield "retry: 5000\n\n"  # Browser reconnect delay
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=EVENTS_CONFIG["heartbeat_seconds"])
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                if event['type'] in wanted:
+                    yield format_sse(event)
+        finally:
+            event_bus.unsubscribe(queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # No proxy buffering (nginx)
+    )
+
+
+def _submit_job(job_id: str, function, params: dict) -> dict:
+    """Queue a job on the background runner (app/jobs.py); 429 when its queue is full"""
+    from app.jobs import job_runner
+    try:
+        return job_runner.submit(job_id, function, params)
+    except RuntimeError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/scrape/hashtags", status_code=202)
 def scrape_hashtags(request: HashtagRequest):
     """
     Scrape posts for given hashtags
 
-    May take 30s-2min depending on the number of hashtags and posts.
-    Results are stored in the database.
+    Takes 30s-2min depending on the number of hashtags and posts, so it runs
+    in the background. Returns the job's execution_id; follow it with
+    GET /jobs/{execution_id}. Results are stored in the database.
 
     Example:
         POST /scrape/hashtags
@@ -260,25 +477,27 @@ def scrape_hashtags(request: HashtagRequest):
             "run_ai_analysis": true
         }
     """
-    try:
+    def work(context):
         orchestrator = get_orchestrator()
         logger.info(f"Scraping options: download_media={request.download_media}, fetch_comments={request.fetch_comments}, run_ai_analysis={request.run_ai_analysis}")
 
         # Scrape hashtag posts
-        result = orchestrator.scrape_hashtags(request.hashtags, request.limit)
+        result = orchestrator.scrape_hashtags(request.hashtags, request.limit, progress=context.stage)
 
         # Optionally fetch comments after scraping posts
         if request.fetch_comments and result.get('posts_added', 0) > 0:
             logger.info("Fetching comments for scraped posts...")
             comments_result = orchestrator.scrape_comments_for_posts(
                 limit_posts=min(result['posts_added'], 20),
-                limit_comments=50
+                limit_comments=50,
+                progress=context.stage
             )
             result['comments'] = comments_result
 
         # Optionally run AI analysis
         if request.run_ai_analysis and result.get('posts_added', 0) > 0:
             logger.info("Running AI analysis on scraped posts...")
+            context.stage('ai_analysis')
             try:
                 ai_result = orchestrator.analyze_all_posts_sentiment(batch_size=50)
                 result['ai_analysis'] = ai_result
@@ -287,17 +506,18 @@ def scrape_hashtags(request: HashtagRequest):
                 result['ai_analysis'] = {'error': str(e)}
 
         return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
 
+    return _submit_job('scrape_hashtags', work, request.model_dump())
 
-@app.post("/scrape/comments")
+
+@app.post("/scrape/comments", status_code=202)
 def scrape_comments(request: CommentRequest):
     """
     Scrape comments for recent posts
     
-    May take 1-3 minutes depending on the number of posts and comments.
-    Results are stored in the database.
+    Takes 1-3 minutes depending on the number of posts and comments, so it
+    runs in the background. Returns the job's execution_id; follow it with
+    GET /jobs/{execution_id}. Results are stored in the database.
     
     Example:
         POST /scrape/comments
@@ -306,12 +526,12 @@ def scrape_comments(request: CommentRequest):
             "limit_comments": 50
         }
     """
-    try:
-        orchestrator = get_orchestrator()
-        result = orchestrator.scrape_comments_for_posts(request.limit_posts, request.limit_comments)
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    def work(context):
+        return get_orchestrator().scrape_comments_for_posts(
+            request.limit_posts, request.limit_comments, progress=context.stage
+        )
+
+    return _submit_job('scrape_comments', work, request.model_dump())
 
 
 @app.get("/stats")
@@ -337,12 +557,13 @@ def get_stats():
         db.close()
 
 
-@app.post("/pipeline/discovery")
+@app.post("/pipeline/discovery", status_code=202)
 def run_discovery_pipeline(request: DiscoveryRequest):
     """
     Discovery pipeline: Search Instagram + Get hashtag stats
     
-    Discovers accounts, hashtags, places, and related hashtags.
+    Discovers accounts, hashtags, places, and related hashtags. Runs in the
+    background; follow the returned execution_id with GET /jobs/{execution_id}.
     
     Example:
         POST /pipeline/discovery
@@ -351,15 +572,13 @@ def run_discovery_pipeline(request: DiscoveryRequest):
             "limit": 30
         }
     """
-    try:
-        orchestrator = get_orchestrator()
-        result = orchestrator.run_discovery_pipeline(request.search_term, request.limit)
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    def work(context):
+        return get_orchestrator().run_discovery_pipeline(request.search_term, request.limit, progress=context.stage)
 
+    return _submit_job('discovery_pipeline', work, request.model_dump())
 
-@app.post("/pipeline/full")
+
+@app.post("/pipeline/full", status_code=202)
 def run_full_pipeline(request: FullPipelineRequest):
     """
     Complete end-to-end pipeline:
@@ -367,8 +586,9 @@ def run_full_pipeline(request: FullPipelineRequest):
     2. Collect posts (hashtags + users + mentions)
     3. Collect comments
     
-    May take 3-10 minutes depending on the limits.
-    Results are stored in the database. Check logs for progress.
+    Takes 3-10 minutes depending on the limits, so it runs in the background.
+    Returns the job's execution_id; GET /jobs/{execution_id} shows the current
+    stage and, once done, the result. Results are stored in the database.
     
     Example:
         POST /pipeline/full
@@ -379,17 +599,16 @@ def run_full_pipeline(request: FullPipelineRequest):
             "limit_comments": 50
         }
     """
-    try:
-        orchestrator = get_orchestrator()
-        result = orchestrator.run_full_collection_pipeline(
+    def work(context):
+        return get_orchestrator().run_full_collection_pipeline(
             request.search_term,
             request.limit_discovery,
             request.limit_posts,
-            request.limit_comments
+            request.limit_comments,
+            progress=context.stage
         )
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+
+    return _submit_job('full_pipeline', work, request.model_dump())
 
 
 # === AI Services Endpoints ===
@@ -405,11 +624,11 @@ def summarize_post(post_id: int, request: SummarizePostRequest):
         
     Example:
         POST /ai/summarize/post/1
-        {"prioritize_engagement": true}
+        {"prioritize_engagement": true, "mode": "extractive"}
     """
     try:
         orchestrator = get_orchestrator()
-        return orchestrator.summarize_post_comments(post_id, request.prioritize_engagement)
+        return orchestrator.summarize_post_comments(post_id, request.prioritize_engagement, request.mode)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -417,19 +636,20 @@ def summarize_post(post_id: int, request: SummarizePostRequest):
 
 
 @app.post("/ai/summarize/comment/{comment_id}")
-def summarize_comment(comment_id: int):
+def summarize_comment(comment_id: int, mode: str = Query('abstractive', pattern='^(extractive|abstractive)$')):
     """
     Summarize a long comment (only if > 100 chars)
     
     Args:
         comment_id: Database ID of comment
+        mode: 'abstractive' (model) or 'extractive' (key sentences, instant)
         
     Example:
-        POST /ai/summarize/comment/5
+        POST /ai/summarize/comment/5?mode=extractive
     """
     try:
         orchestrator = get_orchestrator()
-        return orchestrator.summarize_long_comment(comment_id)
+        return orchestrator.summarize_long_comment(comment_id, mode)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -446,11 +666,11 @@ def summarize_period(request: SummarizePeriodRequest):
         
     Example:
         POST /ai/summarize/period
-        {"days": 7}
+        {"days": 7, "mode": "extractive"}
     """
     try:
         orchestrator = get_orchestrator()
-        return orchestrator.summarize_time_period(request.days)
+        return orchestrator.summarize_time_period(request.days, mode=request.mode)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -495,6 +715,72 @@ def analyze_post(post_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/ai/sentiment/posts/rebuild-counters")
+def rebuild_post_sentiment_counters():
+    """
+    Recompute all posts' sentiment counters from stored comment results (no model)
+
+    Run after changing SENTIMENT_CLASS_WEIGHTS
+    """
+    try:
+        orchestrator = get_orchestrator()
+        return orchestrator.rebuild_post_sentiment_counters()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/ai/topics/extract")
+def extract_topics(max_batches: Optional[int] = Query(None, ge=1, description="Per entity type, stop after this many batches")):
+    """
+    Extract keyword topics for posts and comments with a pending topics task
+
+    No model involved; also runs after every scheduled scrape
+    """
+    try:
+        orchestrator = get_orchestrator()
+        return orchestrator.extract_topics(max_batches=max_batches)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/ai/topics/rebuild-rollup")
+def rebuild_topic_rollup():
+    """Recompute the weekly topic rollup from the topics stored on posts and comments"""
+    try:
+        orchestrator = get_orchestrator()
+        return orchestrator.rebuild_topic_rollup()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/ai/embeddings/embed")
+def embed_content(max_batches: Optional[int] = Query(None, ge=1, description="Per entity type, stop after this many batches")):
+    """
+    Embed posts and comments with a pending embedding task into the semantic search index
+
+    Also runs after every scheduled scrape
+    """
+    try:
+        orchestrator = get_orchestrator()
+        return orchestrator.embed_pending(max_batches=max_batches)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/ai/comments/cluster")
+def cluster_comments(max_batches: Optional[int] = Query(None, ge=1, description="Stop after this many batches")):
+    """
+    Assign near-duplicate clusters (and spam flags) to comments that don't have one yet
+
+    New comments are clustered at ingest; this catches up on older ones
+    """
+    try:
+        orchestrator = get_orchestrator()
+        return orchestrator.cluster_comments(max_batches=max_batches)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/ai/sentiment/batch")
 def analyze_all(request: BatchSentimentRequest):
     """
@@ -537,6 +823,65 @@ def analyze_all_posts(request: BatchSentimentRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/ai/memory")
+def ai_memory():
+    """
+    Memory report of the worker process that served this request
+
+    Compare shared vs private memory across workers (the pid changes between
+    calls) to check that preloaded model weights are shared.
+    """
+    from app.services.ai.memory import process_memory
+    orchestrator = get_orchestrator()
+    return {
+        **process_memory(),
+        'models': {name: status['state'] for name, status in orchestrator.model_status.items()}
+    }
+
+
+@app.get("/ai/autotune")
+def autotune_status():
+    """Tuned inference batch size / threads per model, with the probe measurements"""
+    try:
+        return get_orchestrator().get_autotune_status()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/ai/autotune")
+def run_autotune(
+    model: Optional[str] = Query(None, pattern='^(sentiment|summarization)$'),
+    sample_size: int = Query(256, ge=16, le=2000)
+):
+    """
+    Probe batch sizes and thread counts on a sample of stored texts and keep
+    the fastest setting within the p95 latency and memory ceilings
+
+    Takes from seconds (sentiment) to several minutes (summarization on CPU).
+
+    Example:
+        POST /ai/autotune?model=sentiment
+    """
+    try:
+        return get_orchestrator().autotune_models([model] if model else None, sample_size=sample_size)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/ai/metrics")
+def get_ai_metrics():
+    """
+    Micro-batching metrics for the AI models
+
+    Queue depth, batch sizes, p50/p95 latency and latency SLO violations
+    for the sentiment and summarization services
+    """
+    try:
+        return get_orchestrator().get_ai_metrics()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/ai/reports/weekly")
 def generate_weekly_report(request: WeeklyReportRequest):
     """
@@ -556,6 +901,52 @@ def generate_weekly_report(request: WeeklyReportRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/ai/reports/weekly/backfill")
+def backfill_weekly_reports(request: WeeklyReportBackfillRequest):
+    """
+    Rebuild the stale weekly reports of a date range in the background
+
+    A week is stale when it has content but no report, or when posts/comments
+    were collected or their sentiment (re)analyzed after its report was
+    generated. Poll the returned execution_id for progress.
+
+    Example:
+        POST /ai/reports/weekly/backfill
+        {"date_from": "2025-01-01", "date_to": "2025-12-31"}
+    """
+    from app.report_backfill import plan_weeks, start_backfill
+    if request.date_from > request.date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    date_from = request.date_from.replace(tzinfo=None)
+    date_to = request.date_to.replace(tzinfo=None)
+    try:
+        if request.dry_run:
+            db = SessionLocal()
+            try:
+                plan = plan_weeks(db, date_from, date_to, request.force)
+            finally:
+                db.close()
+            stale = [w for w in plan if w['reason']]
+            return {'execution_id': None, 'planned': len(stale), 'skipped': len(plan) - len(stale), 'weeks': stale}
+        return start_backfill(date_from, date_to, request.force, request.workers)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/ai/reports/weekly/backfill/{execution_id}")
+def weekly_report_backfill_progress(execution_id: int):
+    """Progress of a weekly report backfill: weeks done/failed/pending and ETA"""
+    from app.report_backfill import get_progress
+    try:
+        return get_progress(execution_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/ai/reports/weekly")
 def get_weekly_reports(limit: int = Query(10, ge=1, le=52)):
     """
@@ -564,13 +955,16 @@ def get_weekly_reports(limit: int = Query(10, ge=1, le=52)):
     Args:
         limit: Maximum number of reports to return
     """
+    from app.config import TOPIC_CONFIG
     from app.models import WeeklyReport
+    from app.topics import weekly_top_topics
     db = SessionLocal()
     try:
         reports = db.query(WeeklyReport).order_by(
             desc(WeeklyReport.year),
             desc(WeeklyReport.week_number)
         ).limit(limit).all()
+        topics = weekly_top_topics(db, [r.week_start_date for r in reports], TOPIC_CONFIG["report_top_topics"])
 
         return [
             {
@@ -583,7 +977,7 @@ def get_weekly_reports(limit: int = Query(10, ge=1, le=52)):
                 'total_comments': r.comment_count,
                 'sentiment_summary': r.sentiment_breakdown,
                 'content_summary': r.summary,
-                'top_topics': None,
+                'top_topics': topics.get(r.week_start_date, []),
                 'generated_at': r.generated_at.isoformat() if r.generated_at else None,
             }
             for r in reports
@@ -601,7 +995,9 @@ def get_weekly_report(year: int, week_number: int):
         year: Year of the report
         week_number: Week number (1-53)
     """
+    from app.config import TOPIC_CONFIG
     from app.models import WeeklyReport
+    from app.topics import weekly_top_topics
     db = SessionLocal()
     try:
         report = db.query(WeeklyReport).filter(
@@ -622,7 +1018,9 @@ def get_weekly_report(year: int, week_number: int):
             'total_comments': report.comment_count,
             'sentiment_summary': report.sentiment_breakdown,
             'content_summary': report.summary,
-            'top_topics': None,
+            'top_topics': weekly_top_topics(
+                db, [report.week_start_date], TOPIC_CONFIG["report_top_topics"]
+            ).get(report.week_start_date, []),
             'generated_at': report.generated_at.isoformat() if report.generated_at else None,
         }
     finally:
@@ -1022,7 +1420,11 @@ def get_post(post_id: str):
 
 
 @app.get("/posts/{post_id}/comments")
-def get_post_comments(post_id: str, limit: int = Query(100, le=500)):
+def get_post_comments(
+    post_id: str,
+    limit: int = Query(100, le=500),
+    exclude_spam: bool = Query(False, alias="excludeSpam", description="Leave out comments in near-duplicate spam clusters")
+):
     """
     Get comments for a specific post
 
@@ -1037,9 +1439,10 @@ def get_post_comments(post_id: str, limit: int = Query(100, le=500)):
             raise HTTPException(status_code=404, detail="Post not found")
 
         # Get comments for this post
-        comments = db.query(Comment).filter(
-            Comment.post_id == post.id
-        ).order_by(desc(Comment.likes_count)).limit(limit).all()
+        query = db.query(Comment).filter(Comment.post_id == post.id)
+        if exclude_spam:
+            query = query.filter(Comment.is_spam.isnot(True))
+        comments = query.order_by(desc(Comment.likes_count)).limit(limit).all()
 
         result = []
         for comment in comments:
@@ -1054,6 +1457,8 @@ def get_post_comments(post_id: str, limit: int = Query(100, le=500)):
                 "timestamp": comment.timestamp.isoformat() if comment.timestamp else None,
                 "collected_at": comment.collected_at.isoformat() if comment.collected_at else None,
                 "ai_results": comment.ai_results,
+                "cluster_id": comment.cluster_id,
+                "is_spam": bool(comment.is_spam),
             })
 
         return result
@@ -1061,6 +1466,117 @@ def get_post_comments(post_id: str, limit: int = Query(100, le=500)):
         db.close()
 
 
+# ============================================================================
+# EXPORT ENDPOINTS
+# ============================================================================
+
+def _export_response(name: str, query, columns: list, export_format: str) -> StreamingResponse:
+    """Stream an export (app/exports.py) as a file download; 400 for a bad format"""
+    from app import exports
+    try:
+        body = exports.stream(query, columns, export_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    filename = f"{name}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{export_format}"
+    return StreamingResponse(
+        body,
+        media_type=exports.FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@app.get("/export/posts")
+def export_posts(
+    export_format: str = Query("csv", alias="format", description="csv (UTF-8 with BOM), ndjson or parquet"),
+    search: Optional[str] = Query(None, description="Search in captions and usernames"),
+    sentiment: Optional[str] = Query(None, description="Filter by sentiment: positive, negative, neutral"),
+    post_type: Optional[str] = Query(None, alias="postType", description="Filter by post type: Photo, Video, Carousel, Reel"),
+    source: Optional[str] = Query(None, description="Filter by source: hashtag, user_profile, mentions"),
+    min_likes: Optional[int] = Query(None, alias="minLikes", description="Minimum likes count"),
+    max_likes: Optional[int] = Query(None, alias="maxLikes", description="Maximum likes count"),
+    min_comments: Optional[int] = Query(None, alias="minComments", description="Minimum comments count"),
+    max_comments: Optional[int] = Query(None, alias="maxComments", description="Maximum comments count"),
+    date_from: Optional[str] = Query(None, alias="dateFrom", description="Filter posts from this date (ISO format)"),
+    date_to: Optional[str] = Query(None, alias="dateTo", description="Filter posts until this date (ISO format)"),
+    has_ai_results: Optional[bool] = Query(None, alias="hasAiResults", description="Filter posts with AI results")
+):
+    """
+    Export all posts matching the GET /posts filters, streamed without a row limit
+
+    Rows come from a server-side cursor in batches, so the download starts
+    right away and memory use doesn't grow with the export.
+    """
+    from app.exports import POST_COLUMNS, post_query
+    try:
+        query = post_query(
+            search, sentiment, post_type, source, min_likes, max_likes,
+            min_comments, max_comments, date_from, date_to, has_ai_results
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _export_response("posts", query, POST_COLUMNS, export_format)
+
+
+@app.get("/export/comments")
+def export_comments(
+    export_format: str = Query("csv", alias="format", description="csv (UTF-8 with BOM), ndjson or parquet"),
+    search: Optional[str] = Query(None, description="Search in comment texts and usernames"),
+    sentiment: Optional[str] = Query(None, description="Filter by comment sentiment: positive, negative, neutral"),
+    source: Optional[str] = Query(None, description="Filter by the source of the parent post"),
+    post_id: Optional[str] = Query(None, alias="postId", description="Only comments of this post (Instagram post id)"),
+    min_likes: Optional[int] = Query(None, alias="minLikes", description="Minimum likes count"),
+    max_likes: Optional[int] = Query(None, alias="maxLikes", description="Maximum likes count"),
+    date_from: Optional[str] = Query(None, alias="dateFrom", description="Filter comments from this date (ISO format)"),
+    date_to: Optional[str] = Query(None, alias="dateTo", description="Filter comments until this date (ISO format)"),
+    exclude_spam: bool = Query(False, alias="excludeSpam", description="Leave out comments in near-duplicate spam clusters")
+):
+    """Export all comments matching the filters, streamed like /export/posts"""
+    from app.exports import COMMENT_COLUMNS, comment_query
+    try:
+        query = comment_query(search, sentiment, source, post_id, min_likes, max_likes, date_from, date_to, exclude_spam)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _export_response("comments", query, COMMENT_COLUMNS, export_format)
+
+
+# ============================================================================
+# SEARCH ENDPOINTS
+# ============================================================================
+
+@app.get("/search/semantic")
+def semantic_search(
+    q: str = Query(..., min_length=1, description="Free-text query, Arabic or English"),
+    k: int = Query(10, ge=1, le=100, description="Maximum number of results"),
+    type: str = Query('all', description="posts, comments or all"),
+    source: Optional[str] = Query(None, description="Filter by post source: hashtag, user_profile, mentions"),
+    date_from: Optional[str] = Query(None, alias="dateFrom", description="Items from this date (ISO format)"),
+    date_to: Optional[str] = Query(None, alias="dateTo", description="Items until this date (ISO format)")
+):
+    """
+    Posts and comments closest in meaning to the query
+
+    Finds paraphrases and other word forms that a text search misses. Uses the
+    embedding index filled by the embed_content job.
+    """
+    entity_types = {'posts': ['post'], 'comments': ['comment'], 'all': None}
+    if type not in entity_types:
+        raise HTTPException(status_code=400, detail="type must be posts, comments or all")
+    try:
+        from_date = datetime.fromisoformat(date_from.replace('Z', '+00:00')) if date_from else None
+        # Add one day to include the entire end date
+        to_date = datetime.fromisoformat(date_to.replace('Z', '+00:00')) + timedelta(days=1) if date_to else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format")
+
+    try:
+        orchestrator = get_orchestrator()
+        return orchestrator.semantic_search(q, k, entity_types[type], from_date, to_date, source)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ============================================================================
 # TARGETS ENDPOINTS (for Settings & Monitoring)
 # ============================================================================
@@ -1162,94 +1678,65 @@ def get_target_places(active_only: bool = Query(True)):
 # ANALYTICS ENDPOINTS (for Dashboard)
 # ============================================================================
 
-@app.get("/analytics/sentiment-breakdown")
-def get_sentiment_breakdown():
-    """Get sentiment breakdown across all posts and comments with AI results"""
+@app.get("/analytics/cache")
+def analytics_cache_stats():
+    """Hit rate, size and data versions of the /analytics response cache"""
+    return analytics_cache.stats()
+
+
+@app.post("/analytics/snapshot")
+def get_analytics_snapshot(request: AnalyticsSnapshotRequest):
+    """
+    Compute several dashboard widgets in one request
+
+    Each widget is cached until a data version it depends on changes. The ones
+    computed are read in one transaction, and the per-post aggregates share one scan.
+    """
+    widgets = [widget.model_dump() for widget in request.widgets]
     db = SessionLocal()
     try:
-        positive = 0
-        neutral = 0
-        negative = 0
+        return analytics.snapshot(db, widgets, cache_get_or_compute)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Analytics snapshot failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        db.close()
 
-        # Count post sentiments
-        posts = db.query(Post).filter(Post.ai_results.isnot(None)).all()
-        for post in posts:
-            if post.ai_results and isinstance(post.ai_results, dict) and "sentiment" in post.ai_results:
-                label = post.ai_results["sentiment"].get("label", "").lower()
-                if label == "positive":
-                    positive += 1
-                elif label == "negative":
-                    negative += 1
-                else:
-                    neutral += 1
-
-        # Count comment sentiments
-        comments = db.query(Comment).filter(Comment.ai_results.isnot(None)).all()
-        for comment in comments:
-            if comment.ai_results and isinstance(comment.ai_results, dict) and "sentiment" in comment.ai_results:
-                label = comment.ai_results["sentiment"].get("label", "").lower()
-                if label == "positive":
-                    positive += 1
-                elif label == "negative":
-                    negative += 1
-                else:
-                    neutral += 1
 
-        return {
-            "positive": positive,
-            "neutral": neutral,
-            "negative": negative,
-            "total": positive + neutral + negative
-        }
+@app.get("/analytics/sentiment-breakdown")
+@cached('content', 'ai')
+def get_sentiment_breakdown(exclude_spam: bool = Query(False, alias="excludeSpam", description="Leave out comments in near-duplicate spam clusters")):
+    """Get sentiment breakdown across all posts and comments with AI results"""
+    db = SessionLocal()
+    try:
+        return analytics.sentiment_breakdown(db, exclude_spam)
     finally:
         db.close()
 
 
 @app.get("/analytics/top-hashtags")
+@cached('content')
 def get_top_hashtags(limit: int = Query(10, le=50)):
     """Get most frequently occurring hashtags from scraped posts"""
     db = SessionLocal()
     try:
-        posts = db.query(Post.caption).filter(Post.caption.isnot(None)).all()
-
-        from collections import Counter
-
-        all_hashtags = []
-        for (caption,) in posts:
-            if caption:
-                hashtags = re.findall(r'#(\w+)', caption.lower())
-                all_hashtags.extend(hashtags)
-
-        hashtag_counts = Counter(all_hashtags).most_common(limit)
-
-        return [
-            {"hashtag": tag, "count": count}
-            for tag, count in hashtag_counts
-        ]
+        return analytics.top_hashtags(db, limit)
     finally:
         db.close()
 
 
 @app.get("/analytics/top-topics")
-def get_top_topics(limit: int = Query(10, le=50)):
-    """Get most frequently detected AI topics"""
+@cached('ai')
+def get_top_topics(
+    limit: int = Query(10, le=50),
+    weeks: Optional[int] = Query(None, ge=1, le=520, description="Only the last N weeks (default: all time)")
+):
+    """Get most frequently detected AI topics (posts and comments, from the weekly topic rollup)"""
     db = SessionLocal()
     try:
-        posts = db.query(Post.ai_results).filter(Post.ai_results.isnot(None)).all()
-
-        from collections import Counter
-
-        all_topics = []
-        for (ai_results,) in posts:
-            if ai_results and "topics" in ai_results:
-                all_topics.extend(ai_results["topics"])
-
-        topic_counts = Counter(all_topics).most_common(limit)
-
-        return [
-            {"topic": topic, "count": count}
-            for topic, count in topic_counts
-        ]
+        return analytics.top_topics(db, limit, weeks)
     finally:
         db.close()
 
@@ -1259,114 +1746,45 @@ def get_top_topics(limit: int = Query(10, le=50)):
 # ============================================================================
 
 @app.get("/analytics/engagement-overview")
+@cached('content')
 def get_engagement_overview():
     """Get overall engagement metrics"""
     db = SessionLocal()
     try:
-        from sqlalchemy import func as sql_func
-
-        # Total engagement stats
-        stats = db.query(
-            sql_func.sum(Post.likes_count).label('total_likes'),
-            sql_func.sum(Post.comments_count).label('total_comments'),
-            sql_func.count(Post.id).label('total_posts'),
-            sql_func.avg(Post.likes_count).label('avg_likes'),
-            sql_func.avg(Post.comments_count).label('avg_comments'),
-            sql_func.max(Post.likes_count).label('max_likes'),
-            sql_func.max(Post.comments_count).label('max_comments'),
-        ).first()
-
-        return {
-            "total_likes": stats.total_likes or 0,
-            "total_comments": stats.total_comments or 0,
-            "total_posts": stats.total_posts or 0,
-            "avg_likes_per_post": round(float(stats.avg_likes or 0), 2),
-            "avg_comments_per_post": round(float(stats.avg_comments or 0), 2),
-            "max_likes": stats.max_likes or 0,
-            "max_comments": stats.max_comments or 0,
-            "engagement_rate": round((float(stats.total_likes or 0) + float(stats.total_comments or 0)) / max(stats.total_posts or 1, 1), 2)
-        }
+        return analytics.engagement_overview(db)
     finally:
         db.close()
 
 
 @app.get("/analytics/engagement-by-post-type")
+@cached('content')
 def get_engagement_by_post_type():
     """Get engagement breakdown by post type"""
     db = SessionLocal()
     try:
-        from sqlalchemy import func as sql_func
-
-        results = db.query(
-            Post.post_type,
-            sql_func.count(Post.id).label('count'),
-            sql_func.sum(Post.likes_count).label('total_likes'),
-            sql_func.sum(Post.comments_count).label('total_comments'),
-            sql_func.avg(Post.likes_count).label('avg_likes'),
-            sql_func.avg(Post.comments_count).label('avg_comments'),
-        ).filter(Post.post_type.isnot(None)).group_by(Post.post_type).all()
-
-        return [
-            {
-                "post_type": r.post_type,
-                "count": r.count,
-                "total_likes": r.total_likes or 0,
-                "total_comments": r.total_comments or 0,
-                "avg_likes": round(float(r.avg_likes or 0), 2),
-                "avg_comments": round(float(r.avg_comments or 0), 2),
-            }
-            for r in results
-        ]
+        return analytics.engagement_by_post_type(db)
     finally:
         db.close()
 
 
 @app.get("/analytics/top-posts-by-likes")
+@cached('content')
 def get_top_posts_by_likes(limit: int = Query(10, le=50)):
     """Get top posts by likes count"""
     db = SessionLocal()
     try:
-        posts = db.query(Post).order_by(desc(Post.likes_count)).limit(limit).all()
-
-        return [
-            {
-                "post_id": p.post_id,
-                "shortcode": p.shortcode,
-                "owner_username": p.owner_username,
-                "caption": (p.caption[:100] + "...") if p.caption and len(p.caption) > 100 else p.caption,
-                "post_type": p.post_type,
-                "likes_count": p.likes_count,
-                "comments_count": p.comments_count,
-                "timestamp": p.timestamp.isoformat() if p.timestamp else None,
-                "display_url": f"https://picsum.photos/seed/{p.post_id}/800/800",
-            }
-            for p in posts
-        ]
+        return analytics.top_posts_by_likes(db, limit)
     finally:
         db.close()
 
 
 @app.get("/analytics/top-posts-by-comments")
+@cached('content')
 def get_top_posts_by_comments(limit: int = Query(10, le=50)):
     """Get top posts by comments count"""
     db = SessionLocal()
     try:
-        posts = db.query(Post).order_by(desc(Post.comments_count)).limit(limit).all()
-
-        return [
-            {
-                "post_id": p.post_id,
-                "shortcode": p.shortcode,
-                "owner_username": p.owner_username,
-                "caption": (p.caption[:100] + "...") if p.caption and len(p.caption) > 100 else p.caption,
-                "post_type": p.post_type,
-                "likes_count": p.likes_count,
-                "comments_count": p.comments_count,
-                "timestamp": p.timestamp.isoformat() if p.timestamp else None,
-                "display_url": f"https://picsum.photos/seed/{p.post_id}/800/800",
-            }
-            for p in posts
-        ]
+        return analytics.top_posts_by_comments(db, limit)
     finally:
         db.close()
 
@@ -1376,6 +1794,7 @@ def get_top_posts_by_comments(limit: int = Query(10, le=50)):
 # ============================================================================
 
 @app.get("/analytics/posts-over-time")
+@cached('content')
 def get_posts_over_time(
     group_by: str = Query("day", description="Group by: hour, day, week, month"),
     days: int = Query(30, le=365, description="Number of days to look back")
@@ -1383,101 +1802,29 @@ def get_posts_over_time(
     """Get posts count over time"""
     db = SessionLocal()
     try:
-        from sqlalchemy import func as sql_func
-
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
-
-        # Use date_trunc for PostgreSQL
-        if group_by == "hour":
-            date_format = func.date_trunc('hour', Post.timestamp)
-        elif group_by == "week":
-            date_format = func.date_trunc('week', Post.timestamp)
-        elif group_by == "month":
-            date_format = func.date_trunc('month', Post.timestamp)
-        else:  # day
-            date_format = func.date_trunc('day', Post.timestamp)
-
-        results = db.query(
-            date_format.label('date'),
-            sql_func.count(Post.id).label('count'),
-            sql_func.sum(Post.likes_count).label('likes'),
-            sql_func.sum(Post.comments_count).label('comments')
-        ).filter(
-            Post.timestamp >= cutoff_date,
-            Post.timestamp.isnot(None)
-        ).group_by(date_format).order_by(date_format).all()
-
-        return [
-            {
-                "period": r.date.isoformat() if r.date else None,
-                "count": r.count,
-                "likes": r.likes or 0,
-                "comments": r.comments or 0
-            }
-            for r in results
-        ]
+        return analytics.posts_over_time(db, group_by, days)
     finally:
         db.close()
 
 
 @app.get("/analytics/posting-hours")
+@cached('content')
 def get_posting_hours():
     """Get distribution of posts by hour of day"""
     db = SessionLocal()
     try:
-        from sqlalchemy import func as sql_func
-
-        results = db.query(
-            func.extract('hour', Post.timestamp).label('hour'),
-            sql_func.count(Post.id).label('count'),
-            sql_func.avg(Post.likes_count).label('avg_likes')
-        ).filter(Post.timestamp.isnot(None)).group_by(
-            func.extract('hour', Post.timestamp)
-        ).order_by('hour').all()
-
-        # Fill in missing hours with 0
-        hour_data = {int(r.hour): {'count': r.count, 'avg_likes': float(r.avg_likes or 0)} for r in results}
-        return [
-            {
-                "hour": h,
-                "count": hour_data.get(h, {}).get('count', 0),
-                "avg_likes": round(hour_data.get(h, {}).get('avg_likes', 0), 1)
-            }
-            for h in range(24)
-        ]
+        return analytics.posting_hours(db)
     finally:
         db.close()
 
 
 @app.get("/analytics/posting-days")
+@cached('content')
 def get_posting_days():
     """Get distribution of posts by day of week"""
     db = SessionLocal()
     try:
-        from sqlalchemy import func as sql_func
-
-        results = db.query(
-            func.extract('dow', Post.timestamp).label('day'),
-            sql_func.count(Post.id).label('count'),
-            sql_func.avg(Post.likes_count).label('avg_likes'),
-            sql_func.sum(Post.likes_count).label('total_likes')
-        ).filter(Post.timestamp.isnot(None)).group_by(
-            func.extract('dow', Post.timestamp)
-        ).order_by('day').all()
-
-        day_names = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
-        day_data = {int(r.day): {'count': r.count, 'avg_likes': float(r.avg_likes or 0), 'total_likes': r.total_likes or 0} for r in results}
-
-        return [
-            {
-                "day_name": day_names[d],
-                "day_number": d,
-                "count": day_data.get(d, {}).get('count', 0),
-                "avg_likes": round(day_data.get(d, {}).get('avg_likes', 0), 1),
-                "total_likes": day_data.get(d, {}).get('total_likes', 0)
-            }
-            for d in range(7)
-        ]
+        return analytics.posting_days(db)
     finally:
         db.close()
 
@@ -1487,96 +1834,36 @@ def get_posting_days():
 # ============================================================================
 
 @app.get("/analytics/top-authors")
+@cached('content')
 def get_top_authors(limit: int = Query(10, le=50)):
     """Get authors with most posts"""
     db = SessionLocal()
     try:
-        from sqlalchemy import func as sql_func
-
-        results = db.query(
-            Post.owner_username,
-            sql_func.count(Post.id).label('post_count'),
-            sql_func.sum(Post.likes_count).label('total_likes'),
-            sql_func.sum(Post.comments_count).label('total_comments'),
-        ).filter(Post.owner_username.isnot(None)).group_by(
-            Post.owner_username
-        ).order_by(desc('post_count')).limit(limit).all()
-
-        return [
-            {
-                "username": r.owner_username,
-                "post_count": r.post_count,
-                "total_likes": r.total_likes or 0,
-                "total_comments": r.total_comments or 0,
-            }
-            for r in results
-        ]
+        return analytics.top_authors(db, limit)
     finally:
         db.close()
 
 
 @app.get("/analytics/top-authors-by-engagement")
+@cached('content')
 def get_top_authors_by_engagement(limit: int = Query(10, le=50)):
     """Get authors by total engagement (likes + comments)"""
     db = SessionLocal()
     try:
-        from sqlalchemy import func as sql_func
-
-        results = db.query(
-            Post.owner_username,
-            sql_func.count(Post.id).label('post_count'),
-            sql_func.sum(Post.likes_count).label('total_likes'),
-            sql_func.sum(Post.comments_count).label('total_comments'),
-            (sql_func.sum(Post.likes_count) + sql_func.sum(Post.comments_count)).label('total_engagement'),
-        ).filter(Post.owner_username.isnot(None)).group_by(
-            Post.owner_username
-        ).order_by(desc('total_engagement')).limit(limit).all()
-
-        return [
-            {
-                "username": r.owner_username,
-                "post_count": r.post_count,
-                "total_likes": r.total_likes or 0,
-                "total_comments": r.total_comments or 0,
-                "total_engagement": r.total_engagement or 0,
-            }
-            for r in results
-        ]
+        return analytics.top_authors_by_engagement(db, limit)
     finally:
         db.close()
 
 
 @app.get("/analytics/author-activity")
+@cached('content')
 def get_author_activity(username: str):
     """Get detailed activity for a specific author"""
     db = SessionLocal()
     try:
-        from sqlalchemy import func as sql_func
-
-        posts = db.query(Post).filter(Post.owner_username == username).all()
-
-        if not posts:
-            raise HTTPException(status_code=404, detail="Author not found")
-
-        return {
-            "username": username,
-            "post_count": len(posts),
-            "total_likes": sum(p.likes_count or 0 for p in posts),
-            "total_comments": sum(p.comments_count or 0 for p in posts),
-            "avg_likes": round(sum(p.likes_count or 0 for p in posts) / len(posts), 2) if posts else 0,
-            "avg_comments": round(sum(p.comments_count or 0 for p in posts) / len(posts), 2) if posts else 0,
-            "post_types": list(set(p.post_type for p in posts if p.post_type)),
-            "recent_posts": [
-                {
-                    "post_id": p.post_id,
-                    "caption": (p.caption[:100] + "...") if p.caption and len(p.caption) > 100 else p.caption,
-                    "likes_count": p.likes_count,
-                    "comments_count": p.comments_count,
-                    "timestamp": p.timestamp.isoformat() if p.timestamp else None,
-                }
-                for p in sorted(posts, key=lambda x: x.timestamp or datetime.min, reverse=True)[:5]
-            ]
-        }
+        return analytics.author_activity(db, username)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     finally:
         db.close()
 
@@ -1586,87 +1873,37 @@ def get_author_activity(username: str):
 # ============================================================================
 
 @app.get("/analytics/comment-stats")
-def get_comment_stats():
+@cached('content')
+def get_comment_stats(exclude_spam: bool = Query(False, alias="excludeSpam", description="Leave out comments in near-duplicate spam clusters")):
     """Get overall comment statistics"""
     db = SessionLocal()
     try:
-        from sqlalchemy import func as sql_func
-
-        stats = db.query(
-            sql_func.count(Comment.id).label('total_comments'),
-            sql_func.sum(Comment.likes_count).label('total_likes'),
-            sql_func.avg(Comment.likes_count).label('avg_likes'),
-            sql_func.max(Comment.likes_count).label('max_likes'),
-        ).first()
-
-        # Count comments with AI results
-        ai_analyzed = db.query(Comment).filter(Comment.ai_results.isnot(None)).count()
-
-        return {
-            "total_comments": stats.total_comments or 0,
-            "total_likes": stats.total_likes or 0,
-            "avg_likes_per_comment": round(float(stats.avg_likes or 0), 2),
-            "max_likes": stats.max_likes or 0,
-            "ai_analyzed": ai_analyzed,
-        }
+        return analytics.comment_stats(db, exclude_spam)
     finally:
         db.close()
 
 
 @app.get("/analytics/top-commenters")
-def get_top_commenters(limit: int = Query(10, le=50)):
+@cached('content')
+def get_top_commenters(
+    limit: int = Query(10, le=50),
+    exclude_spam: bool = Query(False, alias="excludeSpam", description="Leave out comments in near-duplicate spam clusters")
+):
     """Get users who comment the most"""
     db = SessionLocal()
     try:
-        from sqlalchemy import func as sql_func
-
-        results = db.query(
-            Comment.owner_username,
-            sql_func.count(Comment.id).label('comment_count'),
-            sql_func.sum(Comment.likes_count).label('total_likes'),
-        ).filter(Comment.owner_username.isnot(None)).group_by(
-            Comment.owner_username
-        ).order_by(desc('comment_count')).limit(limit).all()
-
-        return [
-            {
-                "username": r.owner_username,
-                "comment_count": r.comment_count,
-                "total_likes": r.total_likes or 0,
-            }
-            for r in results
-        ]
+        return analytics.top_commenters(db, limit, exclude_spam)
     finally:
         db.close()
 
 
 @app.get("/analytics/comment-sentiment-breakdown")
-def get_comment_sentiment_breakdown():
+@cached('content', 'ai')
+def get_comment_sentiment_breakdown(exclude_spam: bool = Query(False, alias="excludeSpam", description="Leave out comments in near-duplicate spam clusters")):
     """Get sentiment breakdown for comments"""
     db = SessionLocal()
     try:
-        comments = db.query(Comment).filter(Comment.ai_results.isnot(None)).all()
-
-        positive = 0
-        neutral = 0
-        negative = 0
-
-        for comment in comments:
-            if comment.ai_results and "sentiment" in comment.ai_results:
-                label = comment.ai_results["sentiment"].get("label", "").lower()
-                if label == "positive":
-                    positive += 1
-                elif label == "negative":
-                    negative += 1
-                else:
-                    neutral += 1
-
-        return {
-            "positive": positive,
-            "neutral": neutral,
-            "negative": negative,
-            "total": positive + neutral + negative
-        }
+        return analytics.comment_sentiment_breakdown(db, exclude_spam)
     finally:
         db.close()
 
@@ -1676,99 +1913,34 @@ def get_comment_sentiment_breakdown():
 # ============================================================================
 
 @app.get("/analytics/content-sources")
+@cached('content')
 def get_content_sources():
     """Get breakdown of content by source"""
     db = SessionLocal()
     try:
-        from sqlalchemy import func as sql_func
-
-        results = db.query(
-            Post.source,
-            sql_func.count(Post.id).label('count'),
-            sql_func.sum(Post.likes_count).label('total_likes'),
-            sql_func.sum(Post.comments_count).label('total_comments'),
-        ).filter(Post.source.isnot(None)).group_by(Post.source).all()
-
-        return [
-            {
-                "source": r.source,
-                "count": r.count,
-                "total_likes": r.total_likes or 0,
-                "total_comments": r.total_comments or 0,
-            }
-            for r in results
-        ]
+        return analytics.content_sources(db)
     finally:
         db.close()
 
 
 @app.get("/analytics/caption-length-analysis")
+@cached('content')
 def get_caption_length_analysis():
     """Analyze engagement vs caption length"""
     db = SessionLocal()
     try:
-        posts = db.query(Post).filter(Post.caption.isnot(None)).all()
-
-        # Group by caption length ranges
-        ranges = {
-            "0-50": {"count": 0, "total_likes": 0, "total_comments": 0},
-            "51-100": {"count": 0, "total_likes": 0, "total_comments": 0},
-            "101-200": {"count": 0, "total_likes": 0, "total_comments": 0},
-            "201-500": {"count": 0, "total_likes": 0, "total_comments": 0},
-            "500+": {"count": 0, "total_likes": 0, "total_comments": 0},
-        }
-
-        for post in posts:
-            length = len(post.caption)
-            if length <= 50:
-                key = "0-50"
-            elif length <= 100:
-                key = "51-100"
-            elif length <= 200:
-                key = "101-200"
-            elif length <= 500:
-                key = "201-500"
-            else:
-                key = "500+"
-
-            ranges[key]["count"] += 1
-            ranges[key]["total_likes"] += post.likes_count or 0
-            ranges[key]["total_comments"] += post.comments_count or 0
-
-        return [
-            {
-                "range": k,
-                "count": v["count"],
-                "avg_likes": round(v["total_likes"] / v["count"], 2) if v["count"] > 0 else 0,
-                "avg_comments": round(v["total_comments"] / v["count"], 2) if v["count"] > 0 else 0,
-            }
-            for k, v in ranges.items()
-        ]
+        return analytics.caption_length_analysis(db)
     finally:
         db.close()
 
 
 @app.get("/analytics/mentions")
+@cached('content')
 def get_mentions_analysis(limit: int = Query(20, le=100)):
     """Get most mentioned accounts"""
     db = SessionLocal()
     try:
-        posts = db.query(Post.caption).filter(Post.caption.isnot(None)).all()
-
-        from collections import Counter
-
-        all_mentions = []
-        for (caption,) in posts:
-            if caption:
-                mentions = re.findall(r'@(\w+)', caption)
-                all_mentions.extend(mentions)
-
-        mention_counts = Counter(all_mentions).most_common(limit)
-
-        return [
-            {"username": mention, "count": count}
-            for mention, count in mention_counts
-        ]
+        return analytics.mentions(db, limit)
     finally:
         db.close()
 
@@ -1778,121 +1950,34 @@ def get_mentions_analysis(limit: int = Query(20, le=100)):
 # ============================================================================
 
 @app.get("/analytics/ai-coverage")
+@cached('content', 'ai')
 def get_ai_coverage():
     """Get AI analysis coverage statistics"""
     db = SessionLocal()
     try:
-        total_posts = db.query(Post).count()
-        total_comments = db.query(Comment).count()
-
-        # Count posts/comments with actual sentiment analysis
-        # We need to check if ai_results contains 'sentiment' key
-        # Fetch and check in Python to avoid DB-specific JSON operators
-        posts_with_ai = 0
-        comments_with_ai = 0
-
-        # Check posts with ai_results
-        posts_with_results = db.query(Post).filter(Post.ai_results.isnot(None)).all()
-        for post in posts_with_results:
-            if post.ai_results and isinstance(post.ai_results, dict) and 'sentiment' in post.ai_results:
-                posts_with_ai += 1
-
-        # Check comments with ai_results
-        comments_with_results = db.query(Comment).filter(Comment.ai_results.isnot(None)).all()
-        for comment in comments_with_results:
-            if comment.ai_results and isinstance(comment.ai_results, dict) and 'sentiment' in comment.ai_results:
-                comments_with_ai += 1
-
-        return {
-            "posts": {
-                "total": total_posts,
-                "analyzed": posts_with_ai,
-                "pending": total_posts - posts_with_ai,
-                "coverage_percent": round((posts_with_ai / total_posts * 100), 1) if total_posts > 0 else 0
-            },
-            "comments": {
-                "total": total_comments,
-                "analyzed": comments_with_ai,
-                "pending": total_comments - comments_with_ai,
-                "coverage_percent": round((comments_with_ai / total_comments * 100), 1) if total_comments > 0 else 0
-            }
-        }
+        return analytics.ai_coverage(db)
     finally:
         db.close()
 
 
 @app.get("/analytics/sentiment-by-source")
+@cached('content', 'ai')
 def get_sentiment_by_source():
     """Get sentiment breakdown by content source"""
     db = SessionLocal()
     try:
-        posts = db.query(Post).filter(
-            Post.ai_results.isnot(None),
-            Post.source.isnot(None)
-        ).all()
-
-        source_sentiment = {}
-        for post in posts:
-            source = post.source
-            if source not in source_sentiment:
-                source_sentiment[source] = {"positive": 0, "neutral": 0, "negative": 0}
-
-            if post.ai_results and "sentiment" in post.ai_results:
-                label = post.ai_results["sentiment"].get("label", "").lower()
-                if label in ["positive", "neutral", "negative"]:
-                    source_sentiment[source][label] += 1
-
-        return [
-            {
-                "source": source,
-                "positive": counts["positive"],
-                "neutral": counts["neutral"],
-                "negative": counts["negative"],
-                "total": counts["positive"] + counts["neutral"] + counts["negative"],
-            }
-            for source, counts in source_sentiment.items()
-        ]
+        return analytics.sentiment_by_source(db)
     finally:
         db.close()
 
 
 @app.get("/analytics/sentiment-trend")
+@cached('content', 'ai')
 def get_sentiment_trend(days: int = Query(30, le=365)):
     """Get sentiment trend over time"""
     db = SessionLocal()
     try:
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
-
-        posts = db.query(Post).filter(
-            Post.ai_results.isnot(None),
-            Post.timestamp >= cutoff_date,
-            Post.timestamp.isnot(None)
-        ).all()
-
-        # Group by date
-        date_sentiment = {}
-        for post in posts:
-            date_str = post.timestamp.strftime("%Y-%m-%d")
-            if date_str not in date_sentiment:
-                date_sentiment[date_str] = {"positive": 0, "neutral": 0, "negative": 0}
-
-            if post.ai_results and "sentiment" in post.ai_results:
-                label = post.ai_results["sentiment"].get("label", "").lower()
-                if label in ["positive", "neutral", "negative"]:
-                    date_sentiment[date_str][label] += 1
-
-        # Sort by date
-        sorted_dates = sorted(date_sentiment.keys())
-
-        return [
-            {
-                "date": date,
-                "positive": date_sentiment[date]["positive"],
-                "neutral": date_sentiment[date]["neutral"],
-                "negative": date_sentiment[date]["negative"],
-            }
-            for date in sorted_dates
-        ]
+        return analytics.sentiment_trend(db, days)
     finally:
         db.close()
 
@@ -1902,57 +1987,22 @@ def get_sentiment_trend(days: int = Query(30, le=365)):
 # ============================================================================
 
 @app.get("/analytics/targets-overview")
+@cached('targets')
 def get_targets_overview():
     """Get overview of all targets"""
     db = SessionLocal()
     try:
-        users_total = db.query(TargetUser).count()
-        users_active = db.query(TargetUser).filter(TargetUser.is_active == True).count()
-
-        hashtags_total = db.query(TargetHashtag).count()
-        hashtags_active = db.query(TargetHashtag).filter(TargetHashtag.is_active == True).count()
-
-        places_total = db.query(TargetPlace).count()
-        places_active = db.query(TargetPlace).filter(TargetPlace.is_active == True).count()
-
-        return {
-            "users": {"total": users_total, "active": users_active},
-            "hashtags": {"total": hashtags_total, "active": hashtags_active},
-            "places": {"total": places_total, "active": places_active},
-        }
+        return analytics.targets_overview(db)
     finally:
         db.close()
 
 
 @app.get("/analytics/scraping-activity")
+@cached('content')
 def get_scraping_activity():
     """Get recent scraping activity"""
     db = SessionLocal()
     try:
-        # Get recent posts by collected_at
-        recent_posts = db.query(Post).order_by(desc(Post.collected_at)).limit(100).all()
-
-        # Group by date
-        activity = {}
-        for post in recent_posts:
-            if post.collected_at:
-                date_str = post.collected_at.strftime("%Y-%m-%d")
-                if date_str not in activity:
-                    activity[date_str] = {"posts": 0, "sources": set()}
-                activity[date_str]["posts"] += 1
-                if post.source:
-                    activity[date_str]["sources"].add(post.source)
-
-        # Sort by date descending
-        sorted_dates = sorted(activity.keys(), reverse=True)
-
-        return [
-            {
-                "date": date,
-                "posts_collected": activity[date]["posts"],
-                "sources": list(activity[date]["sources"]),
-            }
-            for date in sorted_dates[:14]  # Last 2 weeks
-        ]
+        return analytics.scraping_activity(db)
     finally:
         db.close()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Boolean
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, Float, String, Text, DateTime, ForeignKey, JSON, Boolean, Index, UniqueConstraint, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -30,11 +30,24 @@ class Post(Base):
     # Potential structure (I say potential because this is flexible, can be changed later):
     # {
     #   "sentiment": {"score": 0.8, "label": "positive"},
+    #   "comment_sentiment": {"label": "positive", "breakdown": {...}, "comment_count": 12},
     #   "summary": "User loves the service...",
     #   "topics": ["service", "experience"],
     #   "processed_at": "2025-12-15T10:00:00Z"
     # }
     
+    # Sentiment of the post's comments, kept up to date as comment sentiments are
+    # written (ai_tasks.update_post_counters); score_sum is the sum of expected-value scores
+    sentiment_positive = Column(Integer, nullable=False, default=0, server_default=text('0'))
+    sentiment_neutral = Column(Integer, nullable=False, default=0, server_default=text('0'))
+    sentiment_negative = Column(Integer, nullable=False, default=0, server_default=text('0'))
+    sentiment_score_sum = Column(Float, nullable=False, default=0.0, server_default=text('0'))
+    sentiment_aggregated_at = Column(DateTime, nullable=True)  # NULL until counters were rebuilt from stored results
+    
+    # Ingest pre-pass (app/services/ai/text_features.py), e.g.
+    # {"kind": "text", "script": "arabic", "lang": "ar", "emoji_count": 1, "length": 42}
+    text_features = Column(JSON, nullable=True)
+    
     # Relationships
     comments = relationship('Comment', back_populates='post', cascade='all, delete-orphan')
 
@@ -65,6 +78,13 @@ class Comment(Base):
     #   "processed_at": "2025-12-15T10:00:00Z"
     # }
     
+    # Ingest pre-pass, kind is 'emoji_only', 'mention_only', 'url_only' or 'empty' for content that skips the models
+    text_features = Column(JSON, nullable=True)
+    
+    # Near-duplicate cluster (comments.id of its representative, own id when unique) and spam flag
+    cluster_id = Column(Integer, nullable=True, index=True)
+    is_spam = Column(Boolean, default=False, server_default=text('false'))
+    
     # Relationships
     post = relationship('Post', back_populates='comments')
 
@@ -99,6 +119,22 @@ class WeeklyReport(Base):
         return f"<WeeklyReport(week={self.week_number}, year={self.year}, posts={self.post_count})>"
 
 
+class WeeklyTopic(Base):
+    __tablename__ = 'weekly_topics'
+    __table_args__ = (
+        UniqueConstraint('week_start_date', 'topic', name='uq_weekly_topics_week_topic'),
+    )
+    
+    # Rollup of ai_results["topics"], maintained as topics are written (app/topics.py)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    week_start_date = Column(DateTime, nullable=False, index=True)  # Sunday 00:00:00, same as weekly_reports
+    topic = Column(String, nullable=False, index=True)
+    post_count = Column(Integer, nullable=False, default=0, server_default=text('0'))
+    comment_count = Column(Integer, nullable=False, default=0, server_default=text('0'))
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class TargetUser(Base):
     __tablename__ = 'target_users'
     
@@ -194,3 +230,44 @@ class JobExecution(Base):
     
     result_summary = Column(JSON, nullable=True) # e.g. {posts_added: 5}
     error_message = Column(Text, nullable=True)
+
+
+class AITask(Base):
+    __tablename__ = 'ai_tasks'
+    __table_args__ = (
+        UniqueConstraint('entity_type', 'entity_id', 'task', name='uq_ai_tasks_entity_task'),
+        # Workers only ever look for pending work, so keep that index small
+        Index('ix_ai_tasks_pending', 'task', 'entity_type', 'id', postgresql_where=text("status = 'pending'")),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    entity_type = Column(String, nullable=False)  # 'post' or 'comment'
+    entity_id = Column(Integer, nullable=False)  # posts.id / comments.id
+    task = Column(String, nullable=False)  # e.g. 'sentiment'
+    status = Column(String, nullable=False, default='pending', index=True)  # pending, running, done, failed
+    attempts = Column(Integer, default=0)
+    model_version = Column(String, nullable=True)  # Model that produced the result
+    error_message = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class CommentLSHBucket(Base):
+    __tablename__ = 'comment_lsh_buckets'
+    
+    # MinHash band key -> near-duplicate cluster (app/near_duplicates.py)
+    bucket = Column(BigInteger, primary_key=True)
+    band = Column(SmallInteger, primary_key=True)
+    cluster_id = Column(Integer, nullable=False, index=True)  # comments.id of the cluster representative
+
+
+class SummaryCache(Base):
+    __tablename__ = 'summary_cache'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    content_hash = Column(String(64), unique=True, nullable=False, index=True)  # sha256 of model, lengths and input text
+    summary = Column(Text, nullable=False)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)  # LRU eviction order
@@ -0,0 +1,154 @@
+# type: ignore  # SQLAlchemy Column type annotations have known limitations with type checkers
+"""
+Near-duplicate comment clusters and spam flags
+
+Every comment gets a cluster_id at ingest: the comments.id of the first comment
+(the representative) whose MinHash signature is close enough to its own, or its
+own id when nothing similar was seen before. The LSH band keys of clustered
+comments live in comment_lsh_buckets, so assigning a new comment is one indexed
+lookup plus a few signature comparisons, independent of the table size.
+
+Sentiment runs once per cluster and is copied to the other members, so copy-
+pasted comments, reply chains of the same slogan and bot floods cost a single
+inference. Clusters that repeat the same non-trivial text under several posts
+are flagged is_spam, which summaries skip and analytics can exclude.
+"""
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from typing import Optional
+import logging
+from app.config import NEAR_DUPLICATE_CONFIG
+from app.models import Comment, CommentLSHBucket
+
+logger = logging.getLogger(__name__)
+
+_hasher = None
+
+
+def get_hasher():
+    global _hasher
+    if _hasher is None:
+        from app.services.ai.minhash import MinHasher
+        _hasher = MinHasher(
+            num_perm=NEAR_DUPLICATE_CONFIG['num_perm'],
+            bands=NEAR_DUPLICATE_CONFIG['bands'],
+            shingle_size=NEAR_DUPLICATE_CONFIG['shingle_size']
+        )
+    return _hasher
+
+
+def assign_clusters(db: Session, comment_ids: Optional[list[str]] = None, limit: Optional[int] = None) -> dict:
+    """
+    Cluster comments that have no cluster_id yet (caller commits)
+
+    Args:
+        comment_ids: Instagram comment_ids to cluster (default: any unclustered comment)
+        limit: Max comments per call, oldest first
+
+    Returns:
+        {'clustered', 'duplicates', 'spam_clusters'}
+    """
+    hasher = get_hasher()
+    threshold = NEAR_DUPLICATE_CONFIG['similarity_threshold']
+
+    query = db.query(Comment.id, Comment.comment_text).filter(Comment.cluster_id.is_(None))
+    if comment_ids is not None:
+        if not comment_ids:
+            return {'clustered': 0, 'duplicates': 0, 'spam_clusters': 0}
+        query = query.filter(Comment.comment_id.in_(comment_ids))
+    rows = query.order_by(Comment.id).limit(limit).all()
+    if not rows:
+        return {'clustered': 0, 'duplicates': 0, 'spam_clusters': 0}
+
+    signatures = {row.id: hasher.signature(row.comment_text) for row in rows}
+    keys = {cid: hasher.band_keys(sig) for cid, sig in signatures.items() if sig is not None}
+
+    # Buckets already in the index, then representatives' signatures for verification
+    all_keys = {key for band_keys in keys.values() for key in band_keys}
+    buckets = {}
+    if all_keys:
+        for bucket in db.query(CommentLSHBucket).filter(CommentLSHBucket.bucket.in_(list(all_keys))).all():
+            buckets[(bucket.band, bucket.bucket)] = bucket.cluster_id
+    missing = set(buckets.values()) - set(signatures)
+    if missing:
+        for rep in db.query(Comment.id, Comment.comment_text).filter(Comment.id.in_(list(missing))).all():
+            signatures[rep.id] = hasher.signature(rep.comment_text)
+
+    assigned, new_buckets, duplicates = {}, {}, 0
+    for row in rows:
+        signature = signatures[row.id]
+        if signature is None:
+            assigned[row.id] = row.id  # Nothing to compare, a cluster of its own
+            continue
+
+        band_keys = list(enumerate(keys[row.id]))
+        candidates = {buckets[k] for k in band_keys if k in buckets}
+        best, best_similarity = None, threshold
+        for candidate in candidates:
+            if signatures.get(candidate) is None:
+                continue
+            similarity = hasher.similarity(signature, signatures[candidate])
+            if similarity >= best_similarity:
+                best, best_similarity = candidate, similarity
+
+        cluster_id = best if best is not None else row.id
+        if best is not None:
+            duplicates += 1
+        assigned[row.id] = cluster_id
+        # Members register their bands too, so later comments match any of them
+        for band_key in band_keys:
+            if band_key not in buckets:
+                buckets[band_key] = new_buckets[band_key] = cluster_id
+
+    if new_buckets:
+        stmt = insert(CommentLSHBucket.__table__).values([
+            {'band': band, 'bucket': bucket, 'cluster_id': cluster_id}
+            for (band, bucket), cluster_id in new_buckets.items()
+        ]).on_conflict_do_nothing(index_elements=['bucket', 'band'])
+        db.execute(stmt)
+
+    comments = Comment.__table__
+    db.execute(
+        update(comments).where(comments.c.id == bindparam('b_id')).values(cluster_id=bindparam('b_cluster_id')),
+        [{'b_id': cid, 'b_cluster_id': cluster_id} for cid, cluster_id in assigned.items()]
+    )
+
+    spam_clusters = flag_spam(db, {c for cid, c in assigned.items() if c != cid})
+    return {'clustered': len(assigned), 'duplicates': duplicates, 'spam_clusters': spam_clusters}
+
+
+def flag_spam(db: Session, cluster_ids: set) -> int:
+    """
+    Flag clusters that repeat the same text under several posts (caller commits)
+
+    Only clusters that just grew need checking. Short texts are exempt:
+    "thanks" under many posts is a reaction, not spam.
+
+    Returns:
+        Number of clusters flagged
+    """
+    if not cluster_ids:
+        return 0
+    from app.services.ai.minhash import normalize_for_dedup
+
+    candidates = db.query(Comment.cluster_id)\
+        .filter(Comment.cluster_id.in_(list(cluster_ids)))\
+        .group_by(Comment.cluster_id)\
+        .having(func.count() >= NEAR_DUPLICATE_CONFIG['spam_min_cluster_size'])\
+        .having(func.count(Comment.post_id.distinct()) >= NEAR_DUPLICATE_CONFIG['spam_min_posts'])\
+        .all()
+    candidates = [c.cluster_id for c in candidates]
+    if not candidates:
+        return 0
+
+    spam = [
+        rep.id for rep in db.query(Comment.id, Comment.comment_text).filter(Comment.id.in_(candidates)).all()
+        if len(normalize_for_dedup(rep.comment_text)) >= NEAR_DUPLICATE_CONFIG['spam_min_length']
+    ]
+    if spam:
+        db.query(Comment)\
+            .filter(Comment.cluster_id.in_(spam), Comment.is_spam.isnot(True))\
+            .update({'is_spam': True}, synchronize_session=False)
+        logger.info(f"Flagged {len(spam)} near-duplicate comment clusters as spam")
+    return len(spam)
@@ -2,15 +2,22 @@
 from app.scraper import InstagramScraper
 from app.database import SessionLocal
 from app.models import Post, Comment, WeeklyReport, TargetUser, TargetHashtag, TargetPlace
-from typing import Optional, List, Dict
+from app import ai_tasks
+from app.cache import analytics_cache
+from typing import Callable, Iterator, Optional, List, Dict
+from sqlalchemy import func, select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.dialects.postgresql import insert
 from datetime import datetime, timedelta
+from functools import lru_cache
 import logging
-import pandas as pd
+import threading
+import time
 
 logger = logging.getLogger("Orchestrator")
 
+WARMUP_TEXT = "الخدمة كانت ممتازة والرحلة مريحة، شكراً لكم على حسن التعامل"
+
 
 class ScrapingOrchestrator:
     def __init__(self):
@@ -18,40 +25,373 @@ class ScrapingOrchestrator:
         # Lazy loading for AI services
         self._summarization_service = None
         self._sentiment_service = None
+        self._extractive_summarizer = None
+        self._topic_extractor = None
+        self._embedding_service = None
+        self._vector_index = None
+        self._embedding_lock = threading.Lock()
+        self._load_locks = {'sentiment': threading.Lock(), 'summarization': threading.Lock()}
+        self.model_status = {
+            name: {'state': 'not_loaded', 'load_seconds': None, 'warmup_seconds': None, 'error': None}
+            for name in self._load_locks
+        }
+    
+    def _load_service(self, name: str):
+        """
+        Create the sentiment or summarization service, tracking its state in model_status
+        
+        When INFERENCE_WORKER_URL is set, the models live in the inference worker
+        and thin HTTP clients are returned instead of loading them here
+        """
+        from app.config import INFERENCE_WORKER_URL
+        
+        status = self.model_status[name]
+        status.update(state='loading', error=None)
+        started = time.perf_counter()
+        
+        try:
+            if INFERENCE_WORKER_URL:
+                from app.services.ai.client import RemoteSentimentService, RemoteSummarizationService
+                service = RemoteSentimentService() if name == 'sentiment' else RemoteSummarizationService()
+            else:
+                from app.services.ai import SentimentService, SummarizationService
+                service = SentimentService() if name == 'sentiment' else SummarizationService()
+        except Exception as e:
+            status.update(state='failed', error=str(e))
+            raise
+        
+        status.update(state='loaded', load_seconds=round(time.perf_counter() - started, 2))
+        return service
     
     @property
     def summarization_service(self):
         if self._summarization_service is None:
-            from app.services.ai import SummarizationService
-            self._summarization_service = SummarizationService()
+            with self._load_locks['summarization']:
+                if self._summarization_service is None:
+                    self._summarization_service = self._load_service('summarization')
         return self._summarization_service
     
     @property
     def sentiment_service(self):
         if self._sentiment_service is None:
-            from app.services.ai import SentimentService
-            self._sentiment_service = SentimentService()
+            with self._load_locks['sentiment']:
+                if self._sentiment_service is None:
+                    self._sentiment_service = self._load_service('sentiment')
         return self._sentiment_service
     
-    def scrape_hashtags(self, hashtags: list[str], limit: int = 10) -> dict:
+    def load_models(self) -> dict:
+        """
+        Load both models without running them
+        
+        Used by the gunicorn preload (gunicorn.conf.py): the master loads the
+        weights once and the forked workers share them copy-on-write. No
+        inference runs here so torch's thread pools start in the workers.
+        """
+        for name in self.model_status:
+            try:
+                getattr(self, f'{name}_service')
+            except Exception as e:
+                logger.error(f"Failed to load {name} model: {e}")
+        return self.get_model_status()
+    
+    def warm_up_models(self) -> dict:
+        """
+        Load both models and run one dummy inference each
+        
+        Meant to run in a background thread at startup (AI_WARMUP_ON_STARTUP).
+        Failures are recorded in model_status instead of raised.
+        """
+        warmups = {
+            'sentiment': lambda: self.sentiment_service.analyze(WARMUP_TEXT),
+            'summarization': lambda: self.summarization_service.summarize(WARMUP_TEXT, max_length=30, min_length=5)
+        }
+        
+        for name, run in warmups.items():
+            status = self.model_status[name]
+            try:
+                started = time.perf_counter()
+                run()
+                status.update(state='ready', warmup_seconds=round(time.perf_counter() - started, 2))
+                logger.info(f"Warm-up done for {name} model (load {status['load_seconds']}s, first inference {status['warmup_seconds']}s)")
+            except Exception as e:
+                status.update(state='failed', error=str(e))
+                logger.error(f"Warm-up failed for {name} model: {e}")
+        
+        return self.get_model_status()
+    
+    def get_model_status(self) -> dict:
+        """Per-model state (not_loaded, loading, loaded, ready, failed) without triggering a load"""
+        from app.config import INFERENCE_WORKER_URL
+        
+        result = {
+            'source': 'inference_worker' if INFERENCE_WORKER_URL else 'in_process',
+            'ready': all(s['state'] in ('loaded', 'ready') for s in self.model_status.values()),
+            'models': {name: dict(status) for name, status in self.model_status.items()}
+        }
+        
+        if INFERENCE_WORKER_URL:
+            from app.services.ai.client import InferenceClient
+            try:
+                result['inference_worker'] = InferenceClient().health()
+            except Exception as e:
+                result['inference_worker'] = {'status': 'unreachable', 'error': str(e)}
+        
+        return result
+    
+    def autotune_models(self, models: Optional[list[str]] = None, sample_size: int = 256, force: bool = True) -> dict:
+        """
+        Tune inference batch size / threads on a random sample of stored texts
+        
+        Args:
+            models: 'sentiment' and/or 'summarization' (default both)
+            sample_size: Number of stored texts to probe with
+            force: Re-tune even if a saved profile exists for this host
+            
+        Returns:
+            Autotune status per model
+        """
+        models = models or ['sentiment', 'summarization']
+        db = SessionLocal()
+        try:
+            # Sentiment runs on comments, summarization mostly on captions and comment digests
+            comments = [r[0] for r in db.query(Comment.comment_text)
+                        .filter(Comment.comment_text.isnot(None), Comment.comment_text != '')
+                        .order_by(func.random()).limit(sample_size).all()]
+            captions = [r[0] for r in db.query(Post.caption)
+                        .filter(Post.caption.isnot(None), func.length(Post.caption) > 100)
+                        .order_by(func.random()).limit(sample_size // 4).all()]
+        finally:
+            db.close()
+        
+        results = {}
+        for name in models:
+            service = getattr(self, f'{name}_service')
+            status = service.autotune_status()
+            if not force and status.get('profile', {}).get('source') == 'autotune':
+                results[name] = status
+                continue
+            texts = comments if name == 'sentiment' else captions + comments[:sample_size // 4]
+            try:
+                results[name] = service.autotune(texts)
+            except ValueError as e:
+                results[name] = {'error': str(e)}
+        return results
+    
+    def get_autotune_status(self) -> dict:
+        """Tuned profiles of the models that are loaded (doesn't load them)"""
+        return {
+            'sentiment': self._sentiment_service.autotune_status() if self._sentiment_service else None,
+            'summarization': self._summarization_service.autotune_status() if self._summarization_service else None
+        }
+    
+    def sentiment_job_batch_size(self) -> int:
+        """Items a sentiment job claims per run when the caller doesn't say: a few tuned forward passes"""
+        from app.config import AUTOTUNE_CONFIG
+        try:
+            batch_size = self.sentiment_service.autotune_status()['profile']['batch_size']
+        except Exception:
+            batch_size = AUTOTUNE_CONFIG['sentiment']['default_batch_size']
+        return max(16, min(1000, batch_size * 4))
+    
+    @property
+    def extractive_summarizer(self):
+        """Model-free summarizer, always runs in-process"""
+        if self._extractive_summarizer is None:
+            from app.services.ai.extractive_service import ExtractiveSummarizer
+            self._extractive_summarizer = ExtractiveSummarizer()
+        return self._extractive_summarizer
+    
+    @property
+    def topic_extractor(self):
+        """Model-free keyword/topic extractor, always runs in-process"""
+        if self._topic_extractor is None:
+            from app.config import TOPIC_CONFIG
+            from app.services.ai.topic_service import TopicExtractor
+            self._topic_extractor = TopicExtractor(
+                max_topics=TOPIC_CONFIG["max_topics"],
+                min_score=TOPIC_CONFIG["min_score"],
+                max_df_ratio=TOPIC_CONFIG["max_df_ratio"],
+                phrase_boost=TOPIC_CONFIG["phrase_boost"]
+            )
+        return self._topic_extractor
+    
+    @property
+    def embedding_service(self):
+        """Sentence embedding model (in the inference worker when one is configured), loaded on first use"""
+        if self._embedding_service is None:
+            with self._embedding_lock:
+                if self._embedding_service is None:
+                    from app.config import INFERENCE_WORKER_URL, EMBEDDING_MODEL, EMBEDDING_CONFIG
+                    if INFERENCE_WORKER_URL:
+                        from app.services.ai.client import RemoteEmbeddingService
+                        self._embedding_service = RemoteEmbeddingService()
+                    else:
+                        from app.services.ai.embedding_service import EmbeddingService
+                        self._embedding_service = EmbeddingService(
+                            EMBEDDING_MODEL,
+                            batch_size=EMBEDDING_CONFIG["batch_size"],
+                            max_length=EMBEDDING_CONFIG["max_length"]
+                        )
+        return self._embedding_service
+    
+    @property
+    def vector_index(self):
+        """On-disk embedding index for semantic search"""
+        if self._vector_index is None:
+            with self._embedding_lock:
+                if self._vector_index is None:
+                    from app.config import EMBEDDING_MODEL, EMBEDDING_INDEX_DIR, EMBEDDING_CONFIG
+                    from app.services.ai.vector_index import VectorIndex
+                    self._vector_index = VectorIndex(
+                        EMBEDDING_INDEX_DIR,
+                        EMBEDDING_CONFIG["dimension"],
+                        EMBEDDING_MODEL,
+                        use_hnsw=EMBEDDING_CONFIG["use_hnsw"],
+                        hnsw_m=EMBEDDING_CONFIG["hnsw_m"],
+                        ef_construction=EMBEDDING_CONFIG["hnsw_ef_construction"],
+                        ef_search=EMBEDDING_CONFIG["hnsw_ef_search"],
+                        graph_rebuild_rows=EMBEDDING_CONFIG["hnsw_rebuild_rows"],
+                        graph_rebuild_seconds=EMBEDDING_CONFIG["hnsw_rebuild_seconds"]
+                    )
+        return self._vector_index
+    
+    def _batch_sentiment(self, texts: list[str], features: list[dict]) -> list:
+        """
+        Sentiment for texts, routed by their pre-pass features
+        
+        Emoji/mention/URL-only and empty content is answered by rules
+        (text_features.rule_sentiment). Only real text reaches the model, which
+        isn't even loaded when a whole batch is trivial.
+        """
+        return self._cluster_sentiment(None, [], texts, features)
+    
+    def _cluster_sentiment(
+        self,
+        db,
+        ids: list[int],
+        texts: list[str],
+        features: list[dict],
+        cluster_ids: Optional[list[Optional[int]]] = None
+    ) -> list:
+        """
+        Comment sentiment with one inference per near-duplicate cluster
+        
+        Comments whose cluster representative already has a stored result reuse
+        it. Of the rest, only the first comment of each cluster goes through
+        rules or the model and its result is copied to the other members.
+        Without cluster_ids (posts, unclustered rows) this is _batch_sentiment.
+        """
+        results, pending, copies = self._plan_sentiment(db, ids, texts, features, cluster_ids)
+        model_results = self.sentiment_service.batch_analyze([texts[i] for i in pending]) if pending else []
+        return self._finish_sentiment(results, pending, copies, model_results)
+    
+    def _plan_sentiment(
+        self,
+        db,
+        ids: list[int],
+        texts: list[str],
+        features: list[dict],
+        cluster_ids: Optional[list[Optional[int]]] = None
+    ) -> tuple:
+        """
+        Everything _cluster_sentiment does before the model runs
+        
+        Returns:
+            (results with None where the model is needed, indices of the texts
+            the model has to see, {index: index whose result it copies})
+        """
+        from app.services.ai.sentiment_service import SentimentResult
+        from app.services.ai.text_features import rule_sentiment
+        
+        results = [None] * len(texts)
+        copies = {}
+        if cluster_ids is not None:
+            # Representatives outside this batch that were already analyzed
+            outside = {c for c in cluster_ids if c is not None} - set(ids)
+            stored = {}
+            if outside:
+                stored = {
+                    r.id: SentimentResult.from_dict(r.ai_results['sentiment'])
+                    for r in db.query(Comment.id, Comment.ai_results)
+                        .filter(Comment.id.in_(list(outside)), ai_tasks.has_sentiment(Comment))
+                        .all()
+                }
+            
+            analyzed_for = {}  # cluster_id -> index analyzed on its behalf
+            for i, cluster_id in enumerate(cluster_ids):
+                if cluster_id is None:
+                    continue
+                if cluster_id in stored:
+                    results[i] = stored[cluster_id]
+                elif cluster_id in analyzed_for:
+                    copies[i] = analyzed_for[cluster_id]
+                else:
+                    analyzed_for[cluster_id] = i
+            
+            reused = len(copies) + sum(1 for r in results if r is not None)
+            if reused:
+                logger.info(f"Near-duplicate fan-out: {reused} of {len(texts)} comments reuse a cluster result")
+        
+        for i, (text, text_features) in enumerate(zip(texts, features)):
+            if results[i] is None and i not in copies:
+                results[i] = rule_sentiment(text, text_features)
+        pending = [i for i, r in enumerate(results) if r is None and i not in copies]
+        return results, pending, copies
+    
+    @staticmethod
+    def _finish_sentiment(results: list, pending: list[int], copies: dict, model_results: list) -> list:
+        """Fill a _plan_sentiment plan with the model's results for its pending texts"""
+        for i, result in zip(pending, model_results):
+            results[i] = result
+        for i, source in copies.items():
+            results[i] = results[source]
+        return results
+    
+    def get_ai_metrics(self) -> dict:
+        """
+        Micro-batching metrics for the AI services
+        
+        Reads them from the inference worker when one is configured, otherwise
+        from the in-process services (without loading models that aren't loaded yet)
+        """
+        from app.config import INFERENCE_WORKER_URL
+        if INFERENCE_WORKER_URL:
+            from app.services.ai.client import InferenceClient
+            return {'source': 'inference_worker', **InferenceClient().get('/metrics', timeout=5)}
+        
+        return {
+            'source': 'in_process',
+            'sentiment': self._sentiment_service.metrics() if self._sentiment_service else None,
+            'summarization': self._summarization_service.metrics() if self._summarization_service else None
+        }
+    
+    def scrape_hashtags(self, hashtags: list[str], limit: int = 10, progress: Optional[Callable] = None) -> dict:
         """
         Scrape posts for hashtags and store in database
         
         Args:
             hashtags: List of hashtag strings
             limit: Max posts per hashtag
+            progress: Called as progress(stage, **details) when a stage starts (app/jobs.py)
             
         Returns:
             Summary dict with counts
         """
+        import pandas as pd
+        from app.services.ai.text_features import tag_records
+        
         db = SessionLocal()
         
         try:
             logger.info(f"Starting hashtag scrape: {hashtags}")
+            if progress:
+                progress('scrape_hashtag_posts', hashtags=len(hashtags))
             posts_data = self.scraper.scrape_hashtag_posts(hashtags, limit)
             
             if not posts_data:
                 return {'success': True, 'posts_added': 0, 'posts_skipped': 0, 'hashtags': hashtags}
+            if progress:
+                progress('store_posts', scraped=len(posts_data))
             
             df = pd.DataFrame(posts_data)
             df['post_id'] = df['id'].fillna(df['shortCode'])
@@ -94,14 +434,17 @@ class ScrapingOrchestrator:
                 # Use PostgreSQL's ON CONFLICT for efficient duplicate handling
                 records = new_df[['post_id', 'shortcode', 'post_url', 'owner_username', 'owner_id', 
                                   'caption', 'post_type', 'likes_count', 'comments_count', 'timestamp', 'source']].to_dict('records')
+                tag_records(records, 'caption')  # Script/language and trivial-content flags for AI routing
                 
                 stmt = insert(Post.__table__).values(records)
                 stmt = stmt.on_conflict_do_nothing(index_elements=['post_id'])
                 result = db.execute(stmt)
                 actual_inserted = result.rowcount  # type: ignore
                 logger.info(f"Batch inserted {actual_inserted} posts ({len(new_df) - actual_inserted} duplicates from race condition)")
+                ai_tasks.enqueue_posts(db, new_df['post_id'].tolist())
             
             db.commit()
+            analytics_cache.bump('content')
             logger.info(f"Hashtag scrape complete: {len(new_df)} added, {posts_skipped} skipped")
             
             return {
@@ -118,17 +461,27 @@ class ScrapingOrchestrator:
         finally:
             db.close()
     
-    def scrape_comments_for_posts(self, limit_posts: int = 10, limit_comments: int = 10) -> dict:
+    def scrape_comments_for_posts(
+        self,
+        limit_posts: int = 10,
+        limit_comments: int = 10,
+        progress: Optional[Callable] = None
+    ) -> dict:
         """
         Scrape comments for recent posts that don't have comments yet
         
         Args:
             limit_posts: Max posts to scrape comments for
             limit_comments: Max comments per post
+            progress: Called as progress(stage, **details) when a stage starts (app/jobs.py)
             
         Returns:
             Summary dict
         """
+        import pandas as pd
+        from app.services.ai.text_features import tag_records
+        from app.near_duplicates import assign_clusters
+        
         db = SessionLocal()
         
         try:
@@ -146,10 +499,14 @@ class ScrapingOrchestrator:
                 return {'success': True, 'comments_added': 0, 'posts_processed': 0}
             
             post_urls: list[str] = [str(p.post_url) for p in posts_without_comments]
+            if progress:
+                progress('scrape_comments', posts=len(post_urls))
             comments_data = self.scraper.scrape_post_comments(post_urls, limit_comments)
             
             if not comments_data:
                 return {'success': True, 'comments_added': 0, 'posts_processed': len(posts_without_comments)}
+            if progress:
+                progress('store_comments', scraped=len(comments_data))
             
             df = pd.DataFrame(comments_data)
             
@@ -211,14 +568,24 @@ class ScrapingOrchestrator:
                 # Use PostgreSQL's ON CONFLICT for efficient duplicate handling
                 records = new_df[['comment_id', 'post_id', 'comment_text', 'owner_username', 
                                   'owner_id', 'likes_count', 'timestamp']].to_dict('records')
+                tag_records(records, 'comment_text')
                 
                 stmt = insert(Comment.__table__).values(records)
                 stmt = stmt.on_conflict_do_nothing(index_elements=['comment_id'])
                 result = db.execute(stmt)
                 actual_inserted = result.rowcount
                 logger.info(f"Batch inserted {actual_inserted} comments ({len(new_df) - actual_inserted} duplicates from race condition)")
+                ai_tasks.enqueue_comments(db, new_df['comment_id'].tolist())
+                try:
+                    with db.begin_nested():  # A failure here must not lose the inserted comments
+                        clusters = assign_clusters(db, new_df['comment_id'].tolist())
+                    logger.info(f"Clustered {clusters['clustered']} new comments ({clusters['duplicates']} near-duplicates)")
+                except Exception as e:
+                    # Comments stay unclustered, the cluster_comments job picks them up
+                    logger.error(f"Failed to cluster new comments: {e}")
             
             db.commit()
+            analytics_cache.bump('content')
             logger.info(f"Comment scrape complete: {len(new_df)} added, {comments_skipped} skipped")
             
             return {
@@ -241,7 +608,8 @@ class ScrapingOrchestrator:
         limit_users: int = 20,
         limit_hashtags: int = 10,
         limit_places: int = 5,
-        max_hashtags_for_stats: int = 10
+        max_hashtags_for_stats: int = 10,
+        progress: Optional[Callable] = None
     ) -> dict:
         """
         Complete discovery pipeline:
@@ -255,6 +623,7 @@ class ScrapingOrchestrator:
             limit_hashtags: Max hashtags to discover
             limit_places: Max places to discover
             max_hashtags_for_stats: Max hashtags to get stats for (default: 10)
+            progress: Called as progress(stage, **details) when a stage starts (app/jobs.py)
             
         Returns:
             Summary of discovered targets
@@ -264,6 +633,8 @@ class ScrapingOrchestrator:
         try:
             # Step 1: Search Instagram for all types
             logger.info("Step 1: Searching Instagram...")
+            if progress:
+                progress('search')
             
             # Search for users
             user_results = self.scraper.search_instagram(
@@ -295,6 +666,8 @@ class ScrapingOrchestrator:
             related_hashtags = []
             if discovered_hashtags:
                 logger.info("Step 2: Getting hashtag statistics...")
+                if progress:
+                    progress('hashtag_stats', hashtags=min(len(discovered_hashtags), max_hashtags_for_stats))
                 # Limit to max_hashtags_for_stats to control API costs
                 hashtags_to_analyze: list[str] = [h for h in discovered_hashtags[:max_hashtags_for_stats] if h]
                 hashtag_stats = self.scraper.get_hashtag_stats(hashtags_to_analyze)
@@ -342,7 +715,8 @@ class ScrapingOrchestrator:
         max_hashtags_to_scrape: int = 5,
         limit_posts_per_target: int = 10,
         max_posts_for_comments: Optional[int] = 20,
-        limit_comments: int = 10
+        limit_comments: int = 10,
+        progress: Optional[Callable] = None
     ) -> dict:
         """
         End-to-end scraping pipeline:
@@ -360,10 +734,14 @@ class ScrapingOrchestrator:
             limit_posts_per_target: Max posts per hashtag/user
             max_posts_for_comments: Max posts to scrape comments for (None = all posts needing comments)
             limit_comments: Max comments per post
+            progress: Called as progress(stage, **details) when a stage starts (app/jobs.py)
             
         Returns:
             Complete pipeline summary
         """
+        import pandas as pd
+        from app.services.ai.text_features import tag_records
+        
         db = SessionLocal()
         
         try:
@@ -374,7 +752,8 @@ class ScrapingOrchestrator:
                 search_term, 
                 limit_users=limit_discovery_users,
                 limit_hashtags=limit_discovery_hashtags,
-                limit_places=limit_discovery_places
+                limit_places=limit_discovery_places,
+                progress=progress
             )
             
             discovered_hashtags = discovery['discovered']['hashtags']
@@ -389,6 +768,8 @@ class ScrapingOrchestrator:
             
             if discovered_hashtags:
                 logger.info(f"Collecting posts from {min(len(discovered_hashtags), max_hashtags_to_scrape)} of {len(discovered_hashtags)} discovered hashtags...")
+                if progress:
+                    progress('scrape_hashtag_posts', hashtags=min(len(discovered_hashtags), max_hashtags_to_scrape))
                 hashtag_posts = self.scraper.scrape_hashtag_posts(
                     discovered_hashtags[:max_hashtags_to_scrape], 
                     limit_posts_per_target
@@ -399,6 +780,8 @@ class ScrapingOrchestrator:
             
             if discovered_accounts:
                 logger.info(f"Collecting posts from {min(len(discovered_accounts), max_users_to_scrape)} of {len(discovered_accounts)} discovered users...")
+                if progress:
+                    progress('scrape_user_posts', users=min(len(discovered_accounts), max_users_to_scrape))
                 user_profiles = self.scraper.scrape_user_posts(discovered_accounts[:max_users_to_scrape])
                 
                 # Extract posts from profile data (scraper returns profiles with nested latestPosts)
@@ -409,12 +792,16 @@ class ScrapingOrchestrator:
                             all_posts_data.append(post)
             
             logger.info(f"Collecting posts where {search_term} is mentioned...")
+            if progress:
+                progress('scrape_mentions')
             mention_posts = self.scraper.scrape_mentions([search_term], limit_posts_per_target)
             for post in mention_posts:
                 post['source'] = 'mentions'
                 all_posts_data.append(post)
             
             if all_posts_data:
+                if progress:
+                    progress('store_posts', scraped=len(all_posts_data))
                 df = pd.DataFrame(all_posts_data)
                 df['post_id'] = df['id'].fillna(df['shortCode'])
                 
@@ -454,15 +841,18 @@ class ScrapingOrchestrator:
                         # Use PostgreSQL's ON CONFLICT for efficient duplicate handling
                         records = new_df[['post_id', 'shortcode', 'post_url', 'owner_username', 'owner_id',
                                           'caption', 'post_type', 'likes_count', 'comments_count', 'timestamp', 'source']].to_dict('records')
+                        tag_records(records, 'caption')
                         
                         stmt = insert(Post.__table__).values(records)
                         stmt = stmt.on_conflict_do_nothing(index_elements=['post_id'])
                         result = db.execute(stmt)
                         posts_added = result.rowcount
                         logger.info(f"Batch inserted {posts_added} posts ({len(new_df) - posts_added} duplicates from race condition)")
+                        ai_tasks.enqueue_posts(db, new_df['post_id'].tolist())
                     
                     posts_added = len(new_df)
                     db.commit()
+                    analytics_cache.bump('content')
                     logger.info(f"Added {posts_added} posts total, {posts_skipped} skipped")
             
             # Phase 3: Collect Comments
@@ -481,7 +871,8 @@ class ScrapingOrchestrator:
             
             comment_result = self.scrape_comments_for_posts(
                 limit_posts=posts_to_scrape,
-                limit_comments=limit_comments
+                limit_comments=limit_comments,
+                progress=progress
             )
             
             # Final Summary
@@ -594,6 +985,7 @@ class ScrapingOrchestrator:
                         added_places += 1
             
             db.commit()
+            analytics_cache.bump('targets')
             
             logger.info(f"Saved targets: {added_hashtags} hashtags, {added_users} users, {added_places} places")
             
@@ -719,6 +1111,7 @@ class ScrapingOrchestrator:
                 target.tags = tags  # type: ignore
             
             db.commit()
+            analytics_cache.bump('targets')
             db.refresh(target) # this makes sure that the target object has the latest data from DB before returning
             
             logger.info(f"Updated {target_type} '{identifier}'")
@@ -800,6 +1193,7 @@ class ScrapingOrchestrator:
             
             db.delete(target)
             db.commit()
+            analytics_cache.bump('targets')
             
             logger.info(f"Deleted {target_type} '{identifier}'")
             
@@ -919,6 +1313,9 @@ class ScrapingOrchestrator:
         Returns:
             Pipeline summary with statistics
         """
+        import pandas as pd
+        from app.services.ai.text_features import tag_records
+        
         db = SessionLocal()
         
         try:
@@ -1007,9 +1404,12 @@ class ScrapingOrchestrator:
                         records = new_df[['post_id', 'shortcode', 'post_url', 'owner_username', 
                                         'owner_id', 'caption', 'post_type', 'likes_count', 
                                         'comments_count', 'timestamp', 'source']].to_dict('records')
+                        tag_records(records, 'caption')
                         
                         db.bulk_insert_mappings(Post, records)
+                        ai_tasks.enqueue_posts(db, new_df['post_id'].tolist())
                         db.commit()
+                        analytics_cache.bump('content')
                         posts_added = len(records)
                         logger.info(f"Inserted {posts_added} new posts from targets")
             
@@ -1237,6 +1637,7 @@ class ScrapingOrchestrator:
                     logger.debug(f"[DRY RUN] Would scrape new comments for post {post.post_id}")
             
             db.commit()
+            analytics_cache.bump('content')
             
             return {
                 'success': True,
@@ -1263,18 +1664,31 @@ class ScrapingOrchestrator:
     def summarize_post_comments(
         self, 
         post_id: int,
-        prioritize_engagement: bool = True
+        prioritize_engagement: bool = True,
+        mode: str = 'abstractive'
     ) -> dict:
         """
         Summarize all comments under a post
         
+        Works from a bounded pool of the most liked comments; near-identical
+        comments are merged and the abstractive input is filled up to the
+        model's token budget (comment_selector.py), so cost doesn't grow with
+        the post's comment count. Emoji/mention/URL-only comments are left out. The abstractive model only
+        reads Arabic, so other comments are left out of its input, and a post
+        without Arabic comments gets an extractive summary instead.
+        
         Args:
             post_id: Database ID of the post
             prioritize_engagement: If True, weight high-engagement comments more
+            mode: 'abstractive' (model-generated) or 'extractive' (most representative comments, no model)
             
         Returns:
-            Summary result with metadata
+            Summary result with metadata ('mode' is the tier that actually ran)
         """
+        from app.config import SUMMARY_CONFIG, SUMMARIZATION_MODEL
+        from app.services.ai.comment_selector import CommentBudgetSelector
+        from app.services.ai.text_features import ensure_features, is_trivial
+        
         db = SessionLocal()
         
         try:
@@ -1282,50 +1696,113 @@ class ScrapingOrchestrator:
             if not post:
                 raise ValueError(f"Post {post_id} not found")
             
-            comments = db.query(Comment).filter(Comment.post_id == post_id).all()
+            total_comments = db.query(func.count(Comment.id)).filter(Comment.post_id == post_id).scalar()
             
-            if not comments:
+            if not total_comments:
                 return {
                     'success': True,
                     'summary': 'No comments to summarize',
                     'comment_count': 0
                 }
             
-            if prioritize_engagement:
-                # Sort by likes, take top comments
-                sorted_comments = sorted(comments, key=lambda c: c.likes_count, reverse=True)
-                # Take top 50% or at least 10 comments
-                top_count = max(len(comments) // 2, min(10, len(comments)))
-                selected_comments = sorted_comments[:top_count]
-            else:
-                selected_comments = comments
+            # Bounded candidate pool, whatever the post's comment volume:
+            # most liked (or most recent) comments with content
+            order = (Comment.likes_count.desc(), Comment.id.asc()) if prioritize_engagement else (Comment.id.desc(),)
+            candidates = db.query(Comment.id, Comment.comment_text, Comment.likes_count, Comment.text_features)\
+                .filter(
+                    Comment.post_id == post_id, Comment.comment_text != '',
+                    ~ai_tasks.is_trivial_text(Comment), Comment.is_spam.isnot(True)
+                )\
+                .order_by(*order)\
+                .limit(SUMMARY_CONFIG["comment_pool_size"])\
+                .all()
+            
+            features = ensure_features([c.comment_text for c in candidates], [c.text_features for c in candidates])
+            tagged = [(c, f) for c, f in zip(candidates, features) if not is_trivial(f)]
+            if mode == 'abstractive':
+                model_input = [(c, f) for c, f in tagged if f['script'] in SUMMARY_CONFIG["model_scripts"]]
+                if model_input:
+                    tagged = model_input
+                else:
+                    mode = 'extractive'
             
-            combined_text = "\n".join([
-                f"تعليق: {c.comment_text}" for c in selected_comments
-            ])
+            if not tagged:
+                return {
+                    'success': True,
+                    'summary': 'No comments to summarize',
+                    'comment_count': 0,
+                    'total_comments': total_comments
+                }
             
-            summary = self.summarization_service.summarize(combined_text, max_length=200)
+            selected_comments = [c for c, _ in tagged]
+            features = [f for _, f in tagged]
+            texts = [c.comment_text for c in selected_comments]
+            likes = [c.likes_count for c in selected_comments] if prioritize_engagement else None
+            
+            if mode == 'extractive':
+                kept, kept_likes = CommentBudgetSelector.dedupe(texts, likes)
+                indices = self.extractive_summarizer.select(
+                    [texts[i] for i in kept],
+                    SUMMARY_CONFIG["extractive_max_items"],
+                    kept_likes if likes is not None else None
+                )
+                selected_comments = [selected_comments[kept[i]] for i in indices]
+                summary = "\n".join(c.comment_text for c in selected_comments)
+            else:
+                # Fill the model's input budget exactly instead of letting the tokenizer truncate
+                lines = [f"تعليق: {text}" for text in texts]
+                selector = CommentBudgetSelector(
+                    self.summarization_service.count_tokens,
+                    self.extractive_summarizer,
+                    token_budget=SUMMARY_CONFIG["comment_token_budget"]
+                )
+                selection = selector.select(
+                    lines,
+                    likes,
+                    token_counts=[(f.get('token_counts') or {}).get(SUMMARIZATION_MODEL) for f in features]
+                )
+                
+                # Cache the new token counts (of the prefixed line, per model) in text_features
+                if selection['counted']:
+                    db.bulk_update_mappings(Comment, [
+                        {
+                            'id': selected_comments[i].id,
+                            'text_features': {
+                                **features[i],
+                                'token_counts': {**(features[i].get('token_counts') or {}), SUMMARIZATION_MODEL: count}
+                            }
+                        }
+                        for i, count in selection['counted'].items()
+                    ])
+                
+                selected_comments = [selected_comments[i] for i in selection['indices']]
+                combined_text = "\n".join(lines[i] for i in selection['indices'])
+                summary = self.summarization_service.summarize(combined_text, max_length=200)
+                logger.info(
+                    f"Post {post_id}: {len(selected_comments)} comments in {selection['tokens']} tokens "
+                    f"({selection['duplicates']} near-duplicates dropped, {len(selection['counted'])} newly tokenized)"
+                )
             
             # Storing in DB
-            if post.ai_results is None:
-                post.ai_results = {}
-            
-            post.ai_results['comment_summary'] = {
+            ai_tasks.merge_results(db, 'post', 'comment_summary', {post.id: {
                 'summary': summary,
+                'mode': mode,
                 'comment_count': len(selected_comments),
-                'total_comments': len(comments),
+                'total_comments': total_comments,
                 'prioritized': prioritize_engagement,
                 'generated_at': datetime.utcnow().isoformat()
-            }
+            }})
             db.commit()
+            analytics_cache.bump('ai')
             
-            logger.info(f"Summarized {len(selected_comments)} comments for post {post_id}")
+            logger.info(f"Summarized {len(selected_comments)} comments for post {post_id} ({mode})")
             
             return {
                 'success': True,
                 'summary': summary,
+                'mode': mode,
                 'comment_count': len(selected_comments),
-                'total_comments': len(comments)
+                'total_comments': total_comments
             }
             
         except Exception as e:
@@ -1335,17 +1812,21 @@ class ScrapingOrchestrator:
         finally:
             db.close()
     
-    def summarize_long_comment(self, comment_id: int) -> dict:
+    def summarize_long_comment(self, comment_id: int, mode: str = 'abstractive') -> dict:
         """
         Summarize a single long comment
         
+        Comments the Arabic model can't read (other scripts) get an extractive summary
+        
         Args:
             comment_id: Database ID of the comment
+            mode: 'abstractive' (model-generated) or 'extractive' (key sentences, no model)
             
         Returns:
-            Summary result
+            Summary result ('mode' is the tier that actually ran)
         """
         from app.config import LONG_COMMENT_THRESHOLD, SUMMARY_CONFIG
+        from app.services.ai.text_features import ensure_features
         
         db = SessionLocal()
         
@@ -1362,26 +1843,36 @@ class ScrapingOrchestrator:
                     'reason': f'Comment shorter than {LONG_COMMENT_THRESHOLD} characters'
                 }
             
-            summary = self.summarization_service.summarize(
-                comment.comment_text,
-                max_length=SUMMARY_CONFIG["short_summary_max_length"]
-            )
+            features = ensure_features([comment.comment_text], [comment.text_features])[0]
+            if features['script'] not in SUMMARY_CONFIG["model_scripts"]:
+                mode = 'extractive'
             
-            # Storing in DB
-            if comment.ai_results is None:
-                comment.ai_results = {}
+            if mode == 'extractive':
+                summary = self.extractive_summarizer.summarize_text(
+                    comment.comment_text,
+                    max_sentences=SUMMARY_CONFIG["extractive_max_sentences"]
+                )
+            else:
+                summary = self.summarization_service.summarize(
+                    comment.comment_text,
+                    max_length=SUMMARY_CONFIG["short_summary_max_length"]
+                )
             
-            comment.ai_results['summary'] = {
+            # Storing in DB
+            ai_tasks.merge_results(db, 'comment', 'summary', {comment.id: {
                 'text': summary,
+                'mode': mode,
                 'original_length': len(comment.comment_text),
                 'summary_length': len(summary),
                 'generated_at': datetime.utcnow().isoformat()
-            }
+            }})
             db.commit()
+            analytics_cache.bump('ai')
             
             return {
                 'success': True,
                 'summary': summary,
+                'mode': mode,
                 'is_summarized': True,
                 'original_length': len(comment.comment_text)
             }
@@ -1393,19 +1884,36 @@ class ScrapingOrchestrator:
         finally:
             db.close()
     
-    def summarize_time_period(self, days: int = 7, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> dict:
+    def summarize_time_period(
+        self,
+        days: int = 7,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        mode: str = 'abstractive'
+    ) -> dict:
         """
         Summarize all posts and comments from a time period
         
+        Captions and top comments are summarized hierarchically (per-day chunks,
+        then a summary of the chunk summaries), so nothing is cut off at the
+        model's input limit. Chunk summaries are cached by content.
+        
+        Emoji/mention/URL-only content is left out, and only Arabic text is fed to
+        the model (falls back to extractive when the period has none).
+        
         Args:
             days: Number of days to look back (used if start_date/end_date not provided)
             start_date: Optional start date for the period
             end_date: Optional end date for the period
+            mode: 'abstractive' (model-generated) or 'extractive' (most representative posts/comments, no model)
             
         Returns:
             Summary result with statistics
         """
-        from app.config import SUMMARY_CONFIG
+        from app.config import SUMMARY_CONFIG, SUMMARIZATION_MODEL
+        from app.services.ai.hierarchical_summarizer import HierarchicalSummarizer
+        from app.services.ai.text_features import ensure_features, is_trivial
+        from app.summary_cache import DBSummaryCache
         
         db = SessionLocal()
         
@@ -1418,10 +1926,10 @@ class ScrapingOrchestrator:
                 cutoff_date = datetime.utcnow() - timedelta(days=days)
                 end_datetime = datetime.utcnow()
             
-            # Fetch recent posts
-            recent_posts = db.query(Post)\
+            # Fetch posts in the period (oldest first, so new posts only change the last chunk of a day)
+            recent_posts = db.query(Post.id, Post.caption, Post.timestamp, Post.text_features)\
                 .filter(Post.timestamp >= cutoff_date, Post.timestamp <= end_datetime)\
-                .order_by(Post.timestamp.desc())\
+                .order_by(Post.timestamp.asc(), Post.id.asc())\
                 .all()
             
             if not recent_posts:
@@ -1432,36 +1940,86 @@ class ScrapingOrchestrator:
                     'comment_count': 0
                 }
             
-            # Gather all captions and top comments
-            all_texts = []
-            total_comments = 0
+            # Top 3 comments per post in a single query (trivial and spam comments don't take a slot)
+            rank = func.row_number().over(
+                partition_by=Comment.post_id,
+                order_by=(Comment.likes_count.desc(), Comment.id.asc())
+            ).label('rank')
+            ranked = db.query(Comment.post_id, Comment.comment_text, Comment.text_features, rank)\
+                .filter(Comment.post_id.in_(select(Post.id).where(
+                    Post.timestamp >= cutoff_date, Post.timestamp <= end_datetime
+                )), ~ai_tasks.is_trivial_text(Comment), Comment.is_spam.isnot(True))\
+                .subquery()
+            top_comments = db.query(ranked.c.post_id, ranked.c.comment_text, ranked.c.text_features)\
+                .filter(ranked.c.rank <= 3)\
+                .order_by(ranked.c.post_id, ranked.c.rank)\
+                .all()
+            
+            comments_by_post = {}
+            for post_id, comment_text, comment_features in top_comments:
+                if comment_text:
+                    comments_by_post.setdefault(post_id, []).append((comment_text, comment_features))
             
+            # One group per day; chunks never span days. Items keep their
+            # features so the abstractive path can pick the Arabic ones.
+            days_content = {}
+            total_comments = 0
             for post in recent_posts:
+                items = days_content.setdefault(post.timestamp.date(), [])
                 if post.caption:
-                    all_texts.append(f"منشور: {post.caption}")
-                
-                # Get top 3 comments per post
-                top_comments = db.query(Comment)\
-                    .filter(Comment.post_id == post.id)\
-                    .order_by(Comment.likes_count.desc())\
-                    .limit(3)\
-                    .all()
-                
-                for comment in top_comments:
-                    all_texts.append(f"تعليق: {comment.comment_text}")
+                    items.append((f"منشور: {post.caption}", ensure_features([post.caption], [post.text_features])[0]))
+                for comment_text, comment_features in comments_by_post.get(post.id, []):
+                    items.append((f"تعليق: {comment_text}", ensure_features([comment_text], [comment_features])[0]))
                     total_comments += 1
+            days_content = {
+                day: [(text, f) for text, f in items if not is_trivial(f)]
+                for day, items in days_content.items()
+            }
             
-            combined_text = "\n".join(all_texts)
-            summary = self.summarization_service.summarize(
-                combined_text,
-                max_length=SUMMARY_CONFIG["time_period_max_length"]
-            )
+            if mode == 'abstractive':
+                model_content = {
+                    day: [text for text, f in items if f['script'] in SUMMARY_CONFIG["model_scripts"]]
+                    for day, items in days_content.items()
+                }
+                model_content = {day: texts for day, texts in model_content.items() if texts}
+                if not model_content:
+                    mode = 'extractive'
+            
+            if mode == 'extractive':
+                texts = [text for items in days_content.values() for text, _ in items]
+                summary_result = {
+                    'summary': self.extractive_summarizer.summarize(texts, SUMMARY_CONFIG["extractive_max_items"]),
+                    'chunks': 0,
+                    'cached_chunks': 0
+                }
+            else:
+                # Drop near-duplicate items on busy days before they reach the model
+                for day, texts in model_content.items():
+                    keep = self.extractive_summarizer.select(texts, SUMMARY_CONFIG["preselect_max_items_per_day"])
+                    model_content[day] = [texts[i] for i in keep]
+                summarizer = HierarchicalSummarizer(
+                    self.summarization_service,
+                    model_name=SUMMARIZATION_MODEL,
+                    chunk_token_budget=SUMMARY_CONFIG["chunk_token_budget"],
+                    chunk_max_length=SUMMARY_CONFIG["chunk_max_length"],
+                    max_levels=SUMMARY_CONFIG["max_reduce_levels"],
+                    cache=DBSummaryCache()
+                )
+                summary_result = summarizer.summarize(
+                    list(model_content.values()),
+                    max_length=SUMMARY_CONFIG["time_period_max_length"]
+                )
+            summary = summary_result['summary']
             
             result = {
                 'success': True,
                 'summary': summary,
                 'post_count': len(recent_posts),
                 'comment_count': total_comments,
+                'mode': mode,
+                'chunk_count': summary_result['chunks'],
+                'cached_chunks': summary_result['cached_chunks'],
+                'truncated': summary_result.get('truncated', False),
                 'date_range': {
                     'from': cutoff_date.isoformat(),
                     'to': end_datetime.isoformat()
@@ -1490,6 +2048,9 @@ class ScrapingOrchestrator:
         Returns:
             Sentiment result
         """
+        from app.config import SENTIMENT_MODEL
+        from app.services.ai.text_features import ensure_features, rule_sentiment
+        
         db = SessionLocal()
         
         try:
@@ -1497,19 +2058,15 @@ class ScrapingOrchestrator:
             if not comment:
                 raise ValueError(f"Comment {comment_id} not found")
             
-            # Analyze sentiment
-            sentiment = self.sentiment_service.analyze(comment.comment_text)
+            # Analyze sentiment (trivial content is answered without the model)
+            features = ensure_features([comment.comment_text], [comment.text_features])[0]
+            sentiment = rule_sentiment(comment.comment_text, features) or self.sentiment_service.analyze(comment.comment_text)
             
             # Store in database
-            if comment.ai_results is None:
-                comment.ai_results = {}
-            
-            comment.ai_results['sentiment'] = {
-                'label': sentiment.label,
-                'score': sentiment.score,
-                'analyzed_at': datetime.utcnow().isoformat()
-            }
+            ai_tasks.store_sentiments(db, 'comment', [comment], [sentiment], [features])  # Also bumps the counters
+            ai_tasks.mark_done(db, 'comment', [comment.id], ai_tasks.TASK_SENTIMENT, SENTIMENT_MODEL)
             db.commit()
+            analytics_cache.bump('ai')
             
             return {
                 'success': True,
@@ -1526,7 +2083,11 @@ class ScrapingOrchestrator:
     
     def analyze_post_sentiment(self, post_id: int) -> dict:
         """
-        Analyze overall sentiment for a post based on its comments
+        Overall sentiment for a post based on its comments
+        
+        Reads the post's sentiment counters, which are updated whenever comment
+        sentiments are written. Only comments without a stored result go through
+        the model, so a post with nothing new returns without any inference.
         
         Args:
             post_id: Database ID of the post
@@ -1534,6 +2095,9 @@ class ScrapingOrchestrator:
         Returns:
             Aggregated sentiment result
         """
+        from app.config import SENTIMENT_MODEL, SENTIMENT_POSITIVE_THRESHOLD, SENTIMENT_NEGATIVE_THRESHOLD
+        from app.services.ai.text_features import ensure_features
+        
         db = SessionLocal()
         
         try:
@@ -1541,62 +2105,64 @@ class ScrapingOrchestrator:
             if not post:
                 raise ValueError(f"Post {post_id} not found")
             
-            comments = db.query(Comment).filter(Comment.post_id == post_id).all()
-            
-            if not comments:
-                return {
-                    'success': True,
-                    'post_id': post_id,
-                    'sentiment': {'label': 'neutral', 'score': 0.0},
-                    'comment_count': 0,
-                    'breakdown': {}
-                }
-            
-            # Batch analyze all comments
-            texts = [c.comment_text for c in comments]
-            sentiments = self.sentiment_service.batch_analyze(texts)
+            first_aggregation = post.sentiment_aggregated_at is None
+            if first_aggregation:
+                # Counters start from the results already stored on the comments
+                ai_tasks.rebuild_post_counters(db, [post_id])
+            
+            # Only comments that were never analyzed need the model
+            new_comments = db.query(
+                Comment.id, Comment.post_id, Comment.cluster_id, Comment.comment_text.label('text'),
+                Comment.ai_results, Comment.text_features
+            ).filter(Comment.post_id == post_id, Comment.comment_text != '', ~ai_tasks.has_sentiment(Comment)).all()
+            new_comments = [c for c in new_comments if c.text.strip()]
+            
+            if new_comments:
+                # Emoji/mention/URL-only comments are answered without the model,
+                # near-duplicates share one inference per cluster
+                texts = [c.text for c in new_comments]
+                features = ensure_features(texts, [c.text_features for c in new_comments])
+                sentiments = self._cluster_sentiment(
+                    db, [c.id for c in new_comments], texts, features, [c.cluster_id for c in new_comments]
+                )
+                ai_tasks.store_sentiments(db, 'comment', new_comments, sentiments, features)  # Also bumps the counters
+                ai_tasks.mark_done(db, 'comment', [c.id for c in new_comments], ai_tasks.TASK_SENTIMENT, SENTIMENT_MODEL)
             
-            # Calculate aggregated sentiment
-            sentiment_counts = {'positive': 0, 'neutral': 0, 'negative': 0}
-            total_score = 0.0
+            if first_aggregation or new_comments:
+                db.flush()
+                db.refresh(post)
             
-            for sentiment in sentiments:
-                sentiment_counts[sentiment.label] += 1
-                # Weight: positive=1, neutral=0, negative=-1
-                weight = {'positive': 1, 'neutral': 0, 'negative': -1}[sentiment.label]
-                total_score += weight * sentiment.score
+            sentiment_counts = {
+                'positive': post.sentiment_positive,
+                'neutral': post.sentiment_neutral,
+                'negative': post.sentiment_negative
+            }
+            comment_count = sum(sentiment_counts.values())
             
-            # Determine overall sentiment
-            from app.config import SENTIMENT_POSITIVE_THRESHOLD, SENTIMENT_NEGATIVE_THRESHOLD
-            avg_score = total_score / len(sentiments)
-            if avg_score > SENTIMENT_POSITIVE_THRESHOLD:
+            # Label from the share of positive minus negative comments; the score
+            # stays the mean expected value, which clusters too close to 0 to label from
+            avg_score = post.sentiment_score_sum / comment_count if comment_count else 0.0
+            polarity = (post.sentiment_positive - post.sentiment_negative) / comment_count if comment_count else 0.0
+            if polarity > SENTIMENT_POSITIVE_THRESHOLD:
                 overall_label = 'positive'
-            elif avg_score < SENTIMENT_NEGATIVE_THRESHOLD:
+            elif polarity < SENTIMENT_NEGATIVE_THRESHOLD:
                 overall_label = 'negative'
             else:
                 overall_label = 'neutral'
             
-            # Store in database
-            if post.ai_results is None:
-                post.ai_results = {}
-            
-            post.ai_results['sentiment'] = {
-                'label': overall_label,
-                'score': abs(avg_score),
-                'breakdown': sentiment_counts,
-                'comment_count': len(comments),
-                'analyzed_at': datetime.utcnow().isoformat()
-            }
-            db.commit()
-            
-            # Store individual comment sentiments
-            for comment, sentiment in zip(comments, sentiments):
-                if comment.ai_results is None:
-                    comment.ai_results = {}
-                comment.ai_results['sentiment'] = sentiment.to_dict()
-            db.commit()
-            
-            logger.info(f"Analyzed sentiment for post {post_id} ({len(comments)} comments)")
+            if first_aggregation or new_comments:
+                post.sentiment_aggregated_at = datetime.utcnow()
+                # Own key: ai_results['sentiment'] is the caption's result, with the probs the scores use
+                ai_tasks.merge_results(db, 'post', ai_tasks.TASK_COMMENT_SENTIMENT, {post.id: {
+                    'label': overall_label,
+                    'score': abs(avg_score),
+                    'breakdown': sentiment_counts,
+                    'comment_count': comment_count,
+                    'analyzed_at': datetime.utcnow().isoformat()
+                }})
+                db.commit()
+                analytics_cache.bump('ai')
+                logger.info(f"Aggregated sentiment for post {post_id} ({comment_count} comments, {len(new_comments)} newly analyzed)")
             
             return {
                 'success': True,
@@ -1605,7 +2171,8 @@ class ScrapingOrchestrator:
                     'label': overall_label,
                     'score': round(abs(avg_score), 4)
                 },
-                'comment_count': len(comments),
+                'comment_count': comment_count,
+                'newly_analyzed': len(new_comments),
                 'breakdown': sentiment_counts,
                 'sentiment_breakdown': sentiment_counts,
                 'overall_label': overall_label,
@@ -1618,30 +2185,98 @@ class ScrapingOrchestrator:
             raise
         finally:
             db.close()
+    
+    def rebuild_post_sentiment_counters(self) -> dict:
+        """
+        Recompute every post's sentiment counters from stored comment results
+        
+        SQL only; needed after SENTIMENT_CLASS_WEIGHTS changes, since the
+        counters hold score sums under the weights in effect when comments were written
+        """
+        db = SessionLocal()
+        
+        try:
+            ai_tasks.rebuild_post_counters(db)
+            db.commit()
+            analytics_cache.bump('ai')
+            return {'success': True, 'posts': db.query(func.count(Post.id)).scalar()}
+        except Exception as e:
+            logger.error(f"Error rebuilding post sentiment counters: {e}")
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    
+    def cluster_comments(self, max_batches: Optional[int] = None) -> dict:
+        """
+        Assign near-duplicate clusters to comments that don't have one yet
+        
+        Ingest clusters new comments itself; this catches up on comments stored
+        before clustering existed or whose ingest-time clustering failed.
+        
+        Args:
+            max_batches: Stop after this many batches of NEAR_DUPLICATE_CONFIG['batch_size'] (default: until done)
+            
+        Returns:
+            Totals over all batches
+        """
+        from app.config import NEAR_DUPLICATE_CONFIG
+        from app.near_duplicates import assign_clusters
+        
+        batch_size = NEAR_DUPLICATE_CONFIG['batch_size']
+        totals = {'clustered': 0, 'duplicates': 0, 'spam_clusters': 0}
+        batches = 0
+        db = SessionLocal()
+        
+        try:
+            while max_batches is None or batches < max_batches:
+                result = assign_clusters(db, limit=batch_size)
+                db.commit()
+                analytics_cache.bump('content')
+                batches += 1
+                for key in totals:
+                    totals[key] += result[key]
+                if result['clustered'] < batch_size:
+                    break
+            
+            logger.info(f"Clustered {totals['clustered']} comments ({totals['duplicates']} near-duplicates, {totals['spam_clusters']} spam clusters)")
+            return {'success': True, **totals}
+        except Exception as e:
+            logger.error(f"Error clustering comments: {e}")
+            db.rollback()
+            raise
+        finally:
+            db.close()
 
-    def analyze_all_posts_sentiment(self, batch_size: int = 50) -> dict:
+    def analyze_all_posts_sentiment(self, batch_size: Optional[int] = None) -> dict:
         """
-        Analyze sentiment for all posts without sentiment data (using captions)
+        Analyze sentiment for posts with a pending sentiment task (using captions)
 
         Args:
-            batch_size: Number of posts to process per batch
+            batch_size: Number of posts to process per batch (default: derived from the autotuned batch size)
 
         Returns:
             Processing summary
         """
+        from app.config import SENTIMENT_MODEL, SUMMARY_CONFIG
+        from app.services.ai.text_features import ensure_features, is_trivial
+        
+        batch_size = batch_size or self.sentiment_job_batch_size()
         db = SessionLocal()
+        task_ids = []
 
         try:
-            # Find posts without sentiment analysis that have captions
-            all_posts = db.query(Post).filter(Post.caption.isnot(None), Post.caption != '').all()
-            posts = []
-            for post in all_posts:
-                if post.ai_results is None or not isinstance(post.ai_results, dict) or 'sentiment' not in post.ai_results:
-                    posts.append(post)
-                    if len(posts) >= batch_size:
-                        break
+            # Claim pending work from the queue instead of scanning posts
+            tasks = ai_tasks.claim_tasks(db, 'post', ai_tasks.TASK_SENTIMENT, batch_size)
+            task_ids = [t.id for t in tasks]
+            posts_by_id = {
+                p.id: p for p in db.query(Post).filter(Post.id.in_([t.entity_id for t in tasks])).all()
+            } if tasks else {}
+            posts = [posts_by_id[t.entity_id] for t in tasks if t.entity_id in posts_by_id and posts_by_id[t.entity_id].caption]
 
             if not posts:
+                ai_tasks.complete_tasks(db, tasks)  # Deleted posts or captions removed since ingest
+                db.commit()
                 return {
                     'success': True,
                     'processed': 0,
@@ -1651,26 +2286,21 @@ class ScrapingOrchestrator:
 
             # Batch analyze captions
             texts = [p.caption for p in posts]
-            sentiments = self.sentiment_service.batch_analyze(texts)
+            features = ensure_features(texts, [p.text_features for p in posts])
+            sentiments = self._batch_sentiment(texts, features)
 
             # Store results and build response for frontend
+            ai_tasks.store_sentiments(db, 'post', posts, sentiments, features)
             results = []
-            for post, sentiment in zip(posts, sentiments):
-                if post.ai_results is None:
-                    post.ai_results = {}
-                post.ai_results['sentiment'] = {
-                    **sentiment.to_dict(),
-                    'analyzed_at': datetime.utcnow().isoformat()
-                }
-
-                # Also generate a summary for the caption if it's long enough
-                if len(post.caption) > 100:
+            digests = {}
+            for post, sentiment, post_features in zip(posts, sentiments, features):
+                # Also add a quick extractive digest for the caption if it's long enough
+                if len(post.caption) > 100 and not is_trivial(post_features):
                     try:
-                        summary = self.summarization_service.summarize(
+                        digests[post.id] = self.extractive_summarizer.summarize_text(
                             post.caption,
-                            max_length=100
+                            max_sentences=SUMMARY_CONFIG["extractive_max_sentences"]
                         )
-                        post.ai_results['summary'] = summary
                     except Exception as e:
                         logger.warning(f"Failed to summarize post {post.id}: {e}")
 
@@ -1681,7 +2311,10 @@ class ScrapingOrchestrator:
                     'sentiment': sentiment.to_dict()
                 })
 
+            ai_tasks.merge_results(db, 'post', 'summary', digests)
+            ai_tasks.complete_tasks(db, tasks, SENTIMENT_MODEL)
             db.commit()
+            analytics_cache.bump('ai')
 
             logger.info(f"Analyzed sentiment for {len(posts)} posts")
 
@@ -1693,46 +2326,48 @@ class ScrapingOrchestrator:
                     'neutral': sum(1 for s in sentiments if s.label == 'neutral'),
                     'negative': sum(1 for s in sentiments if s.label == 'negative')
                 },
+                'rule_based': sum(1 for s in sentiments if s.source),
                 'results': results
             }
 
         except Exception as e:
             logger.error(f"Error in batch post sentiment analysis: {e}")
             db.rollback()
+            ai_tasks.fail_tasks(db, task_ids, str(e))
+            db.commit()
             raise
         finally:
             db.close()
 
-    def analyze_all_comments_sentiment(self, batch_size: int = 50) -> dict:
+    def analyze_all_comments_sentiment(self, batch_size: Optional[int] = None) -> dict:
         """
-        Analyze sentiment for all comments without sentiment data
+        Analyze sentiment for comments with a pending sentiment task
         
         Args:
-            batch_size: Number of comments to process per batch
+            batch_size: Number of comments to process per batch (default: derived from the autotuned batch size)
             
         Returns:
             Processing summary
         """
+        from app.config import SENTIMENT_MODEL
+        from app.services.ai.text_features import ensure_features
+        
+        batch_size = batch_size or self.sentiment_job_batch_size()
         db = SessionLocal()
+        task_ids = []
         
         try:
-            # Find comments without sentiment analysis
-            from sqlalchemy import func, cast, String, or_, not_
-            from sqlalchemy.dialects.postgresql import JSONB
-            
-            # Query comments without sentiment analysis
-            # Cast to JSONB for proper operator support, or use simpler approach
-            comments = db.query(Comment)\
-                .filter(
-                    or_(
-                        Comment.ai_results == None,
-                        not_(cast(Comment.ai_results, JSONB).has_key('sentiment'))
-                    )
-                )\
-                .limit(batch_size)\
-                .all()
+            # Claim pending work from the queue instead of filtering on ai_results JSON
+            tasks = ai_tasks.claim_tasks(db, 'comment', ai_tasks.TASK_SENTIMENT, batch_size)
+            task_ids = [t.id for t in tasks]
+            comments_by_id = {
+                c.id: c for c in db.query(Comment).filter(Comment.id.in_([t.entity_id for t in tasks])).all()
+            } if tasks else {}
+            comments = [comments_by_id[t.entity_id] for t in tasks if t.entity_id in comments_by_id and comments_by_id[t.entity_id].comment_text]
             
             if not comments:
+                ai_tasks.complete_tasks(db, tasks)  # Comments deleted since ingest
+                db.commit()
                 return {
                     'success': True,
                     'processed': 0,
@@ -1742,17 +2377,15 @@ class ScrapingOrchestrator:
 
             # Batch analyze
             texts = [c.comment_text for c in comments]
-            sentiments = self.sentiment_service.batch_analyze(texts)
+            features = ensure_features(texts, [c.text_features for c in comments])
+            sentiments = self._cluster_sentiment(
+                db, [c.id for c in comments], texts, features, [c.cluster_id for c in comments]
+            )
 
             # Store results and build response for frontend
+            ai_tasks.store_sentiments(db, 'comment', comments, sentiments, features)  # Also bumps the counters
             results = []
             for comment, sentiment in zip(comments, sentiments):
-                if comment.ai_results is None:
-                    comment.ai_results = {}
-                comment.ai_results['sentiment'] = {
-                    **sentiment.to_dict(),
-                    'analyzed_at': datetime.utcnow().isoformat()
-                }
                 # Add to results for frontend display
                 results.append({
                     'comment_id': comment.id,
@@ -1760,7 +2393,9 @@ class ScrapingOrchestrator:
                     'sentiment': sentiment.to_dict()
                 })
 
+            ai_tasks.complete_tasks(db, tasks, SENTIMENT_MODEL)
             db.commit()
+            analytics_cache.bump('ai')
 
             logger.info(f"Analyzed sentiment for {len(comments)} comments")
 
@@ -1772,88 +2407,573 @@ class ScrapingOrchestrator:
                     'neutral': sum(1 for s in sentiments if s.label == 'neutral'),
                     'negative': sum(1 for s in sentiments if s.label == 'negative')
                 },
+                'rule_based': sum(1 for s in sentiments if s.source),
                 'results': results
             }
             
         except Exception as e:
             logger.error(f"Error in batch sentiment analysis: {e}")
             db.rollback()
+            ai_tasks.fail_tasks(db, task_ids, str(e))
+            db.commit()
             raise
         finally:
             db.close()
     
-    def generate_weekly_report(self, year: int, week_number: int) -> dict:
+    def backfill_sentiment_batch(self, entity_type: str, batch_size: int) -> int:
         """
-        Generate and store a weekly report with summary and sentiment analysis
-        Weeks start on Sunday and end on Saturday
+        Lean bulk sentiment pass for one batch (the backfill worker runs the
+        pipelined stream_sentiment_backfill)
+
+        Claims pending tasks, runs one batch inference, writes all results with a
+        single bulk update and commits. No per-item response payload is built.
+
+        Args:
+            entity_type: 'post' or 'comment'
+            batch_size: Max tasks to claim
+
+        Returns:
+            Number of tasks completed (0 when the queue is empty)
+        """
+        from app.config import SENTIMENT_MODEL
+        from app.services.ai.text_features import ensure_features
+        
+        model = ai_tasks.ENTITY_MODELS[entity_type]
+        text_column = Post.caption if entity_type == 'post' else Comment.comment_text
+        # Post sentiment counters and near-duplicate fan-out
+        comment_columns = [Comment.post_id, Comment.cluster_id] if entity_type == 'comment' else []
+        
+        db = SessionLocal()
+        task_ids = []
+        
+        try:
+            tasks = ai_tasks.claim_tasks(db, entity_type, ai_tasks.TASK_SENTIMENT, batch_size)
+            task_ids = [t.id for t in tasks]
+            if not tasks:
+                db.commit()
+                return 0
+            
+            rows = db.query(model.id, text_column.label('text'), model.ai_results, model.text_features, *comment_columns)\
+                .filter(model.id.in_([t.entity_id for t in tasks]))\
+                .all()
+            rows = [r for r in rows if r.text and r.text.strip()]
+            
+            features = ensure_features([r.text for r in rows], [r.text_features for r in rows])
+            sentiments = self._cluster_sentiment(
+                db, [r.id for r in rows], [r.text for r in rows], features,
+                [r.cluster_id for r in rows] if entity_type == 'comment' else None
+            )
+            ai_tasks.store_sentiments(db, entity_type, rows, sentiments, features)
+            ai_tasks.complete_tasks(db, tasks, SENTIMENT_MODEL)
+            db.commit()
+            analytics_cache.bump('ai')
+            
+            return len(tasks)
+            
+        except Exception as e:
+            logger.error(f"Error in sentiment backfill batch ({entity_type}): {e}")
+            db.rollback()
+            ai_tasks.fail_tasks(db, task_ids, str(e))
+            db.commit()
+            raise
+        finally:
+            db.close()
+    
+    def stream_sentiment_backfill(
+        self,
+        batch_size: Callable[[], int],
+        keep_going: Callable[[], bool],
+        cpu_meter=None
+    ) -> Iterator[int]:
+        """
+        Pipelined backfill_sentiment_batch, used by the backfill worker
+        
+        Batches of comments, then posts, go through four threads connected by
+        bounded queues (app/services/ai/pipeline.py): claim and read (with
+        rules and near-duplicate reuse), tokenization, forward pass, and
+        decode and write back. While batch N is in the model, batch N+1 is
+        read and tokenized and batch N-1 written.
+        
+        Each batch keeps its own session from claim to commit, so its tasks
+        stay locked until its results are stored. A failed batch is recorded
+        with fail_tasks and the error re-raised; batches still in flight are
+        rolled back and go back to the queue untouched.
         
         Args:
-            year: Year for the report
-            week_number: ISO week number (1-53)
+            batch_size: Called before each claim (the worker adapts it between batches)
+            keep_going: Checked before each claim, no more batches are claimed once it returns False
+            cpu_meter: Optional pipeline.CpuMeter charged with the pipeline threads' CPU time
             
+        Yields:
+            Number of tasks completed per batch, until the queue is empty
+        """
+        from app.config import SENTIMENT_MODEL, PIPELINE_QUEUE_SIZE
+        from app.services.ai.pipeline import run_stages
+        
+        def read():
+            for entity_type in ('comment', 'post'):
+                while keep_going():
+                    batch = self._read_sentiment_batch(entity_type, batch_size())
+                    if batch is None:
+                        break
+                    yield batch
+        
+        def tokenize(batch):
+            texts = [batch['rows'][i].text for i in batch['pending']]
+            batch['model_input'] = self.sentiment_service.tokenize(texts) if texts else []
+            return batch
+        
+        def forward(batch):
+            batch['model_output'] = self.sentiment_service.forward(batch['model_input']) if batch['model_input'] else []
+            return batch
+        
+        def write(batch):
+            db = batch['db']
+            model_results = self.sentiment_service.decode(batch['model_output']) if batch['model_output'] else []
+            sentiments = self._finish_sentiment(batch['results'], batch['pending'], batch['copies'], model_results)
+            ai_tasks.store_sentiments(db, batch['entity_type'], batch['rows'], sentiments, batch['features'])
+            ai_tasks.complete_tasks(db, batch['tasks'], SENTIMENT_MODEL)
+            db.commit()
+            analytics_cache.bump('ai')
+            db.close()
+            return len(batch['tasks'])
+        
+        yield from run_stages(
+            read(),
+            [tokenize, forward, write],
+            PIPELINE_QUEUE_SIZE,
+            name="sentiment-backfill",
+            on_error=self._release_sentiment_batch,
+            on_discard=self._release_sentiment_batch,
+            cpu_meter=cpu_meter
+        )
+    
+    def _read_sentiment_batch(self, entity_type: str, batch_size: int) -> Optional[dict]:
+        """
+        Claim and load one batch for stream_sentiment_backfill
+        
         Returns:
-            Report data including summary and sentiment
+            The batch with its open session, or None when the queue is empty
         """
-        db = SessionLocal()
+        from app.services.ai.text_features import ensure_features
+        
+        model = ai_tasks.ENTITY_MODELS[entity_type]
+        text_column = Post.caption if entity_type == 'post' else Comment.comment_text
+        # Post sentiment counters and near-duplicate fan-out
+        comment_columns = [Comment.post_id, Comment.cluster_id] if entity_type == 'comment' else []
+        
+        batch = {'entity_type': entity_type, 'db': SessionLocal(), 'tasks': []}
+        db = batch['db']
         
         try:
-            # Calculate week boundaries (Sunday to Saturday)
-            # ISO week 1 is the week containing the first Thursday
-            jan_4 = datetime(year, 1, 4)
-            week_start = jan_4 - timedelta(days=jan_4.weekday() + 1)  # Previous Sunday
-            week_start = week_start + timedelta(weeks=week_number - 1)
-            week_start = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
-            
-            week_end = week_start + timedelta(days=6, hours=23, minutes=59, seconds=59)
-            
-            # Check if report already exists
-            existing_report = db.query(WeeklyReport).filter(
-                WeeklyReport.year == year,
-                WeeklyReport.week_number == week_number
-            ).first()
-            
-            # Use existing methods to get summary and sentiment
-            summary_result = self.summarize_time_period(
-                start_date=week_start,
-                end_date=week_end
+            batch['tasks'] = ai_tasks.claim_tasks(db, entity_type, ai_tasks.TASK_SENTIMENT, batch_size)
+            if not batch['tasks']:
+                db.commit()
+                db.close()
+                return None
+            
+            rows = db.query(model.id, text_column.label('text'), model.ai_results, model.text_features, *comment_columns)\
+                .filter(model.id.in_([t.entity_id for t in batch['tasks']]))\
+                .all()
+            rows = [r for r in rows if r.text and r.text.strip()]
+            features = ensure_features([r.text for r in rows], [r.text_features for r in rows])
+            results, pending, copies = self._plan_sentiment(
+                db, [r.id for r in rows], [r.text for r in rows], features,
+                [r.cluster_id for r in rows] if entity_type == 'comment' else None
             )
+            batch.update(rows=rows, features=features, results=results, pending=pending, copies=copies)
+            return batch
             
-            sentiment_result = self.analyze_time_period_sentiment(
-                start_date=week_start,
-                end_date=week_end
+        except Exception as e:
+            self._release_sentiment_batch(batch, e)
+            raise
+    
+    @staticmethod
+    def _release_sentiment_batch(batch: dict, error: Optional[BaseException] = None) -> None:
+        """Roll back a batch that won't be written; with an error, record the failed attempt"""
+        db = batch['db']
+        task_ids = [t.id for t in batch['tasks']]
+        try:
+            db.rollback()
+            if error is not None:
+                logger.error(f"Error in sentiment backfill batch ({batch['entity_type']}): {error}")
+                ai_tasks.fail_tasks(db, task_ids, str(error))
+                db.commit()
+        finally:
+            db.close()
+    
+    def _fill_missing_sentiment(self, db, entity_type: str, filters: list, chunk_size: int = 256) -> int:
+        """
+        Run sentiment only for rows matching filters that have no stored result,
+        store the results and mark their queue tasks done
+        
+        Returns:
+            Number of rows analyzed
+        """
+        from app.config import SENTIMENT_MODEL
+        from app.services.ai.text_features import ensure_features
+        
+        model = ai_tasks.ENTITY_MODELS[entity_type]
+        text_column = Post.caption if entity_type == 'post' else Comment.comment_text
+        # Post sentiment counters and near-duplicate fan-out
+        comment_columns = [Comment.post_id, Comment.cluster_id] if entity_type == 'comment' else []
+        
+        rows = db.query(model.id, text_column.label('text'), model.ai_results, model.text_features, *comment_columns)\
+            .filter(*filters, text_column.isnot(None), text_column != '', ~ai_tasks.has_sentiment(model))\
+            .all()
+        rows = [r for r in rows if r.text.strip()]
+        
+        for i in range(0, len(rows), chunk_size):
+            chunk = rows[i:i + chunk_size]
+            features = ensure_features([r.text for r in chunk], [r.text_features for r in chunk])
+            sentiments = self._cluster_sentiment(
+                db, [r.id for r in chunk], [r.text for r in chunk], features,
+                [r.cluster_id for r in chunk] if entity_type == 'comment' else None
             )
+            ai_tasks.store_sentiments(db, entity_type, chunk, sentiments, features)
+            ai_tasks.mark_done(db, entity_type, [r.id for r in chunk], ai_tasks.TASK_SENTIMENT, SENTIMENT_MODEL)
+            db.commit()
+            analytics_cache.bump('ai')
+        
+        return len(rows)
+    
+    def extract_topics_batch(self, entity_type: str, batch_size: int) -> int:
+        """
+        Topics for one batch of pending 'topics' tasks
+        
+        Claims the tasks, extracts topics for the whole batch at once (the batch
+        is also the IDF reference), writes them with one bulk update plus the
+        weekly rollup and commits. Trivial content and spam comments get no topics.
+        
+        Args:
+            entity_type: 'post' or 'comment'
+            batch_size: Max tasks to claim
             
-            # Create or update report
-            report_data = {
-                'year': year,
-                'week_number': week_number,
-                'week_start_date': week_start,
-                'week_end_date': week_end,
-                'post_count': summary_result['post_count'],
-                'comment_count': summary_result['comment_count'],
-                'summary': summary_result['summary'],
-                'sentiment_label': sentiment_result['sentiment_label'],
-                'sentiment_score': sentiment_result['sentiment_score'],
-                'sentiment_breakdown': sentiment_result['sentiment_breakdown'],
-                'generated_at': datetime.utcnow()
-            }
+        Returns:
+            Number of tasks completed (0 when the queue is empty)
+        """
+        from app.config import TOPIC_CONFIG
+        from app.services.ai.text_features import ensure_features, is_trivial
+        from app.services.ai.topic_service import TOPIC_EXTRACTOR_VERSION
+        from app.topics import store_topics
+        
+        model = ai_tasks.ENTITY_MODELS[entity_type]
+        text_column = Post.caption if entity_type == 'post' else Comment.comment_text
+        spam_column = [Comment.is_spam] if entity_type == 'comment' else []
+        
+        db = SessionLocal()
+        task_ids = []
+        
+        try:
+            tasks = ai_tasks.claim_tasks(db, entity_type, ai_tasks.TASK_TOPICS, batch_size)
+            task_ids = [t.id for t in tasks]
+            if not tasks:
+                db.commit()
+                return 0
             
-            if existing_report:
-                for key, value in report_data.items():
-                    setattr(existing_report, key, value)
-            else:
-                existing_report = WeeklyReport(**report_data)
-                db.add(existing_report)
+            rows = db.query(model.id, text_column.label('text'), model.ai_results, model.text_features, model.timestamp, *spam_column)\
+                .filter(model.id.in_([t.entity_id for t in tasks]))\
+                .all()
+            
+            features = ensure_features([r.text for r in rows], [r.text_features for r in rows])
+            usable = [
+                i for i, (r, f) in enumerate(zip(rows, features))
+                if r.text and not is_trivial(f) and not getattr(r, 'is_spam', False)
+            ]
+            topics = [[] for _ in rows]
+            extracted = self.topic_extractor.extract([rows[i].text for i in usable])
+            if TOPIC_CONFIG["merge_with_embeddings"]:
+                extracted = self.topic_extractor.merge_similar(
+                    extracted, self.embedding_service.encode, TOPIC_CONFIG["merge_threshold"]
+                )
+            for i, row_topics in zip(usable, extracted):
+                topics[i] = row_topics
+            
+            store_topics(db, entity_type, rows, topics)
+            ai_tasks.complete_tasks(db, tasks, TOPIC_EXTRACTOR_VERSION)
+            db.commit()
+            analytics_cache.bump('ai')
+            
+            return len(tasks)
+            
+        except Exception as e:
+            logger.error(f"Error in topic extraction batch ({entity_type}): {e}")
+            db.rollback()
+            ai_tasks.fail_tasks(db, task_ids, str(e))
+            db.commit()
+            raise
+        finally:
+            db.close()
+    
+    def extract_topics(self, max_batches: Optional[int] = None) -> dict:
+        """
+        Drain the 'topics' queue (comments, then posts)
+        
+        Args:
+            max_batches: Per entity type, stop after this many batches (default: until done)
+            
+        Returns:
+            Items processed per entity type
+        """
+        from app.config import TOPIC_CONFIG
+        
+        batch_size = TOPIC_CONFIG["batch_size"]
+        processed = {}
+        for entity_type in ('comment', 'post'):
+            processed[entity_type] = 0
+            batches = 0
+            while max_batches is None or batches < max_batches:
+                count = self.extract_topics_batch(entity_type, batch_size)
+                processed[entity_type] += count
+                batches += 1
+                if count < batch_size:
+                    break
+        
+        logger.info(f"Extracted topics for {processed['comment']} comments and {processed['post']} posts")
+        return {'success': True, 'processed': processed}
+    
+    def rebuild_topic_rollup(self) -> dict:
+        """Recompute weekly_topics from the topics stored in ai_results (SQL only)"""
+        from app.models import WeeklyTopic
+        from app.topics import rebuild_weekly_topics
+        
+        db = SessionLocal()
+        
+        try:
+            rebuild_weekly_topics(db)
+            db.commit()
+            analytics_cache.bump('ai')
+            return {'success': True, 'rows': db.query(func.count(WeeklyTopic.id)).scalar()}
+        except Exception as e:
+            logger.error(f"Error rebuilding topic rollup: {e}")
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    
+    def embed_batch(self, entity_type: str, batch_size: int) -> int:
+        """
+        Embeddings for one batch of pending 'embedding' tasks
+        
+        Claims the tasks, encodes the texts in one pass and writes them to the
+        vector index before completing the tasks (a retried batch overwrites the
+        same index rows). Trivial content and spam comments are not indexed.
+        
+        Args:
+            entity_type: 'post' or 'comment'
+            batch_size: Max tasks to claim
+            
+        Returns:
+            Number of tasks completed (0 when the queue is empty)
+        """
+        from app.config import EMBEDDING_MODEL
+        from app.services.ai.text_features import ensure_features, is_trivial
+        
+        model = ai_tasks.ENTITY_MODELS[entity_type]
+        text_column = Post.caption if entity_type == 'post' else Comment.comment_text
+        spam_column = [Comment.is_spam] if entity_type == 'comment' else []
+        
+        db = SessionLocal()
+        task_ids = []
+        
+        try:
+            tasks = ai_tasks.claim_tasks(db, entity_type, ai_tasks.TASK_EMBEDDING, batch_size)
+            task_ids = [t.id for t in tasks]
+            if not tasks:
+                db.commit()
+                return 0
+            
+            rows = db.query(model.id, text_column.label('text'), model.text_features, *spam_column)\
+                .filter(model.id.in_([t.entity_id for t in tasks]))\
+                .all()
+            features = ensure_features([r.text for r in rows], [r.text_features for r in rows])
+            rows = [
+                r for r, f in zip(rows, features)
+                if r.text and r.text.strip() and not is_trivial(f) and not getattr(r, 'is_spam', False)
+            ]
+            
+            if rows:
+                vectors = self.embedding_service.encode([r.text for r in rows])
+                self.vector_index.add(entity_type, [r.id for r in rows], vectors)
+            ai_tasks.complete_tasks(db, tasks, EMBEDDING_MODEL)
+            db.commit()
+            
+            return len(tasks)
+            
+        except Exception as e:
+            logger.error(f"Error in embedding batch ({entity_type}): {e}")
+            db.rollback()
+            ai_tasks.fail_tasks(db, task_ids, str(e))
+            db.commit()
+            raise
+        finally:
+            db.close()
+    
+    def embed_pending(self, max_batches: Optional[int] = None) -> dict:
+        """
+        Drain the 'embedding' queue (posts, then comments)
+        
+        Args:
+            max_batches: Per entity type, stop after this many batches (default: until done)
+            
+        Returns:
+            Items processed per entity type and the index size
+        """
+        from app.config import EMBEDDING_CONFIG
+        
+        batch_size = EMBEDDING_CONFIG["job_batch_size"]
+        processed = {}
+        for entity_type in ('post', 'comment'):
+            processed[entity_type] = 0
+            batches = 0
+            while max_batches is None or batches < max_batches:
+                count = self.embed_batch(entity_type, batch_size)
+                processed[entity_type] += count
+                batches += 1
+                if count < batch_size:
+                    break
+        
+        logger.info(f"Embedded {processed['post']} posts and {processed['comment']} comments")
+        return {'success': True, 'processed': processed, 'index': self.vector_index.stats()}
+    
+    def semantic_search(
+        self,
+        query: str,
+        k: int = 10,
+        entity_types: Optional[list[str]] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        source: Optional[str] = None
+    ) -> dict:
+        """
+        Posts and comments closest in meaning to a query
+        
+        The query is embedded with the same model as the index and looked up
+        in the vector index; time and source filters are applied to the
+        candidates in SQL (oversampled so k results usually survive them).
+        
+        Args:
+            query: Free text, any language the model covers
+            k: Max results
+            entity_types: 'post' and/or 'comment' (default: both)
+            date_from: Only items created at or after this time
+            date_to: Only items created before this time
+            source: Only posts (or comments under posts) with this source
+            
+        Returns:
+            Results best first, with their cosine similarity
+        """
+        from app.config import EMBEDDING_CONFIG
+        
+        if not query or not query.strip():
+            raise ValueError("Query is empty")
+        
+        started = time.perf_counter()
+        vector = self.embedding_service.encode([query.strip()])[0]
+        filtered = date_from is not None or date_to is not None or source is not None
+        fetch = k * EMBEDDING_CONFIG["filter_oversample"] if filtered else k
+        candidates = self.vector_index.search(vector, fetch, entity_types)
+        
+        db = SessionLocal()
+        
+        try:
+            def time_filters(column):
+                return [
+                    *([column >= date_from] if date_from else []),
+                    *([column < date_to] if date_to else [])
+                ]
+            
+            source_filter = [Post.source == source] if source else []
+            post_ids = [entity_id for entity_type, entity_id, _ in candidates if entity_type == 'post']
+            comment_ids = [entity_id for entity_type, entity_id, _ in candidates if entity_type == 'comment']
+            
+            posts = {
+                p.id: p for p in db.query(Post)
+                    .filter(Post.id.in_(post_ids), *time_filters(Post.timestamp), *source_filter)
+                    .all()
+            } if post_ids else {}
+            comments = {
+                c.id: (c, p) for c, p in db.query(Comment, Post)
+                    .join(Post, Comment.post_id == Post.id)
+                    .filter(
+                        Comment.id.in_(comment_ids), Comment.is_spam.isnot(True),
+                        *time_filters(Comment.timestamp), *source_filter
+                    )
+                    .all()
+            } if comment_ids else {}
+            
+            results = []
+            for entity_type, entity_id, score in candidates:
+                if entity_type == 'post' and entity_id in posts:
+                    post = posts[entity_id]
+                    results.append({
+                        'type': 'post',
+                        'id': post.id,
+                        'score': score,
+                        'text': post.caption,
+                        'owner_username': post.owner_username,
+                        'post_id': post.post_id,
+                        'post_url': post.post_url,
+                        'source': post.source,
+                        'timestamp': post.timestamp.isoformat() if post.timestamp else None
+                    })
+                elif entity_type == 'comment' and entity_id in comments:
+                    comment, post = comments[entity_id]
+                    results.append({
+                        'type': 'comment',
+                        'id': comment.id,
+                        'score': score,
+                        'text': comment.comment_text,
+                        'owner_username': comment.owner_username,
+                        'post_id': post.post_id,
+                        'post_url': post.post_url,
+                        'source': post.source,
+                        'timestamp': comment.timestamp.isoformat() if comment.timestamp else None
+                    })
+                if len(results) >= k:
+                    break
+            
+            return {
+                'query': query,
+                'results': results,
+                'took_ms': round((time.perf_counter() - started) * 1000, 1),
+                'index': {'size': self.vector_index.count, 'backend': self.vector_index.backend}
+            }
+        finally:
+            db.close()
+    
+    def generate_weekly_report(self, year: int, week_number: int) -> dict:
+        """
+        Generate and store a weekly report with summary and sentiment analysis
+        Weeks start on Sunday and end on Saturday
+        
+        Args:
+            year: Year for the report
+            week_number: ISO week number (1-53)
             
+        Returns:
+            Report data including summary, sentiment and top topics
+        """
+        from app.config import TOPIC_CONFIG
+        from app.topics import weekly_top_topics
+        
+        report_data = self.build_weekly_report(year, week_number)
+        db = SessionLocal()
+        
+        try:
+            report = self.store_weekly_report(db, report_data)
             db.commit()
-            db.refresh(existing_report)
+            db.refresh(report)
             
             logger.info(f"Generated weekly report for {year}-W{week_number}")
             
             return {
                 'success': True,
-                'report_id': existing_report.id,
-                **report_data
+                'report_id': report.id,
+                **report_data,
+                'top_topics': weekly_top_topics(
+                    db, [report_data['week_start_date']], TOPIC_CONFIG["report_top_topics"]
+                ).get(report_data['week_start_date'], [])
             }
             
         except Exception as e:
@@ -1863,10 +2983,79 @@ class ScrapingOrchestrator:
         finally:
             db.close()
     
+    @staticmethod
+    def weekly_report_bounds(year: int, week_number: int) -> tuple[datetime, datetime]:
+        """Sunday 00:00:00 and Saturday 23:59:59 of a report week"""
+        # ISO week 1 is the week containing the first Thursday
+        jan_4 = datetime(year, 1, 4)
+        week_start = jan_4 - timedelta(days=jan_4.weekday() + 1)  # Previous Sunday
+        week_start = week_start + timedelta(weeks=week_number - 1)
+        week_start = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
+        
+        week_end = week_start + timedelta(days=6, hours=23, minutes=59, seconds=59)
+        return week_start, week_end
+    
+    def build_weekly_report(self, year: int, week_number: int) -> dict:
+        """
+        Summary and sentiment of a week, without storing the report
+        
+        Returns:
+            WeeklyReport column values
+        """
+        week_start, week_end = self.weekly_report_bounds(year, week_number)
+        
+        # Use existing methods to get summary and sentiment
+        summary_result = self.summarize_time_period(
+            start_date=week_start,
+            end_date=week_end
+        )
+        
+        sentiment_result = self.analyze_time_period_sentiment(
+            start_date=week_start,
+            end_date=week_end
+        )
+        
+        return {
+            'year': year,
+            'week_number': week_number,
+            'week_start_date': week_start,
+            'week_end_date': week_end,
+            'post_count': summary_result['post_count'],
+            'comment_count': summary_result['comment_count'],
+            'summary': summary_result['summary'],
+            'sentiment_label': sentiment_result['sentiment_label'],
+            'sentiment_score': sentiment_result['sentiment_score'],
+            'sentiment_breakdown': sentiment_result['sentiment_breakdown'],
+            'generated_at': datetime.utcnow()
+        }
+    
+    @staticmethod
+    def store_weekly_report(db, report_data: dict) -> WeeklyReport:
+        """Create or update the report of report_data's week (caller commits)"""
+        report = db.query(WeeklyReport).filter(
+            WeeklyReport.year == report_data['year'],
+            WeeklyReport.week_number == report_data['week_number']
+        ).first()
+        
+        if report:
+            for key, value in report_data.items():
+                setattr(report, key, value)
+        else:
+            report = WeeklyReport(**report_data)
+            db.add(report)
+        return report
+    
     def analyze_time_period_sentiment(self, days: int = 7, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> dict:
         """
         Analyze sentiment distribution across a time period
         
+        The breakdown and scores are SQL aggregates over results stored in
+        ai_results; the model only runs for items in the period that haven't
+        been analyzed yet. sentiment_score (and the label) is the mean polarity
+        x 100 (ai_tasks.sentiment_polarity): percentage points of positive
+        minus negative items, counted from the 5-class distributions.
+        expected_value is the mean ai_tasks.sentiment_score.
+        
         Args:
             days: Number of days to look back (used if start_date/end_date not provided)
             start_date: Optional start date for the period
@@ -1886,13 +3075,16 @@ class ScrapingOrchestrator:
                 cutoff_date = datetime.utcnow() - timedelta(days=days)
                 end_datetime = datetime.utcnow()
             
-            # Fetch posts from time period
-            posts = db.query(Post).filter(
-                Post.timestamp >= cutoff_date,
-                Post.timestamp <= end_datetime
-            ).all()
+            post_filters = [Post.timestamp >= cutoff_date, Post.timestamp <= end_datetime]
+            comment_filters = [
+                Comment.post_id.in_(select(Post.id).where(*post_filters)),
+                Comment.timestamp >= cutoff_date,
+                Comment.timestamp <= end_datetime
+            ]
             
-            if not posts:
+            post_count = db.query(func.count(Post.id)).filter(*post_filters).scalar()
+            
+            if not post_count:
                 return {
                     'success': True,
                     'sentiment_label': 'neutral',
@@ -1903,49 +3095,48 @@ class ScrapingOrchestrator:
                     'message': f'No content found in the specified period'
                 }
             
-            # Gather all text content
-            all_texts = []
-            total_comments = 0
+            total_comments = db.query(func.count(Comment.id)).filter(*comment_filters).scalar()
             
-            for post in posts:
-                if post.caption:
-                    all_texts.append(post.caption)
-                
-                comments = db.query(Comment).filter(
-                    Comment.post_id == post.id,
-                    Comment.timestamp >= cutoff_date,
-                    Comment.timestamp <= end_datetime
-                ).all()
-                
-                for comment in comments:
-                    all_texts.append(comment.comment_text)
-                    total_comments += 1
+            # Only run the model on items that don't have a stored result yet
+            inferred = self._fill_missing_sentiment(db, 'post', post_filters)
+            inferred += self._fill_missing_sentiment(db, 'comment', comment_filters)
             
-            if not all_texts:
+            # Aggregate stored results in SQL; a post counts by its caption, its
+            # comments on their own (the comment aggregate has its own key)
+            sentiment_counts = {'positive': 0, 'neutral': 0, 'negative': 0}
+            total_score = 0.0
+            total_polarity = 0.0
+            for model, filters in ((Post, post_filters), (Comment, comment_filters)):
+                label = ai_tasks.sentiment_label(model)
+                rows = db.query(
+                    label,
+                    func.count(model.id),
+                    func.sum(ai_tasks.sentiment_score(model)),
+                    func.sum(ai_tasks.sentiment_polarity(model))
+                ).filter(*filters, label.isnot(None))\
+                    .group_by(label)\
+                    .all()
+                for sentiment_label, count, score_sum, polarity_sum in rows:
+                    if sentiment_label in sentiment_counts:
+                        sentiment_counts[sentiment_label] += count
+                    total_score += score_sum or 0.0
+                    total_polarity += polarity_sum or 0.0
+            
+            total_sentiments = sum(sentiment_counts.values())
+            
+            if not total_sentiments:
                 return {
                     'success': True,
                     'sentiment_label': 'neutral',
                     'sentiment_score': 0,
-                    'sentiment_breakdown': {'positive': 0, 'neutral': 0, 'negative': 0},
-                    'post_count': len(posts),
-                    'comment_count': 0,
+                    'sentiment_breakdown': sentiment_counts,
+                    'post_count': post_count,
+                    'comment_count': total_comments,
                     'message': 'No text content to analyze'
                 }
             
-            # Analyze sentiment
-            sentiment_results = self.sentiment_service.batch_analyze(all_texts)
-            
-            # Calculate breakdown
-            sentiment_counts = {
-                'positive': sum(1 for s in sentiment_results if s.label == 'positive'),
-                'neutral': sum(1 for s in sentiment_results if s.label == 'neutral'),
-                'negative': sum(1 for s in sentiment_results if s.label == 'negative')
-            }
-            
-            total_sentiments = len(sentiment_results)
-            sentiment_score = int(
-                (sentiment_counts['positive'] - sentiment_counts['negative']) / total_sentiments * 100
-            )
+            # Mean polarity, scaled to -100..100 (the scale SENTIMENT_TIME_PERIOD_THRESHOLD is on)
+            sentiment_score = int(total_polarity / total_sentiments * 100)
             
             # Determine overall label
             from app.config import SENTIMENT_TIME_PERIOD_THRESHOLD
@@ -1956,15 +3147,17 @@ class ScrapingOrchestrator:
             else:
                 overall_label = 'neutral'
             
-            logger.info(f"Analyzed sentiment from {cutoff_date} to {end_datetime}: {overall_label} ({sentiment_score})")
+            logger.info(f"Analyzed sentiment from {cutoff_date} to {end_datetime}: {overall_label} ({sentiment_score}), {inferred} items newly inferred")
             
             result = {
                 'success': True,
                 'sentiment_label': overall_label,
                 'sentiment_score': sentiment_score,
+                'expected_value': round(total_score / total_sentiments, 4),
                 'sentiment_breakdown': sentiment_counts,
-                'post_count': len(posts),
+                'post_count': post_count,
                 'comment_count': total_comments,
+                'newly_analyzed': inferred,
                 'date_range': {
                     'from': cutoff_date.isoformat(),
                     'to': end_datetime.isoformat()
@@ -1981,3 +3174,9 @@ class ScrapingOrchestrator:
             raise
         finally:
             db.close()
+
+
+@lru_cache()
+def get_orchestrator() -> ScrapingOrchestrator:
+    """Get singleton orchestrator instance shared by the API and the scheduler (loads AI models once)"""
+    return ScrapingOrchestrator()
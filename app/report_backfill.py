@@ -0,0 +1,295 @@
+# type: ignore  # SQLAlchemy Column type annotations have known limitations with type checkers
+"""
+Historical weekly report backfill
+
+plan_weeks() lists the report weeks (Sunday to Saturday) in a date range and
+marks the stale ones: weeks with content but no report, weeks with posts or
+comments collected after their report was generated, and weeks whose
+sentiment was (re)analyzed since, e.g. after a model upgrade. This takes one
+grouped query per table for the whole range.
+
+start_backfill() builds the stale weeks in parallel and upserts each
+WeeklyReport row as soon as its week is done. Progress is recorded in a
+JobExecution row ('weekly_report_backfill'), which
+GET /ai/reports/weekly/backfill/{execution_id} reads.
+
+Only one backfill runs at a time across all API processes. Starts take a
+Postgres advisory lock for their transaction, and a 'running' row blocks new
+ones until it finishes or the process that owns it is gone (see
+jobs.process_gone; rows of other hosts count as running).
+
+With INFERENCE_WORKER_URL set, weeks are built in a process pool. Every
+process runs its own queries and extractive work, and all of them share the
+inference worker's models. Without it, a thread pool shares the in-process
+models, and the micro-batcher merges their concurrent summaries.
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Optional
+import logging
+import multiprocessing
+import threading
+from sqlalchemy import and_, func, select, text
+from app.config import INFERENCE_WORKER_URL, REPORT_BACKFILL_CONFIG
+from app.database import SessionLocal
+from app.jobs import PROCESS, process_gone
+from app.models import AITask, JobExecution, WeeklyReport
+from app.topics import week_start, week_start_expression
+from app import ai_tasks
+
+logger = logging.getLogger(__name__)
+
+JOB_ID = 'weekly_report_backfill'
+
+_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+
+
+def report_weeks(date_from: datetime, date_to: datetime) -> list[tuple]:
+    """(year, ISO week number, Sunday start) of every report week overlapping the range"""
+    weeks = []
+    start = week_start(date_from)
+    while start <= date_to:
+        # Report weeks start the Sunday before their ISO week's Monday
+        year, week_number, _ = (start + timedelta(days=1)).isocalendar()
+        weeks.append((year, week_number, start))
+        start += timedelta(weeks=1)
+    return weeks
+
+
+def _latest_change_per_week(db, first: datetime, last: datetime, sentiment: bool = False) -> dict:
+    """
+    {week start: latest change} over posts and comments with a timestamp in [first, last)
+
+    A change is an item being collected or, with sentiment=True, its sentiment task finishing
+    """
+    latest = {}
+    for entity_type, model in ai_tasks.ENTITY_MODELS.items():
+        changed_at = AITask.updated_at if sentiment else model.collected_at
+        changes = select(week_start_expression(model.timestamp).label('week'), changed_at.label('changed_at'))\
+            .select_from(model)\
+            .where(model.timestamp >= first, model.timestamp < last)
+        if sentiment:
+            changes = changes.join(AITask, and_(
+                AITask.entity_type == entity_type,
+                AITask.entity_id == model.id,
+                AITask.task == ai_tasks.TASK_SENTIMENT,
+                AITask.status == 'done'
+            ))
+        changes = changes.subquery()
+        for week, changed_at in db.query(changes.c.week, func.max(changes.c.changed_at)).group_by(changes.c.week):
+            if changed_at is not None and (week not in latest or changed_at > latest[week]):
+                latest[week] = changed_at
+    return latest
+
+
+def plan_weeks(db, date_from: datetime, date_to: datetime, force: bool = False) -> list[dict]:
+    """
+    Report weeks in a date range and why each one needs rebuilding
+
+    Returns:
+        One entry per week, oldest first. 'reason' is 'forced', 'missing',
+        'new_content', 'reanalyzed' or None (up to date, or no content and no report)
+    """
+    weeks = report_weeks(date_from, date_to)
+    if not weeks:
+        return []
+    first, last = weeks[0][2], weeks[-1][2] + timedelta(weeks=1)
+
+    generated = {}
+    for year, week_number, generated_at in db.query(WeeklyReport.year, WeeklyReport.week_number, WeeklyReport.generated_at)\
+            .filter(WeeklyReport.week_start_date >= first, WeeklyReport.week_start_date < last):
+        generated[(year, week_number)] = generated_at
+    collected = _latest_change_per_week(db, first, last)
+    analyzed = _latest_change_per_week(db, first, last, sentiment=True)
+
+    plan = []
+    for year, week_number, start in weeks:
+        generated_at = generated.get((year, week_number))
+        has_report = (year, week_number) in generated
+        if force and (has_report or start in collected):
+            reason = 'forced'
+        elif not has_report:
+            reason = 'missing' if start in collected else None
+        elif generated_at is None or (collected.get(start) and collected[start] > generated_at):
+            reason = 'new_content'
+        elif analyzed.get(start) and analyzed[start] > generated_at:
+            reason = 'reanalyzed'
+        else:
+            reason = None
+        plan.append({
+            'year': year,
+            'week_number': week_number,
+            'week_start_date': start.isoformat(),
+            'generated_at': generated_at.isoformat() if generated_at else None,
+            'reason': reason
+        })
+    return plan
+
+
+def _build_report(year: int, week_number: int) -> dict:
+    """Runs in a pool worker (module level so a process pool can pickle it)"""
+    from app.orchestrator import get_orchestrator
+    return get_orchestrator().build_weekly_report(year, week_number)
+
+
+def _executor(workers: int):
+    if INFERENCE_WORKER_URL:
+        # spawn: children must not inherit the parent's DB connections
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='report-backfill')
+
+
+def start_backfill(date_from: datetime, date_to: datetime, force: bool = False, workers: Optional[int] = None) -> dict:
+    """
+    Plan a backfill and start building the stale weeks in the background
+
+    Raises:
+        RuntimeError: If a backfill is already running (in any process)
+    """
+    global _thread
+    workers = workers or REPORT_BACKFILL_CONFIG["workers"]
+
+    with _lock:
+        if _thread is not None and _thread.is_alive():
+            raise RuntimeError("A weekly report backfill is already running")
+
+        db = SessionLocal()
+        try:
+            # Serializes starts across processes until this transaction commits
+            db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:job_id))"), {'job_id': JOB_ID})
+            running = db.query(JobExecution)\
+                .filter(JobExecution.job_id == JOB_ID, JobExecution.status == 'running')\
+                .all()
+            live = [e.id for e in running if not process_gone((e.result_summary or {}).get('process'))]
+            if live:
+                raise RuntimeError(f"A weekly report backfill is already running (execution {live[0]})")
+
+            plan = plan_weeks(db, date_from, date_to, force)
+            stale = [w for w in plan if w['reason']]
+
+            # A run whose process is gone can't be resumed, the next plan picks up its weeks
+            if running:
+                db.query(JobExecution)\
+                    .filter(JobExecution.id.in_([e.id for e in running]))\
+                    .update({'status': 'interrupted', 'completed_at': datetime.utcnow()}, synchronize_session=False)
+            execution = JobExecution(
+                job_id=JOB_ID,
+                status='running' if stale else 'completed',
+                started_at=datetime.utcnow(),
+                completed_at=None if stale else datetime.utcnow(),
+                result_summary={
+                    'process': PROCESS,  # Lets later starts tell a live run from one of an exited process
+                    'date_from': date_from.isoformat(),
+                    'date_to': date_to.isoformat(),
+                    'workers': workers,
+                    'total': len(stale),
+                    'done': 0,
+                    'failed': 0,
+                    'skipped': len(plan) - len(stale),
+                    'weeks': {_week_key(w): 'pending' for w in stale},
+                    'errors': {}
+                }
+            )
+            db.add(execution)
+            db.commit()
+            execution_id = execution.id
+        finally:
+            db.close()
+
+        if stale:
+            _thread = threading.Thread(
+                target=_run, args=(execution_id, stale, workers), name="weekly-report-backfill", daemon=True
+            )
+            _thread.start()
+            logger.info(f"Weekly report backfill {execution_id}: {len(stale)} stale weeks, {workers} workers")
+
+    return {'execution_id': execution_id, 'planned': len(stale), 'skipped': len(plan) - len(stale), 'weeks': stale}
+
+
+def _week_key(week: dict) -> str:
+    return f"{week['year']}-W{week['week_number']:02d}"
+
+
+def _run(execution_id: int, weeks: list[dict], workers: int):
+    """Build weeks in the pool, upserting each report together with the progress"""
+    from app.orchestrator import ScrapingOrchestrator
+
+    failed = 0
+    try:
+        with _executor(workers) as executor:
+            futures = {executor.submit(_build_report, w['year'], w['week_number']): w for w in weeks}
+            for future in as_completed(futures):
+                key = _week_key(futures[future])
+                db = SessionLocal()
+                try:
+                    execution = db.query(JobExecution).filter(JobExecution.id == execution_id).first()
+                    progress = dict(execution.result_summary)
+                    progress['weeks'] = dict(progress['weeks'])
+                    try:
+                        ScrapingOrchestrator.store_weekly_report(db, future.result())
+                        progress['done'] += 1
+                        progress['weeks'][key] = 'done'
+                    except Exception as e:
+                        db.rollback()
+                        execution = db.query(JobExecution).filter(JobExecution.id == execution_id).first()
+                        logger.error(f"Weekly report backfill {execution_id}: {key} failed: {e}")
+                        failed += 1
+                        progress['failed'] += 1
+                        progress['weeks'][key] = 'failed'
+                        progress['errors'] = {**progress['errors'], key: str(e)[:500]}
+                    execution.result_summary = progress  # Reassigned, JSON columns don't track in-place changes
+                    db.commit()
+                finally:
+                    db.close()
+        status, error = ('failed', f"{failed} of {len(weeks)} weeks failed") if failed else ('completed', None)
+    except Exception as e:
+        logger.error(f"Weekly report backfill {execution_id} failed: {e}")
+        status, error = 'failed', str(e)
+
+    db = SessionLocal()
+    try:
+        db.query(JobExecution).filter(JobExecution.id == execution_id).update(
+            {'status': status, 'completed_at': datetime.utcnow(), 'error_message': error}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+    logger.info(f"Weekly report backfill {execution_id} {status}")
+
+
+def get_progress(execution_id: int) -> dict:
+    """
+    Progress of a backfill run
+
+    Raises:
+        ValueError: If there is no backfill run with this id
+    """
+    db = SessionLocal()
+    try:
+        execution = db.query(JobExecution)\
+            .filter(JobExecution.id == execution_id, JobExecution.job_id == JOB_ID)\
+            .first()
+        if not execution:
+            raise ValueError(f"Backfill run {execution_id} not found")
+
+        progress = execution.result_summary or {}
+        finished = progress.get('done', 0) + progress.get('failed', 0)
+        remaining = progress.get('total', 0) - finished
+        eta_seconds = None
+        if execution.status == 'running' and finished:
+            elapsed = (datetime.utcnow() - execution.started_at).total_seconds()
+            eta_seconds = int(elapsed / finished * remaining)
+
+        return {
+            'execution_id': execution.id,
+            'status': execution.status,
+            **progress,
+            'remaining': remaining,
+            'eta_seconds': eta_seconds,
+            'started_at': execution.started_at.isoformat() + 'Z' if execution.started_at else None,
+            'completed_at': execution.completed_at.isoformat() + 'Z' if execution.completed_at else None,
+            'error_message': execution.error_message
+        }
+    finally:
+        db.close()
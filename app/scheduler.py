@@ -1,4 +1,5 @@
 import logging
+import os
 from datetime import datetime
 from sqlalchemy.orm import Session
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -11,12 +12,15 @@ logger = logging.getLogger(__name__)
 
 scheduler = BackgroundScheduler()
 
+SCHEDULER_LOCK_FILE = os.getenv('SCHEDULER_LOCK_FILE', '/tmp/instagram-scraper-scheduler.lock')
+_scheduler_lock = None  # Open handle holding the lock while this process runs the scheduler
+
 # Function mappings
 def job_scrape_targets():
-    from app.orchestrator import ScrapingOrchestrator
+    from app.orchestrator import get_orchestrator
     logger.info("Scheduler: Executing job_scrape_targets")
     try:
-        orchestrator = ScrapingOrchestrator()
+        orchestrator = get_orchestrator()
         result = orchestrator.run_target_based_pipeline(
             limit_posts_per_target=10,
             max_posts_for_comments=20,
@@ -25,24 +29,28 @@ def job_scrape_targets():
         logger.info(f"Scheduler: Scrape targets finished. New posts: {result['posts']['added']}, New comments: {result['comments'].get('comments_added', 0)}")
     except Exception as e:
         logger.error(f"Scheduler: Scrape targets failed: {e}")
+        return
+    # New content gets topics and search embeddings right after ingestion
+    job_extract_topics()
+    job_embed_content()
 
 def job_analyze_sentiment():
-    from app.orchestrator import ScrapingOrchestrator
+    from app.orchestrator import get_orchestrator
     logger.info("Scheduler: Executing job_analyze_sentiment")
     try:
-        orchestrator = ScrapingOrchestrator()
-        # Analyze 50 comments and 20 posts per run
-        result_comments = orchestrator.analyze_all_comments_sentiment(batch_size=50)
-        result_posts = orchestrator.analyze_all_posts_sentiment(batch_size=20)
+        orchestrator = get_orchestrator()
+        # Batch sizes follow the autotuned inference batch size
+        result_comments = orchestrator.analyze_all_comments_sentiment()
+        result_posts = orchestrator.analyze_all_posts_sentiment()
         logger.info(f"Scheduler: Sentiment analysis finished. Comments: {result_comments.get('processed', 0)}, Posts: {result_posts.get('processed', 0)}")
     except Exception as e:
         logger.error(f"Scheduler: Sentiment analysis failed: {e}")
 
 def job_weekly_report():
-    from app.orchestrator import ScrapingOrchestrator
+    from app.orchestrator import get_orchestrator
     logger.info("Scheduler: Generating weekly report")
     try:
-        orchestrator = ScrapingOrchestrator()
+        orchestrator = get_orchestrator()
         now = datetime.utcnow()
         # Get ISO calendar year and week
         year, week, _ = now.isocalendar()
@@ -51,12 +59,60 @@ def job_weekly_report():
     except Exception as e:
         logger.error(f"Scheduler: Weekly report generation failed: {e}")
 
+def job_sentiment_backfill():
+    """
+    Watchdog: (re)start the continuous backfill worker if it isn't running
+
+    Scheduled even while the job is inactive: the worker reads is_active itself
+    and pauses, so a resume from any API process reaches it.
+    """
+    from app.backfill import backfill_worker
+    if backfill_worker.start():
+        logger.info("Scheduler: Sentiment backfill worker started")
+
+def job_extract_topics():
+    from app.orchestrator import get_orchestrator
+    logger.info("Scheduler: Extracting topics")
+    try:
+        result = get_orchestrator().extract_topics()
+        logger.info(f"Scheduler: Topic extraction finished. Comments: {result['processed']['comment']}, Posts: {result['processed']['post']}")
+    except Exception as e:
+        logger.error(f"Scheduler: Topic extraction failed: {e}")
+
+def job_embed_content():
+    from app.orchestrator import get_orchestrator
+    logger.info("Scheduler: Embedding posts and comments for semantic search")
+    try:
+        result = get_orchestrator().embed_pending()
+        logger.info(f"Scheduler: Embedding finished. Posts: {result['processed']['post']}, Comments: {result['processed']['comment']}, index size: {result['index']['size']}")
+    except Exception as e:
+        logger.error(f"Scheduler: Embedding failed: {e}")
+
+def job_cluster_comments():
+    from app.orchestrator import get_orchestrator
+    logger.info("Scheduler: Clustering near-duplicate comments")
+    try:
+        result = get_orchestrator().cluster_comments()
+        logger.info(f"Scheduler: Comment clustering finished. Clustered: {result['clustered']}, near-duplicates: {result['duplicates']}")
+    except Exception as e:
+        logger.error(f"Scheduler: Comment clustering failed: {e}")
+
 JOB_FUNCTIONS = {
     'scrape_targets': job_scrape_targets,
     'analyze_sentiment': job_analyze_sentiment,
-    'weekly_report': job_weekly_report
+    'weekly_report': job_weekly_report,
+    'sentiment_backfill': job_sentiment_backfill,
+    'cluster_comments': job_cluster_comments,
+    'extract_topics': job_extract_topics,
+    'embed_content': job_embed_content
 }
 
+# Scheduled whether or not they're active: is_active is a flag the job reads itself
+ALWAYS_SCHEDULED = {'sentiment_backfill'}
+
+# Runs not recorded as JobExecution rows (the backfill worker checkpoints its own row)
+UNRECORDED_JOBS = {'sentiment_backfill'}
+
 DEFAULT_SCHEDULES = [
     {
         'job_id': 'scrape_targets',
@@ -78,6 +134,34 @@ DEFAULT_SCHEDULES = [
         'schedule_type': 'interval',
         'interval_minutes': 720, # 12 hours
         'hour': None, 'minute': None, 'day_of_week': None, 'day_of_month': None
+    },
+    {
+        'job_id': 'sentiment_backfill',
+        'name': 'Sentiment Backfill',
+        'schedule_type': 'interval',
+        'interval_minutes': 5, # Watchdog, the worker itself runs continuously
+        'hour': None, 'minute': None, 'day_of_week': None, 'day_of_month': None
+    },
+    {
+        'job_id': 'cluster_comments',
+        'name': 'Cluster Near-Duplicate Comments',
+        'schedule_type': 'interval',
+        'interval_minutes': 30, # Ingest clusters new comments, this catches up on the rest
+        'hour': None, 'minute': None, 'day_of_week': None, 'day_of_month': None
+    },
+    {
+        'job_id': 'extract_topics',
+        'name': 'Extract Topics',
+        'schedule_type': 'interval',
+        'interval_minutes': 60, # 1 hour, also runs after each scrape_targets run
+        'hour': None, 'minute': None, 'day_of_week': None, 'day_of_month': None
+    },
+    {
+        'job_id': 'embed_content',
+        'name': 'Embed Content for Search',
+        'schedule_type': 'interval',
+        'interval_minutes': 60, # 1 hour, also runs after each scrape_targets run
+        'hour': None, 'minute': None, 'day_of_week': None, 'day_of_month': None
     }
 ]
 
@@ -109,7 +193,7 @@ def schedule_job(schedule: JobSchedule):
     if scheduler.get_job(schedule.job_id):
         scheduler.remove_job(schedule.job_id)
         
-    if not schedule.is_active:
+    if not schedule.is_active and schedule.job_id not in ALWAYS_SCHEDULED:
         logger.info(f"Job {schedule.job_id} is inactive, skipping")
         return
 
@@ -176,11 +260,14 @@ def trigger_now(job_id: str):
 
 from apscheduler.events import EVENT_JOB_SUBMITTED, EVENT_JOB_EXECUTED, EVENT_JOB_ERROR
 from app.models import JobExecution
+from app.events import job_changed
 
 RUNNING_JOBS = set()
 
 def on_job_submitted(event):
     RUNNING_JOBS.add(event.job_id)
+    if event.job_id in UNRECORDED_JOBS:
+        return
     # Record start
     db = SessionLocal()
     try:
@@ -191,6 +278,7 @@ def on_job_submitted(event):
         )
         db.add(execution)
         db.commit()
+        job_changed(event.job_id, 'running', execution.id)
     except Exception as e:
         logger.error(f"Failed to record job start: {e}")
     finally:
@@ -198,6 +286,8 @@ def on_job_submitted(event):
 
 def on_job_finished(event):
     RUNNING_JOBS.discard(event.job_id)
+    if event.job_id in UNRECORDED_JOBS:
+        return
     # Record finish
     db = SessionLocal()
     try:
@@ -220,13 +310,36 @@ def on_job_finished(event):
                 # For simplicity, we just mark completed.)
             
             db.commit()
+            job_changed(event.job_id, execution.status, execution.id, error_message=execution.error_message)
     except Exception as e:
         logger.error(f"Failed to record job finish: {e}")
     finally:
         db.close()
 
+def _acquire_scheduler_lock() -> bool:
+    """
+    Only one process per host runs the scheduler
+
+    With several API workers (gunicorn.conf.py) every worker calls
+    start_scheduler(); the first one to take the file lock wins and keeps it
+    until it exits.
+    """
+    global _scheduler_lock
+    import fcntl
+    handle = open(SCHEDULER_LOCK_FILE, 'w')
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    _scheduler_lock = handle
+    return True
+
 def start_scheduler():
     if not scheduler.running:
+        if not _acquire_scheduler_lock():
+            logger.info("Scheduler already running in another worker process, skipping")
+            return
         init_scheduler_jobs()
         
         # Add listeners
@@ -266,6 +379,13 @@ def determine_job_name(job_id):
     if job_id == 'scrape_targets': return 'Scrape Targets'
     if job_id == 'analyze_sentiment': return 'Analyze Sentiment'
     if job_id == 'weekly_report': return 'Generate Weekly Report'
+    if job_id == 'sentiment_backfill': return 'Sentiment Backfill'
+    if job_id == 'sentiment_backfill_worker': return 'Sentiment Backfill Worker'
+    if job_id == 'weekly_report_backfill': return 'Weekly Report Backfill'
+    if job_id == 'scrape_hashtags': return 'Scrape Hashtags'
+    if job_id == 'scrape_comments': return 'Scrape Comments'
+    if job_id == 'discovery_pipeline': return 'Discovery Pipeline'
+    if job_id == 'full_pipeline': return 'Full Pipeline'
     return job_id
 
 def get_jobs_status():
@@ -310,6 +430,13 @@ def get_jobs_status():
         db.close()
 
 def determine_job_type(job_id):
+    # Jobs submitted through the API (app/jobs.py)
+    if job_id == 'scrape_hashtags':
+        return 'hashtag'
+    if job_id == 'scrape_comments':
+        return 'comments'
+    if job_id == 'discovery_pipeline':
+        return 'discovery'
     if 'scrape' in job_id:
         return 'full_pipeline'
     if 'sentiment' in job_id:
@@ -1,5 +1,6 @@
 """AI Services Module"""
 from .summarization_service import SummarizationService
 from .sentiment_service import SentimentService, SentimentResult
+from .extractive_service import ExtractiveSummarizer
 
-__all__ = ["SummarizationService", "SentimentService", "SentimentResult"]
+__all__ = ["SummarizationService", "SentimentService", "SentimentResult", "ExtractiveSummarizer"]
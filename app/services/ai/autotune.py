@@ -0,0 +1,294 @@
+"""
+Inference batch size / thread count autotuner
+
+Probes a model with a sample of real texts over a grid of batch sizes and
+torch thread counts, and picks the setting with the highest items/sec whose
+p95 batch latency and process memory stay under the configured ceilings.
+
+The choice is persisted per model and host (CPU model, core count, memory,
+device) in a JSON file, so a restart reuses it. The tuner also tracks the
+length of the texts it sees and re-tunes on recent texts when the p50 or p90
+length drifts from the distribution it was tuned on.
+"""
+from collections import deque
+from datetime import datetime
+from typing import Callable, Optional
+import json
+import logging
+import os
+import random
+import threading
+import time
+from .memory import current_rss_mb
+
+logger = logging.getLogger(__name__)
+
+_state_lock = threading.Lock()
+
+
+def host_fingerprint(device: str) -> str:
+    """Identifies the hardware, stable across container restarts"""
+    cpu_model = 'unknown-cpu'
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    cpu_model = line.split(':', 1)[1].strip()
+                    break
+    except OSError:
+        pass
+
+    memory_gb = 0
+    try:
+        memory_gb = round(os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / 1024 ** 3)
+    except (ValueError, OSError, AttributeError):
+        pass
+
+    return f"{cpu_model}|{os.cpu_count()}cpu|{memory_gb}gb|{device}"
+
+
+def _quantiles(lengths: list[int]) -> dict:
+    if not lengths:
+        return {'p50': 0, 'p90': 0}
+    ordered = sorted(lengths)
+    return {
+        'p50': ordered[len(ordered) // 2],
+        'p90': ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))]
+    }
+
+
+class AutoTuner:
+    """
+    Args:
+        name: 'sentiment' or 'summarization'
+        model_name: Part of the persistence key
+        device: Part of the persistence key
+        run_batch: Runs one forward pass over a list of texts
+        config: AUTOTUNE_CONFIG[name] plus drift settings
+        state_file: JSON file holding the tuned profiles
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model_name: str,
+        device: str,
+        run_batch: Callable[[list[str]], object],
+        config: dict,
+        state_file: str,
+        drift_check_every: int = 500,
+        drift_threshold: float = 0.5
+    ):
+        self.name = name
+        self.run_batch = run_batch
+        self.config = config
+        self.state_file = state_file
+        self.drift_check_every = drift_check_every
+        self.drift_threshold = drift_threshold
+        self.key = f"{model_name}@{host_fingerprint(device)}"
+
+        self._lengths: deque = deque(maxlen=2000)
+        self._samples: deque = deque(maxlen=256)  # Recent texts, used when re-tuning after drift
+        self._seen = 0
+        self._tuning = threading.Lock()
+
+        # Read in the process that runs the model (see _in_process): with preload_app
+        # this object is built in the gunicorn master, where torch is held at 1 thread
+        self._thread_budget = 1
+        self._pid: Optional[int] = None
+
+        self.profile = self._load() or {
+            'batch_size': config['default_batch_size'],
+            'threads': None,
+            'tuned_at': None,
+            'source': 'default'
+        }
+        self.drifted = False
+
+    @property
+    def batch_size(self) -> int:
+        self._in_process()
+        return self.profile['batch_size']
+
+    def _in_process(self):
+        """
+        Once per process: take torch's thread count as the budget and apply the profile's threads
+
+        Under gunicorn this first runs in a worker, after post_fork gave it its
+        share of the cores.
+        """
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        import torch
+        self._pid = pid
+        self._thread_budget = torch.get_num_threads()
+        self._apply_threads(self.profile.get('threads'))
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _read_state(self) -> dict:
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _load(self) -> Optional[dict]:
+        profile = self._read_state().get(self.key)
+        if profile:
+            logger.info(f"Autotune: using saved {self.name} profile (batch {profile['batch_size']}, threads {profile['threads']})")
+        return profile  # Its threads are applied by _in_process()
+
+    def _save(self):
+        with _state_lock:
+            state = self._read_state()
+            state[self.key] = self.profile
+            os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+            tmp = f"{self.state_file}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp, self.state_file)
+
+    # ------------------------------------------------------------------
+    # Probing
+    # ------------------------------------------------------------------
+
+    def _apply_threads(self, threads: Optional[int]):
+        if not threads:
+            return
+        import torch
+        torch.set_num_threads(min(threads, self._thread_budget))
+
+    def _thread_candidates(self) -> list[int]:
+        """The process' thread budget and a few divisions of it"""
+        return sorted({max(1, self._thread_budget // d) for d in (1, 2, 4)}, reverse=True)
+
+    def _measure(self, texts: list[str], batch_size: int) -> dict:
+        latencies = []
+        peak_rss = current_rss_mb()
+        for _ in range(self.config['repeats']):
+            batch = random.choices(texts, k=batch_size)
+            started = time.perf_counter()
+            self.run_batch(batch)
+            latencies.append(time.perf_counter() - started)
+            peak_rss = max(peak_rss, current_rss_mb())
+
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return {
+            'batch_size': batch_size,
+            'items_per_sec': round(batch_size * len(latencies) / sum(latencies), 2),
+            'p95_ms': round(p95 * 1000, 1),
+            'rss_mb': peak_rss
+        }
+
+    def tune(self, texts: list[str]) -> dict:
+        """
+        Probe batch sizes x thread counts on sample texts and keep the best feasible setting
+
+        Args:
+            texts: Representative texts (e.g. a random sample of stored comments)
+
+        Returns:
+            The new profile, including the measurements
+        """
+        texts = [t for t in texts if t and t.strip()]
+        if not texts:
+            raise ValueError("No sample texts to tune on")
+
+        self._in_process()
+        with self._tuning:
+            import torch
+            trials = []
+
+            try:
+                self.run_batch(texts[:1])  # Warm-up, not timed
+                for threads in self._thread_candidates():
+                    torch.set_num_threads(threads)
+                    for batch_size in self.config['batch_sizes']:
+                        result = {**self._measure(texts, batch_size), 'threads': threads}
+                        result['feasible'] = (
+                            result['p95_ms'] <= self.config['p95_ceiling_ms']
+                            and result['rss_mb'] <= self.config['memory_ceiling_mb']
+                        )
+                        trials.append(result)
+                        logger.info(f"Autotune {self.name}: {result}")
+                        if not result['feasible']:
+                            break  # Larger batches only get slower / bigger
+            finally:
+                torch.set_num_threads(self._thread_budget)
+
+            feasible = [t for t in trials if t['feasible']] or [min(trials, key=lambda t: t['p95_ms'])]
+            best = max(feasible, key=lambda t: t['items_per_sec'])
+
+            self.profile = {
+                'batch_size': best['batch_size'],
+                'threads': best['threads'],
+                'items_per_sec': best['items_per_sec'],
+                'p95_ms': best['p95_ms'],
+                'rss_mb': best['rss_mb'],
+                'lengths': _quantiles([len(t) for t in texts]),
+                'sample_size': len(texts),
+                'tuned_at': datetime.utcnow().isoformat(),
+                'source': 'autotune',
+                'trials': trials
+            }
+            self._apply_threads(best['threads'])
+            self.drifted = False
+            self._save()
+
+            logger.info(f"Autotune {self.name}: batch {best['batch_size']}, {best['threads']} threads, {best['items_per_sec']} items/sec")
+            return self.profile
+
+    # ------------------------------------------------------------------
+    # Drift detection
+    # ------------------------------------------------------------------
+
+    def observe(self, texts: list[str]):
+        """Record text lengths seen in production; flags drift from the tuned distribution"""
+        self._in_process()
+        for t in texts:
+            self._lengths.append(len(t))
+        if texts:
+            self._samples.extend(random.sample(texts, min(len(texts), 8)))
+
+        self._seen += len(texts)
+        if self._seen < self.drift_check_every:
+            return
+        self._seen = 0
+
+        tuned = self.profile.get('lengths')
+        if not tuned:
+            return
+        current = _quantiles(list(self._lengths))
+        for q in ('p50', 'p90'):
+            if tuned[q] and abs(current[q] - tuned[q]) / tuned[q] > self.drift_threshold:
+                if not self.drifted:
+                    logger.info(f"Autotune {self.name}: text length drifted ({q} {tuned[q]} -> {current[q]}), re-tuning")
+                    self.drifted = True
+                    threading.Thread(target=self.retune_from_recent, name=f"autotune-{self.name}", daemon=True).start()
+                return
+
+    def retune_from_recent(self):
+        """Re-tune on the texts recently seen in production"""
+        if self._tuning.locked():
+            return
+        try:
+            self.tune(list(self._samples))
+        except Exception as e:
+            logger.error(f"Autotune {self.name} re-tune failed: {e}")
+
+    def status(self) -> dict:
+        self._in_process()
+        return {
+            'key': self.key,
+            'thread_budget': self._thread_budget,
+            'profile': {k: v for k, v in self.profile.items() if k != 'trials'},
+            'trials': self.profile.get('trials', []),
+            'observed_lengths': _quantiles(list(self._lengths)),
+            'drifted': self.drifted,
+            'tuning': self._tuning.locked()
+        }
@@ -0,0 +1,173 @@
+"""
+Dynamic micro-batching for concurrent single-item inference requests
+
+Requests that arrive within a short window (up to a max batch size) are run as
+one forward pass and each caller's future is resolved with its own result.
+Items are only batched together when they share a key (e.g. the same
+generation parameters for summarization).
+"""
+from concurrent.futures import Future
+from collections import deque
+from typing import Any, Callable, Hashable, Optional
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _percentile(ordered: list, q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class _Request:
+    __slots__ = ("item", "key", "future", "enqueued_at")
+
+    def __init__(self, item: Any, key: Hashable):
+        self.item = item
+        self.key = key
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Collects items submitted from many threads and runs them in batches
+
+    Args:
+        batch_fn: Called as batch_fn(key, items) and must return one result per item
+                  (an Exception instance in place of a result fails only that item)
+        name: Used in logs and metrics
+        max_batch_size: Max items per forward pass
+        max_wait_ms: How long the first item in a batch waits for company
+        latency_slo_ms: Target end-to-end latency; while the recent p95 is above it
+                        the wait window is skipped and batches are dispatched immediately
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[Hashable, list], list],
+        name: str,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10,
+        latency_slo_ms: float = 1000
+    ):
+        self.batch_fn = batch_fn
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.latency_slo = latency_slo_ms / 1000
+
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._pending: deque = deque()  # Items pulled from the queue but left for a later batch (different key)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        # Metrics
+        self._latencies: deque = deque(maxlen=1000)
+        self._batches = 0
+        self._items = 0
+        self._slo_violations = 0
+        self._max_queue_depth = 0
+
+    def submit(self, item: Any, key: Hashable = None) -> Future:
+        """Queue an item and return a future resolved with its result"""
+        self._ensure_started()
+        request = _Request(item, key)
+        self._queue.put(request)
+        depth = self._queue.qsize()
+        if depth > self._max_queue_depth:
+            self._max_queue_depth = depth
+        return request.future
+
+    def run(self, item: Any, key: Hashable = None) -> Any:
+        """Submit an item and block until its result is ready"""
+        return self.submit(item, key).result()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name=f"microbatch-{self.name}", daemon=True)
+                self._thread.start()
+
+    def _next_request(self, timeout: Optional[float]) -> Optional[_Request]:
+        if self._pending:
+            return self._pending.popleft()
+        try:
+            return self._queue.get(timeout=timeout) if timeout is None or timeout > 0 else self._queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _loop(self):
+        while True:
+            first = self._next_request(timeout=None)
+            batch = [first]
+            leftovers = []
+
+            # Skip the wait window while we're missing the latency target
+            wait = 0 if self._p95() > self.latency_slo else self.max_wait
+            deadline = first.enqueued_at + wait
+
+            while len(batch) < self.max_batch_size:
+                request = self._next_request(timeout=deadline - time.perf_counter())
+                if request is None:
+                    break
+                if request.key == first.key:
+                    batch.append(request)
+                else:
+                    leftovers.append(request)
+
+            self._pending.extend(leftovers)
+            self._dispatch(first.key, batch)
+
+    def _dispatch(self, key: Hashable, batch: list):
+        try:
+            results = self.batch_fn(key, [r.item for r in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name} batch returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            logger.error(f"Micro-batch {self.name} failed ({len(batch)} items): {e}")
+            results = [e] * len(batch)
+
+        now = time.perf_counter()
+        for request, result in zip(batch, results):
+            if isinstance(result, Exception):
+                request.future.set_exception(result)
+            else:
+                request.future.set_result(result)
+            latency = now - request.enqueued_at
+            self._latencies.append(latency)
+            if latency > self.latency_slo:
+                self._slo_violations += 1
+
+        self._batches += 1
+        self._items += len(batch)
+
+    def _p95(self) -> float:
+        return _percentile(sorted(self._latencies), 0.95)
+
+    def metrics(self) -> dict:
+        ordered = sorted(self._latencies)
+        return {
+            'name': self.name,
+            'queue_depth': self._queue.qsize() + len(self._pending),
+            'max_queue_depth': self._max_queue_depth,
+            'batches': self._batches,
+            'items': self._items,
+            'avg_batch_size': round(self._items / self._batches, 2) if self._batches else 0,
+            'latency_ms': {
+                'p50': round(_percentile(ordered, 0.5) * 1000, 1) if ordered else None,
+                'p95': round(_percentile(ordered, 0.95) * 1000, 1) if ordered else None,
+            },
+            'slo': {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'latency_slo_ms': self.latency_slo * 1000,
+                'violations': self._slo_violations,
+            }
+        }
@@ -0,0 +1,168 @@
+"""
+Thin client for the standalone inference worker (app/services/ai/worker.py)
+
+RemoteSentimentService, RemoteSummarizationService and RemoteEmbeddingService
+expose the same methods as the in-process services, so the orchestrator can
+use either one.
+"""
+from typing import Optional
+import json
+import logging
+import urllib.error
+import urllib.request
+import numpy as np
+from app.config import INFERENCE_WORKER_URL, INFERENCE_WORKER_TIMEOUT, EMBEDDING_CONFIG
+from .sentiment_service import SentimentResult
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceClient:
+    """Minimal JSON-over-HTTP client for the inference worker"""
+
+    def __init__(self, base_url: str = INFERENCE_WORKER_URL, timeout: int = INFERENCE_WORKER_TIMEOUT):
+        if not base_url:
+            raise ValueError("INFERENCE_WORKER_URL is not set")
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def post(self, path: str, payload: dict) -> dict:
+        """
+        POST a JSON payload to the worker
+
+        Raises:
+            ValueError: If the worker rejected the input (HTTP 400), mirroring the local services
+            RuntimeError: If the worker is unreachable or failed
+        """
+        request = urllib.request.Request(
+            f"{self.base_url}{path}",
+            data=json.dumps(payload).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            detail = e.read().decode('utf-8', errors='replace')
+            if e.code == 400:
+                raise ValueError(json.loads(detail).get('detail', detail))
+            logger.error(f"Inference worker {path} failed with {e.code}: {detail}")
+            raise RuntimeError(f"Inference worker error {e.code}: {detail}")
+        except urllib.error.URLError as e:
+            logger.error(f"Inference worker unreachable at {self.base_url}: {e.reason}")
+            raise RuntimeError(f"Inference worker unreachable: {e.reason}")
+
+    def get(self, path: str, timeout: Optional[int] = None) -> dict:
+        try:
+            with urllib.request.urlopen(f"{self.base_url}{path}", timeout=timeout or self.timeout) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except urllib.error.URLError as e:
+            raise RuntimeError(f"Inference worker unreachable: {e.reason}")
+
+    def health(self) -> dict:
+        return self.get('/health', timeout=5)
+
+
+class RemoteSentimentService:
+    """Same interface as SentimentService, backed by the inference worker"""
+
+    def __init__(self, client: Optional[InferenceClient] = None):
+        self.client = client or InferenceClient()
+
+    def analyze(self, text: str) -> SentimentResult:
+        if not text or len(text.strip()) == 0:
+            raise ValueError("Cannot analyze empty text")
+        result = self.client.post('/sentiment/analyze', {'text': text})
+        return SentimentResult(label=result['label'], score=result['score'], probs=result.get('probs'))
+
+    def autotune(self, texts: list[str]) -> dict:
+        return self.client.post('/autotune/sentiment', {'texts': texts})
+    
+    def autotune_status(self) -> dict:
+        return self.client.get('/autotune', timeout=5).get('sentiment', {})
+    
+    def batch_analyze(self, texts: list[str]) -> list[SentimentResult]:
+        """Raises RuntimeError when the worker fails, like the local service re-raises model errors"""
+        if not texts:
+            return []
+        results = self.client.post('/sentiment/batch', {'texts': texts})['results']
+        return [SentimentResult(label=r['label'], score=r['score'], source=r.get('source'), probs=r.get('probs')) for r in results]
+
+    # Pipeline stages of SentimentService; the worker tokenizes, so forward() is the whole request
+
+    def tokenize(self, texts: list[str]) -> list:
+        return [texts]
+
+    def forward(self, chunks: list) -> list:
+        return [self.batch_analyze(texts) for texts in chunks]
+
+    def decode(self, outputs: list) -> list[SentimentResult]:
+        return [result for results in outputs for result in results]
+
+
+class RemoteSummarizationService:
+    """Same interface as SummarizationService, backed by the inference worker"""
+
+    def __init__(self, client: Optional[InferenceClient] = None):
+        self.client = client or InferenceClient()
+
+    def summarize(
+        self,
+        text: str,
+        max_length: Optional[int] = None,
+        min_length: Optional[int] = None
+    ) -> str:
+        if not text or len(text.strip()) < 10:
+            raise ValueError("Text too short to summarize")
+        result = self.client.post('/summarize', {
+            'text': text,
+            'max_length': max_length,
+            'min_length': min_length
+        })
+        return result['summary']
+
+    def autotune(self, texts: list[str]) -> dict:
+        return self.client.post('/autotune/summarization', {'texts': texts})
+    
+    def autotune_status(self) -> dict:
+        return self.client.get('/autotune', timeout=5).get('summarization', {})
+    
+    def count_tokens(self, texts: list[str]) -> list[int]:
+        if not texts:
+            return []
+        return self.client.post('/summarize/tokens', {'texts': texts})['counts']
+    
+    def batch_summarize(
+        self,
+        texts: list[str],
+        max_length: Optional[int] = None,
+        min_length: Optional[int] = None,
+        raise_errors: bool = False
+    ) -> list[str]:
+        if not texts:
+            return []
+        try:
+            return self.client.post('/summarize/batch', {
+                'texts': texts,
+                'max_length': max_length,
+                'min_length': min_length,
+                'raise_errors': raise_errors
+            })['summaries']
+        except Exception as e:
+            logger.error(f"Remote batch summarization failed: {e}")
+            if raise_errors:
+                raise
+            return list(texts)  # Fallback to original, like the local service
+
+
+class RemoteEmbeddingService:
+    """Same interface as EmbeddingService, backed by the inference worker"""
+
+    def __init__(self, client: Optional[InferenceClient] = None):
+        self.client = client or InferenceClient()
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, EMBEDDING_CONFIG["dimension"]), dtype=np.float32)
+        return np.asarray(self.client.post('/embed', {'texts': texts})['vectors'], dtype=np.float32)
@@ -0,0 +1,113 @@
+"""
+Token-budgeted comment selection for abstractive summaries
+
+Instead of joining many comments and letting the tokenizer truncate, fill the
+model's input budget exactly:
+
+1. Near-identical comments (same content words) collapse into one, carrying
+   the likes of the whole group
+2. The rest are ranked by MMR over TF-IDF (relevance weighted by likes,
+   penalized by similarity to comments already picked)
+3. Comments are added greedily in that order while they fit the token budget;
+   token counts come from the summarizer's tokenizer and are cached by the
+   caller, so a comment is tokenized once
+
+Work per summary is bounded by the candidate pool the caller passes in, not by
+the number of comments under the post.
+"""
+from itertools import islice
+from typing import Callable, Optional
+from .extractive_service import ExtractiveSummarizer, content_key
+
+COUNT_BATCH = 64  # Candidates tokenized per call, in rank order
+
+
+class CommentBudgetSelector:
+    """
+    Args:
+        count_tokens: Token count per text, from the summarizer's tokenizer
+        ranker: ExtractiveSummarizer providing the MMR ranking
+        token_budget: Max input tokens for the joined selection
+        min_tokens: Stop once less than this is left in the budget
+    """
+
+    def __init__(
+        self,
+        count_tokens: Callable[[list[str]], list[int]],
+        ranker: ExtractiveSummarizer,
+        token_budget: int,
+        min_tokens: int = 8
+    ):
+        self.count_tokens = count_tokens
+        self.ranker = ranker
+        self.token_budget = token_budget
+        self.min_tokens = min_tokens
+
+    @staticmethod
+    def dedupe(texts: list[str], likes: Optional[list[int]] = None) -> tuple[list[int], list[int]]:
+        """
+        Collapse near-identical texts
+
+        Returns:
+            (indices of the kept texts, summed likes of each kept text's group)
+        """
+        likes = likes or [0] * len(texts)
+        groups = {}
+        for i, text in enumerate(texts):
+            key = content_key(text) or text.strip()
+            groups.setdefault(key, []).append(i)
+
+        kept, group_likes = [], []
+        for members in groups.values():
+            kept.append(max(members, key=lambda i: likes[i] or 0))
+            group_likes.append(sum(likes[i] or 0 for i in members))
+        order = sorted(range(len(kept)), key=lambda j: kept[j])
+        return [kept[j] for j in order], [group_likes[j] for j in order]
+
+    def select(
+        self,
+        lines: list[str],
+        likes: Optional[list[int]] = None,
+        token_counts: Optional[list[Optional[int]]] = None
+    ) -> dict:
+        """
+        Pick the lines to feed the model
+
+        Args:
+            lines: Model input lines, one per comment (already prefixed)
+            likes: Optional likes per line; None ranks by content only
+            token_counts: Cached token counts per line (None where unknown)
+
+        Returns:
+            {'indices': selected line indices in original order,
+             'tokens': tokens used,
+             'duplicates': lines dropped as near-identical,
+             'counted': {index: tokens} for lines tokenized by this call (to cache)}
+        """
+        token_counts = list(token_counts or [None] * len(lines))
+        kept, kept_likes = self.dedupe(lines, likes)
+
+        ranked = self.ranker.rank([lines[i] for i in kept], kept_likes if likes is not None else None)
+        ranked = (kept[j] for j in ranked)
+
+        selected, used, counted = [], 0, {}
+        while self.token_budget - used >= self.min_tokens:
+            batch = list(islice(ranked, COUNT_BATCH))
+            if not batch:
+                break
+
+            missing = [i for i in batch if token_counts[i] is None]
+            for i, count in zip(missing, self.count_tokens([lines[i] for i in missing])):
+                token_counts[i] = counted[i] = count
+
+            for i in batch:
+                if used + token_counts[i] <= self.token_budget:
+                    selected.append(i)
+                    used += token_counts[i]
+
+        return {
+            'indices': sorted(selected),
+            'tokens': used,
+            'duplicates': len(lines) - len(kept),
+            'counted': counted
+        }
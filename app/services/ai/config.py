@@ -1,9 +1,13 @@
 """AI Service Configuration"""
-import torch
+from functools import lru_cache
 from typing import Literal
 
 # Device configuration
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+# Resolved on first use so that importing the config doesn't pull in torch
+@lru_cache()
+def get_device() -> str:
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
 
 # Model names
 SUMMARIZATION_MODEL = "fatmaserry/AraT5v2-arabic-summarization"
@@ -0,0 +1,60 @@
+"""
+Sentence embeddings (multilingual MiniLM, mean pooling)
+
+Plain transformers, no sentence-transformers dependency: token embeddings
+are mean-pooled over the attention mask and L2-normalized, so a dot product
+is the cosine similarity.
+"""
+import logging
+import numpy as np
+from .config import get_device
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingService:
+    """
+    Args:
+        model_name: HF model id (a sentence-transformers checkpoint)
+        batch_size: Texts per forward pass
+        max_length: Token limit per text
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 64, max_length: int = 128):
+        from transformers import AutoTokenizer, AutoModel
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.device = get_device()
+        logger.info(f"Loading embedding model: {model_name}")
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name, low_cpu_mem_usage=True)
+        self.model.to(self.device)
+        self.model.eval()
+        self.dimension = self.model.config.hidden_size
+        logger.info(f"Embedding model loaded on {self.device}")
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """L2-normalized float32 embeddings, one row per text"""
+        import torch
+
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+
+        chunks = []
+        for i in range(0, len(texts), self.batch_size):
+            inputs = self.tokenizer(
+                texts[i:i + self.batch_size],
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+                max_length=self.max_length
+            ).to(self.device)
+            with torch.no_grad():
+                hidden = self.model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
+            chunks.append(pooled.cpu().numpy().astype(np.float32))
+        return np.concatenate(chunks)
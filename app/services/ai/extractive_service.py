@@ -0,0 +1,153 @@
+"""
+Model-free extractive summarization (fast tier)
+
+Picks the most representative comments/sentences instead of generating text:
+TF-IDF vectors, relevance to the (optionally weighted) centroid, and Maximal
+Marginal Relevance (MMR) so the picks don't repeat each other. Everything is
+vectorized with NumPy and runs in milliseconds, so it can serve dashboard
+digests directly or pre-select the input for the abstractive model.
+"""
+from collections import Counter
+from itertools import islice
+from typing import Iterator, Optional
+import logging
+import math
+import re
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[^\W\d_]{2,}", re.UNICODE)
+_SENTENCE_RE = re.compile(r"(?<=[.!?؟])\s+|\n+")
+_DIACRITICS_RE = re.compile(r"[ً-ْٰـ]")  # Harakat, dagger alef, tatweel
+
+_ARABIC_NORMALIZATION = str.maketrans({'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ى': 'ي', 'ة': 'ه', 'ؤ': 'و', 'ئ': 'ي'})
+
+STOPWORDS = {
+    # Arabic (normalized)
+    'في', 'من', 'علي', 'الي', 'عن', 'مع', 'هذا', 'هذه', 'ذلك', 'تلك', 'التي', 'الذي', 'الذين', 'ان', 'او',
+    'ما', 'لا', 'لم', 'لن', 'قد', 'كل', 'كان', 'كانت', 'هو', 'هي', 'هم', 'انا', 'نحن', 'انت', 'كما', 'بعد',
+    'قبل', 'حتي', 'اذا', 'ثم', 'بين', 'عند', 'لكن', 'يا', 'ولا', 'وفي', 'ومن', 'به', 'بها', 'له', 'لها',
+    # English
+    'the', 'and', 'for', 'are', 'was', 'this', 'that', 'with', 'you', 'your', 'our', 'have', 'has', 'but',
+    'not', 'all', 'from', 'they', 'will', 'can', 'its', 'his', 'her', 'their', 'what', 'who', 'how',
+}
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip Arabic diacritics/tatweel and unify alef/yeh/teh marbuta forms"""
+    return _DIACRITICS_RE.sub('', (text or '').lower()).translate(_ARABIC_NORMALIZATION)
+
+
+def tokenize(text: str) -> list[str]:
+    """Normalized content words in order (stopwords, digits and 1-letter tokens dropped)"""
+    return [t for t in _TOKEN_RE.findall(normalize(text)) if t not in STOPWORDS]
+
+
+def content_key(text: str) -> str:
+    """Normalized content words, equal for near-identical texts (case, diacritics, punctuation, emoji, stopwords ignored)"""
+    return " ".join(tokenize(text or ''))
+
+
+def split_sentences(text: str) -> list[str]:
+    return [s.strip() for s in _SENTENCE_RE.split(text or '') if s and s.strip()]
+
+
+class ExtractiveSummarizer:
+    """
+    TF-IDF centroid + MMR selection
+
+    Args:
+        max_features: Vocabulary cap (most frequent terms by document frequency)
+        diversity: MMR trade-off, 0 = pure relevance, 1 = pure novelty
+    """
+
+    def __init__(self, max_features: int = 4096, diversity: float = 0.3):
+        self.max_features = max_features
+        self.diversity = diversity
+
+    def _vectorize(self, texts: list[str]) -> np.ndarray:
+        """L2-normalized TF-IDF matrix (texts x terms)"""
+        docs = [Counter(tokenize(t)) for t in texts]
+        df = Counter(term for doc in docs for term in doc)
+        vocabulary = {term: i for i, (term, _) in enumerate(df.most_common(self.max_features))}
+
+        matrix = np.zeros((len(texts), max(len(vocabulary), 1)), dtype=np.float32)
+        for row, doc in enumerate(docs):
+            for term, count in doc.items():
+                col = vocabulary.get(term)
+                if col is not None:
+                    matrix[row, col] = 1 + math.log(count)
+
+        idf = np.zeros(matrix.shape[1], dtype=np.float32)
+        for term, col in vocabulary.items():
+            idf[col] = math.log((1 + len(texts)) / (1 + df[term])) + 1
+        matrix *= idf
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    def rank(self, texts: list[str], weights: Optional[list[float]] = None) -> Iterator[int]:
+        """
+        Yield text indices in MMR order (most representative first, each next one
+        trading relevance against similarity to those already yielded)
+
+        Args:
+            texts: Candidate texts (comments or sentences)
+            weights: Optional importance per text (e.g. likes), pulls the centroid towards them
+        """
+        candidates = [i for i, t in enumerate(texts) if t and t.strip()]
+        if len(candidates) <= 1:
+            yield from candidates
+            return
+
+        matrix = self._vectorize([texts[i] for i in candidates])
+
+        w = np.ones(len(candidates), dtype=np.float32)
+        if weights is not None:
+            w += np.log1p(np.maximum(np.asarray([weights[i] or 0 for i in candidates], dtype=np.float32), 0))
+        centroid = (matrix * w[:, None]).sum(axis=0)
+        centroid /= np.linalg.norm(centroid) or 1
+        relevance = matrix @ centroid
+
+        best = int(np.argmax(relevance))
+        max_similarity = matrix @ matrix[best]
+        available = np.ones(len(candidates), dtype=bool)
+        available[best] = False
+        yield candidates[best]
+
+        for _ in range(len(candidates) - 1):
+            scores = (1 - self.diversity) * relevance - self.diversity * max_similarity
+            scores[~available] = -np.inf
+            best = int(np.argmax(scores))
+            available[best] = False
+            max_similarity = np.maximum(max_similarity, matrix @ matrix[best])
+            yield candidates[best]
+
+    def select(self, texts: list[str], k: int, weights: Optional[list[float]] = None) -> list[int]:
+        """
+        Pick up to k representative, mutually diverse texts
+
+        Args:
+            texts: Candidate texts (comments or sentences)
+            k: Number of texts to keep
+            weights: Optional importance per text (e.g. likes), pulls the centroid towards them
+
+        Returns:
+            Indices of the selected texts, in their original order
+        """
+        candidates = [i for i, t in enumerate(texts) if t and t.strip()]
+        if len(candidates) <= k:
+            return candidates
+        return sorted(islice(self.rank(texts, weights), k))
+
+    def summarize(self, texts: list[str], k: int = 5, weights: Optional[list[float]] = None) -> str:
+        """Digest of the k most representative texts, one per line"""
+        return "\n".join(texts[i].strip() for i in self.select(texts, k, weights))
+
+    def summarize_text(self, text: str, max_sentences: int = 2) -> str:
+        """Digest of a single long text (its most representative sentences)"""
+        sentences = split_sentences(text)
+        if len(sentences) <= max_sentences:
+            return (text or '').strip()
+        return " ".join(sentences[i] for i in self.select(sentences, max_sentences))
@@ -0,0 +1,136 @@
+"""
+Hierarchical (map-reduce) summarization for content that doesn't fit in one model input
+
+Map: texts are packed into token-budgeted chunks (never crossing a group
+boundary, e.g. a day) and all chunks are summarized in one batch.
+Reduce: the chunk summaries are packed and summarized again, level by level,
+until everything fits in a single input for the final summary.
+
+Chunk summaries are cached by content hash, so regenerating only runs the
+model for chunks whose text changed.
+
+A model failure raises instead of passing the chunk's source text on as its
+summary. If max_levels is reached with several chunks left, the final input
+is cut at the model's max length, and the result says so ('truncated').
+"""
+from typing import Optional, Protocol
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SummaryCacheBackend(Protocol):
+    def get_many(self, keys: list[str]) -> dict: ...
+    def put_many(self, summaries: dict) -> None: ...
+
+
+class HierarchicalSummarizer:
+    """
+    Map-reduce summarizer on top of a summarization service
+
+    Args:
+        service: SummarizationService or RemoteSummarizationService
+        model_name: Part of the cache key, so a model change invalidates old summaries
+        chunk_token_budget: Max input tokens per chunk (keep below the model's max input length)
+        chunk_max_length: Max summary length for intermediate (chunk) summaries
+        max_levels: Safety limit on reduce levels
+        cache: Optional backend with get_many(keys) / put_many({key: summary})
+    """
+
+    def __init__(
+        self,
+        service,
+        model_name: str,
+        chunk_token_budget: int = 900,
+        chunk_max_length: int = 120,
+        max_levels: int = 4,
+        cache: Optional[SummaryCacheBackend] = None
+    ):
+        self.service = service
+        self.model_name = model_name
+        self.chunk_token_budget = chunk_token_budget
+        self.chunk_max_length = chunk_max_length
+        self.max_levels = max_levels
+        self.cache = cache
+
+    def _pack(self, groups: list[list[str]]) -> list[str]:
+        """Greedily pack each group's texts into chunks of at most chunk_token_budget tokens"""
+        flat = [text for group in groups for text in group]
+        counts = iter(self.service.count_tokens(flat)) if flat else iter(())
+
+        chunks = []
+        for group in groups:
+            current, current_tokens = [], 0
+            for text in group:
+                tokens = next(counts)
+                if current and current_tokens + tokens > self.chunk_token_budget:
+                    chunks.append("\n".join(current))
+                    current, current_tokens = [], 0
+                current.append(text)  # A single oversized text gets its own (truncated) chunk
+                current_tokens += tokens
+            if current:
+                chunks.append("\n".join(current))
+        return chunks
+
+    def _key(self, text: str, max_length: int) -> str:
+        return hashlib.sha256(f"{self.model_name}|{max_length}|{text}".encode('utf-8')).hexdigest()
+
+    def _summarize_chunks(self, chunks: list[str], max_length: int, stats: dict) -> list[str]:
+        """Summarize chunks in one batch, skipping those already cached"""
+        keys = [self._key(chunk, max_length) for chunk in chunks]
+        cached = self.cache.get_many(list(set(keys))) if self.cache else {}
+
+        hits = sum(1 for key in keys if key in cached)
+        missing = {key: chunk for key, chunk in zip(keys, chunks) if key not in cached}
+        if missing:
+            summaries = self.service.batch_summarize(list(missing.values()), max_length=max_length, raise_errors=True)
+            fresh = dict(zip(missing.keys(), summaries))
+            if self.cache:
+                self.cache.put_many(fresh)
+            cached.update(fresh)
+
+        stats['chunks'] += len(chunks)
+        stats['cached_chunks'] += hits
+        return [cached[key] for key in keys]
+
+    def summarize(self, groups: list[list[str]], max_length: int) -> dict:
+        """
+        Summarize grouped texts
+
+        Args:
+            groups: Lists of texts; chunks never mix texts from different groups
+            max_length: Max length of the final summary
+
+        Returns:
+            {'summary', 'levels', 'chunks', 'cached_chunks', 'truncated'}; truncated is
+            True when max_levels left several chunks, so the final input was cut
+
+        Raises:
+            ValueError: If there is no text to summarize
+            RuntimeError: If the model failed on a chunk
+        """
+        groups = [[t for t in group if t and t.strip()] for group in groups]
+        groups = [group for group in groups if group]
+        if not groups:
+            raise ValueError("Text too short to summarize")
+
+        stats = {'levels': 0, 'chunks': 0, 'cached_chunks': 0}
+        chunks = self._pack(groups)
+
+        # Reduce until everything fits in one input
+        while len(chunks) > 1 and stats['levels'] < self.max_levels:
+            stats['levels'] += 1
+            summaries = self._summarize_chunks(chunks, self.chunk_max_length, stats)
+            chunks = self._pack([summaries])
+            logger.info(f"Hierarchical summary level {stats['levels']}: {len(summaries)} chunk summaries -> {len(chunks)} chunks")
+
+        stats['truncated'] = len(chunks) > 1
+        if stats['truncated']:
+            logger.warning(
+                f"Hierarchical summary stopped at {self.max_levels} levels with {len(chunks)} chunks left, "
+                f"the final summary only sees what fits in one input"
+            )
+
+        final = self._summarize_chunks(["\n".join(chunks)], max_length, stats)[0]
+        return {'summary': final, **stats}
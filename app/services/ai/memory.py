@@ -0,0 +1,38 @@
+"""
+Per-process memory report
+
+Reads /proc/self/smaps_rollup (Linux) to show how much of a worker's memory is
+shared with its siblings. With preloaded models, the weights should show up as
+Shared_* rather than Private_*, and Pss should be roughly RSS / workers.
+"""
+import os
+
+SMAPS_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty', 'Swap')
+
+
+def process_memory() -> dict:
+    """Memory breakdown of the current process in MB"""
+    report = {'pid': os.getpid(), 'ppid': os.getppid()}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in SMAPS_FIELDS:
+                    report[f"{key.lower()}_mb"] = round(int(value.split()[0]) / 1024, 1)  # Values are in kB
+    except OSError:
+        report['error'] = 'smaps_rollup not available on this platform'
+        return report
+
+    shared = report.get('shared_clean_mb', 0) + report.get('shared_dirty_mb', 0)
+    report['shared_percent'] = round(shared / report['rss_mb'] * 100, 1) if report.get('rss_mb') else 0
+    return report
+
+
+def current_rss_mb() -> float:
+    """Resident memory of the current process in MB (cheap, for sampling in loops)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return round(int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024, 1)
+    except (OSError, ValueError):
+        import resource
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # Peak, in kB on Linux
@@ -0,0 +1,89 @@
+"""
+MinHash signatures and LSH banding for near-duplicate detection
+
+Texts are normalized (case, Arabic diacritics/letter forms, mentions, URLs,
+punctuation, stretched letters like "راااائع"), cut into character shingles
+and reduced to a fixed-size MinHash signature. The fraction of equal signature
+slots estimates the Jaccard similarity of two texts' shingle sets.
+
+For lookup the signature is split into bands; two texts sharing any band key
+are near-duplicate candidates. Band keys are plain 64-bit integers, so the
+index is a single table (comment_lsh_buckets) and a lookup is an indexed IN.
+
+Hash seeds are fixed, so signatures and band keys are stable across processes
+and restarts.
+"""
+from typing import Optional
+import hashlib
+import re
+import unicodedata
+import zlib
+import numpy as np
+from .extractive_service import normalize
+
+_PRIME = np.uint64(4294967311)  # Smallest prime above 2^32; a*x + b stays below 2^64 for 32-bit x
+_URL_MENTION_RE = re.compile(r"https?://\S+|www\.\S+|@[\w.]+", re.IGNORECASE | re.UNICODE)
+_REPEAT_RE = re.compile(r"(.)\1{2,}")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_for_dedup(text: Optional[str]) -> str:
+    """Text with everything that doesn't change what a comment says removed"""
+    text = _URL_MENTION_RE.sub(' ', normalize(text or ''))
+    text = ''.join(' ' if unicodedata.category(c).startswith('P') else c for c in text)
+    text = _REPEAT_RE.sub(r'\1', text)
+    return _SPACE_RE.sub(' ', text).strip()
+
+
+class MinHasher:
+    """
+    Args:
+        num_perm: Signature size (hash functions)
+        bands: LSH bands, num_perm must divide evenly; more bands catch lower similarities
+        shingle_size: Characters per shingle
+        seed: Fixes the hash functions, changing it invalidates stored band keys
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 8, shingle_size: int = 3, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        # RandomState is frozen across NumPy versions, so the functions never change
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 2 ** 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 2 ** 32, size=num_perm, dtype=np.uint64)
+
+    def shingles(self, normalized: str) -> set[str]:
+        n = self.shingle_size
+        if len(normalized) <= n:
+            return {normalized}
+        return {normalized[i:i + n] for i in range(len(normalized) - n + 1)}
+
+    def signature(self, text: Optional[str]) -> Optional[np.ndarray]:
+        """MinHash signature of a text, None when nothing is left after normalization"""
+        normalized = normalize_for_dedup(text)
+        if not normalized:
+            return None
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode('utf-8')) for s in self.shingles(normalized)), dtype=np.uint64
+        )
+        # (perm x shingles) universal hashes, min per permutation
+        return ((np.outer(self._a, hashes) + self._b[:, None]) % _PRIME).min(axis=1)
+
+    def band_keys(self, signature: np.ndarray) -> list[int]:
+        """One signed 64-bit key per band (fits a BIGINT column)"""
+        keys = []
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows]
+            digest = hashlib.blake2b(chunk.tobytes(), digest_size=8, person=band.to_bytes(2, 'little')).digest()
+            keys.append(int.from_bytes(digest, 'little', signed=True))
+        return keys
+
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray) -> float:
+        """Estimated Jaccard similarity of the texts behind two signatures"""
+        return float(np.mean(a == b))
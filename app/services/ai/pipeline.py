@@ -0,0 +1,208 @@
+"""
+Staged batch pipelines: a producer thread and one thread per stage, joined by bounded queues
+
+Bulk jobs used to take every batch through read -> tokenize -> forward pass ->
+decode -> write back before starting the next one, leaving the CPU idle in
+the non-model stages. With each stage on its own thread, batch N+1 is read and
+tokenized and batch N-1 decoded and written while batch N is in the model.
+Tokenizers (Rust) and torch release the GIL, so stages really run in parallel.
+
+Queues hold at most queue_size items, so a slow stage holds back the ones
+before it. Items come out in the order they went in. An exception in the
+producer or a stage stops the pipeline and is re-raised to the consumer.
+"""
+from typing import Callable, Iterable, Iterator, Optional
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class CpuMeter:
+    """
+    CPU seconds spent on the pipeline's own threads (time.thread_time per call)
+
+    Unlike process_time, this leaves out the API's request threads and any
+    other job running in the same process. Work torch hands to its intra-op
+    thread pool isn't counted either.
+    """
+
+    def __init__(self):
+        self._seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._seconds += seconds
+
+    def take(self) -> float:
+        """CPU seconds since the last take()"""
+        with self._lock:
+            seconds, self._seconds = self._seconds, 0.0
+        return seconds
+
+    def measured(self, function: Callable) -> Callable:
+        def wrapper(item):
+            start = time.thread_time()
+            try:
+                return function(item)
+            finally:
+                self.add(time.thread_time() - start)
+        return wrapper
+
+    def iterate(self, source: Iterable) -> Iterator:
+        iterator = iter(source)
+        while True:
+            start = time.thread_time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.add(time.thread_time() - start)
+            yield item
+
+
+class _Failure:
+    __slots__ = ("item", "error")
+
+    def __init__(self, item, error: BaseException):
+        self.item = item
+        self.error = error
+
+
+def run_stages(
+    source: Iterable,
+    stages: list[Callable],
+    queue_size: int = 1,
+    name: str = "pipeline",
+    on_error: Optional[Callable] = None,
+    on_discard: Optional[Callable] = None,
+    cpu_meter: Optional[CpuMeter] = None
+) -> Iterator:
+    """
+    Run items from source through stages, each stage on its own thread
+
+    Args:
+        source: Iterated on a producer thread (e.g. a generator reading batches from the DB)
+        stages: Functions applied in order, each returns the item handed to the next
+        queue_size: Items buffered between two stages
+        name: Thread name prefix
+        on_error: Called as on_error(item, error) for the item a stage failed on
+        on_discard: Called for items that never made it through the last stage because
+                    the pipeline stopped early (an error, or the consumer stopped iterating),
+                    e.g. to release their DB session
+        cpu_meter: Charged with the CPU time of the producer and stage threads
+
+    Yields:
+        Output of the last stage per item, in source order
+    """
+    if cpu_meter is not None:
+        source = cpu_meter.iterate(source)
+        stages = [cpu_meter.measured(stage) for stage in stages]
+
+    stop = threading.Event()
+    queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in range(len(stages) + 1)]
+
+    def discard(item):
+        if on_discard is not None and item is not _DONE and not isinstance(item, _Failure):
+            try:
+                on_discard(item)
+            except Exception as e:
+                logger.error(f"Pipeline {name}: failed to discard an item: {e}")
+
+    def put(outbox: queue.Queue, item) -> bool:
+        """Hand an item on, unless the pipeline stops first"""
+        while not stop.is_set():
+            try:
+                outbox.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        if outbox is not queues[-1]:  # Finished results have nothing left to release
+            discard(item)
+        return False
+
+    def get(inbox: queue.Queue):
+        while not stop.is_set():
+            try:
+                return inbox.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return _DONE
+
+    def produce():
+        try:
+            for item in source:
+                if not put(queues[0], item):
+                    return
+            put(queues[0], _DONE)
+        except BaseException as e:
+            put(queues[0], _Failure(None, e))
+
+    def work(stage: Callable, inbox: queue.Queue, outbox: queue.Queue):
+        while True:
+            item = get(inbox)
+            if stop.is_set():
+                discard(item)
+                return
+            if item is _DONE or isinstance(item, _Failure):
+                put(outbox, item)
+                return
+            try:
+                result = stage(item)
+            except BaseException as e:
+                if on_error is not None:
+                    try:
+                        on_error(item, e)
+                    except Exception as handler_error:
+                        logger.error(f"Pipeline {name}: error handler failed: {handler_error}")
+                put(outbox, _Failure(item, e))
+                return
+            if not put(outbox, result):
+                return
+
+    threads = [threading.Thread(target=produce, name=f"{name}-source", daemon=True)]
+    threads += [
+        threading.Thread(target=work, args=(stage, queues[i], queues[i + 1]), name=f"{name}-stage{i + 1}", daemon=True)
+        for i, stage in enumerate(stages)
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = queues[-1].get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        # Let every thread finish its current item, then release whatever is left in the queues
+        stop.set()
+        for thread in threads:
+            thread.join()
+        for q in queues[:-1]:
+            while not q.empty():
+                discard(q.get_nowait())
+
+
+def run_chunks(chunks: list, stages: list[Callable], queue_size: int = 1, name: str = "pipeline") -> Iterator:
+    """
+    run_stages over chunks already in memory; a single chunk runs inline on the calling thread
+
+    One chunk has nothing to overlap with, so starting a thread per stage would
+    only add hand-off latency to single requests and small batches.
+    """
+    if len(chunks) > 1:
+        yield from run_stages(chunks, stages, queue_size, name)
+        return
+    for item in chunks:
+        for stage in stages:
+            item = stage(item)
+        yield item
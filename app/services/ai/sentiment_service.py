@@ -3,13 +3,17 @@ Multilingual Sentiment Analysis Service
 Uses tabularisai/multilingual-sentiment-analysis
 
 Model outputs 5 classes: Very Negative, Negative, Neutral, Positive, Very Positive
-We map these to 3 simplified labels: negative, neutral, positive
+We map these to 3 simplified labels: negative, neutral, positive, and keep the
+full 5-class distribution (SENTIMENT_CLASSES order) so scores can be recomputed
+from stored results without re-running the model
 """
-from transformers import pipeline
-import torch
-from typing import Literal
+from typing import Literal, Optional
 import logging
-from app.config import DEVICE, SENTIMENT_MODEL, SENTIMENT_CONFIG
+from app.config import get_device, SENTIMENT_MODEL, SENTIMENT_CONFIG, MICRO_BATCH_ENABLED, MICRO_BATCH_CONFIG
+from app.config import AUTOTUNE_CONFIG, AUTOTUNE_STATE_FILE, SENTIMENT_CLASSES, PIPELINE_QUEUE_SIZE
+from .autotune import AutoTuner
+from .batching import MicroBatcher
+from .pipeline import run_chunks
 
 logger = logging.getLogger(__name__)
 
@@ -18,12 +22,30 @@ SentimentLabel = Literal["positive", "neutral", "negative"]
 
 class SentimentResult:
     """Structured sentiment analysis result"""
-    def __init__(self, label: SentimentLabel, score: float):
+    def __init__(
+        self,
+        label: SentimentLabel,
+        score: float,
+        source: Optional[str] = None,
+        probs: Optional[list[float]] = None
+    ):
         self.label = label
         self.score = score
+        self.source = source  # Set when the result came from a rule instead of the model (see text_features.py)
+        self.probs = probs  # 5-class distribution in SENTIMENT_CLASSES order (model results only)
     
     def to_dict(self) -> dict:
-        return {"label": self.label, "score": round(self.score, 4)}
+        result = {"label": self.label, "score": round(self.score, 4)}
+        if self.probs:
+            result["probs"] = self.probs
+        if self.source:
+            result["source"] = self.source
+        return result
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> "SentimentResult":
+        """Rebuild a stored result (ai_results['sentiment'])"""
+        return cls(label=data['label'], score=data.get('score', 0.0), source=data.get('source'), probs=data.get('probs'))
 
 
 class SentimentService:
@@ -31,17 +53,122 @@ class SentimentService:
     
     def __init__(self):
         """Load model on initialization"""
+        from transformers import pipeline
+        
+        self.device = get_device()
         logger.info(f"Loading sentiment model: {SENTIMENT_MODEL}")
         
         self.pipeline = pipeline(
             "sentiment-analysis",
             model=SENTIMENT_MODEL,
-            device=0 if DEVICE == "cuda" else -1,
+            device=0 if self.device == "cuda" else -1,
+            model_kwargs={"low_cpu_mem_usage": True},
             truncation=True,
             max_length=SENTIMENT_CONFIG["max_length"]
         )
         
-        logger.info(f"Sentiment model loaded on {DEVICE}")
+        logger.info(f"Sentiment model loaded on {self.device}")
+        
+        # Batch size and threads: saved autotune profile for this host, or the default
+        self.tuner = AutoTuner(
+            "sentiment",
+            SENTIMENT_MODEL,
+            self.device,
+            self._run_pipeline,
+            AUTOTUNE_CONFIG["sentiment"],
+            AUTOTUNE_STATE_FILE,
+            drift_check_every=AUTOTUNE_CONFIG["drift_check_every"],
+            drift_threshold=AUTOTUNE_CONFIG["drift_threshold"]
+        )
+        
+        # Concurrent analyze() calls are collected into one forward pass
+        self._batcher = None
+        if MICRO_BATCH_ENABLED:
+            self._batcher = MicroBatcher(
+                lambda _key, texts: self._run_pipeline(texts),
+                name="sentiment",
+                **{
+                    **MICRO_BATCH_CONFIG["sentiment"],
+                    "max_batch_size": min(MICRO_BATCH_CONFIG["sentiment"]["max_batch_size"], self.tuner.batch_size)
+                }
+            )
+    
+    def autotune(self, texts: list[str]) -> dict:
+        """Probe batch size / threads on sample texts (see autotune.py) and apply the result"""
+        profile = self.tuner.tune([t[:SENTIMENT_CONFIG["max_length"]] for t in texts])
+        if self._batcher:
+            self._batcher.max_batch_size = min(MICRO_BATCH_CONFIG["sentiment"]["max_batch_size"], profile['batch_size'])
+        return self.tuner.status()
+    
+    def autotune_status(self) -> dict:
+        return self.tuner.status()
+    
+    def _run_pipeline(self, texts: list[str]) -> list[SentimentResult]:
+        """Run one forward pass over already validated texts"""
+        results = self.pipeline(texts, batch_size=len(texts), top_k=None)
+        return [self._to_result(r) for r in results]
+    
+    def _to_result(self, class_scores: list[dict]) -> SentimentResult:
+        """
+        Build a result from the scores of all 5 classes (pipeline called with top_k=None)
+        
+        The label is still the top class mapped to 3 labels; probs keeps the
+        whole distribution, rounded to 4 decimals to keep ai_results small
+        """
+        by_class = {r["label"].lower().replace(" ", "_"): r["score"] for r in class_scores}
+        top = max(class_scores, key=lambda r: r["score"])
+        return SentimentResult(
+            label=self._map_label(top["label"]),
+            score=top["score"],
+            probs=[round(by_class.get(c, 0.0), 4) for c in SENTIMENT_CLASSES]
+        )
+    
+    def metrics(self) -> Optional[dict]:
+        """Micro-batching queue metrics (None when micro-batching is disabled)"""
+        return self._batcher.metrics() if self._batcher else None
+    
+    # Bulk inference stages, run on separate threads by batch_analyze and the
+    # orchestrator's pipelined backfill (see pipeline.py)
+    
+    def tokenize(self, texts: list[str]) -> list:
+        """
+        Model inputs for non-empty texts, one chunk per forward pass of the tuned batch size
+        
+        CPU only, no model: safe to run next to forward() on another thread
+        """
+        texts = [t[:SENTIMENT_CONFIG["max_length"]] for t in texts]
+        self.tuner.observe(texts)
+        batch_size = self.tuner.batch_size
+        return [
+            self.pipeline.tokenizer(
+                texts[i:i + batch_size],
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+                max_length=SENTIMENT_CONFIG["max_length"]
+            )
+            for i in range(0, len(texts), batch_size)
+        ]
+    
+    def forward(self, chunks: list) -> list:
+        """Class probabilities per chunk of tokenize() output"""
+        import torch
+        
+        probabilities = []
+        with torch.no_grad():
+            for inputs in chunks:
+                logits = self.pipeline.model(**inputs.to(self.device)).logits
+                probabilities.append(torch.softmax(logits, dim=-1).cpu().numpy())
+        return probabilities
+    
+    def decode(self, probabilities: list) -> list[SentimentResult]:
+        """SentimentResults from forward() output, in input order"""
+        id2label = self.pipeline.model.config.id2label
+        return [
+            self._to_result([{"label": id2label[i], "score": float(p)} for i, p in enumerate(row)])
+            for chunk in probabilities
+            for row in chunk
+        ]
     
     def _map_label(self, model_label: str) -> SentimentLabel:
         """
@@ -78,13 +205,11 @@ class SentimentService:
             raise ValueError("Cannot analyze empty text")
         
         try:
-            result = self.pipeline(text[:SENTIMENT_CONFIG["max_length"]])[0]
+            text = text[:SENTIMENT_CONFIG["max_length"]]
+            if self._batcher:
+                return self._batcher.run(text)
             
-            # Simplify label using mapping
-            label = self._map_label(result["label"])
-            score = result["score"]
-            
-            return SentimentResult(label=label, score=score)
+            return self._to_result(self.pipeline([text], top_k=None)[0])
             
         except Exception as e:
             logger.error(f"Sentiment analysis failed: {e}")
@@ -94,33 +219,47 @@ class SentimentService:
         """
         Analyze sentiment for multiple texts
         
+        Tokenization, forward passes and decoding run as a pipeline, so the
+        next chunk is tokenized while the current one is in the model. A
+        single chunk runs inline, without the pipeline threads.
+        
         Args:
             texts: List of texts to analyze
             
         Returns:
             List of SentimentResults (same order as input)
+            
+        Raises:
+            Exception: Whatever the model raised. Callers on the AI task queue
+                       fail the batch (fail_tasks) instead of storing results.
         """
         if not texts:
             return []
         
-        try:
-            valid_texts = [t[:SENTIMENT_CONFIG["max_length"]] for t in texts if t and t.strip()]
-            
-            if not valid_texts:
-                return [SentimentResult(label="neutral", score=0.0) for _ in texts]
-            
-            results = self.pipeline(valid_texts)
-            
-            # Convert to SentimentResult objects using label mapping
-            sentiment_results = []
-            for result in results:
-                label = self._map_label(result["label"])
-                sentiment_results.append(SentimentResult(label=label, score=result["score"]))
-            
+        valid = [(i, t[:SENTIMENT_CONFIG["max_length"]]) for i, t in enumerate(texts) if t and t.strip()]
+        
+        # Empty texts stay neutral, results keep the input order
+        sentiment_results = [SentimentResult(label="neutral", score=0.0) for _ in texts]
+        if not valid:
             return sentiment_results
-            
+        
+        valid_texts = [t for _, t in valid]
+        chunk_size = self.tuner.batch_size
+        chunks = [valid_texts[i:i + chunk_size] for i in range(0, len(valid_texts), chunk_size)]
+        try:
+            results = [
+                result
+                for chunk_results in run_chunks(
+                    chunks, [self.tokenize, self.forward, self.decode], PIPELINE_QUEUE_SIZE, name="sentiment"
+                )
+                for result in chunk_results
+            ]
         except Exception as e:
             logger.error(f"Batch sentiment analysis failed: {e}")
-            # Return neutral sentiment for all on error
-            return [SentimentResult(label="neutral", score=0.0) for _ in texts]
+            raise
+        
+        for (i, _), result in zip(valid, results):
+            sentiment_results[i] = result
+        
+        return sentiment_results
 
@@ -1,8 +1,10 @@
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
-import torch
 from typing import Optional
 import logging
-from .config import DEVICE, SUMMARIZATION_MODEL, SUMMARY_CONFIG
+from .config import get_device, SUMMARIZATION_MODEL, SUMMARY_CONFIG
+from app.config import MICRO_BATCH_ENABLED, MICRO_BATCH_CONFIG, AUTOTUNE_CONFIG, AUTOTUNE_STATE_FILE, PIPELINE_QUEUE_SIZE
+from .autotune import AutoTuner
+from .batching import MicroBatcher
+from .pipeline import run_chunks
 
 logger = logging.getLogger(__name__)
 
@@ -12,12 +14,89 @@ class SummarizationService:
     
     def __init__(self):
         """Load model on initialization"""
+        from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+        
+        self.device = get_device()
         logger.info(f"Loading summarization model: {SUMMARIZATION_MODEL}")
         self.tokenizer = AutoTokenizer.from_pretrained(SUMMARIZATION_MODEL)
-        self.model = AutoModelForSeq2SeqLM.from_pretrained(SUMMARIZATION_MODEL)
-        self.model.to(DEVICE)
+        # safetensors (preferred when available) with low_cpu_mem_usage loads weights without an extra
+        # full copy, which also keeps them shareable after a preload-then-fork (gunicorn.conf.py)
+        self.model = AutoModelForSeq2SeqLM.from_pretrained(SUMMARIZATION_MODEL, low_cpu_mem_usage=True)
+        self.model.to(self.device)
         self.model.eval()  # Set to evaluation mode
-        logger.info(f"Summarization model loaded on {DEVICE}")
+        logger.info(f"Summarization model loaded on {self.device}")
+        
+        # Batch size and threads: saved autotune profile for this host, or the default
+        self.tuner = AutoTuner(
+            "summarization",
+            SUMMARIZATION_MODEL,
+            self.device,
+            lambda texts: self._generate(texts, SUMMARY_CONFIG["max_output_length"], SUMMARY_CONFIG["min_length"]),
+            AUTOTUNE_CONFIG["summarization"],
+            AUTOTUNE_STATE_FILE,
+            drift_check_every=AUTOTUNE_CONFIG["drift_check_every"],
+            drift_threshold=AUTOTUNE_CONFIG["drift_threshold"]
+        )
+        
+        # Concurrent summarize() calls with the same length settings share one generate() call
+        self._batcher = None
+        if MICRO_BATCH_ENABLED:
+            self._batcher = MicroBatcher(
+                lambda lengths, texts: self._generate(texts, *lengths),
+                name="summarization",
+                **{
+                    **MICRO_BATCH_CONFIG["summarization"],
+                    "max_batch_size": min(MICRO_BATCH_CONFIG["summarization"]["max_batch_size"], self.tuner.batch_size)
+                }
+            )
+    
+    def autotune(self, texts: list[str]) -> dict:
+        """Probe batch size / threads on sample texts (see autotune.py) and apply the result"""
+        profile = self.tuner.tune([t for t in texts if t and len(t.strip()) >= 10])
+        if self._batcher:
+            self._batcher.max_batch_size = min(MICRO_BATCH_CONFIG["summarization"]["max_batch_size"], profile['batch_size'])
+        return self.tuner.status()
+    
+    def autotune_status(self) -> dict:
+        return self.tuner.status()
+    
+    def _generate(self, texts: list[str], max_length: int, min_length: int) -> list[str]:
+        """Summarize a batch of already validated texts in one generate() call"""
+        return self._decode(self._generate_ids(self._tokenize(texts), max_length, min_length))
+    
+    def _tokenize(self, texts: list[str]):
+        return self.tokenizer(
+            texts,
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=SUMMARY_CONFIG["max_input_length"]
+        )
+    
+    def _generate_ids(self, inputs, max_length: int, min_length: int):
+        import torch
+        
+        with torch.no_grad():
+            return self.model.generate(
+                **inputs.to(self.device),
+                max_length=max_length,
+                min_length=min_length,
+                num_beams=SUMMARY_CONFIG["num_beams"],
+                early_stopping=True
+            )
+    
+    def _decode(self, summary_ids) -> list[str]:
+        return self.tokenizer.batch_decode(summary_ids, skip_special_tokens=True)
+    
+    def count_tokens(self, texts: list[str]) -> list[int]:
+        """Token count per text (no special tokens), used to pack inputs under max_input_length"""
+        if not texts:
+            return []
+        return [len(ids) for ids in self.tokenizer(texts, add_special_tokens=False)["input_ids"]]
+    
+    def metrics(self) -> Optional[dict]:
+        """Micro-batching queue metrics (None when micro-batching is disabled)"""
+        return self._batcher.metrics() if self._batcher else None
     
     def summarize(
         self, 
@@ -46,23 +125,10 @@ class SummarizationService:
         min_length = min_length or SUMMARY_CONFIG["min_length"]
         
         try:
-            inputs = self.tokenizer(
-                text,
-                return_tensors="pt",
-                truncation=True,
-                max_length=SUMMARY_CONFIG["max_input_length"]
-            ).to(DEVICE)
-            
-            with torch.no_grad():
-                summary_ids = self.model.generate(
-                    **inputs,
-                    max_length=max_length,
-                    min_length=min_length,
-                    num_beams=SUMMARY_CONFIG["num_beams"],
-                    early_stopping=True
-                )
-            
-            summary = self.tokenizer.decode(summary_ids[0], skip_special_tokens=True)
+            if self._batcher:
+                summary = self._batcher.run(text, key=(max_length, min_length))
+            else:
+                summary = self._generate([text], max_length, min_length)[0]
             
             logger.info(f"Summarized text: {len(text)} chars -> {len(summary)} chars")
             return summary
@@ -71,26 +137,91 @@ class SummarizationService:
             logger.error(f"Summarization failed: {e}")
             raise
     
-    def batch_summarize(self, texts: list[str]) -> list[str]:
+    def batch_summarize(
+        self,
+        texts: list[str],
+        max_length: Optional[int] = None,
+        min_length: Optional[int] = None,
+        raise_errors: bool = False
+    ) -> list[str]:
         """
-        Summarize multiple texts (processes sequentially for stability)
+        Summarize multiple texts
+        
+        With micro-batching enabled all texts are queued at once and run in
+        batches, otherwise they run in chunks of the autotuned batch size,
+        pipelined so the next chunk is tokenized and the previous one decoded
+        while generate() runs
         
         Args:
             texts: List of texts to summarize
+            max_length: Maximum length of each summary (default from config)
+            min_length: Minimum length of each summary (default from config)
+            raise_errors: Raise when the model fails instead of returning the input
+                          text for the failed texts (callers that feed summaries on)
             
         Returns:
             List of summaries (same order as input)
+            
+        Raises:
+            RuntimeError: With raise_errors, if any text failed to summarize
         """
-        summaries = []
+        max_length = max_length or SUMMARY_CONFIG["max_output_length"]
+        min_length = min(min_length or SUMMARY_CONFIG["min_length"], max_length)
+        
+        valid = [t for t in texts if t and len(t.strip()) >= 10]  # Shorter texts are returned as-is
+        self.tuner.observe(valid)
+        
+        pending = []
         for text in texts:
+            if not text or len(text.strip()) < 10:
+                pending.append(None)  # Text too short, return original
+            elif self._batcher:
+                pending.append(self._batcher.submit(text, key=(max_length, min_length)))
+            else:
+                pending.append(text)
+        
+        # Without the micro-batcher, run valid texts in chunks of the tuned batch size
+        generated = {}
+        if not self._batcher:
+            def stage(fn):
+                """A failed chunk is passed on as None and keeps its original texts"""
+                def run(item):
+                    chunk, value = item
+                    if value is None:
+                        return item
+                    try:
+                        return chunk, fn(value)
+                    except Exception as e:
+                        logger.error(f"Failed to summarize batch: {e}")
+                        if raise_errors:
+                            raise RuntimeError(f"Summarization failed: {e}") from e
+                        return chunk, None
+                return run
+            
+            batch_size = self.tuner.batch_size
+            chunks = [(valid[i:i + batch_size],) * 2 for i in range(0, len(valid), batch_size)]
+            stages = [
+                stage(self._tokenize),
+                stage(lambda inputs: self._generate_ids(inputs, max_length, min_length)),
+                stage(self._decode)
+            ]
+            for chunk, summaries in run_chunks(chunks, stages, PIPELINE_QUEUE_SIZE, name="summarization"):
+                if summaries is not None:
+                    generated.update(zip(chunk, summaries))
+        
+        summaries = []
+        for text, item in zip(texts, pending):
             try:
-                summary = self.summarize(text)
-                summaries.append(summary)
-            except ValueError:
-                # Text too short, return original
-                summaries.append(text)
+                if item is None:
+                    summaries.append(text)
+                elif self._batcher:
+                    summaries.append(item.result())
+                else:
+                    summaries.append(generated.get(text, text))  # Fallback to original
             except Exception as e:
                 logger.error(f"Failed to summarize text: {e}")
+                if raise_errors:
+                    raise RuntimeError(f"Summarization failed: {e}") from e
                 summaries.append(text)  # Fallback to original
         
         return summaries
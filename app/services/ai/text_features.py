@@ -0,0 +1,156 @@
+"""
+Text pre-pass: script/language tag and trivial-content flags
+
+Runs at ingest (and on the fly for rows ingested before it existed) so the AI
+jobs can route items before any model is involved:
+
+- kind 'emoji_only', 'mention_only', 'url_only' or 'empty' content never
+  reaches the sentiment model; emoji-only comments get a lexicon score and the
+  rest are neutral
+- only Arabic (or mixed) text is fed to the Arabic summarization model, other
+  scripts go to the extractive tier
+
+Everything is a handful of precompiled regexes per text, microseconds each.
+"""
+from typing import Optional
+import re
+from .sentiment_service import SentimentResult
+
+_URL_RE = re.compile(r"https?://\S+|www\.\S+", re.IGNORECASE)
+_MENTION_RE = re.compile(r"@[\w.]+", re.UNICODE)
+_EMOJI_RE = re.compile(
+    "["
+    "\U0001F000-\U0001FAFF"  # Pictographs, emoticons, transport, flags, skin tones, supplemental symbols
+    "\u2600-\u27BF"  # Misc symbols, dingbats
+    "\u2B00-\u2BFF"  # Arrows, stars
+    "\u2764\u2763\u203C\u2049\u00A9\u00AE\u3030\u303D"
+    "]"
+)
+_EMOJI_JOINERS_RE = re.compile("[\uFE0F\uFE0E\u200D\u20E3\U0001F3FB-\U0001F3FF]")  # Variation selectors, ZWJ, keycap, skin tones
+_LETTER_RE = re.compile(r"[^\W\d_]", re.UNICODE)
+_ARABIC_LETTER_RE = re.compile("[\u0620-\u064A\u066E-\u06D3\u06FA-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]")
+_LATIN_LETTER_RE = re.compile("[A-Za-z\u00C0-\u024F]")
+_WORD_RE = re.compile(r"[A-Za-z']+")
+
+_ENGLISH_HINTS = {
+    'the', 'and', 'you', 'is', 'are', 'this', 'that', 'for', 'with', 'not', 'was', 'have', 'very', 'good',
+    'bad', 'thank', 'thanks', 'love', 'please', 'my', 'your', 'so', 'it', 'of', 'to', 'in', 'on', 'we',
+}
+
+# Polarity of common emojis in comments, -1 (negative) to 1 (positive)
+EMOJI_LEXICON = {
+    # Positive
+    '❤': 1.0, '♥': 1.0, '😍': 1.0, '🥰': 1.0, '😘': 0.8, '💕': 1.0, '💖': 1.0, '💗': 1.0, '💓': 1.0,
+    '💞': 1.0, '💘': 1.0, '💙': 0.8, '💚': 0.8, '💛': 0.8, '💜': 0.8, '🧡': 0.8, '🤍': 0.8, '😊': 0.8,
+    '☺': 0.8, '🙂': 0.5, '😀': 0.8, '😃': 0.8, '😄': 0.8, '😁': 0.8, '😆': 0.6, '😂': 0.5, '🤣': 0.5,
+    '🤩': 1.0, '😇': 0.8, '😎': 0.6, '🥳': 1.0, '👍': 0.8, '👏': 0.8, '🙌': 0.8, '👌': 0.7, '💪': 0.7,
+    '🙏': 0.5, '🤝': 0.6, '💯': 0.8, '🔥': 0.6, '✨': 0.6, '⭐': 0.6, '🌟': 0.7, '🌹': 0.8, '🌷': 0.7,
+    '💐': 0.8, '🌸': 0.6, '🎉': 0.8, '🎊': 0.8, '🏆': 0.8, '✅': 0.5, '✔': 0.4, '😋': 0.6, '🤗': 0.8,
+    # Negative
+    '😡': -1.0, '😠': -1.0, '🤬': -1.0, '👎': -0.9, '💔': -0.8, '😢': -0.7, '😭': -0.6, '😞': -0.7,
+    '😔': -0.6, '😩': -0.7, '😫': -0.7, '😤': -0.7, '🙄': -0.6, '😒': -0.6, '🤮': -1.0, '🤢': -0.9,
+    '😱': -0.5, '😰': -0.6, '😟': -0.6, '😕': -0.5, '🙁': -0.6, '☹': -0.6, '😣': -0.6, '😖': -0.6,
+    '😑': -0.3, '😐': -0.2, '❌': -0.6, '⛔': -0.6, '🚫': -0.6, '💩': -0.9, '🤡': -0.6, '🖕': -1.0,
+    '😬': -0.3, '🥵': -0.3, '😪': -0.4, '😓': -0.5,
+}
+
+TRIVIAL_KINDS = ('emoji_only', 'mention_only', 'url_only', 'empty')
+
+
+def extract_features(text: Optional[str]) -> dict:
+    """
+    Tag one text
+
+    Returns:
+        {'kind', 'script', 'lang', 'emoji_count', 'length'} where kind is 'text' or
+        one of TRIVIAL_KINDS and script is 'arabic', 'latin', 'mixed', 'other' or 'none'
+    """
+    text = text or ''
+    urls = _URL_RE.findall(text)
+    rest = _URL_RE.sub(' ', text)
+    mentions = _MENTION_RE.findall(rest)
+    rest = _MENTION_RE.sub(' ', rest)
+    emoji_count = len(_EMOJI_RE.findall(_EMOJI_JOINERS_RE.sub('', rest)))
+
+    letters = len(_LETTER_RE.findall(rest))
+    arabic = len(_ARABIC_LETTER_RE.findall(rest))
+    latin = len(_LATIN_LETTER_RE.findall(rest))
+
+    if letters:
+        kind = 'text'
+    elif emoji_count:
+        kind = 'emoji_only'
+    elif mentions:
+        kind = 'mention_only'
+    elif urls:
+        kind = 'url_only'
+    else:
+        kind = 'empty'
+
+    if not letters:
+        script = 'none'
+    elif arabic >= 0.8 * letters:
+        script = 'arabic'
+    elif latin >= 0.8 * letters:
+        script = 'latin'
+    elif arabic and latin:
+        script = 'mixed'
+    else:
+        script = 'other'
+
+    if script in ('arabic', 'mixed') and arabic >= latin:
+        lang = 'ar'
+    elif script == 'latin' and any(w in _ENGLISH_HINTS for w in _WORD_RE.findall(rest.lower())):
+        lang = 'en'
+    else:
+        lang = 'und'
+
+    return {'kind': kind, 'script': script, 'lang': lang, 'emoji_count': emoji_count, 'length': len(text)}
+
+
+def tag_records(records: list[dict], text_key: str) -> list[dict]:
+    """Ingest pre-pass: add 'text_features' to rows about to be inserted"""
+    for record in records:
+        record['text_features'] = extract_features(record.get(text_key))
+    return records
+
+
+def ensure_features(texts: list[Optional[str]], stored: Optional[list[Optional[dict]]] = None) -> list[dict]:
+    """Stored features where present, extracted ones for rows tagged before the pre-pass existed"""
+    stored = stored or [None] * len(texts)
+    return [features or extract_features(text) for text, features in zip(texts, stored)]
+
+
+def is_trivial(features: dict) -> bool:
+    return features.get('kind') in TRIVIAL_KINDS
+
+
+def emoji_sentiment(text: str) -> SentimentResult:
+    """Lexicon score of the emojis in a text (neutral when none are in the lexicon)"""
+    polarities = [
+        EMOJI_LEXICON[e] for e in _EMOJI_RE.findall(_EMOJI_JOINERS_RE.sub('', text or ''))
+        if e in EMOJI_LEXICON
+    ]
+    if not polarities:
+        return SentimentResult(label="neutral", score=1.0, source="emoji_lexicon")
+
+    polarity = sum(polarities) / len(polarities)
+    if polarity >= 0.2:
+        return SentimentResult(label="positive", score=min(polarity, 1.0), source="emoji_lexicon")
+    if polarity <= -0.2:
+        return SentimentResult(label="negative", score=min(-polarity, 1.0), source="emoji_lexicon")
+    return SentimentResult(label="neutral", score=1.0 - abs(polarity), source="emoji_lexicon")
+
+
+def rule_sentiment(text: str, features: dict) -> Optional[SentimentResult]:
+    """
+    Sentiment for trivial content without a model
+
+    Returns:
+        SentimentResult for emoji/mention/URL-only or empty content, None for real text
+    """
+    if features['kind'] == 'emoji_only':
+        return emoji_sentiment(text)
+    if is_trivial(features):
+        return SentimentResult(label="neutral", score=1.0, source="rule")
+    return None
@@ -0,0 +1,138 @@
+"""
+Batch keyword/topic extraction (no model)
+
+Topics of a caption or comment are its highest-scoring terms within the batch
+it is processed in: hashtags, then content-word bigrams and unigrams (Arabic
+and English, normalized like the extractive tier) scored by TF-IDF. The whole
+batch is one sparse (doc, term) triple list, so scoring and the per-document
+top-k are a few NumPy operations regardless of batch size.
+
+Terms found in more than max_df_ratio of a large batch are treated as batch
+stopwords ("flight" under an airline's posts says nothing about a comment).
+
+Optionally, near-synonymous topics ("تأخير الرحلة" / "تاخر الرحلات") can be
+merged by embedding the batch's distinct topics and mapping each onto the most
+frequent topic within a cosine similarity threshold.
+"""
+from collections import Counter
+from typing import Callable, Optional
+import re
+import numpy as np
+from .extractive_service import normalize, tokenize
+
+TOPIC_EXTRACTOR_VERSION = "keywords-tfidf-v1"  # Recorded as the tasks' model_version
+
+_HASHTAG_RE = re.compile(r"#([^\W_][\w]*)", re.UNICODE)
+_MIN_UNIGRAM_LENGTH = 3
+
+
+def _terms(text: str) -> list[str]:
+    """Candidate topics of one text: hashtags, bigrams and longer unigrams"""
+    hashtags = ['#' + normalize(tag) for tag in _HASHTAG_RE.findall(text or '')]
+    tokens = tokenize(_HASHTAG_RE.sub(' ', text or ''))
+    bigrams = [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return hashtags + bigrams + [t for t in tokens if len(t) >= _MIN_UNIGRAM_LENGTH]
+
+
+class TopicExtractor:
+    """
+    Args:
+        max_topics: Topics kept per text
+        min_score: Minimum TF-IDF score for a term to count as a topic
+        max_df_ratio: Terms in more than this share of a batch are ignored (batches of 20+ texts)
+        phrase_boost: Score multiplier for hashtags and bigrams over single words
+    """
+
+    def __init__(self, max_topics: int = 3, min_score: float = 1.0, max_df_ratio: float = 0.5, phrase_boost: float = 1.5):
+        self.max_topics = max_topics
+        self.min_score = min_score
+        self.max_df_ratio = max_df_ratio
+        self.phrase_boost = phrase_boost
+
+    def extract(self, texts: list[Optional[str]]) -> list[list[str]]:
+        """
+        Topics for each text, scored against the rest of the batch
+
+        Returns:
+            One list of up to max_topics topics per text, best first
+        """
+        docs = [Counter(_terms(t)) for t in texts]
+        vocabulary = {}
+        rows, cols, counts = [], [], []
+        for row, doc in enumerate(docs):
+            for term, count in doc.items():
+                rows.append(row)
+                cols.append(vocabulary.setdefault(term, len(vocabulary)))
+                counts.append(count)
+        if not vocabulary:
+            return [[] for _ in texts]
+
+        terms = list(vocabulary)
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        counts = np.asarray(counts, dtype=np.float32)
+
+        n = len(texts)
+        df = np.bincount(cols, minlength=len(terms))
+        idf = np.log((1 + n) / (1 + df)).astype(np.float32) + 1
+        if n >= 20:
+            idf[df > self.max_df_ratio * n] = 0
+        boost = np.asarray([self.phrase_boost if (' ' in t or t.startswith('#')) else 1.0 for t in terms], dtype=np.float32)
+
+        scores = (1 + np.log(counts)) * idf[cols] * boost[cols]
+        keep = scores >= self.min_score
+        rows, cols, scores = rows[keep], cols[keep], scores[keep]
+
+        # Best first within each document; a few spare candidates per document
+        # since words of an already picked bigram are skipped
+        order = np.lexsort((-scores, rows))
+        rows, cols = rows[order], cols[order]
+        rank = np.arange(len(rows)) - np.searchsorted(rows, rows, side='left')
+        keep = rank < 3 * self.max_topics
+        rows, cols = rows[keep], cols[keep]
+
+        topics = [[] for _ in texts]
+        covered = [set() for _ in texts]
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            term = terms[col]
+            if len(topics[row]) >= self.max_topics or term in covered[row]:
+                continue
+            topics[row].append(term)
+            covered[row].update(term.split(' '))
+        return topics
+
+    @staticmethod
+    def merge_similar(
+        topics: list[list[str]],
+        embed: Callable[[list[str]], np.ndarray],
+        threshold: float = 0.85
+    ) -> list[list[str]]:
+        """
+        Map near-synonymous topics onto one label
+
+        Args:
+            topics: Output of extract()
+            embed: Returns one L2-normalized vector per text
+            threshold: Cosine similarity needed to merge two topics
+
+        Returns:
+            topics with every topic replaced by its cluster's most frequent member
+        """
+        frequency = Counter(t for doc in topics for t in doc)
+        distinct = [t for t, _ in frequency.most_common()]
+        if len(distinct) < 2:
+            return topics
+
+        vectors = np.asarray(embed(distinct), dtype=np.float32)
+        similarity = vectors @ vectors.T
+        canonical = {}
+        labels = []  # Indices of topics that are their cluster's label, most frequent first
+        for i, topic in enumerate(distinct):
+            match = next((j for j in labels if similarity[i, j] >= threshold), None)
+            if match is None:
+                labels.append(i)
+                canonical[topic] = topic
+            else:
+                canonical[topic] = distinct[match]
+
+        return [list(dict.fromkeys(canonical[t] for t in doc)) for doc in topics]
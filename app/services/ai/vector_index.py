@@ -0,0 +1,403 @@
+"""
+On-disk embedding index for semantic search
+
+Layout (one directory):
+    vectors.f16   float16 (capacity x dim) memory-mapped matrix, one row per item
+    keys.i64      int64 (capacity x 2) memory-mapped (entity kind, entity id) per row
+    hnsw.bin      HNSW graph snapshot over the first graph_count rows (only with hnswlib installed)
+    meta.json     row count, capacity, dim, model, graph snapshot info and a version bumped on every write
+
+Rows are append-only; re-embedding an item overwrites its row in place. The
+HNSW graph (inner product on L2-normalized vectors, i.e. cosine) is used when
+hnswlib is installed. Without it, a search is an exact scan of the float16
+matrix in chunks, which stays in the low milliseconds up to a few hundred
+thousand rows.
+
+Writers (the embedding job) hold an exclusive file lock, so several processes
+can run it safely. A write appends rows to the matrix and bumps meta.json; it
+only extends and saves the graph once graph_rebuild_rows rows are waiting or
+the snapshot is graph_rebuild_seconds old. Searches use the graph snapshot and
+scan the rows it doesn't cover yet (appended or re-embedded since) exactly.
+
+Readers in other processes pick up new rows when they see a newer meta.json
+version, reading only the new keys. They load a new graph snapshot under a
+shared file lock, so never a half-written one, and never write or delete files.
+"""
+from contextlib import contextmanager
+from typing import Optional
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:  # Optional, exact numpy search otherwise
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+KINDS = {'post': 0, 'comment': 1}
+KIND_NAMES = {code: name for name, code in KINDS.items()}
+SCAN_CHUNK_ROWS = 65536
+INDEX_FILES = ('vectors.f16', 'keys.i64', 'hnsw.bin', 'meta.json')
+
+
+class VectorIndex:
+    """
+    Args:
+        directory: Where the index files live (created if missing)
+        dim: Embedding size
+        model_name: Recorded in meta.json; a different model invalidates the files
+        use_hnsw: Use an HNSW graph when hnswlib is installed
+        hnsw_m: HNSW graph degree
+        ef_construction: HNSW build-time candidate list size
+        ef_search: HNSW query-time candidate list size (recall vs speed)
+        graph_rebuild_rows: Rows outside the graph snapshot that make a write extend and save it
+        graph_rebuild_seconds: Age of the snapshot after which any write with rows outside it does
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        dim: int,
+        model_name: str,
+        use_hnsw: bool = True,
+        hnsw_m: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        graph_rebuild_rows: int = 10000,
+        graph_rebuild_seconds: int = 3600
+    ):
+        self.directory = directory
+        self.dim = dim
+        self.model_name = model_name
+        self.use_hnsw = use_hnsw and hnswlib is not None
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.graph_rebuild_rows = graph_rebuild_rows
+        self.graph_rebuild_seconds = graph_rebuild_seconds
+
+        self._lock = threading.RLock()
+        self._version = -1
+        self._generation = None  # Changes when the files are recreated (other model)
+        self.count = 0
+        self.capacity = 0
+        self._writable = False
+        self._vectors = None
+        self._keys = None
+        self._rows = {}  # (kind, id) -> row
+        self._hnsw = None
+        self._graph_version = None
+        self._graph_at = 0.0
+        self.graph_count = 0  # Rows covered by the graph snapshot
+        self._stale = np.empty(0, dtype=np.int64)  # Re-embedded rows the snapshot has old vectors for
+
+        os.makedirs(directory, exist_ok=True)
+        self._refresh()
+
+    @property
+    def backend(self) -> str:
+        return 'hnsw' if self.use_hnsw else 'exact'
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def _file_lock(self, mode: int, blocking: bool = True):
+        """Lock across processes; yields False when not blocking and the lock is taken"""
+        with open(self._path('index.lock'), 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, mode if blocking else mode | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _write_lock(self):
+        """Exclusive across threads and processes"""
+        with self._lock, self._file_lock(fcntl.LOCK_EX):
+            yield
+
+    def _read_meta(self) -> dict:
+        """meta.json, or {} when missing, unreadable or written for another model"""
+        try:
+            with open(self._path('meta.json')) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if meta.get('model') != self.model_name or meta.get('dim') != self.dim:
+            return {}
+        return meta
+
+    def _map(self, capacity: int, writable: bool = False):
+        """(Re)open the memmaps with this capacity; only writers grow the files"""
+        if writable:
+            for name, width, dtype in (('vectors.f16', self.dim, np.float16), ('keys.i64', 2, np.int64)):
+                size = capacity * width * np.dtype(dtype).itemsize
+                with open(self._path(name), 'ab') as f:
+                    if f.tell() < size:
+                        f.truncate(size)
+        mode = 'r+' if writable else 'r'
+        self._vectors = np.memmap(self._path('vectors.f16'), dtype=np.float16, mode=mode, shape=(capacity, self.dim))
+        self._keys = np.memmap(self._path('keys.i64'), dtype=np.int64, mode=mode, shape=(capacity, 2))
+        self.capacity = capacity
+        self._writable = writable
+
+    def _refresh(self):
+        """Load what other processes wrote since the last look"""
+        with self._lock:
+            if self._read_meta().get('version', 0) == self._version:
+                return
+            # Don't wait for a writer holding the lock (e.g. saving a graph) if there is a snapshot to serve
+            with self._file_lock(fcntl.LOCK_SH, blocking=self._version < 0) as locked:
+                if locked:
+                    self._load(self._read_meta())
+
+    def _load(self, meta: dict):
+        """Bring the in-memory view up to meta (caller holds a file lock)"""
+        if meta.get('generation') != self._generation:
+            self.count, self.capacity, self._rows = 0, 0, {}
+            self._vectors = self._keys = None
+            self._hnsw, self._graph_version, self.graph_count, self._graph_at = None, None, 0, 0.0
+            self._generation = meta.get('generation')
+
+        capacity = meta.get('capacity', 0)
+        if capacity > self.capacity:
+            self._map(capacity, writable=self._writable)
+        count = meta.get('count', 0)
+        if count > self.count:
+            self._rows.update({
+                (int(kind), int(entity_id)): row
+                for row, (kind, entity_id) in enumerate(self._keys[self.count:count].tolist(), start=self.count)
+            })
+        self.count = count
+        self._stale = np.asarray(meta.get('stale_rows', []), dtype=np.int64)
+        if self.use_hnsw and meta.get('graph_version') != self._graph_version:
+            self._load_graph(meta)
+        self._version = meta.get('version', 0)
+
+    def _load_graph(self, meta: dict):
+        self._hnsw, self.graph_count = None, 0
+        path = self._path('hnsw.bin')
+        if meta.get('graph_count') and os.path.exists(path):
+            graph = hnswlib.Index(space='ip', dim=self.dim)
+            graph.load_index(path, max_elements=meta['graph_count'])
+            graph.set_ef(self.ef_search)
+            self._hnsw, self.graph_count = graph, meta['graph_count']
+        self._graph_version = meta.get('graph_version')
+        self._graph_at = meta.get('graph_at', 0.0)
+
+    def _graph_due(self) -> bool:
+        pending = self.count - self.graph_count + len(self._stale)
+        if not self.use_hnsw or not pending:
+            return False
+        return pending >= self.graph_rebuild_rows or time.time() - self._graph_at >= self.graph_rebuild_seconds
+
+    def _save_graph(self):
+        """Extend the graph to every row and replace the snapshot (writer only)"""
+        if self._hnsw is None:
+            self._hnsw = hnswlib.Index(space='ip', dim=self.dim)
+            self._hnsw.init_index(max_elements=self.count, ef_construction=self.ef_construction, M=self.hnsw_m)
+            self.graph_count = 0
+        elif self._hnsw.get_max_elements() < self.count:
+            self._hnsw.resize_index(self.count)
+
+        logger.info(f"Adding {self.count - self.graph_count} new and {len(self._stale)} re-embedded rows to the HNSW graph")
+        for start in range(self.graph_count, self.count, SCAN_CHUNK_ROWS):
+            end = min(start + SCAN_CHUNK_ROWS, self.count)
+            self._hnsw.add_items(np.asarray(self._vectors[start:end], dtype=np.float32), np.arange(start, end))
+        if len(self._stale):
+            self._hnsw.add_items(np.asarray(self._vectors[self._stale], dtype=np.float32), self._stale)
+        self._hnsw.set_ef(self.ef_search)
+
+        self._hnsw.save_index(self._path('hnsw.bin.tmp'))
+        os.replace(self._path('hnsw.bin.tmp'), self._path('hnsw.bin'))
+        self.graph_count = self.count
+        self._stale = np.empty(0, dtype=np.int64)
+        self._graph_version = (self._graph_version or 0) + 1
+        self._graph_at = time.time()
+
+    def _save(self):
+        self._vectors.flush()
+        self._keys.flush()
+
+        self._version += 1
+        meta = {
+            'count': self.count,
+            'capacity': self.capacity,
+            'dim': self.dim,
+            'model': self.model_name,
+            'version': self._version,
+            'generation': self._generation,
+            'graph_version': self._graph_version,
+            'graph_count': self.graph_count,
+            'graph_at': self._graph_at,
+            'stale_rows': self._stale.tolist()
+        }
+        with open(self._path('meta.json.tmp'), 'w') as f:
+            json.dump(meta, f)
+        os.replace(self._path('meta.json.tmp'), self._path('meta.json'))
+
+    # ------------------------------------------------------------------
+    # Writes / queries
+    # ------------------------------------------------------------------
+
+    def add(self, entity_type: str, ids: list[int], vectors: np.ndarray) -> None:
+        """
+        Store (or replace) the embeddings of some posts/comments and persist
+
+        Args:
+            entity_type: 'post' or 'comment'
+            ids: Database ids
+            vectors: L2-normalized embeddings, one row per id
+        """
+        if not ids:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.shape != (len(ids), self.dim):
+            raise ValueError(f"Expected {len(ids)} x {self.dim} vectors, got {vectors.shape}")
+        kind = KINDS[entity_type]
+
+        with self._write_lock():
+            meta = self._read_meta()
+            if not meta:
+                if os.path.exists(self._path('meta.json')):
+                    logger.warning(f"Embedding index in {self.directory} was built with another model, starting over")
+                for name in INDEX_FILES:
+                    if os.path.exists(self._path(name)):
+                        os.remove(self._path(name))
+                meta = {'generation': uuid.uuid4().hex}
+            self._load(meta)
+
+            rows = []
+            for entity_id in ids:
+                row = self._rows.get((kind, entity_id))
+                if row is None:
+                    row = self._rows[(kind, entity_id)] = self.count
+                    self.count += 1
+                rows.append(row)
+
+            if self.count > self.capacity:
+                self._map(max(self.count, 2 * self.capacity, 1024), writable=True)
+            elif not self._writable:
+                self._map(self.capacity, writable=True)
+
+            rows = np.asarray(rows, dtype=np.int64)
+            self._vectors[rows] = vectors.astype(np.float16)
+            self._keys[rows, 0] = kind
+            self._keys[rows, 1] = np.asarray(ids, dtype=np.int64)
+            self._stale = np.union1d(self._stale, rows[rows < self.graph_count])
+            if self._graph_due():
+                self._save_graph()
+            self._save()
+
+    def search(self, vector: np.ndarray, k: int, entity_types: Optional[list[str]] = None) -> list[tuple]:
+        """
+        Nearest items to a query embedding
+
+        Args:
+            vector: L2-normalized query embedding
+            k: Max results
+            entity_types: Restrict to 'post' and/or 'comment'
+
+        Returns:
+            [(entity_type, id, cosine similarity)] best first
+        """
+        self._refresh()
+        with self._lock:
+            count = self.count
+            if not count or k <= 0:
+                return []
+            query = np.asarray(vector, dtype=np.float32).reshape(-1)
+            kinds = None if not entity_types else [KINDS[t] for t in entity_types]
+
+            if self._hnsw is not None:
+                # The graph doesn't know kinds; fetch extra when filtering on them
+                fetch = min(self.graph_count, k if kinds is None else 4 * k)
+                self._hnsw.set_ef(max(self.ef_search, fetch))
+                labels, distances = self._hnsw.knn_query(query, k=fetch)
+                fresh = ~np.isin(labels[0], self._stale)
+                graph_rows = labels[0][fresh].astype(np.int64)
+                graph_scores = 1 - distances[0][fresh]
+                if kinds is not None:
+                    keep = np.isin(self._keys[graph_rows, 0], kinds)
+                    graph_rows, graph_scores = graph_rows[keep], graph_scores[keep]
+                # Rows the snapshot doesn't cover (or has old vectors for) are scored exactly
+                tail_rows, tail_scores = self._scan(query, k, self.graph_count, count, kinds, self._stale)
+                rows = np.concatenate([graph_rows, tail_rows])
+                scores = np.concatenate([graph_scores, tail_scores])
+                order = np.argsort(-scores)[:k]
+                rows, scores = rows[order], scores[order]
+            else:
+                rows, scores = self._scan(query, k, 0, count, kinds)
+
+            keys = self._keys[np.asarray(rows, dtype=np.int64)]
+
+        return [
+            (KIND_NAMES[kind], entity_id, round(float(score), 4))
+            for (kind, entity_id), score in zip(keys.tolist(), np.asarray(scores).tolist())
+        ]
+
+    def _scan(
+        self,
+        query: np.ndarray,
+        k: int,
+        start: int,
+        end: int,
+        kinds: Optional[list[int]],
+        extra_rows: Optional[np.ndarray] = None
+    ) -> tuple:
+        """Exact top-k over rows start..end (plus extra_rows) of the float16 matrix, one chunk at a time"""
+        chunks = [np.arange(s, min(s + SCAN_CHUNK_ROWS, end)) for s in range(start, end, SCAN_CHUNK_ROWS)]
+        if extra_rows is not None and len(extra_rows):
+            chunks.append(np.asarray(extra_rows, dtype=np.int64))
+
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for chunk in chunks:
+            if chunk[-1] - chunk[0] + 1 == len(chunk):  # Contiguous: a slice, not a gather
+                vectors, chunk_kinds = self._vectors[chunk[0]:chunk[-1] + 1], self._keys[chunk[0]:chunk[-1] + 1, 0]
+            else:
+                vectors, chunk_kinds = self._vectors[chunk], self._keys[chunk, 0]
+            scores = np.asarray(vectors, dtype=np.float32) @ query
+            if kinds is not None:
+                scores[~np.isin(chunk_kinds, kinds)] = -np.inf
+            top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+            best_rows = np.concatenate([best_rows, chunk[top]])
+            best_scores = np.concatenate([best_scores, scores[top]])
+            if len(best_rows) > k:
+                keep = np.argpartition(-best_scores, k - 1)[:k]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+
+        order = np.argsort(-best_scores)
+        rows, scores = best_rows[order], best_scores[order]
+        valid = np.isfinite(scores)
+        return rows[valid], scores[valid]
+
+    def stats(self) -> dict:
+        self._refresh()
+        return {
+            'size': self.count,
+            'capacity': self.capacity,
+            'dim': self.dim,
+            'backend': self.backend,
+            'graph_rows': self.graph_count,
+            'disk_mb': round(sum(
+                os.path.getsize(self._path(name))
+                for name in ('vectors.f16', 'keys.i64', 'hnsw.bin') if os.path.exists(self._path(name))
+            ) / 1024 ** 2, 1)
+        }
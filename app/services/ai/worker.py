@@ -0,0 +1,194 @@
+"""
+Standalone Inference Worker
+
+Runs the sentiment, summarization and sentence embedding models in their own
+process so the API and the scheduler don't have to load them. Each worker
+process loads the models once at startup and serves them over a small local
+HTTP interface.
+
+Run with:
+    uvicorn app.services.ai.worker:app --host 0.0.0.0 --port 8001 --workers 2
+
+or, to share the model weights between processes (see gunicorn.conf.py):
+    GUNICORN_BIND=0.0.0.0:8001 gunicorn app.services.ai.worker:app -c gunicorn.conf.py
+
+Clients talk to it through app/services/ai/client.py (set INFERENCE_WORKER_URL).
+"""
+from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from typing import Optional
+from pydantic import BaseModel, Field
+import logging
+import os
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("InferenceWorker")
+
+services = {}
+
+WARMUP_TEXT = "الخدمة كانت ممتازة والرحلة مريحة، شكراً لكم على حسن التعامل"
+
+
+class AnalyzeRequest(BaseModel):
+    text: str
+
+
+class BatchAnalyzeRequest(BaseModel):
+    texts: list[str] = Field(default_factory=list)
+
+
+class SummarizeRequest(BaseModel):
+    text: str
+    max_length: Optional[int] = None
+    min_length: Optional[int] = None
+
+
+class BatchSummarizeRequest(BaseModel):
+    texts: list[str] = Field(default_factory=list)
+    max_length: Optional[int] = None
+    min_length: Optional[int] = None
+    raise_errors: bool = False
+
+
+def preload_models():
+    """
+    Load the models (no inference)
+
+    Called once in the gunicorn master with PRELOAD_MODELS=true (gunicorn.conf.py),
+    so the forked workers share the weights copy-on-write.
+    """
+    from app.config import EMBEDDING_MODEL, EMBEDDING_CONFIG
+    from app.services.ai import SentimentService, SummarizationService
+    from app.services.ai.embedding_service import EmbeddingService
+
+    logger.info(f"Inference worker {os.getpid()} loading models...")
+    services['sentiment'] = SentimentService()
+    services['summarization'] = SummarizationService()
+    services['embedding'] = EmbeddingService(
+        EMBEDDING_MODEL,
+        batch_size=EMBEDDING_CONFIG["batch_size"],
+        max_length=EMBEDDING_CONFIG["max_length"]
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load (unless preloaded) and warm up the models once per worker process"""
+    if not services:
+        preload_models()
+
+    # One dummy inference each, so the first real request doesn't pay for lazy initialization
+    services['sentiment'].analyze(WARMUP_TEXT)
+    services['summarization'].summarize(WARMUP_TEXT, max_length=30, min_length=5)
+    services['embedding'].encode([WARMUP_TEXT])
+
+    logger.info(f"Inference worker {os.getpid()} ready")
+    yield
+    services.clear()
+
+
+app = FastAPI(
+    title="Inference Worker",
+    description="Sentiment, summarization and embedding models served to the API and scheduler",
+    version="0.1.0",
+    lifespan=lifespan
+)
+
+
+@app.get("/health")
+def health():
+    return {
+        "status": "ok" if services else "loading",
+        "pid": os.getpid(),
+        "models": sorted(services.keys())
+    }
+
+
+@app.get("/metrics")
+def metrics():
+    """Micro-batching queue depth, batch sizes and latency per model"""
+    return {
+        "pid": os.getpid(),
+        "sentiment": services['sentiment'].metrics() if 'sentiment' in services else None,
+        "summarization": services['summarization'].metrics() if 'summarization' in services else None
+    }
+
+
+@app.get("/memory")
+def memory():
+    """RSS/PSS and shared vs private memory of this worker process"""
+    from app.services.ai.memory import process_memory
+    return process_memory()
+
+
+@app.get("/autotune")
+def autotune_status():
+    """Batch size / thread profile per model"""
+    return {name: service.tuner.status() for name, service in services.items() if hasattr(service, 'tuner')}
+
+
+@app.post("/autotune/{model}")
+def autotune(model: str, request: BatchAnalyzeRequest):
+    """Probe batch sizes and thread counts for one model on the given sample texts"""
+    if not hasattr(services.get(model), 'tuner'):
+        raise HTTPException(status_code=404, detail=f"Unknown model: {model}")
+    try:
+        return services[model].autotune(request.texts)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/sentiment/analyze")
+def analyze(request: AnalyzeRequest):
+    try:
+        return services['sentiment'].analyze(request.text).to_dict()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/sentiment/batch")
+def batch_analyze(request: BatchAnalyzeRequest):
+    try:
+        results = services['sentiment'].batch_analyze(request.texts)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch sentiment analysis failed: {e}")
+    return {"results": [r.to_dict() for r in results]}
+
+
+@app.post("/summarize")
+def summarize(request: SummarizeRequest):
+    try:
+        summary = services['summarization'].summarize(
+            request.text,
+            max_length=request.max_length,
+            min_length=request.min_length
+        )
+        return {"summary": summary}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/summarize/batch")
+def batch_summarize(request: BatchSummarizeRequest):
+    try:
+        summaries = services['summarization'].batch_summarize(
+            request.texts,
+            max_length=request.max_length,
+            min_length=request.min_length,
+            raise_errors=request.raise_errors
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"summaries": summaries}
+
+
+@app.post("/summarize/tokens")
+def count_tokens(request: BatchAnalyzeRequest):
+    """Summarization tokenizer counts, used to pack long content into chunks"""
+    return {"counts": services['summarization'].count_tokens(request.texts)}
+
+
+@app.post("/embed")
+def embed(request: BatchAnalyzeRequest):
+    """L2-normalized sentence embeddings, one per text"""
+    return {"vectors": services['embedding'].encode(request.texts).tolist()}
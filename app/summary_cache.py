@@ -0,0 +1,73 @@
+# type: ignore  # SQLAlchemy Column type annotations have known limitations with type checkers
+"""
+Database-backed cache for chunk summaries (summary_cache table)
+
+Keys are content hashes computed by the hierarchical summarizer, so an entry
+stays valid for as long as the chunk's text and the generation settings are
+unchanged. Nothing is invalidated explicitly; changed chunks get new keys.
+The table is an LRU: beyond SUMMARY_CONFIG["cache_max_entries"], the least
+recently used entries are deleted.
+"""
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import text
+from datetime import datetime
+import logging
+from app.config import SUMMARY_CONFIG
+from app.database import SessionLocal
+from app.models import SummaryCache
+
+logger = logging.getLogger(__name__)
+
+
+class DBSummaryCache:
+    """
+    get_many/put_many cache used by HierarchicalSummarizer
+
+    Args:
+        max_entries: Entries kept; the least recently used beyond it are evicted on put_many
+    """
+
+    def __init__(self, max_entries: int = SUMMARY_CONFIG["cache_max_entries"]):
+        self.max_entries = max_entries
+
+    def get_many(self, keys: list[str]) -> dict:
+        """Return {key: summary} for the keys that are cached"""
+        if not keys:
+            return {}
+        db = SessionLocal()
+        try:
+            rows = db.query(SummaryCache)\
+                .filter(SummaryCache.content_hash.in_(keys))\
+                .all()
+            if rows:
+                db.query(SummaryCache)\
+                    .filter(SummaryCache.id.in_([r.id for r in rows]))\
+                    .update({'last_used_at': datetime.utcnow()}, synchronize_session=False)
+                db.commit()
+            return {r.content_hash: r.summary for r in rows}
+        finally:
+            db.close()
+
+    def put_many(self, summaries: dict) -> None:
+        """Store {key: summary}, keeping existing entries"""
+        if not summaries:
+            return
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            stmt = insert(SummaryCache.__table__).values([
+                {'content_hash': key, 'summary': summary, 'created_at': now, 'last_used_at': now}
+                for key, summary in summaries.items()
+            ]).on_conflict_do_nothing(index_elements=['content_hash'])
+            db.execute(stmt)
+            db.execute(text(
+                "DELETE FROM summary_cache WHERE id IN ("
+                "SELECT id FROM summary_cache ORDER BY last_used_at DESC, id DESC OFFSET :keep)"
+            ), {'keep': self.max_entries})
+            db.commit()
+        except Exception as e:
+            # A cache write failing shouldn't fail the summary
+            logger.error(f"Failed to store chunk summaries: {e}")
+            db.rollback()
+        finally:
+            db.close()
@@ -0,0 +1,179 @@
+# type: ignore  # SQLAlchemy Column type annotations have known limitations with type checkers
+"""
+Topic results and the per-week topic rollup (weekly_topics table)
+
+Topics are extracted in batches from the 'topics' queue (ai_tasks) and written
+to ai_results["topics"] with one bulk update, merged in SQL. The same call adjusts the
+weekly_topics rollup by the difference between the old and the new topics, so
+/analytics/top-topics and the weekly reports read a few pre-aggregated rows
+instead of expanding topic arrays out of every post and comment.
+
+Weeks start on Sunday 00:00, like weekly_reports. An item is counted in the
+week of its own timestamp; items without one only appear in ai_results.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import cast, delete, func, literal, select, union_all
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.orm import Session
+from app.ai_tasks import ENTITY_MODELS, TASK_TOPICS, merge_results
+from app.models import WeeklyTopic
+
+COUNT_COLUMNS = {'post': 'post_count', 'comment': 'comment_count'}
+
+
+def week_start(moment: datetime) -> datetime:
+    """Sunday 00:00 of the week containing moment"""
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return day - timedelta(days=(day.weekday() + 1) % 7)
+
+
+def week_start_expression(column):
+    """SQL twin of week_start (date_trunc weeks start on Monday)"""
+    return func.date_trunc('week', column + timedelta(days=1)) - timedelta(days=1)
+
+
+def store_topics(db: Session, entity_type: str, rows: list, topics: list[list[str]]) -> None:
+    """
+    Bulk-write topics into ai_results and update the rollup (caller commits)
+
+    The rollup delta is taken against the topics this write replaced, read
+    under the row lock (ai_tasks.merge_results), not the ones the caller loaded.
+
+    Args:
+        rows: Objects/rows with .id and .timestamp
+        topics: Topic lists in the same order as rows
+    """
+    if not rows:
+        return
+    previous = merge_results(db, entity_type, TASK_TOPICS, {
+        row.id: row_topics for row, row_topics in zip(rows, topics)
+    })
+    update_weekly_topics(db, entity_type, [
+        (row.timestamp, previous.get(row.id), row_topics)
+        for row, row_topics in zip(rows, topics)
+    ])
+
+
+def update_weekly_topics(db: Session, entity_type: str, changes: list) -> None:
+    """
+    Apply topic writes to the weekly rollup (caller commits)
+
+    Upserts with relative increments, so concurrent writers don't lose updates.
+
+    Args:
+        changes: (timestamp, previous topics or None, new topics) per item
+    """
+    deltas = Counter()
+    for timestamp, previous, current in changes:
+        if timestamp is None:
+            continue
+        week = week_start(timestamp)
+        for topic in previous or []:
+            deltas[(week, topic)] -= 1
+        for topic in current or []:
+            deltas[(week, topic)] += 1
+
+    deltas = sorted((key, delta) for key, delta in deltas.items() if delta)  # Fixed lock order
+    if not deltas:
+        return
+    column = COUNT_COLUMNS[entity_type]
+    other = COUNT_COLUMNS['comment' if entity_type == 'post' else 'post']
+    now = datetime.utcnow()
+
+    table = WeeklyTopic.__table__
+    stmt = insert(table).values([
+        {'week_start_date': week, 'topic': topic, column: delta, other: 0, 'updated_at': now}
+        for (week, topic), delta in deltas
+    ])
+    stmt = stmt.on_conflict_do_update(
+        constraint='uq_weekly_topics_week_topic',
+        set_={column: table.c[column] + stmt.excluded[column], 'updated_at': now}
+    )
+    db.execute(stmt)
+
+
+def rebuild_weekly_topics(db: Session) -> None:
+    """
+    Recompute the whole rollup from ai_results["topics"] (caller commits)
+
+    SQL only. For topics stored before the rollup existed, or after editing
+    ai_results by hand.
+    """
+    mentions = []
+    for entity_type, model in ENTITY_MODELS.items():
+        topics = cast(model.ai_results, JSONB)[TASK_TOPICS]
+        mentions.append(
+            select(
+                week_start_expression(model.timestamp).label('week_start_date'),
+                func.jsonb_array_elements_text(topics).label('topic'),
+                literal(entity_type).label('entity_type')
+            ).where(model.timestamp.isnot(None), func.jsonb_typeof(topics) == 'array')
+        )
+    mentions = union_all(*mentions).subquery()
+
+    totals = select(
+        mentions.c.week_start_date,
+        mentions.c.topic,
+        func.count().filter(mentions.c.entity_type == 'post'),
+        func.count().filter(mentions.c.entity_type == 'comment'),
+        literal(datetime.utcnow())
+    ).group_by(mentions.c.week_start_date, mentions.c.topic)
+
+    db.execute(delete(WeeklyTopic.__table__))
+    db.execute(
+        insert(WeeklyTopic.__table__).from_select(
+            ['week_start_date', 'topic', 'post_count', 'comment_count', 'updated_at'], totals
+        )
+    )
+
+
+def top_topics(db: Session, limit: int = 10, since: Optional[datetime] = None) -> list[dict]:
+    """Most frequent topics over all weeks, or over the weeks from since on"""
+    total = func.sum(WeeklyTopic.post_count + WeeklyTopic.comment_count)
+    query = db.query(
+        WeeklyTopic.topic,
+        total.label('count'),
+        func.sum(WeeklyTopic.post_count).label('post_count'),
+        func.sum(WeeklyTopic.comment_count).label('comment_count')
+    )
+    if since is not None:
+        query = query.filter(WeeklyTopic.week_start_date >= week_start(since))
+    rows = query.group_by(WeeklyTopic.topic)\
+        .having(total > 0)\
+        .order_by(total.desc(), WeeklyTopic.topic)\
+        .limit(limit)\
+        .all()
+    return [
+        {'topic': r.topic, 'count': int(r.count), 'post_count': int(r.post_count), 'comment_count': int(r.comment_count)}
+        for r in rows
+    ]
+
+
+def weekly_top_topics(db: Session, week_starts: list[datetime], limit: int = 10) -> dict:
+    """
+    Top topics of several weeks in one query
+
+    Returns:
+        {week_start_date: [{'topic', 'count'}, ...]} (weeks without topics are missing)
+    """
+    if not week_starts:
+        return {}
+    total = WeeklyTopic.post_count + WeeklyTopic.comment_count
+    rank = func.row_number().over(
+        partition_by=WeeklyTopic.week_start_date,
+        order_by=(total.desc(), WeeklyTopic.topic)
+    ).label('rank')
+    ranked = db.query(WeeklyTopic.week_start_date, WeeklyTopic.topic, total.label('count'), rank)\
+        .filter(WeeklyTopic.week_start_date.in_(week_starts), total > 0)\
+        .subquery()
+    rows = db.query(ranked.c.week_start_date, ranked.c.topic, ranked.c.count)\
+        .filter(ranked.c.rank <= limit)\
+        .order_by(ranked.c.week_start_date, ranked.c.rank)\
+        .all()
+
+    result = {}
+    for week, topic, count in rows:
+        result.setdefault(week, []).append({'topic': topic, 'count': count})
+    return result
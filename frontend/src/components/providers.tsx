@@ -4,6 +4,12 @@ import { QueryClient, QueryClientProvider } from '@tanstack/react-query';
 import { ReactQueryDevtools } from '@tanstack/react-query-devtools';
 import { useState } from 'react';
 import { Toaster } from '@/components/ui/sonner';
+import { useLiveUpdates } from '@/hooks/useApi';
+
+function LiveUpdates() {
+  useLiveUpdates();
+  return null;
+}
 
 export function Providers({ children }: { children: React.ReactNode }) {
   const [queryClient] = useState(
@@ -20,6 +26,7 @@ export function Providers({ children }: { children: React.ReactNode }) {
 
   return (
     <QueryClientProvider client={queryClient}>
+      <LiveUpdates />
       {children}
       <Toaster position="bottom-right" />
       <ReactQueryDevtools initialIsOpen={false} />
@@ -1,5 +1,7 @@
+import { useEffect, useSyncExternalStore } from 'react';
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import * as api from '@/lib/api';
+import { isEventsConnected, onConnectionChange, subscribeEvents } from '@/lib/events';
 import type {
   PostFilters,
   ScrapeHashtagsRequest,
@@ -8,12 +10,46 @@ import type {
   FullPipelineRequest,
 } from '@/types';
 
+// Live updates: while GET /events is connected, events refetch what changed and polling stops
+const NON_DATA_QUERY_KEYS = ['jobs', 'job-history', 'job', 'health'];
+
+export const useEventsConnected = () =>
+  useSyncExternalStore(onConnectionChange, isEventsConnected, () => false);
+
+// Poll only as a fallback, when the event stream is down
+const usePollInterval = (interval: number) => (useEventsConnected() ? false : interval);
+
+// Mounted once (see Providers)
+export const useLiveUpdates = () => {
+  const queryClient = useQueryClient();
+
+  useEffect(
+    () =>
+      subscribeEvents((event) => {
+        if (event.type === 'job') {
+          queryClient.invalidateQueries({ queryKey: ['jobs'] });
+          queryClient.invalidateQueries({ queryKey: ['job-history'] });
+          if (event.execution_id !== null) {
+            queryClient.invalidateQueries({ queryKey: ['job', event.execution_id] });
+          }
+        } else if (event.type === 'data') {
+          queryClient.invalidateQueries({
+            predicate: (query) => !NON_DATA_QUERY_KEYS.includes(query.queryKey[0] as string),
+          });
+        } else {
+          queryClient.invalidateQueries();
+        }
+      }),
+    [queryClient]
+  );
+};
+
 // Stats
 export const useStats = () => {
   return useQuery({
     queryKey: ['stats'],
     queryFn: api.getStats,
-    refetchInterval: 30000, // Refresh every 30 seconds
+    refetchInterval: usePollInterval(30000), // Refresh every 30 seconds
   });
 };
 
@@ -22,7 +58,7 @@ export const useHealth = () => {
   return useQuery({
     queryKey: ['health'],
     queryFn: api.checkHealth,
-    refetchInterval: 60000,
+    refetchInterval: 60000, // No event announces the API or DB going down, so this always polls
   });
 };
 
@@ -63,7 +99,7 @@ export const useJobs = () => {
   return useQuery({
     queryKey: ['jobs'],
     queryFn: api.getJobs,
-    refetchInterval: 5000, // Refresh every 5 seconds for real-time updates
+    refetchInterval: usePollInterval(5000), // Refresh every 5 seconds without live updates
   });
 };
 
@@ -71,7 +107,43 @@ export const useJobHistory = (limit: number = 50) => {
   return useQuery({
     queryKey: ['job-history', limit],
     queryFn: () => api.getJobHistory(limit),
-    refetchInterval: 10000,
+    refetchInterval: usePollInterval(10000),
+  });
+};
+
+const FINISHED_JOB_STATUSES = ['completed', 'failed', 'cancelled', 'interrupted'];
+
+// A submitted scrape/pipeline job, refetched on its events (or polled) until it finishes
+export const useJob = (executionId?: number) => {
+  const queryClient = useQueryClient();
+  const live = useEventsConnected();
+
+  return useQuery({
+    queryKey: ['job', executionId],
+    queryFn: async () => {
+      const job = await api.getJob(executionId!);
+      if (FINISHED_JOB_STATUSES.includes(job.status)) {
+        queryClient.invalidateQueries({ queryKey: ['stats'] });
+        queryClient.invalidateQueries({ queryKey: ['posts'] });
+        queryClient.invalidateQueries({ queryKey: ['job-history'] });
+      }
+      return job;
+    },
+    enabled: executionId !== undefined,
+    refetchInterval: (query) =>
+      live || (query.state.data && FINISHED_JOB_STATUSES.includes(query.state.data.status)) ? false : 3000,
+  });
+};
+
+export const useCancelJob = () => {
+  const queryClient = useQueryClient();
+
+  return useMutation({
+    mutationFn: (executionId: number) => api.cancelJob(executionId),
+    onSuccess: (job) => {
+      queryClient.setQueryData(['job', job.execution_id], job);
+      queryClient.invalidateQueries({ queryKey: ['job-history'] });
+    },
   });
 };
 
@@ -179,7 +251,7 @@ export const useSentimentBreakdown = () => {
   return useQuery({
     queryKey: ['sentiment-breakdown'],
     queryFn: api.getSentimentBreakdown,
-    refetchInterval: 60000, // Refresh every minute
+    refetchInterval: usePollInterval(60000), // Refresh every minute
   });
 };
 
@@ -187,7 +259,7 @@ export const useTopHashtags = (limit: number = 10) => {
   return useQuery({
     queryKey: ['top-hashtags', limit],
     queryFn: () => api.getTopHashtags(limit),
-    refetchInterval: 60000,
+    refetchInterval: usePollInterval(60000),
   });
 };
 
@@ -195,7 +267,7 @@ export const useTopTopics = (limit: number = 10) => {
   return useQuery({
     queryKey: ['top-topics', limit],
     queryFn: () => api.getTopTopics(limit),
-    refetchInterval: 60000,
+    refetchInterval: usePollInterval(60000),
   });
 };
 
@@ -204,7 +276,7 @@ export const useEngagementOverview = () => {
   return useQuery({
     queryKey: ['engagement-overview'],
     queryFn: api.getEngagementOverview,
-    refetchInterval: 60000,
+    refetchInterval: usePollInterval(60000),
   });
 };
 
@@ -212,7 +284,7 @@ export const useEngagementByPostType = () => {
   return useQuery({
     queryKey: ['engagement-by-post-type'],
     queryFn: api.getEngagementByPostType,
-    refetchInterval: 60000,
+    refetchInterval: usePollInterval(60000),
   });
 };
 
@@ -220,7 +292,7 @@ export const useTopPostsByLikes = (limit: number = 10) => {
   return useQuery({
     queryKey: ['top-posts-likes', limit],
     queryFn: () => api.getTopPostsByLikes(limit),
-    refetchInterval: 60000,
+    refetchInterval: usePollInterval(60000),
   });
 };
 
@@ -228,7 +300,7 @@ export const useTopPostsByComments = (limit: number = 10) => {
   return useQuery({
     queryKey: ['top-posts-comments', limit],
     queryFn: () => api.getTopPostsByComments(limit),
-    refetchInterval: 60000,
+    refetchInterval: usePollInterval(60000),
   });
 };
 
@@ -237,7 +309,7 @@ export const usePostsOverTime = (groupBy: string = 'day', days: number = 30) =>
   return useQuery({
     queryKey: ['posts-over-time', groupBy, days],
     queryFn: () => api.getPostsOverTime(groupBy, days),
-    refetchInterval: 60000,
+    refetchInterval: usePollInterval(60000),
   });
 };
 
@@ -245,7 +317,7 @@ export const usePostingHours = () => {
   return useQuery({
     queryKey: ['posting-hours'],
     queryFn: api.getPostingHours,
-    refetchInterval: 60000,
+    refetchInterval: usePollInterval(60000),
   });
 };
 
@@ -253,7 +325,7 @@ export const usePostingDays = () => {
   return useQuery({
     queryKey: ['posting-days'],
     queryFn: api.getPostingDays,
-    refetchInterval: 60000,
+    refetchInterval: usePollInterval(60000),
   });
 };
 
@@ -262,7 +334,7 @@ export const useTopAuthors = (limit: number = 10) => {
   return useQuery({
     queryKey: ['top-authors', limit],
     queryFn: () => api.getTopAuthors(limit),
-    refetchInterval: 60000,
+    refetchInterval: usePollInterval(60000),
   });
 };
 
@@ -270,7 +342,7 @@ export const useTopAuthorsByEngagement = (limit: number = 10) => {
   return useQuery({
     queryKey: ['top-authors-engagement', limit],
     queryFn: () => api.getTopAuthorsByEngagement(limit),
-    refetchInterval: 60000,
+    refetchInterval: usePollInterval(60000),
   });
 };
 
@@ -287,7 +359,7 @@ export const useCommentStats = () => {
   return useQuery({
     queryKey: ['comment-stats'],
     queryFn: api.getCommentStats,
-    refetchInterval: 60000,
+    refetchInterval: usePollInterval(60000),
   });
 };
 
@@ -295,7 +367,7 @@ export const useTopCommenters = (limit: number = 10) => {
   return useQuery({
     queryKey: ['top-commenters', limit],
     queryFn: () => api.getTopCommenters(limit),
-    refetchInterval: 60000,
+    refetchInterval: usePollInterval(60000),
   });
 };
 
@@ -303,7 +375,7 @@ export const useCommentSentimentBreakdown = () => {
   return useQuery({
     queryKey: ['comment-sentiment'],
     queryFn: api.getCommentSentimentBreakdown,
-    refetchInterval: 60000,
+    refetchInterval: usePollInterval(60000),
   });
 };
 
@@ -312,7 +384,7 @@ export const useContentSources = () => {
   return useQuery({
     queryKey: ['content-sources'],
     queryFn: api.getContentSources,
-    refetchInterval: 60000,
+    refetchInterval: usePollInterval(60000),
   });
 };
 
@@ -320,7 +392,7 @@ export const useCaptionLengthAnalysis = () => {
   return useQuery({
     queryKey: ['caption-length'],
     queryFn: api.getCaptionLengthAnalysis,
-    refetchInterval: 60000,
+    refetchInterval: usePollInterval(60000),
   });
 };
 
@@ -328,7 +400,7 @@ export const useMentionsAnalysis = (limit: number = 20) => {
   return useQuery({
     queryKey: ['mentions', limit],
     queryFn: () => api.getMentionsAnalysis(limit),
-    refetchInterval: 60000,
+    refetchInterval: usePollInterval(60000),
   });
 };
 
@@ -337,7 +409,7 @@ export const useAiCoverage = () => {
   return useQuery({
     queryKey: ['ai-coverage'],
     queryFn: api.getAiCoverage,
-    refetchInterval: 60000,
+    refetchInterval: usePollInterval(60000),
   });
 };
 
@@ -345,7 +417,7 @@ export const useSentimentBySource = () => {
   return useQuery({
     queryKey: ['sentiment-by-source'],
     queryFn: api.getSentimentBySource,
-    refetchInterval: 60000,
+    refetchInterval: usePollInterval(60000),
   });
 };
 
@@ -353,7 +425,7 @@ export const useSentimentTrend = (days: number = 30) => {
   return useQuery({
     queryKey: ['sentiment-trend', days],
     queryFn: () => api.getSentimentTrend(days),
-    refetchInterval: 60000,
+    refetchInterval: usePollInterval(60000),
   });
 };
 
@@ -362,7 +434,7 @@ export const useTargetsOverview = () => {
   return useQuery({
     queryKey: ['targets-overview'],
     queryFn: api.getTargetsOverview,
-    refetchInterval: 60000,
+    refetchInterval: usePollInterval(60000),
   });
 };
 
@@ -370,7 +442,7 @@ export const useScrapingActivity = () => {
   return useQuery({
     queryKey: ['scraping-activity'],
     queryFn: api.getScrapingActivity,
-    refetchInterval: 30000,
+    refetchInterval: usePollInterval(30000),
   });
 };
 
@@ -471,7 +543,7 @@ export const useWeeklyReports = (limit: number = 10) => {
   return useQuery({
     queryKey: ['weekly-reports', limit],
     queryFn: () => api.getWeeklyReports(limit),
-    refetchInterval: 60000,
+    refetchInterval: usePollInterval(60000),
   });
 };
 
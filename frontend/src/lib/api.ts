@@ -24,9 +24,11 @@ import type {
   DiscoverAndSaveRequest,
   UpdateJobScheduleRequest,
   JobExecution,
+  JobSubmission,
+  JobDetails,
 } from '@/types';
 
-const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
+export const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
 
 const api = axios.create({
   baseURL: API_BASE_URL,
@@ -46,24 +48,24 @@ export const checkHealth = async (): Promise<{ status: string; endpoints: string
   return data;
 };
 
-// Scraping Operations
-export const scrapeHashtags = async (request: ScrapeHashtagsRequest) => {
+// Scraping Operations (run in the background; follow the returned execution_id with getJob)
+export const scrapeHashtags = async (request: ScrapeHashtagsRequest): Promise<JobSubmission> => {
   const { data } = await api.post('/scrape/hashtags', request);
   return data;
 };
 
-export const scrapeComments = async (request: ScrapeCommentsRequest) => {
+export const scrapeComments = async (request: ScrapeCommentsRequest): Promise<JobSubmission> => {
   const { data } = await api.post('/scrape/comments', request);
   return data;
 };
 
 // Pipeline Operations
-export const runDiscoveryPipeline = async (request: DiscoveryRequest) => {
+export const runDiscoveryPipeline = async (request: DiscoveryRequest): Promise<JobSubmission> => {
   const { data } = await api.post('/pipeline/discovery', request);
   return data;
 };
 
-export const runFullPipeline = async (request: FullPipelineRequest) => {
+export const runFullPipeline = async (request: FullPipelineRequest): Promise<JobSubmission> => {
   const { data } = await api.post('/pipeline/full', request);
   return data;
 };
@@ -109,6 +111,16 @@ export const getJobHistory = async (limit: number = 50): Promise<JobExecution[]>
   return data;
 };
 
+export const getJob = async (executionId: number): Promise<JobDetails> => {
+  const { data } = await api.get(`/jobs/${executionId}`);
+  return data;
+};
+
+export const cancelJob = async (executionId: number): Promise<JobDetails> => {
+  const { data } = await api.post(`/jobs/${executionId}/cancel`);
+  return data;
+};
+
 export const updateJobSchedule = async (jobId: string, data: UpdateJobScheduleRequest) => {
   const { data: response } = await api.post(`/jobs/${jobId}/schedule`, data);
   return response;
@@ -173,131 +185,173 @@ export const discoverAndSave = async (request: DiscoverAndSaveRequest): Promise<
   return data;
 };
 
+// Analytics widgets requested in the same tick (e.g. by the hooks of one dashboard page)
+// are fetched together with one POST /analytics/snapshot
+type PendingWidget = {
+  name: string;
+  params: Record<string, unknown>;
+  resolve: (value: any) => void;
+  reject: (reason: unknown) => void;
+};
+
+let pendingWidgets: PendingWidget[] = [];
+
+const flushWidgets = async () => {
+  const batch = pendingWidgets;
+  pendingWidgets = [];
+  try {
+    const { data } = await api.post('/analytics/snapshot', {
+      widgets: batch.map((widget, i) => ({ name: widget.name, params: widget.params, id: String(i) })),
+    });
+    batch.forEach((widget, i) => {
+      const key = String(i);
+      if (key in data.widgets) {
+        widget.resolve(data.widgets[key]);
+      } else {
+        widget.reject(new Error(data.errors[key] || `Widget ${widget.name} failed`));
+      }
+    });
+  } catch (error) {
+    batch.forEach((widget) => widget.reject(error));
+  }
+};
+
+const getWidget = (name: string, params: Record<string, unknown> = {}): Promise<any> =>
+  new Promise((resolve, reject) => {
+    if (pendingWidgets.length === 0) {
+      setTimeout(flushWidgets, 0);
+    }
+    pendingWidgets.push({ name, params, resolve, reject });
+    if (pendingWidgets.length === 50) {
+      flushWidgets(); // The snapshot endpoint takes up to 50 widgets
+    }
+  });
+
 // Analytics - New real endpoints
 export const getSentimentBreakdown = async () => {
-  const { data } = await api.get('/analytics/sentiment-breakdown');
+  const data = await getWidget('sentiment-breakdown');
   return data;
 };
 
 export const getTopHashtags = async (limit: number = 10) => {
-  const { data } = await api.get(`/analytics/top-hashtags?limit=${limit}`);
+  const data = await getWidget('top-hashtags', { limit });
   return data;
 };
 
 export const getTopTopics = async (limit: number = 10) => {
-  const { data } = await api.get(`/analytics/top-topics?limit=${limit}`);
+  const data = await getWidget('top-topics', { limit });
   return data;
 };
 
 // Engagement Analytics
 export const getEngagementOverview = async () => {
-  const { data } = await api.get('/analytics/engagement-overview');
+  const data = await getWidget('engagement-overview');
   return data;
 };
 
 export const getEngagementByPostType = async () => {
-  const { data } = await api.get('/analytics/engagement-by-post-type');
+  const data = await getWidget('engagement-by-post-type');
   return data;
 };
 
 export const getTopPostsByLikes = async (limit: number = 10) => {
-  const { data } = await api.get(`/analytics/top-posts-by-likes?limit=${limit}`);
+  const data = await getWidget('top-posts-by-likes', { limit });
   return data;
 };
 
 export const getTopPostsByComments = async (limit: number = 10) => {
-  const { data } = await api.get(`/analytics/top-posts-by-comments?limit=${limit}`);
+  const data = await getWidget('top-posts-by-comments', { limit });
   return data;
 };
 
 // Time-based Analytics
 export const getPostsOverTime = async (groupBy: string = 'day', days: number = 30) => {
-  const { data } = await api.get(`/analytics/posts-over-time?group_by=${groupBy}&days=${days}`);
+  const data = await getWidget('posts-over-time', { group_by: groupBy, days });
   return data;
 };
 
 export const getPostingHours = async () => {
-  const { data } = await api.get('/analytics/posting-hours');
+  const data = await getWidget('posting-hours');
   return data;
 };
 
 export const getPostingDays = async () => {
-  const { data } = await api.get('/analytics/posting-days');
+  const data = await getWidget('posting-days');
   return data;
 };
 
 // Author Analytics
 export const getTopAuthors = async (limit: number = 10) => {
-  const { data } = await api.get(`/analytics/top-authors?limit=${limit}`);
+  const data = await getWidget('top-authors', { limit });
   return data;
 };
 
 export const getTopAuthorsByEngagement = async (limit: number = 10) => {
-  const { data } = await api.get(`/analytics/top-authors-by-engagement?limit=${limit}`);
+  const data = await getWidget('top-authors-by-engagement', { limit });
   return data;
 };
 
 export const getAuthorActivity = async (username: string) => {
-  const { data } = await api.get(`/analytics/author-activity?username=${encodeURIComponent(username)}`);
+  const data = await getWidget('author-activity', { username });
   return data;
 };
 
 // Comment Analytics
 export const getCommentStats = async () => {
-  const { data } = await api.get('/analytics/comment-stats');
+  const data = await getWidget('comment-stats');
   return data;
 };
 
 export const getTopCommenters = async (limit: number = 10) => {
-  const { data } = await api.get(`/analytics/top-commenters?limit=${limit}`);
+  const data = await getWidget('top-commenters', { limit });
   return data;
 };
 
 export const getCommentSentimentBreakdown = async () => {
-  const { data } = await api.get('/analytics/comment-sentiment-breakdown');
+  const data = await getWidget('comment-sentiment-breakdown');
   return data;
 };
 
 // Content Analytics
 export const getContentSources = async () => {
-  const { data } = await api.get('/analytics/content-sources');
+  const data = await getWidget('content-sources');
   return data;
 };
 
 export const getCaptionLengthAnalysis = async () => {
-  const { data } = await api.get('/analytics/caption-length-analysis');
+  const data = await getWidget('caption-length-analysis');
   return data;
 };
 
 export const getMentionsAnalysis = async (limit: number = 20) => {
-  const { data } = await api.get(`/analytics/mentions?limit=${limit}`);
+  const data = await getWidget('mentions', { limit });
   return data;
 };
 
 // AI Analytics
 export const getAiCoverage = async () => {
-  const { data } = await api.get('/analytics/ai-coverage');
+  const data = await getWidget('ai-coverage');
   return data;
 };
 
 export const getSentimentBySource = async () => {
-  const { data } = await api.get('/analytics/sentiment-by-source');
+  const data = await getWidget('sentiment-by-source');
   return data;
 };
 
 export const getSentimentTrend = async (days: number = 30) => {
-  const { data } = await api.get(`/analytics/sentiment-trend?days=${days}`);
+  const data = await getWidget('sentiment-trend', { days });
   return data;
 };
 
 // Targets Analytics
 export const getTargetsOverview = async () => {
-  const { data } = await api.get('/analytics/targets-overview');
+  const data = await getWidget('targets-overview');
   return data;
 };
 
 export const getScrapingActivity = async () => {
-  const { data } = await api.get('/analytics/scraping-activity');
+  const data = await getWidget('scraping-activity');
   return data;
 };
 
@@ -0,0 +1,74 @@
+import { API_BASE_URL } from '@/lib/api';
+
+// Events pushed by GET /events (server-sent events)
+export type LiveEvent =
+  | {
+      type: 'job';
+      id: number;
+      at: number;
+      job_id: string;
+      name: string;
+      execution_id: number | null;
+      status: string;
+      stage?: string;
+      details?: Record<string, unknown>;
+      error_message?: string | null;
+    }
+  | { type: 'data'; id: number; at: number; domains: string[] }
+  // Not sent by the API: the stream came back after a drop, events may have been missed
+  | { type: 'reconnected' };
+
+type Listener = (event: LiveEvent) => void;
+
+const listeners = new Set<Listener>();
+const connectionListeners = new Set<() => void>();
+let source: EventSource | null = null;
+let connected = false;
+let wasConnected = false;
+
+const setConnected = (value: boolean) => {
+  if (connected === value) return;
+  connected = value;
+  connectionListeners.forEach((listener) => listener());
+};
+
+const dispatch = (event: LiveEvent) => listeners.forEach((listener) => listener(event));
+
+const open = () => {
+  source = new EventSource(`${API_BASE_URL}/events`);
+  source.onopen = () => {
+    if (wasConnected) dispatch({ type: 'reconnected' });
+    wasConnected = true;
+    setConnected(true);
+  };
+  // The browser reconnects on its own (after the retry delay the API sends)
+  source.onerror = () => setConnected(false);
+  for (const type of ['job', 'data'] as const) {
+    source.addEventListener(type, (message) => dispatch(JSON.parse((message as MessageEvent).data)));
+  }
+};
+
+// One shared connection, open while anything listens
+export const subscribeEvents = (listener: Listener) => {
+  listeners.add(listener);
+  if (!source && typeof EventSource !== 'undefined') open();
+
+  return () => {
+    listeners.delete(listener);
+    if (listeners.size === 0 && source) {
+      source.close();
+      source = null;
+      wasConnected = false;
+      setConnected(false);
+    }
+  };
+};
+
+export const isEventsConnected = () => connected;
+
+export const onConnectionChange = (listener: () => void) => {
+  connectionListeners.add(listener);
+  return () => {
+    connectionListeners.delete(listener);
+  };
+};
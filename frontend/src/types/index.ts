@@ -187,10 +187,19 @@ export interface UpdateJobScheduleRequest {
   day_of_month?: string;
 }
 
+export type JobExecutionStatus =
+  | 'queued'
+  | 'running'
+  | 'cancelling'
+  | 'completed'
+  | 'failed'
+  | 'cancelled'
+  | 'interrupted';
+
 export interface JobExecution {
   id: number;
   job_id: string;
-  status: 'running' | 'completed' | 'failed';
+  status: JobExecutionStatus;
   started_at: string;
   completed_at?: string;
   error_message?: string;
@@ -198,6 +207,35 @@ export interface JobExecution {
   type?: 'hashtag' | 'comments' | 'discovery' | 'full_pipeline';
 }
 
+// Returned by the scrape and pipeline endpoints, which run in the background
+export interface JobSubmission {
+  execution_id: number;
+  job_id: string;
+  status: 'queued';
+}
+
+export interface JobStage {
+  name: string;
+  started_at: string;
+  [detail: string]: string | number;
+}
+
+// GET /jobs/{execution_id}
+export interface JobDetails {
+  execution_id: number;
+  job_id: string;
+  name: string;
+  status: JobExecutionStatus;
+  stage: string | null;
+  stages: JobStage[];
+  params: Record<string, any> | null;
+  result: Record<string, any> | null;
+  cancellable: boolean;
+  started_at: string | null;
+  completed_at: string | null;
+  error_message: string | null;
+}
+
 // API Request Types
 export interface ScrapeHashtagsRequest {
   hashtags: string[];
@@ -0,0 +1,64 @@
+"""
+Gunicorn config for running the API or the inference worker with several processes
+
+    gunicorn app.main:app -c gunicorn.conf.py
+    gunicorn app.services.ai.worker:app -c gunicorn.conf.py
+
+With PRELOAD_MODELS=true the app module's preload_models() runs once in the
+master before forking, so every worker shares the model weights copy-on-write
+instead of loading its own copy. Torch intra-op threads are split across
+workers so they don't oversubscribe the cores. Check the sharing with
+GET /ai/memory (API) or GET /memory (inference worker).
+"""
+import gc
+import importlib
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+worker_class = 'uvicorn.workers.UvicornWorker'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '300'))  # Summarization can be slow on CPU
+
+preload_app = os.getenv('PRELOAD_MODELS', 'true').lower() == 'true'
+
+
+def when_ready(server):
+    """Runs in the master after the app is imported and before workers are forked"""
+    if not preload_app:
+        return
+
+    module = importlib.import_module(server.app.app_uri.split(':')[0])
+    preload = getattr(module, 'preload_models', None)
+    if preload is None:
+        server.log.info(f"{server.app.app_uri} has no preload_models(), nothing to preload")
+        return
+
+    server.log.info("Preloading models in the master process...")
+    try:
+        import torch
+        torch.set_num_threads(1)  # Don't start a multi-threaded OpenMP pool in the master, it doesn't survive fork
+    except ImportError:
+        pass
+    preload()
+
+    # Move everything allocated so far out of the GC's reach; otherwise the
+    # first collection in each worker touches every object and un-shares its page
+    gc.collect()
+    gc.freeze()
+    server.log.info("Models preloaded, forking workers")
+
+
+def post_fork(server, worker):
+    """Give each worker its share of the cores for torch intra-op parallelism"""
+    try:
+        import torch
+    except ImportError:
+        return
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # Already set (inter-op pool started before fork)
+    server.log.info(f"Worker {worker.pid}: torch using {threads} threads")
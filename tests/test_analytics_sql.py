@@ -0,0 +1,368 @@
+"""
+Regression tests: the SQL analytics widgets against the Python loops they replaced
+
+The baseline_* functions are equivalent to the loop implementations from
+before the widgets moved to grouped queries: same branches and arithmetic,
+but selecting only the columns they read instead of whole rows. AI coverage
+now counts the work queue rather than ai_results, so its seeded queue rows are
+done exactly when the row carries a sentiment result, as the jobs keep them;
+the test then checks the queue aggregate against the old ai_results count.
+Each test seeds edge cases (NULL ai_results, results without a sentiment or a
+label, odd label casing, empty captions, the caption bucket boundaries, NULL
+sources and timestamps) and compares both outputs.
+
+Needs a Postgres database: set TEST_DATABASE_URL (its tables are created if
+missing, and every test rolls back what it wrote).
+"""
+from datetime import datetime, timedelta
+import os
+import pytest
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+if not TEST_DATABASE_URL:
+    pytest.skip("TEST_DATABASE_URL is not set", allow_module_level=True)
+
+os.environ['DATABASE_URL'] = TEST_DATABASE_URL
+os.environ.setdefault('APIFY_API_TOKEN', 'test')
+
+from sqlalchemy import null  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+from app import analytics  # noqa: E402
+from app.database import engine, init_db  # noqa: E402
+from app.models import AITask, Comment, Post  # noqa: E402
+
+
+# ============================================================================
+# Baseline loop implementations
+# ============================================================================
+
+def _count_labels(rows, counts=None) -> dict:
+    counts = counts or {"positive": 0, "neutral": 0, "negative": 0}
+    for (ai_results,) in rows:
+        if ai_results and isinstance(ai_results, dict) and "sentiment" in ai_results:
+            label = ai_results["sentiment"].get("label", "").lower()
+            if label == "positive":
+                counts["positive"] += 1
+            elif label == "negative":
+                counts["negative"] += 1
+            else:
+                counts["neutral"] += 1
+    return counts
+
+
+def baseline_sentiment_breakdown(db, exclude_spam=False) -> dict:
+    counts = _count_labels(db.query(Post.ai_results).filter(Post.ai_results.isnot(None)))
+    query = db.query(Comment.ai_results).filter(Comment.ai_results.isnot(None))
+    if exclude_spam:
+        query = query.filter(Comment.is_spam.isnot(True))
+    counts = _count_labels(query, counts)
+    return {**counts, "total": counts["positive"] + counts["neutral"] + counts["negative"]}
+
+
+def baseline_comment_sentiment_breakdown(db, exclude_spam=False) -> dict:
+    query = db.query(Comment.ai_results).filter(Comment.ai_results.isnot(None))
+    if exclude_spam:
+        query = query.filter(Comment.is_spam.isnot(True))
+    counts = _count_labels(query)
+    return {**counts, "total": counts["positive"] + counts["neutral"] + counts["negative"]}
+
+
+def baseline_author_activity(db, username) -> dict:
+    posts = db.query(Post).filter(Post.owner_username == username).all()
+    if not posts:
+        raise ValueError("Author not found")
+
+    return {
+        "username": username,
+        "post_count": len(posts),
+        "total_likes": sum(p.likes_count or 0 for p in posts),
+        "total_comments": sum(p.comments_count or 0 for p in posts),
+        "avg_likes": round(sum(p.likes_count or 0 for p in posts) / len(posts), 2),
+        "avg_comments": round(sum(p.comments_count or 0 for p in posts) / len(posts), 2),
+        "post_types": list(set(p.post_type for p in posts if p.post_type)),
+        "recent_posts": [
+            {
+                "post_id": p.post_id,
+                "caption": (p.caption[:100] + "...") if p.caption and len(p.caption) > 100 else p.caption,
+                "likes_count": p.likes_count,
+                "comments_count": p.comments_count,
+                "timestamp": p.timestamp.isoformat() if p.timestamp else None,
+            }
+            for p in sorted(posts, key=lambda x: x.timestamp or datetime.min, reverse=True)[:5]
+        ]
+    }
+
+
+def baseline_caption_length_analysis(db) -> list[dict]:
+    ranges = {
+        "0-50": {"count": 0, "total_likes": 0, "total_comments": 0},
+        "51-100": {"count": 0, "total_likes": 0, "total_comments": 0},
+        "101-200": {"count": 0, "total_likes": 0, "total_comments": 0},
+        "201-500": {"count": 0, "total_likes": 0, "total_comments": 0},
+        "500+": {"count": 0, "total_likes": 0, "total_comments": 0},
+    }
+
+    for caption, likes_count, comments_count in db.query(Post.caption, Post.likes_count, Post.comments_count)\
+            .filter(Post.caption.isnot(None)):
+        length = len(caption)
+        if length <= 50:
+            key = "0-50"
+        elif length <= 100:
+            key = "51-100"
+        elif length <= 200:
+            key = "101-200"
+        elif length <= 500:
+            key = "201-500"
+        else:
+            key = "500+"
+
+        ranges[key]["count"] += 1
+        ranges[key]["total_likes"] += likes_count or 0
+        ranges[key]["total_comments"] += comments_count or 0
+
+    return [
+        {
+            "range": k,
+            "count": v["count"],
+            "avg_likes": round(v["total_likes"] / v["count"], 2) if v["count"] > 0 else 0,
+            "avg_comments": round(v["total_comments"] / v["count"], 2) if v["count"] > 0 else 0,
+        }
+        for k, v in ranges.items()
+    ]
+
+
+def baseline_ai_coverage(db) -> dict:
+    total_posts = db.query(Post).count()
+    total_comments = db.query(Comment).count()
+
+    posts_with_ai = 0
+    comments_with_ai = 0
+    for (ai_results,) in db.query(Post.ai_results).filter(Post.ai_results.isnot(None)):
+        if ai_results and isinstance(ai_results, dict) and 'sentiment' in ai_results:
+            posts_with_ai += 1
+    for (ai_results,) in db.query(Comment.ai_results).filter(Comment.ai_results.isnot(None)):
+        if ai_results and isinstance(ai_results, dict) and 'sentiment' in ai_results:
+            comments_with_ai += 1
+
+    return {
+        "posts": {
+            "total": total_posts,
+            "analyzed": posts_with_ai,
+            "pending": total_posts - posts_with_ai,
+            "coverage_percent": round((posts_with_ai / total_posts * 100), 1) if total_posts > 0 else 0
+        },
+        "comments": {
+            "total": total_comments,
+            "analyzed": comments_with_ai,
+            "pending": total_comments - comments_with_ai,
+            "coverage_percent": round((comments_with_ai / total_comments * 100), 1) if total_comments > 0 else 0
+        }
+    }
+
+
+def baseline_sentiment_by_source(db) -> list[dict]:
+    source_sentiment = {}
+    for source, ai_results in db.query(Post.source, Post.ai_results).filter(
+        Post.ai_results.isnot(None),
+        Post.source.isnot(None)
+    ):
+        counts = source_sentiment.setdefault(source, {"positive": 0, "neutral": 0, "negative": 0})
+        if ai_results and "sentiment" in ai_results:
+            label = ai_results["sentiment"].get("label", "").lower()
+            if label in counts:
+                counts[label] += 1
+
+    return [
+        {"source": source, **counts, "total": counts["positive"] + counts["neutral"] + counts["negative"]}
+        for source, counts in source_sentiment.items()
+    ]
+
+
+def baseline_sentiment_trend(db, days=30) -> list[dict]:
+    cutoff_date = datetime.utcnow() - timedelta(days=days)
+
+    date_sentiment = {}
+    for timestamp, ai_results in db.query(Post.timestamp, Post.ai_results).filter(
+        Post.ai_results.isnot(None),
+        Post.timestamp >= cutoff_date,
+        Post.timestamp.isnot(None)
+    ):
+        counts = date_sentiment.setdefault(timestamp.strftime("%Y-%m-%d"), {"positive": 0, "neutral": 0, "negative": 0})
+        if ai_results and "sentiment" in ai_results:
+            label = ai_results["sentiment"].get("label", "").lower()
+            if label in counts:
+                counts[label] += 1
+
+    return [{"date": date, **date_sentiment[date]} for date in sorted(date_sentiment)]
+
+
+# ============================================================================
+# Fixtures
+# ============================================================================
+
+# Stored ai_results variants, cycled over the seeded rows
+AI_RESULTS = [
+    None,  # JSON null (SQL NULL on every other row, see seeded)
+    {},
+    {'topics': ['news']},  # Other tasks only
+    {'sentiment': {'score': 0.7}},  # No label
+    {'sentiment': {'label': 'positive', 'score': 0.9}},
+    {'sentiment': {'label': 'NEGATIVE', 'score': 0.8}},
+    {'sentiment': {'label': 'neutral', 'score': 0.5}},
+    {'sentiment': {'label': 'Positive', 'score': 0.6, 'probs': [0.1, 0.1, 0.1, 0.4, 0.3]}},
+    {'sentiment': {'label': 'mixed', 'score': 0.4}},  # Neither positive, neutral nor negative
+]
+
+# Caption lengths around the bucket bounds (51, 101, 201, 501)
+CAPTION_LENGTHS = [0, 1, 50, 51, 100, 101, 200, 201, 500, 501, 1200]
+
+
+def _ai_results(i: int):
+    result = AI_RESULTS[i % len(AI_RESULTS)]
+    return null() if result is None and i % 2 else result
+
+
+@pytest.fixture(scope='module', autouse=True)
+def schema():
+    init_db()
+
+
+@pytest.fixture
+def db():
+    """Session whose writes are rolled back after the test"""
+    connection = engine.connect()
+    transaction = connection.begin()
+    session = Session(bind=connection, join_transaction_mode='create_savepoint')
+    try:
+        yield session
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
+
+
+@pytest.fixture
+def seeded(db):
+    now = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+    sources = ['hashtag', 'profile', None, 'tagged']
+    post_types = ['Photo', 'Video', None, 'Reel']
+
+    posts = []
+    for i in range(40):
+        length = CAPTION_LENGTHS[i % len(CAPTION_LENGTHS)]
+        posts.append(Post(
+            post_id=f"test-analytics-{i}",
+            owner_username=f"test-analytics-author{i % 3}",
+            caption=None if i % 13 == 12 else ('x' if i % 2 else 'س') * length,  # Multi-byte characters count as one
+            post_type=post_types[i % len(post_types)],
+            likes_count=None if i % 11 == 10 else i * 7,
+            comments_count=None if i % 17 == 16 else i * 3,
+            timestamp=None if i % 19 == 18 else now - timedelta(days=i, hours=i % 5),
+            source=sources[i % len(sources)],
+            ai_results=_ai_results(i),
+        ))
+    db.add_all(posts)
+    db.flush()
+
+    comments = []
+    for i in range(60):
+        comments.append(Comment(
+            comment_id=f"test-analytics-comment-{i}",
+            post_id=posts[i % len(posts)].id,
+            comment_text=f"comment {i}",
+            timestamp=now - timedelta(days=i % 10),
+            is_spam=[False, True, None][i % 3],
+            ai_results=_ai_results(i + 2),
+        ))
+    db.add_all(comments)
+    db.flush()
+
+    # Sentiment tasks are done exactly for rows with a stored result, as the jobs leave them
+    unfinished = ['pending', 'failed', 'running']
+
+    def sentiment_status(i, ai_results):
+        return 'done' if isinstance(ai_results, dict) and 'sentiment' in ai_results else unfinished[i % len(unfinished)]
+
+    db.add_all([
+        AITask(entity_type='post', entity_id=p.id, task='sentiment', status=sentiment_status(i, _ai_results(i)))
+        for i, p in enumerate(posts)
+    ] + [
+        AITask(entity_type='comment', entity_id=c.id, task='sentiment', status=sentiment_status(i, _ai_results(i + 2)))
+        for i, c in enumerate(comments)
+    ] + [
+        AITask(entity_type='post', entity_id=p.id, task='topics', status='done') for p in posts[:5]
+    ])
+    db.flush()
+    return db
+
+
+# ============================================================================
+# Tests
+# ============================================================================
+
+@pytest.mark.parametrize('exclude_spam', [False, True])
+def test_sentiment_breakdown(seeded, exclude_spam):
+    assert analytics.sentiment_breakdown(seeded, exclude_spam) == baseline_sentiment_breakdown(seeded, exclude_spam)
+
+
+@pytest.mark.parametrize('exclude_spam', [False, True])
+def test_comment_sentiment_breakdown(seeded, exclude_spam):
+    assert analytics.comment_sentiment_breakdown(seeded, exclude_spam) == \
+        baseline_comment_sentiment_breakdown(seeded, exclude_spam)
+
+
+def test_ai_coverage(seeded):
+    """Queue counts match the old ai_results count (rows outside the seed must have a consistent queue too)"""
+    assert analytics.ai_coverage(seeded) == baseline_ai_coverage(seeded)
+
+
+def test_sentiment_by_source(seeded):
+    def by_source(rows):
+        return sorted(rows, key=lambda r: r['source'])
+    assert by_source(analytics.sentiment_by_source(seeded)) == by_source(baseline_sentiment_by_source(seeded))
+
+
+@pytest.mark.parametrize('days', [1, 7, 30, 365])
+def test_sentiment_trend(seeded, days):
+    assert analytics.sentiment_trend(seeded, days) == baseline_sentiment_trend(seeded, days)
+
+
+def test_caption_length_analysis(seeded):
+    assert analytics.caption_length_analysis(seeded) == baseline_caption_length_analysis(seeded)
+
+
+def test_caption_length_boundaries(db):
+    """Each boundary length lands in its documented bucket, not just in the same one as the baseline"""
+    before = [r['count'] for r in analytics.caption_length_analysis(db)]
+    db.add_all([
+        Post(post_id=f"test-analytics-bound-{length}", caption='x' * length)
+        for length in CAPTION_LENGTHS
+    ])
+    db.flush()
+    after = [r['count'] for r in analytics.caption_length_analysis(db)]
+    # 0-50: 0, 1, 50 / 51-100: 51, 100 / 101-200: 101, 200 / 201-500: 201, 500 / 500+: 501, 1200
+    assert [a - b for a, b in zip(after, before)] == [3, 2, 2, 2, 2]
+
+
+@pytest.mark.parametrize('username', ['test-analytics-author0', 'test-analytics-author1', 'test-analytics-author2'])
+def test_author_activity(seeded, username):
+    result = analytics.author_activity(seeded, username)
+    expected = baseline_author_activity(seeded, username)
+    assert sorted(result.pop('post_types')) == sorted(expected.pop('post_types'))
+    assert result == expected
+
+
+def test_author_activity_unknown(seeded):
+    with pytest.raises(ValueError):
+        analytics.author_activity(seeded, 'nobody-test-analytics')
+
+
+def test_empty_tables(db):
+    """Same answers before any content exists (only meaningful on an empty database)"""
+    if db.query(Post).count() or db.query(Comment).count():
+        pytest.skip("Test database already has content")
+    assert analytics.sentiment_breakdown(db) == baseline_sentiment_breakdown(db)
+    assert analytics.caption_length_analysis(db) == baseline_caption_length_analysis(db)
+    assert analytics.ai_coverage(db) == baseline_ai_coverage(db)
+    assert analytics.sentiment_by_source(db) == baseline_sentiment_by_source(db)
+    assert analytics.sentiment_trend(db) == baseline_sentiment_trend(db)